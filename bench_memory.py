@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: memory per logical brick, brick objects vs. compact BrickStore records
+
+Measures with tracemalloc how much memory the logical bricks take (without grid and
+3d-objects), once as headless RectangularBrick objects and once as BrickStore rows.
+
+    python bench_memory.py                       # 10k, 100k, 1M bricks
+    python bench_memory.py --counts 10000 50000
+    python bench_memory.py --max-objects 1000000 # also build 1M brick objects (several GB)
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+
+from brickstack import *
+from brickstack_records import BrickStore
+
+
+def random_bricks(count, seed = 1):
+    """Brick arguments in add_brick order (grid units)"""
+    rng = random.Random(seed)
+    colors = [color.red, color.blue, color.yellow, color.green, color.white]
+    orientations = [NORTH, EAST, SOUTH, WEST]
+    return [("rect", rng.choice([1, 2, 4, 8]), rng.choice([1, 2]), rng.choice([1 / 3, 1, 2]),
+             rng.randint(-500, 500), rng.randint(-500, 500), rng.randint(0, 50) / 3,
+             rng.choice(colors), rng.choice(orientations)) for _ in range(count)]
+
+def measure(build):
+    """Bytes allocated by build() that are still alive afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current
+
+def build_objects(bricks):
+    return [BrickFactory.create_brick("lego", *brick_args, False) for brick_args in bricks]
+
+def build_store(bricks):
+    store = BrickStore("lego")
+    store.extend(bricks)
+    return store
+
+def run_benchmark(counts = (10_000, 100_000, 1_000_000), max_objects = 100_000):
+    """Print bytes per brick for both layouts
+
+    Returns:
+        list: one dict per count
+    """
+    results = []
+    print(f"{'bricks':>10}{'objects [B/brick]':>20}{'store [B/brick]':>18}{'ratio':>8}")
+    for count in counts:
+        bricks = random_bricks(count)
+        store_bytes = measure(lambda: build_store(bricks))
+        object_bytes = measure(lambda: build_objects(bricks)) if count <= max_objects else None
+        result = {"bricks": count, "store_bytes": store_bytes, "object_bytes": object_bytes}
+        results.append(result)
+
+        object_column = f"{object_bytes / count:>20.1f}" if object_bytes is not None else f"{'skipped':>20}"
+        ratio_column = f"{object_bytes / store_bytes:>8.1f}" if object_bytes is not None else f"{'-':>8}"
+        print(f"{count:>10}{object_column}{store_bytes / count:>18.1f}{ratio_column}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type = int, nargs = "+", default = [10_000, 100_000, 1_000_000])
+    parser.add_argument("--max-objects", type = int, default = 100_000, help = "skip brick objects above this count")
+    args = parser.parse_args()
+    run_benchmark(args.counts, args.max_objects)
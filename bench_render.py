@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: one 3d-object per brick vs. chunked scenes
+
+Builds the same wall-grid for every mode and reports build time and the number of
+draw objects. With --render the scenes are shown in the browser and the frame time
+is measured while the camera circles the model (needs a vpython canvas).
+
+    python bench_render.py                 # headless: build time, draw objects
+    python bench_render.py --render        # additionally frame times
+    python bench_render.py --size 64 --layers 8 --chunk-size 16
+"""
+
+import argparse
+import time
+from math import cos, sin, pi
+
+from brickstack import *
+
+
+def build_scene(size, layers, chunk_size, render):
+    """Grid of 2x2 bricks, size x size studs, layers high"""
+    project = BrickProject("lego", render=render, chunk_size=chunk_size)
+    scene = project.add_scene()
+    positions = [(x, y) for x in range(0, size, 2) for y in range(0, size, 2)]
+    for layer in range(layers):
+        scene.add_bricks(length=2, width=2,
+                         x_pos=[x for x, y in positions],
+                         y_pos=[y for x, y in positions],
+                         brick_color=color.red if layer % 2 else color.blue)
+    return scene
+
+def measure_frames(scene, frames):
+    """Average seconds per frame while the camera circles the scene"""
+    import vpython
+    canvas_obj = scene.scene
+    center = canvas_obj.center
+    radius = canvas_obj.camera.pos.mag
+    canvas_obj.waitfor("draw_complete")
+    start = time.perf_counter()
+    for frame in range(frames):
+        angle = 2 * pi * frame / frames
+        canvas_obj.camera.pos = center + vpython.vector(radius * cos(angle), radius * sin(angle), radius / 2)
+        canvas_obj.camera.axis = center - canvas_obj.camera.pos
+        canvas_obj.waitfor("draw_complete")
+    return (time.perf_counter() - start) / frames
+
+def run_benchmark(size = 64, layers = 4, chunk_size = 16, render = False, frames = 60):
+    """Run both modes and print a table
+
+    Returns:
+        list: one dict per mode
+    """
+    results = []
+    for name, mode_chunk_size in [("per brick", None), (f"chunked {chunk_size}", chunk_size)]:
+        start = time.perf_counter()
+        scene = build_scene(size, layers, mode_chunk_size, render)
+        build_time = time.perf_counter() - start
+        result = {
+            "mode": name,
+            "bricks": len(scene.bricks),
+            "draw_objects": scene.get_draw_object_count(),
+            "build_s": build_time,
+        }
+        if render:
+            result["frame_ms"] = measure_frames(scene, frames) * 1000
+        results.append(result)
+
+    print(f"{'mode':<14}{'bricks':>8}{'draw objects':>14}{'build [s]':>11}" + (f"{'frame [ms]':>12}" if render else ""))
+    for result in results:
+        line = f"{result['mode']:<14}{result['bricks']:>8}{result['draw_objects']:>14}{result['build_s']:>11.3f}"
+        if render:
+            line += f"{result['frame_ms']:>12.2f}"
+        print(line)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type = int, default = 64, help = "edge of the model in studs")
+    parser.add_argument("--layers", type = int, default = 4)
+    parser.add_argument("--chunk-size", type = int, default = 16)
+    parser.add_argument("--render", action = "store_true", help = "render in the browser and measure frame times")
+    parser.add_argument("--frames", type = int, default = 60)
+    args = parser.parse_args()
+    run_benchmark(args.size, args.layers, args.chunk_size, args.render, args.frames)
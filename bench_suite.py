@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite: occupancy grids, brick placement and geometry generation
+
+Every benchmark reports the best of --repeat runs. Results are printed as a table
+and can be written as JSON to track them over time (one file per run/commit).
+
+    python bench_suite.py                        # headless benchmarks
+    python bench_suite.py --json results.json    # machine-readable results
+    python bench_suite.py --render               # also baseplate/stud/brick geometry (needs a vpython canvas)
+    python bench_suite.py --filter grid --scale 0.1
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from brickstack import *
+import roman_bond_house
+
+
+# name -> (function, needs_render); functions take the scale and return (operations, callable)
+BENCHMARKS = {}
+
+def benchmark(name, needs_render = False):
+    """Register a benchmark function under name"""
+    def register(function):
+        BENCHMARKS[name] = (function, needs_render)
+        return function
+    return register
+
+def random_footprints(count, seed = 0):
+    rng = random.Random(seed)
+    return [(rng.randint(-100, 100), rng.randint(-100, 100), rng.choice([1, 2, 4, 8]), rng.choice([1, 2])) for _ in range(count)]
+
+def headless_scene(brick_system = "lego", **options):
+    return BrickProject(brick_system, render = False, **options).add_scene()
+
+##### IMPORT #####
+
+def start_python(code, scale):
+    # fresh interpreter per run: the timings include interpreter start-up ("import.python")
+    runs = max(1, int(10 * scale))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    def run():
+        for _ in range(runs):
+            subprocess.run([sys.executable, "-c", code], cwd = directory, check = True)
+    return runs, run
+
+@benchmark("import.python")
+def bench_import_python(scale):
+    return start_python("pass", scale)
+
+@benchmark("import.brickstack")
+def bench_import_brickstack(scale):
+    return start_python("import brickstack", scale)
+
+##### OCCUPANCY GRID #####
+
+def grid_add_brick(grid_backend, scale):
+    footprints = random_footprints(int(20_000 * scale))
+    def run():
+        grid = create_occupancy_grid(grid_backend)
+        for x, y, x_extension, y_extension in footprints:
+            grid.add_brick(x, y, grid.get_next_z(x, y, x_extension, y_extension), x_extension, y_extension, 1)
+    return len(footprints), run
+
+def grid_get_next_z(grid_backend, scale):
+    footprints = random_footprints(int(20_000 * scale))
+    grid = create_occupancy_grid(grid_backend)
+    for x, y, x_extension, y_extension in footprints:
+        grid.add_brick(x, y, grid.get_next_z(x, y, x_extension, y_extension), x_extension, y_extension, 1)
+    queries = random_footprints(len(footprints), seed = 1)
+    def run():
+        for x, y, x_extension, y_extension in queries:
+            grid.get_next_z(x, y, x_extension, y_extension)
+    return len(queries), run
+
+def grid_remove_brick(grid_backend, scale):
+    footprints = random_footprints(int(20_000 * scale))
+    grid = create_occupancy_grid(grid_backend)
+    bricks = []
+    for x, y, x_extension, y_extension in footprints:
+        bricks.append((x, y, grid.get_next_z(x, y, x_extension, y_extension), x_extension, y_extension, 1))
+        grid.add_brick(*bricks[-1])
+    def run():
+        # remove and add back every brick: the grid is the same after each run
+        for brick in bricks:
+            grid.remove_brick(*brick)
+            grid.add_brick(*brick)
+    return len(bricks), run
+
+@benchmark("grid.add_brick[dict]")
+def bench_grid_add_dict(scale):
+    return grid_add_brick("dict", scale)
+
+@benchmark("grid.add_brick[heightmap]")
+def bench_grid_add_heightmap(scale):
+    return grid_add_brick("heightmap", scale)
+
+@benchmark("grid.get_next_z[dict]")
+def bench_grid_next_z_dict(scale):
+    return grid_get_next_z("dict", scale)
+
+@benchmark("grid.get_next_z[heightmap]")
+def bench_grid_next_z_heightmap(scale):
+    return grid_get_next_z("heightmap", scale)
+
+@benchmark("grid.remove_brick[dict]")
+def bench_grid_remove_dict(scale):
+    return grid_remove_brick("dict", scale)
+
+@benchmark("grid.remove_brick[heightmap]")
+def bench_grid_remove_heightmap(scale):
+    return grid_remove_brick("heightmap", scale)
+
+##### SCENE PLACEMENT (headless) #####
+
+@benchmark("scene.tower")
+def bench_tower(scale):
+    count = int(2_000 * scale)
+    def run():
+        scene = headless_scene()
+        for _ in range(count):
+            scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    return count, run
+
+@benchmark("scene.wall")
+def bench_wall(scale):
+    rows, columns = 20, int(250 * scale)
+    def run():
+        scene = headless_scene()
+        for row in range(rows):
+            offset = 2 * (row % 2)
+            for column in range(columns):
+                scene.add_brick("rect", 4, 2, 1, column * 4 + offset, 0, 0, color.red, NORTH)
+    return rows * columns, run
+
+@benchmark("scene.random_fill")
+def bench_random_fill(scale):
+    footprints = random_footprints(int(10_000 * scale))
+    def run():
+        scene = headless_scene()
+        for x, y, length, width in footprints:
+            scene.add_brick("rect", length, width, 1, x, y, 0, color.red, NORTH)
+    return len(footprints), run
+
+@benchmark("scene.random_fill_traced")
+def bench_random_fill_traced(scale):
+    from brickstack_trace import AggregateSink, tracing
+    count, fill = bench_random_fill(scale)
+    def run():
+        with tracing(AggregateSink()):
+            fill()
+    return count, run
+
+@benchmark("scene.random_fill_batch")
+def bench_random_fill_batch(scale):
+    footprints = random_footprints(int(10_000 * scale))
+    bricks = [("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints]
+    def run():
+        headless_scene().add_bricks(bricks)
+    return len(bricks), run
+
+@benchmark("scene.random_fill_async")
+def bench_random_fill_async(scale):
+    # includes the idle part of every frame (60 fps, half of each frame for adding bricks)
+    import asyncio
+    footprints = random_footprints(int(10_000 * scale))
+    bricks = [("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints]
+    def run():
+        asyncio.run(headless_scene().add_bricks_async(bricks, frame_rate = 60))
+    return len(bricks), run
+
+@benchmark("scene.random_fill_records")
+def bench_random_fill_records(scale):
+    footprints = random_footprints(int(10_000 * scale))
+    bricks = [("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints]
+    def run():
+        headless_scene(brick_objects = False).add_bricks(bricks)
+    return len(bricks), run
+
+@benchmark("scene.random_fill_strict")
+def bench_random_fill_strict(scale):
+    footprints = random_footprints(int(10_000 * scale))
+    bricks = [("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints]
+    def run():
+        headless_scene(brick_objects = False, strict = True).add_bricks(bricks)
+    return len(bricks), run
+
+def remove_undo(scale, connectivity = False):
+    footprints = random_footprints(int(10_000 * scale))
+    scene = headless_scene()
+    bricks = scene.add_bricks([("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints])
+    if connectivity:
+        # kept up to date by every removal and undo
+        scene.get_connectivity()
+    def run():
+        for brick in bricks[::-1]:
+            scene.remove_brick(brick)
+            scene.undo()
+    return len(bricks), run
+
+@benchmark("scene.remove_undo")
+def bench_remove_undo(scale):
+    return remove_undo(scale)
+
+@benchmark("scene.remove_undo[connectivity]")
+def bench_remove_undo_connectivity(scale):
+    return remove_undo(scale, connectivity = True)
+
+@benchmark("scene.connectivity")
+def bench_connectivity(scale):
+    footprints = random_footprints(int(100_000 * scale))
+    scene = headless_scene(brick_objects = False)
+    scene.add_bricks([("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints])
+    def run():
+        scene.connectivity = None
+        connectivity = scene.get_connectivity()
+        connectivity.get_floating()
+        connectivity.get_weak_joints()
+    return len(footprints), run
+
+@benchmark("scene.validate")
+def bench_validate(scale):
+    footprints = random_footprints(int(50_000 * scale))
+    scene = headless_scene(brick_objects = False)
+    scene.add_bricks([("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in footprints])
+    def run():
+        scene.validate()
+    return len(footprints), run
+
+@benchmark("scene.roman_bond_house")
+def bench_roman_bond_house(scale):
+    houses = max(1, int(20 * scale))
+    def build_house():
+        scene = headless_scene("duplo")
+        for row in range(6):
+            offset = row % 2
+            roman_bond_house.build_house_walls(scene, row, offset, offset, color.red, 10, 10, 4, 2)
+        return scene
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(houses):
+                build_house()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bricks_per_house = len(build_house().bricks)
+    return houses * bricks_per_house, run
+
+##### BRICK MAP #####
+
+@benchmark("map.get_next_z")
+def bench_map_next_z(scale):
+    from brickstack_mmap import BrickMap
+    scene = headless_scene(brick_objects = False)
+    scene.add_bricks([("rect", length, width, 1, x, y, 0, color.red, NORTH)
+                      for x, y, length, width in random_footprints(int(100_000 * scale))], return_bricks = False)
+    path = os.path.join(tempfile.mkdtemp(), "bench.brickmap")
+    scene.save_map(path)
+    brick_map = BrickMap(path)
+    queries = random_footprints(int(5_000 * scale), seed = 1)
+    def run():
+        for x, y, x_extension, y_extension in queries:
+            brick_map.get_next_z(x, y, x_extension, y_extension)
+    return len(queries), run
+
+##### VERTEX BUFFERS #####
+
+def vertex_buffers(scale, processes):
+    from brickstack_buffers import generate_buffers
+    scene = headless_scene(cull_hidden_studs = True)
+    scene.add_bricks([("rect", length, width, 1, x, y, 0, color.red, NORTH) for x, y, length, width in random_footprints(int(20_000 * scale))])
+    parts = [brick.get_mesh_part() for brick in scene.bricks]
+    specs = BasicBrick.BRICK_SPECS["lego"]
+    def run():
+        for buffers in generate_buffers(parts, specs, processes):
+            pass
+    return len(parts), run
+
+@benchmark("buffers.generate[serial]")
+def bench_buffers_serial(scale):
+    return vertex_buffers(scale, 1)
+
+@benchmark("buffers.generate[pool]")
+def bench_buffers_pool(scale):
+    return vertex_buffers(scale, None)
+
+def assemble_buffers(brick_system, scale):
+    # main thread part of geometry="buffers": 3d-objects from finished buffers
+    from brickstack_buffers import generate_buffers
+    specs = BasicBrick.BRICK_SPECS[brick_system]
+    parts = [("brick", (index * 4, 0, 0, 4, 2, 1), "hollow" if specs["is_hollow"] else "solid", frozenset()) for index in range(int(200 * scale))]
+    buffers = list(generate_buffers(parts, specs, 1))
+    def run():
+        for part_buffers in buffers:
+            build_buffer_compound(*part_buffers, color.red).visible = False
+    return len(buffers), run
+
+@benchmark("buffers.assemble[lego]", needs_render = True)
+def bench_buffers_assemble_lego(scale):
+    return assemble_buffers("lego", scale)
+
+@benchmark("buffers.assemble[duplo]", needs_render = True)
+def bench_buffers_assemble_duplo(scale):
+    return assemble_buffers("duplo", scale)
+
+##### STUD LAYOUT #####
+
+def layout_columns(scale):
+    footprints = random_footprints(int(100_000 * scale))
+    count = len(footprints)
+    return ([length for x, y, length, width in footprints], [width for x, y, length, width in footprints], [1] * count,
+            [x for x, y, length, width in footprints], [y for x, y, length, width in footprints], [0] * count,
+            ("N", "E", "S", "W") * (count // 4) + ("N",) * (count % 4))
+
+@benchmark("layout.batch")
+def bench_layout_batch(scale):
+    from brickstack_layout import layout_bricks
+    columns = layout_columns(scale)
+    specs = BasicBrick.BRICK_SPECS["lego"]
+    return len(columns[0]), lambda: layout_bricks(*columns, specs)
+
+@benchmark("layout.stud_cells")
+def bench_layout_stud_cells(scale):
+    scene = headless_scene()
+    orientations = (NORTH, EAST, SOUTH, WEST)
+    scene.add_bricks([("rect", length, width, 1, x, y, 0, color.red, orientations[index % 4])
+                      for index, (x, y, length, width) in enumerate(random_footprints(int(20_000 * scale)))])
+    def run():
+        for brick in scene.bricks:
+            for cell, stud in brick.stud_cells():
+                pass
+    return len(scene.bricks), run
+
+def layout_rows(scale):
+    brick_colors = ((1, 0, 0), (0, 0, 1))
+    return [("rect", length, width, 1, x, y, z, brick_colors[x % 2], orientation)
+            for length, width, height, x, y, z, orientation in zip(*layout_columns(scale))]
+
+@benchmark("layout.scene_mesh")
+def bench_layout_scene_mesh(scale):
+    from brickstack_mesh import scene_mesh
+    rows = layout_rows(scale * 0.2)
+    specs = BasicBrick.BRICK_SPECS["lego"]
+    return len(rows), lambda: scene_mesh(rows, (), specs)
+
+@benchmark("layout.export_glb")
+def bench_layout_export_glb(scale):
+    from brickstack_export import export_glb
+    rows = layout_rows(scale * 0.2)
+    specs = BasicBrick.BRICK_SPECS["lego"]
+    path = os.path.join(tempfile.mkdtemp(), "bench.glb")
+    return len(rows), lambda: export_glb(path, lambda: [rows], (), specs)
+
+##### GEOMETRY (needs a canvas) #####
+
+@benchmark("geometry.baseplate[duplo]", needs_render = True)
+def bench_baseplate_duplo(scale):
+    return 1, lambda: Baseplate("duplo", color.green, render = True)
+
+@benchmark("geometry.baseplate[lego]", needs_render = True)
+def bench_baseplate_lego(scale):
+    return 1, lambda: Baseplate("lego", color.green, render = True)
+
+@benchmark("geometry.baseplate[lego,uncached]", needs_render = True)
+def bench_baseplate_lego_uncached(scale):
+    def run():
+        cache = Baseplate.compound_cache
+        Baseplate.compound_cache = None
+        try:
+            Baseplate("lego", color.green, render = True)
+        finally:
+            Baseplate.compound_cache = cache
+    return 1, run
+
+def stud_benchmark(stud_mode, scale):
+    count = int(500 * scale)
+    def run():
+        previous_mode = BasicBrick.STUD_MODE
+        BasicBrick.STUD_MODE = stud_mode
+        try:
+            brick = RectangularBrick("duplo", 1, 1, 1, 0, 0, 0, color.red, NORTH, render = False)
+            for index in range(count):
+                brick.make_stud(vector(index * 16, 0, 0), hollow = True)
+        finally:
+            BasicBrick.STUD_MODE = previous_mode
+    return count, run
+
+@benchmark("geometry.studs[per_call]", needs_render = True)
+def bench_studs_per_call(scale):
+    return stud_benchmark("per_call", scale)
+
+@benchmark("geometry.studs[template]", needs_render = True)
+def bench_studs_template(scale):
+    return stud_benchmark("template", scale)
+
+@benchmark("geometry.bricks[mesh_cache]", needs_render = True)
+def bench_bricks_cached(scale):
+    count = int(200 * scale)
+    def run():
+        for index in range(count):
+            RectangularBrick("lego", 4, 2, 1, index * 4, 0, 0, color.red, NORTH, render = True)
+    return count, run
+
+def lod_benchmark(lod, scale):
+    count = int(200 * scale)
+    def run():
+        brick = RectangularBrick("duplo", 4, 2, 1, 0, 0, 0, color.red, NORTH, render = False)
+        brick.lod = lod
+        for _ in range(count):
+            brick.build_compound().visible = False
+    return count, run
+
+@benchmark("geometry.bricks[lod=full]", needs_render = True)
+def bench_lod_full(scale):
+    return lod_benchmark("full", scale)
+
+@benchmark("geometry.bricks[lod=solid]", needs_render = True)
+def bench_lod_solid(scale):
+    return lod_benchmark("solid", scale)
+
+@benchmark("geometry.bricks[lod=flat]", needs_render = True)
+def bench_lod_flat(scale):
+    return lod_benchmark("flat", scale)
+
+##### RUNNER #####
+
+def get_git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(names = None, scale = 1.0, repeat = 3, render = False):
+    """Run the selected benchmarks
+
+    Args:
+        names (list, optional): substrings of benchmark names to run, all if None. Defaults to None.
+        scale (float, optional): problem size factor. Defaults to 1.0.
+        repeat (int, optional): runs per benchmark, the best one counts. Defaults to 3.
+        render (bool, optional): also run the geometry benchmarks (creates a canvas). Defaults to False.
+
+    Returns:
+        dict: metadata and one entry per benchmark
+    """
+    if render:
+        BrickProject("lego").add_scene()  # canvas for the geometry benchmarks
+
+    results = {}
+    for name, (function, needs_render) in BENCHMARKS.items():
+        if names and not any(part in name for part in names):
+            continue
+        if needs_render and not render:
+            results[name] = {"skipped": "needs --render"}
+            continue
+        operations, run = function(scale)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {
+            "operations": operations,
+            "best_s": best,
+            "mean_s": sum(timings) / len(timings),
+            "ops_per_s": operations / best if best > 0 else None,
+        }
+
+    return {
+        "suite": "brickstack",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec = "seconds"),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "repeat": repeat,
+        "results": results,
+    }
+
+def print_table(report):
+    print(f"{'benchmark':<32}{'ops':>9}{'best [ms]':>12}{'ops/s':>14}")
+    for name, result in report["results"].items():
+        if "skipped" in result:
+            print(f"{name:<32}{'skipped: ' + result['skipped']:>35}")
+            continue
+        print(f"{name:<32}{result['operations']:>9}{result['best_s'] * 1000:>12.2f}{result['ops_per_s']:>14.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+    parser.add_argument("--filter", nargs = "+", help = "run benchmarks whose name contains one of these strings")
+    parser.add_argument("--scale", type = float, default = 1.0, help = "problem size factor")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--render", action = "store_true", help = "include geometry benchmarks (needs a vpython canvas)")
+    parser.add_argument("--json", metavar = "PATH", help = "write results as JSON ('-' for stdout)")
+    parser.add_argument("--list", action = "store_true", help = "list benchmark names and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (function, needs_render) in BENCHMARKS.items():
+            print(name + (" (--render)" if needs_render else ""))
+        sys.exit(0)
+
+    report = run_suite(args.filter, args.scale, args.repeat, args.render)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+    else:
+        print_table(report)
+        if args.json:
+            with open(args.json, "w") as json_file:
+                json.dump(report, json_file, indent = 2)
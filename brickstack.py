@@ -3,9 +3,23 @@
 
 # lego and duplo are trademarks of their respective owners!
 
-from vpython import *
+from collections import OrderedDict
+import gc
+from math import ceil, pi
+import os
 import random
 
+from brickstack_bounds import BoundsIndex
+from brickstack_chunks import ChunkIndex
+from brickstack_collision import BrickCollisionError, CollisionIndex
+from brickstack_culling import StudCuller
+from brickstack_files import BATCH_SIZE, open_writer, read_project
+from brickstack_lod import DEFAULT_FOV, check_lod, choose_lod, get_box_distance, get_stud_pixels
+from brickstack_options import ProjectOptions
+from brickstack_records import BrickStore, get_grid_footprint, to_grid_ints
+from brickstack_trace import TRACER, traced
+from brickstack_vector import color, get_vpython, to_vpython, vector
+
 # Debug options
 # GLOBAL = Turn on/off all debug options
 GLOBAL_DEBUG = False
@@ -18,8 +32,12 @@ BRICK_DEBUG = False
 STOP_DEBUG = False
 
 
-# Expanding vector-class from vpython:
+# Expanding vector-class (see brickstack_vector):
 class DirectionalVector(vector):
+    # orientations are never changed, so they can be dict keys
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
     @property
     def rotation(self):
         return {
@@ -34,6 +52,18 @@ EAST = DirectionalVector(1,0,0)
 SOUTH = DirectionalVector(0,-1,0)
 WEST = DirectionalVector(-1,0,0)
 
+# orientation codes used in project files
+ORIENTATIONS = {"N" : NORTH, "E" : EAST, "S" : SOUTH, "W" : WEST}
+ORIENTATION_CODES = {(vec.x, vec.y, vec.z) : code for code, vec in ORIENTATIONS.items()}
+
+def color_to_tuple(brick_color):
+    """vpython color vector -> (r, g, b) as stored in files"""
+    return (brick_color.x, brick_color.y, brick_color.z)
+
+def orientation_to_code(orientation):
+    """NORTH/EAST/SOUTH/WEST -> "N"/"E"/"S"/"W" as stored in files"""
+    return ORIENTATION_CODES[(orientation.x, orientation.y, orientation.z)]
+
 ##### COORDINATES #####
 ## x = length from left to right (standard camera view)
 ## y = width from front to back (standard camera view)
@@ -51,12 +81,12 @@ WEST = DirectionalVector(-1,0,0)
 ####### TO DO ########
 ## 0: close scenes? update cameras?
 ## 1: Auto_Camera, auto_scene
-## 2: render to file
-## 3: read simple scene files
-## 4: create booklet
+## 2: render to file -> BrickProject.render_to_files (brickstack_render)
+## 3: read simple scene files -> BrickProject.save/load (brickstack_files)
+## 4: create booklet -> BrickProject.add_step, BrickScene.export_booklet (brickstack_booklet)
 ## 5: encapsulation ok? CameraManager?
 ## 6: make baseplate a subclass to rectangularbrick??
-## 7: try clone for stud generation (duplo!)
+## 7: try clone for stud generation (duplo!) -> StudTemplateCache
 
 ####### NOTES #########
 ## update camera better from BrickProject? ##
@@ -64,31 +94,47 @@ WEST = DirectionalVector(-1,0,0)
 class BrickProject:
     """Class holding individual scenes (= steps in constructing a brick project)
     
-    Will (soon) provide functionality for file handling of simplified project files"""
-    # planned use:
-    # - load project file
-    # - save renders
-    #
+    Projects can be saved to and loaded from project files (see brickstack_files)
+    and rendered offscreen to PNG files (see brickstack_render)"""
     # description
     # brick_system = duplo/lego
-    # auto_z = True // turn off by initialising project with auto_z = False
-    
-    def __init__(self, brick_system, auto_z = True):
+    # options = ProjectOptions (brickstack_options): auto_z, grid_backend, render, culling, chunks, lod, strict, geometry
+
+    def __init__(self, brick_system, options = None, **changes):
         """BrickProject init
         
         Args:
             brick_system (str): "duplo", "lego" or "test"
-            auto_z (bool): True (standard), change to define own z-values
+            options (ProjectOptions or bool, optional): settings of all scenes. Defaults to ProjectOptions().
+                A bool is auto_z, as in BrickProject("duplo", False) before there were options.
+            **changes: ProjectOptions fields, e.g. auto_z=False, render=False, strict=True (override options)
+
+        Raises:
+            ValueError: invalid combination or unknown mode, see ProjectOptions
+            TypeError: unknown option, options neither ProjectOptions nor bool, auto_z given twice
 
         Additional Variables:
             brick_scenes (array): empty array to store brick_scenes (int-index)
         """
+        if isinstance(options, bool):
+            if "auto_z" in changes:
+                raise TypeError("BrickProject got auto_z both as second argument and as keyword")
+            options, changes = None, dict(changes, auto_z = options)
+        elif options is not None and not isinstance(options, ProjectOptions):
+            raise TypeError(f"options must be a ProjectOptions object or auto_z (bool), not {type(options).__name__}")
         self.brick_scenes = []
         self.brick_system = brick_system
-        self.auto_z = auto_z        
+        self.options = (ProjectOptions() if options is None else options).replace(**changes)
+
+    def __getattr__(self, name):
+        # project.auto_z, project.strict, ... read the options
+        options = self.__dict__.get("options")
+        if options is not None and name in ProjectOptions.FIELDS:
+            return getattr(options, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
 
     # special_canvas, special_camera not yet there :)
-    def add_scene(self, special_canvas=None, special_camera=None):
+    def add_scene(self, special_canvas=None, special_camera=None, **changes):
         """add_scene to a BrickProject
 
         Scenes are intended as construction steps of a larger brick project,
@@ -103,19 +149,185 @@ class BrickProject:
         Args:
             special_canvas (obj): vpython-canvas object, optional
             special_camera (obj): vpython-camera object, optional
+            **changes: ProjectOptions fields that differ for this scene, e.g. lod="flat"
             
-        Scenes are appended to the brick_scene array."""
-        brick_scene = BrickScene(self, special_canvas, special_camera)
+        Scenes are appended to the brick_scene array.
+
+        Returns:
+            BrickScene: the new scene"""
+        brick_scene = BrickScene(self, special_canvas, special_camera, self.options.replace(**changes))
         self.brick_scenes.append(brick_scene)
+        return brick_scene
+
+    def add_step(self):
+        """Step mode: start the next construction step
+
+        All steps share one scene (the last one, created on the first call) with its
+        grid, brick store and 3d-objects; a step only records which bricks were added
+        in it. Use BrickScene.export_booklet for building instructions.
+
+        Returns:
+            BrickScene: the scene to add the bricks of the step to
+        """
+        if not self.brick_scenes:
+            self.add_scene()
+        brick_scene = self.brick_scenes[-1]
+        brick_scene.start_step()
+        return brick_scene
 
     def get_scene_index(self, brick_scene):
         return self.brick_scenes.index(brick_scene)
 
+    def save(self, path, file_format = None):
+        """Save all scenes (baseplates and bricks) to a project file
+
+        Bricks are written from the scenes' BrickStores (and brick maps) in batches,
+        so saving works the same for record-only and mapped scenes.
+
+        Args:
+            path (str): target file, ".bricks" (text) or ".brickb" (binary)
+            file_format (str, optional): "text" or "binary", overrides the extension. Defaults to None.
+        """
+        with open_writer(path, self.brick_system, self.auto_z, file_format) as writer:
+            for brick_scene in self.brick_scenes:
+                writer.begin_scene()
+                for baseplate in brick_scene.get_baseplate_rows():
+                    writer.write_baseplate(*baseplate)
+                for rows in brick_scene.get_file_row_batches():
+                    writer.write_bricks(rows)
+
+    @classmethod
+    def load(cls, path, file_format = None, **options):
+        """Load a project file, streaming the bricks into the scenes batch by batch
+
+        Stored z values are used as they are (no auto-z while loading). The garbage
+        collector is paused while loading: the grid creates millions of small lists
+        that would otherwise trigger repeated full collections.
+
+        Args:
+            path (str): project file (text or binary, detected from the content)
+            file_format (str, optional): "text" or "binary". Defaults to None.
+            **options: BrickProject arguments, e.g. render=False, brick_objects=False or
+                options=ProjectOptions(...); auto_z defaults to the stored value
+
+        Returns:
+            BrickProject: the loaded project
+        """
+        events = read_project(path, file_format = file_format)
+        kind, header = next(events)
+        if options.get("options") is None:
+            options.setdefault("auto_z", header["auto_z"])
+        project = cls(header["brick_system"], **options)
+
+        colors = {}
+        def to_color(rgb):
+            brick_color = colors.get(rgb)
+            if brick_color is None:
+                brick_color = colors[rgb] = vector(*rgb)
+            return brick_color
+
+        def to_bricks(rows):
+            # rows share their color tuples, so convert each distinct tuple object once
+            converted = {}
+            for brick_type, length, width, height, x, y, z, rgb, orientation in rows:
+                brick_color = converted.get(id(rgb))
+                if brick_color is None:
+                    brick_color = converted[id(rgb)] = to_color(rgb)
+                yield (brick_type, length, width, height, x, y, z, brick_color, ORIENTATIONS[orientation])
+
+        brick_scene = None
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for kind, data in events:
+                if kind == "scene":
+                    brick_scene = project.add_scene()
+                    continue
+                if brick_scene is None:
+                    raise ValueError(f"{path}: {kind} before the first scene")
+                if kind == "baseplate":
+                    baseplate_color, length, width, center_x, center_y = data
+                    brick_scene.add_baseplate(to_color(baseplate_color), length, width, center_x, center_y)
+                elif kind == "bricks":
+                    brick_scene.add_bricks(to_bricks(data), auto_z = False, return_bricks = False)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return project
+
+    @classmethod
+    def open_map(cls, path, **options):
+        """Open a brick map (see BrickScene.save_map) as a project with one scene
+
+        Only header and tile table are read; bricks are paged in by auto-z lookups
+        and BrickScene.render_region.
+
+        Args:
+            path (str): .brickmap file
+            **options: BrickProject arguments, e.g. render=False
+
+        Returns:
+            BrickProject: project with one mapped scene
+        """
+        from brickstack_mmap import BrickMap
+        brick_map = BrickMap(path)
+        project = cls(brick_map.brick_system, **options)
+        project.add_scene().attach_map(brick_map)
+        return project
+
+    def render_to_files(self, output_dir, width = 1024, height = 768, processes = None, name = "scene_{index:03d}.png", fit = True, studs = True):
+        """Render every scene offscreen to a PNG file, scenes in parallel with a process pool
+
+        Args:
+            output_dir (str): target directory (created if missing)
+            width (int, optional): image width in pixels. Defaults to 1024.
+            height (int, optional): image height in pixels. Defaults to 768.
+            processes (int, optional): worker processes, None = one per CPU, 1 = no pool. Defaults to None.
+            name (str, optional): file name pattern, formatted with the scene index. Defaults to "scene_{index:03d}.png".
+            fit, studs: see BrickScene.get_render_job
+
+        Returns:
+            list: written paths in scene order
+        """
+        from brickstack_render import render_jobs
+        os.makedirs(output_dir, exist_ok = True)
+        jobs = [brick_scene.get_render_job(os.path.join(output_dir, name.format(index = index)), width, height, fit, studs)
+                for index, brick_scene in enumerate(self.brick_scenes)]
+        return render_jobs(jobs, processes)
+
+def render_project_file(job):
+    """Process pool worker of render_project_files: load one project headless and render its scenes"""
+    path, output_dir, options = job
+    project = BrickProject.load(path, render = False, brick_objects = False)
+    return project.render_to_files(output_dir, processes = 1, **options)
+
+def render_project_files(paths, output_dir, processes = None, **options):
+    """Render the scenes of many project files, one project per worker process
+
+    Images go to one subdirectory per project, named after the file (without extension).
+
+    Args:
+        paths (list): project files (see BrickProject.save)
+        output_dir (str): target directory
+        processes (int, optional): worker processes, None = one per CPU, 1 = no pool. Defaults to None.
+        **options: BrickProject.render_to_files arguments (width, height, name, fit, studs)
+
+    Returns:
+        list: one list of written paths per project file
+    """
+    from brickstack_render import run_in_pool
+    jobs = [(path, os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0]), options) for path in paths]
+    return run_in_pool(render_project_file, jobs, processes)
+
 class OccupancyGrid:
     """Helper class to store z-values for occupied grid locations
+
+    Keeps running min/max bounds while bricks are added and removed (see
+    brickstack_bounds), so reading the construction size does not rescan the grid.
     """
     def __init__(self):
         self.points = {}  # Dictionary using (x,y) as Key
+        self.bounds = BoundsIndex()  # true min/max of occupied cells and z-intervals
         
     def add_brick(self, x, y, z, length, width, height):
         """Store mathematical representation of bricks for z calculation in helper grid
@@ -129,48 +341,63 @@ class OccupancyGrid:
             height (int): see above
         """
         if GLOBAL_DEBUG and GRID_DEBUG: print(f"Function add_brick/OccupancyGrid: adding brick at ({x},{y}) with w={width}, l={length}")
-        # for every point occupied by a brick
+        length, width, x, y = to_grid_ints(length, width, x, y)
+        # for every point occupied by a brick (all cells share one interval tuple)
+        points = self.points
+        interval = (z, z + height)
+        for point_x in range(x, x + length):
+            for point_y in range(y, y + width):
+                cell = points.get((point_x, point_y))
+                if cell is None:
+                    points[(point_x, point_y)] = [interval]
+                else:
+                    cell.append(interval)
+
+        if length > 0 and width > 0:
+            self.bounds.add_brick(x, y, z, length, width, height)
+
+    def remove_brick(self, x, y, z, length, width, height):
+        """Remove a brick stored with add_brick (same arguments)
+
+        Costs O(footprint) plus O(log n) for the bounds.
+
+        Raises:
+            KeyError: if the brick is not stored in the grid
+        """
         for dx in range(length):
             for dy in range(width):
                 point = (x + dx, y + dy)
-                if point not in self.points:
-                    self.points[point] = []
-                self.points[point].append((z, z + height))
+                if point not in self.points or (z, z + height) not in self.points[point]:
+                    raise KeyError(f"No brick stored at {point} with z=({z}, {z + height})")
+
+        for dx in range(length):
+            for dy in range(width):
+                point = (x + dx, y + dy)
+                self.points[point].remove((z, z + height))
+                if not self.points[point]:
+                    del self.points[point]
+
+        if length > 0 and width > 0:
+            self.bounds.remove_brick(x, y, z, length, width, height)
+
+    def get_bounds(self):
+        """Return true min/max x, y (occupied cells) and z (intervals) as dict, or None for an empty grid"""
+        return self.bounds.get_bounds()
 
     def get_xyz_range(self):
-        # define min/max values (min-z is always 0 on automatic setting)
-        min_x = 0
-        max_x = 0
-        min_y = 0
-        max_y = 0
-        min_z = 0
-        max_z = 0
-
-        # obtain max z
-        for z_summary_of_coordinate in self.points:
-            if GLOBAL_DEBUG and CALC_DEBUG: print(f"value {self.points[z_summary_of_coordinate]}, key: {z_summary_of_coordinate}")
-            for z_minmax_value in self.points[z_summary_of_coordinate]:
-                z_start, z_end = z_minmax_value
-                if z_start < min_z : min_z = z_start
-                if z_end > max_z : max_z = z_end
-
-        # obtain min/max x and y:
-        xy_keys = self.points.keys()
-        for xy_tuple in xy_keys:
-            x_value, y_value = xy_tuple
-            if x_value < min_x : min_x = x_value
-            if x_value > max_x : max_x = x_value
-            if y_value < min_y : min_y = y_value
-            if y_value > max_y : max_y = y_value
-
-        results = {
-            "min_x" : min_x,
-            "max_x" : max_x,
-            "min_y" : min_y,
-            "max_y" : max_y,
-            "min_z" : min_z,
-            "max_z" : max_z
-        }
+        """Return construction range as dict; always includes the origin (min-z is always 0 on automatic setting)"""
+        bounds = self.get_bounds()
+        if bounds is None:
+            results = dict.fromkeys(["min_x", "max_x", "min_y", "max_y", "min_z", "max_z"], 0)
+        else:
+            results = {
+                "min_x" : min(bounds["min_x"], 0),
+                "max_x" : max(bounds["max_x"], 0),
+                "min_y" : min(bounds["min_y"], 0),
+                "max_y" : max(bounds["max_y"], 0),
+                "min_z" : min(bounds["min_z"], 0),
+                "max_z" : max(bounds["max_z"], 0)
+            }
 
         if GLOBAL_DEBUG and CALC_DEBUG: print(results)
 
@@ -193,24 +420,69 @@ class OccupancyGrid:
         return max_height
 
 
+def create_occupancy_grid(grid_backend = "dict"):
+    """Create the occupancy grid used by a BrickScene
+
+    Args:
+        grid_backend (str): "dict" for OccupancyGrid (dict of interval lists) or
+            "heightmap" for HeightmapOccupancyGrid (numpy heightmap, much faster auto-z on large models)
+
+    Returns:
+        OccupancyGrid or HeightmapOccupancyGrid
+    """
+    if grid_backend == "dict":
+        return OccupancyGrid()
+    elif grid_backend == "heightmap":
+        # numpy is only needed for this backend
+        from brickstack_heightmap import HeightmapOccupancyGrid
+        return HeightmapOccupancyGrid()
+    raise ValueError(f"Unknown grid backend: {grid_backend}")
+
+
 class BrickScene:
     """BrickScene is a functional container for individual brick scenes
     and provides orientation, camera and scene settings
     """
 
-    def __init__(self, project, special_scene=None, special_camera=None):
+    def __init__(self, project, special_scene=None, special_camera=None, options=None):
         """__init__ brick_scene
 
         Args:
             project (obj::BrickProject): contains copy of brick-project to access standard values
             special_scene (obj::vpython-scene, optional): individual scene settings. Defaults to None.
             special_camera (obj::vpython-camera, optional): individual camera settings. Defaults to None.
+            options (ProjectOptions, optional): settings of this scene. Defaults to the project options.
         """
-        self.grid = OccupancyGrid()
+        options = options or project.options
+        self.options = options
+        self.grid = create_occupancy_grid(options.grid_backend)
         self.project = project
         self.brick_system = project.brick_system
-        self.auto_z = project.auto_z
-        self.bricks = []
+        self.auto_z = options.auto_z
+        self.render_enabled = options.render
+        self._bricks = []  # see bricks
+        self.removed_parts = set()  # removed bricks still in _bricks until the next read of bricks
+        # logical bricks (grid units) in placement order, see brickstack_records
+        self.store = BrickStore(self.brick_system)
+        self.store_bricks = []  # brick object per store row (while the scene has brick objects)
+        self.brick_objects = options.brick_objects
+        self.culler = StudCuller() if options.cull_hidden_studs else None
+        self.chunks = ChunkIndex(options.chunk_size) if options.chunk_size else None
+        # read-only bricks from a .brickmap (see attach_map), brick objects only for rendered regions
+        self.brick_map = None
+        self.mapped_bricks = {}  # record index -> RectangularBrick
+        # stud level of detail of all parts, see set_lod
+        self.lod = options.lod
+        # construction steps (see BrickProject.add_step): store index where each step starts
+        self.step_starts = [0]
+        # strict scenes: z-intervals of the store bricks per cell, see check_collision
+        self.collisions = CollisionIndex() if options.strict else None
+        self.collision_reports = []  # "report" mode: (row index, row index of the brick hit)
+        self.unindexed_rows = set()  # "report" mode: store rows kept out of the collision index
+        self.connectivity = None  # ConnectivityIndex, see get_connectivity
+        # undo/redo: ("add" | "remove", store rows), see undo
+        self.history = []
+        self.redo_history = []
 
         if special_scene == None:
             self.has_special_scene = False
@@ -222,7 +494,23 @@ class BrickScene:
         else:
             self.has_special_camera = True
         
-        self.scene = self.set_scene(special_scene, special_camera)
+        # headless scenes get their canvas on the first call to render()
+        if self.render_enabled:
+            self.scene = self.set_scene(special_scene, special_camera)
+        else:
+            self.scene = None
+
+    @property
+    def bricks(self):
+        """Baseplates and brick objects of the scene in placement order
+
+        remove_brick only marks brick objects; they are dropped from the list here, in
+        one pass on the first read after any removals.
+        """
+        if self.removed_parts:
+            self._bricks[:] = [part for part in self._bricks if part not in self.removed_parts]
+            self.removed_parts.clear()
+        return self._bricks
 
     def add_baseplate(self, baseplate_color = color.green * 0.5, baseplate_custom_length = None, baseplate_custom_width = None, baseplate_custom_x = None, baseplate_custom_y = None):
         """Add a baseplate to a scene
@@ -235,32 +523,425 @@ class BrickScene:
             baseplate_custom_width (int, optional): See length. Defaults to None.
             baseplate_custom_x (int, optional): Custom center position of baseplate; internal default = 0. Defaults to None.
             baseplate_custom_y (_type_, optional): See custom_y. Defaults to None.
+
+        Returns:
+            Baseplate: the new baseplate
         """
-        baseplate = BrickFactory.create_baseplate(self.brick_system, baseplate_color, baseplate_custom_length, baseplate_custom_width, baseplate_custom_x, baseplate_custom_y)
-        self.bricks.append(baseplate)
+        baseplate = BrickFactory.create_baseplate(self.brick_system, baseplate_color, baseplate_custom_length, baseplate_custom_width, baseplate_custom_x, baseplate_custom_y, False)
+        self._bricks.append(baseplate)
+
+        baseplate.geometry = self.options.geometry
+        if self.culler is not None:
+            # stud rows are a primitives optimization, buffers rebuild the whole plate
+            if baseplate.geometry == "primitives":
+                baseplate.stud_row_compounds = {}
+            self.cull_studs(baseplate, covers_studs = False)
+        baseplate.lod = self.choose_part_lod(baseplate)
+        if self.render_enabled:
+            baseplate.compound = baseplate.generate()
+        return baseplate
+
+    def cull_studs(self, part, covers_studs = True):
+        """Register a part with the StudCuller and rebuild the parts whose studs it covers
+
+        Args:
+            part (obj::RectangularBrick or Baseplate): newly placed part (not generated yet)
+            covers_studs (bool, optional): False for baseplates. Defaults to True.
+        """
+        changed = self.culler.add_part(part, covers_studs)
+        for other, studs in changed.items():
+            other.refresh_studs(studs)
+            # chunked bricks only serve as source for their chunk
+            if self.chunks is not None and other.compound is not None and self.chunks.mark_dirty(other):
+                other.compound.visible = False
+        if GLOBAL_DEBUG and STUD_DEBUG: print(f"Culling: {self.culler.hidden_count} of {self.culler.stud_count} studs hidden")
+
+    def get_stud_counts(self):
+        """Return number of studs in the scene and how many of them are hidden by culling
+
+        Returns:
+            dict: {"total": int, "hidden": int}
+        """
+        if self.culler is not None:
+            return {"total" : self.culler.stud_count, "hidden" : self.culler.hidden_count}
+        total = sum(sum(1 for _ in part.stud_cells()) for part in self.bricks if isinstance(part, BasicBrick))
+        return {"total" : total, "hidden" : 0}
+
+    def get_lod_camera(self):
+        """Camera position, viewport height and field of view for automatic LOD
+
+        Uses the canvas camera (which may have been moved with the mouse), headless
+        scenes the camera get_camera describes.
+
+        Returns:
+            tuple: (pos (x, y, z), viewport height in pixels, fov)
+        """
+        if self.scene is not None:
+            camera_pos = self.scene.camera.pos
+            return (camera_pos.x, camera_pos.y, camera_pos.z), self.scene.height, self.scene.fov
+        return self.get_camera()["pos"], 768, DEFAULT_FOV
+
+    def choose_part_lod(self, part, lod_camera = None):
+        """Tier for one brick or baseplate: the scene setting, or by stud size on screen for "auto"
+
+        Args:
+            part (obj::BasicBrick): brick or baseplate
+            lod_camera (tuple, optional): result of get_lod_camera, to compute it once for many parts. Defaults to None.
+        """
+        if self.lod != "auto":
+            return self.lod
+        camera_pos, viewport_height, fov = lod_camera or self.get_lod_camera()
+        distance = get_box_distance(camera_pos, *part.get_box())
+        return choose_lod(get_stud_pixels(part.specs["stud_diameter"], distance, viewport_height, fov))
+
+    def set_lod(self, lod):
+        """Set the stud level of detail of the scene and apply it to all parts
+
+        Only 3d-objects change (grid, store and bricks stay as they are); objects of
+        tiers used before are reused, so switching back is cheap.
+
+        Args:
+            lod (str): "full", "solid" (plain cylinder studs), "flat" (no studs) or "auto"
+                (per part, by the size of its studs on screen)
+
+        Returns:
+            int: number of parts whose 3d-object changed
+        """
+        self.lod = check_lod(lod)
+        return self.update_lod()
+
+    def update_lod(self):
+        """Apply the scene's level of detail again, e.g. after moving the camera in "auto" mode
+
+        Returns:
+            int: number of parts whose 3d-object changed
+        """
+        lod_camera = self.get_lod_camera() if self.lod == "auto" else None
+        changed = 0
+        for part in self.bricks + list(self.mapped_bricks.values()):
+            if part.set_lod(self.choose_part_lod(part, lod_camera)):
+                changed += 1
+                # chunked bricks only serve as source for their chunk
+                if self.chunks is not None and isinstance(part, RectangularBrick) and self.chunks.mark_dirty(part):
+                    part.compound.visible = False
+        if self.chunks is not None:
+            self.rebuild_chunks()
+        if GLOBAL_DEBUG and STUD_DEBUG: print(f"LOD {self.lod}: {changed} parts changed")
+        return changed
+
+    def get_lod_counts(self):
+        """Number of parts per level of detail tier
+
+        Returns:
+            dict: {"full": int, "solid": int, "flat": int}
+        """
+        counts = dict.fromkeys(("full", "solid", "flat"), 0)
+        for part in self.bricks + list(self.mapped_bricks.values()):
+            counts[part.lod] += 1
+        return counts
+
+    @traced("generate")
+    def generate_bricks(self, bricks):
+        """Generate the 3d-objects of new bricks; chunked scenes merge them into their chunks
+
+        With geometry="buffers" the meshes of all bricks are computed in a process pool
+        first (see brickstack_buffers), then turned into 3d-objects.
+
+        Args:
+            bricks (list): RectangularBricks (and, for geometry="buffers", Baseplates) without compound
+        """
+        lod_camera = self.get_lod_camera() if self.lod == "auto" else None
+        for brick in bricks:
+            brick.lod = self.choose_part_lod(brick, lod_camera)
+            brick.geometry = self.options.geometry
+        if self.options.geometry == "buffers":
+            from brickstack_buffers import generate_buffers
+            buffers = generate_buffers([brick.get_mesh_part() for brick in bricks], BasicBrick.BRICK_SPECS[self.brick_system],
+                                       self.options.geometry_processes)
+            for brick, brick_buffers in zip(bricks, buffers):
+                with TRACER.span("compound"):
+                    brick.compound = brick.generate_from_buffers(brick_buffers)
+        else:
+            for brick in bricks:
+                brick.compound = brick.generate()
+        if self.chunks is not None:
+            for brick in bricks:
+                if not isinstance(brick, Baseplate):
+                    brick.compound.visible = False
+            self.rebuild_chunks()
+
+    def rebuild_chunks(self):
+        """Merge every dirty chunk into one compound (clones of the hidden brick compounds)"""
+        vpython = get_vpython()
+        for key in self.chunks.pop_dirty():
+            old_compound = self.chunks.compounds.pop(key, None)
+            if old_compound is not None:
+                old_compound.visible = False
+            parts = [part.compound.clone() for part in self.chunks.members.get(key, ()) if part.compound is not None]
+            if len(parts) > 1:
+                self.chunks.compounds[key] = vpython.compound(parts)
+            elif parts:
+                self.chunks.compounds[key] = parts[0]
+            if GLOBAL_DEBUG and BRICK_DEBUG: print(f"Chunk {key} rebuilt from {len(parts)} bricks")
+
+    def get_draw_object_count(self):
+        """Number of 3d-objects the scene shows (or would show once rendered)
+
+        Returns:
+            int: bricks (or chunks) plus baseplates and their stud rows
+        """
+        count = 0
+        for part in self.bricks:
+            if isinstance(part, Baseplate):
+                count += 1 + len(part.stud_row_compounds or ())
+            elif self.chunks is None:
+                count += 1
+        if self.chunks is not None:
+            count += self.chunks.get_chunk_count()
+        else:
+            count += len(self.mapped_bricks)
+            if not self.brick_objects:
+                count += len(self.store)
+        return count
+
+    def get_file_row_batches(self):
+        """Yield lists of brick rows in project file layout (mapped bricks first, then the store)"""
+        if self.brick_map is not None:
+            batch = []
+            for row in self.brick_map.rows():
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        for start in range(0, self.store.row_count, BATCH_SIZE):
+            yield list(self.store.rows(start, start + BATCH_SIZE, color_to_tuple, orientation_to_code))
+
+    def start_step(self):
+        """Begin a new construction step: bricks added from now on form its delta
+
+        Steps are store index ranges, so they share the scene's grid, store and 3d-objects.
+        Calling start_step again before adding a brick does not create an empty step.
+
+        Returns:
+            int: index of the current step
+        """
+        if self.store.row_count > self.step_starts[-1]:
+            self.step_starts.append(self.store.row_count)
+        return len(self.step_starts) - 1
+
+    def get_step_ranges(self):
+        """Store index range (start, stop) of every construction step (removed bricks keep their index)
+
+        Returns:
+            list: one (start, stop) tuple per step
+        """
+        stops = self.step_starts[1:] + [self.store.row_count]
+        return list(zip(self.step_starts, stops))
+
+    def get_step_rows(self, step):
+        """Bricks added in one step, as rows in project file layout
+
+        Returns:
+            list: brick rows of the step
+        """
+        start, stop = self.get_step_ranges()[step]
+        return list(self.store.rows(start, stop, color_to_tuple, orientation_to_code))
+
+    def show_step(self, step):
+        """Show the model as it is after a step: hide the 3d-objects of all later bricks
+
+        Raises:
+            ValueError: chunked scenes (chunks merge bricks of different steps)
+        """
+        if self.chunks is not None:
+            raise ValueError("show_step needs one 3d-object per brick (chunk_size=None)")
+        stop = self.get_step_ranges()[step][1]
+        for index, brick in enumerate(self.store_bricks):
+            if brick.compound is not None:
+                brick.compound.visible = index < stop and not self.store.is_removed(index)
+
+    async def play_steps(self, delay = 1.0, on_step = None, start = 0):
+        """Show the construction steps one after the other (asyncio), see show_step
+
+        Waits delay seconds after every step, the event loop keeps running meanwhile.
+        Finishes with the complete model shown, also when the task is cancelled.
+
+        Args:
+            delay (float, optional): seconds per step. Defaults to 1.0.
+            on_step (callable, optional): called with the step index after showing it (e.g. to update a caption). Defaults to None.
+            start (int, optional): first step to show. Defaults to 0.
+
+        Returns:
+            int: number of steps shown
+        """
+        import asyncio
+        steps = len(self.get_step_ranges())
+        shown = 0
+        try:
+            for step in range(start, steps):
+                self.show_step(step)
+                shown += 1
+                if on_step is not None:
+                    on_step(step)
+                await asyncio.sleep(delay)
+        finally:
+            if shown:
+                self.show_step(steps - 1)
+        return shown
+
+    def get_baseplate_rows(self):
+        """Baseplates in project file layout: ((r, g, b), length, width, center_x, center_y)"""
+        return [(color_to_tuple(part.brick_color),
+                 part.stud_y_counter,
+                 part.stud_x_counter,
+                 part.grid_lower_left_x + part.stud_x_counter / 2,
+                 part.grid_lower_left_y + part.stud_y_counter / 2)
+                for part in self.bricks if isinstance(part, Baseplate)]
+
+    def export_mesh(self, path, file_format = None, studs = True):
+        """Export the scene geometry as STL, OBJ or binary glTF (brickstack_export)
+
+        Works for headless and record-only scenes; bricks are streamed to the file in
+        batches. glTF files place repeated bricks and studs as instances of shared meshes.
+
+        Args:
+            path (str): target file, ".stl", ".obj" (writes a ".mtl" next to it) or ".glb"
+            file_format (str, optional): "stl", "obj" or "glb", overrides the extension. Defaults to None.
+            studs (bool, optional): include studs. Defaults to True.
+
+        Returns:
+            int: triangles written (STL/OBJ) or instances (glTF)
+        """
+        from brickstack_export import export_mesh
+        return export_mesh(path, self.get_file_row_batches, self.get_baseplate_rows(),
+                           dict(BasicBrick.BRICK_SPECS[self.brick_system]), studs, file_format)
+
+    def save_map(self, path, tile_size = 64):
+        """Write all bricks of the scene to a memory-mapped brick map (.brickmap)
+
+        Args:
+            path (str): target file
+            tile_size (int, optional): tile edge in studs; smaller tiles page in less per query. Defaults to 64.
+
+        Returns:
+            int: number of bricks written
+        """
+        from brickstack_mmap import write_brick_map
+        rows = (row for batch in self.get_file_row_batches() for row in batch)
+        return write_brick_map(path, self.brick_system, rows, tile_size)
+
+    def attach_map(self, brick_map):
+        """Use a BrickMap as read-only base of the scene
+
+        Auto-z and bounds include the mapped bricks; new bricks are added on top as usual.
+
+        Args:
+            brick_map (obj::BrickMap): opened brick map of the same brick system
+        """
+        from brickstack_mmap import MappedOccupancyGrid
+        if brick_map.brick_system != self.brick_system:
+            raise ValueError(f"Brick map is {brick_map.brick_system}, scene is {self.brick_system}")
+        if self.brick_map is not None:
+            raise ValueError("Scene already has a brick map")
+        self.brick_map = brick_map
+        self.grid = MappedOccupancyGrid(brick_map, self.grid)
+        self.connectivity = None  # row indices of the store bricks change
+        self.update_camera_position()
+
+    def render_region(self, min_x, min_y, max_x, max_y):
+        """Create brick objects for the mapped bricks overlapping a region (grid cells, inclusive)
+
+        Bricks that already have objects are skipped; objects are generated if the scene renders.
+
+        Returns:
+            list: the new RectangularBricks
+        """
+        if self.brick_map is None:
+            return []
+        indices = [index for index in self.brick_map.get_region_indices(min_x, min_y, max_x, max_y).tolist()
+                   if index not in self.mapped_bricks]
+        colors = {}
+        def to_color(rgb):
+            if rgb not in colors:
+                colors[rgb] = vector(*rgb)
+            return colors[rgb]
+
+        new_bricks = []
+        for index, (brick_type, length, width, height, x, y, z, rgb, orientation) in zip(indices, self.brick_map.rows(indices)):
+            brick = BrickFactory.create_brick(self.brick_system, brick_type, length, width, height, x, y, z,
+                                              to_color(rgb), ORIENTATIONS[orientation], False)
+            self.mapped_bricks[index] = brick
+            if self.chunks is not None:
+                self.chunks.add_part(brick)
+            new_bricks.append(brick)
+        if self.render_enabled:
+            self.generate_bricks(new_bricks)
+        return new_bricks
+
+    # start camera per brick system: (pos, axis)
+    # Y negativ = von vorne, Z positiv = von oben; schaut nach hinten und leicht nach unten
+    CAMERAS = {
+        "lego" : ((130, -30, 80), (0, 30, -30)),
+        "duplo" : ((260, -60, 160), (0, 60, -60)),
+    }
 
     def set_scene(self, special_scene=None, special_camera=None):
         # Scene with std values
         # special scene/camera not yet implemented
+        # first render: vpython is only imported now
+        vpython = get_vpython()
 
-        self.scene = canvas(
+        self.scene = vpython.canvas(
             width=1024,            # window width
             height=768,           # window height
-            center=vector(0,0,0), # Scene center
-            background=color.cyan,  # bg color
-            up=vector(0,0,1)     # Z is "up"
+            center=vpython.vector(0,0,0), # Scene center
+            background=vpython.color.cyan,  # bg color
+            up=vpython.vector(0,0,1)     # Z is "up"
         )
 
         # Kamera mittig von oben/vorne
-        if self.brick_system == "lego":
-            self.scene.camera.pos = vector(130,-30,80)    # Y negativ = von vorne, Z positiv = von oben
-            self.scene.camera.axis = vector(0,30,-30)   # Schaut nach hinten und leicht nach unten
-        else:
-            self.scene.camera.pos = vector(260,-60,160)    # Y negativ = von vorne, Z positiv = von oben
-            self.scene.camera.axis = vector(0,60,-60)   # Schaut nach hinten und leicht nach unten            
+        camera_pos, camera_axis = self.CAMERAS["lego" if self.brick_system == "lego" else "duplo"]
+        self.scene.camera.pos = vpython.vector(*camera_pos)
+        self.scene.camera.axis = vpython.vector(*camera_axis)
 
         # self.scene.autoscale = True
+        return self.scene
+
+    def render(self):
+        """Build all 3d-objects that were skipped while the scene was headless
 
+        Creates the canvas if needed; afterwards the scene renders new bricks immediately.
+        Does nothing for bricks that already have their compound.
+        """
+        if self.scene is None:
+            self.set_scene()
+        self.scene.select()
+        self.render_enabled = True
+
+        # record-only scenes get their brick objects now
+        if not self.brick_objects:
+            self.store_bricks = [BrickFactory.create_brick(self.brick_system, *self.store.get(index).as_args(), False)
+                                 for index in range(self.store.row_count)]
+            for index, brick in enumerate(self.store_bricks):
+                brick.store_index = index
+            self._bricks.extend(brick for index, brick in enumerate(self.store_bricks) if not self.store.is_removed(index))
+            self.brick_objects = True
+
+        missing = []
+        for brick in self.bricks:
+            if isinstance(brick, Baseplate) and brick.compound is None and self.options.geometry == "primitives":
+                brick.lod = self.choose_part_lod(brick)
+                brick.compound = brick.generate()
+            elif isinstance(brick, BasicBrick) and brick.compound is None:
+                missing.append(brick)
+        self.generate_bricks(missing)
+
+        if self.grid.get_bounds() is not None:
+            self.update_camera_position()
+
+    @traced("camera")
     def update_camera_position(self):
         """Update camera position after new block is placed
 
@@ -268,28 +949,106 @@ class BrickScene:
             none
 
         Currently only calculates x-extension and moves the camera so it points to x-center of scene.
+        Headless scenes have no camera, nothing happens then.
         """    
-        xyz_range = self.grid.get_xyz_range()
-        min_x = xyz_range["min_x"]
-        max_x = xyz_range["max_x"]
-        dx = max_x - min_x
-        scene_index = self.get_my_scene_index()
-        if GLOBAL_DEBUG and CALC_DEBUG: print(f"scene_index: {scene_index}")
+        if self.scene is None:
+            return
+        if GLOBAL_DEBUG and CALC_DEBUG: print(f"scene_index: {self.get_my_scene_index()}")
 
-        current_canvas = canvas.get_selected()
-        current_canvas.camera.pos = vector((max_x - dx/2) * self.bricks[-1].specs["xy_factor"], -30, 80)
+        vpython = get_vpython()
+        current_canvas = vpython.canvas.get_selected()
+        current_canvas.camera.pos = vpython.vector(*self.get_camera()["pos"])
+
+    def get_camera(self):
+        """Camera position and view direction of the scene, as the canvas camera would have them
+
+        Same logic as set_scene and update_camera_position, but also for headless scenes.
+
+        Returns:
+            dict: {"pos": (x, y, z), "axis": (x, y, z)}
+        """
+        camera_pos, camera_axis = self.CAMERAS["lego" if self.brick_system == "lego" else "duplo"]
+        if self.grid.get_bounds() is not None:
+            xyz_range = self.grid.get_xyz_range()
+            min_x = xyz_range["min_x"]
+            max_x = xyz_range["max_x"]
+            dx = max_x - min_x
+            camera_pos = ((max_x - dx/2) * BasicBrick.BRICK_SPECS[self.brick_system]["xy_factor"], -30, 80)
+        return {"pos" : camera_pos, "axis" : camera_axis}
+
+    def get_render_job(self, path, width = 1024, height = 768, fit = True, studs = True):
+        """Describe the scene as an offscreen render job (see brickstack_render)
 
+        Args:
+            path (str): PNG file to write
+            width (int, optional): image width in pixels. Defaults to 1024.
+            height (int, optional): image height in pixels. Defaults to 768.
+            fit (bool, optional): move the camera along its axis until the whole scene is in view. Defaults to True.
+            studs (bool, optional): False renders plain boxes (faster for large scenes). Defaults to True.
+
+        Returns:
+            dict: picklable job for brickstack_render.render_job
+        """
+        return {
+            "path" : path,
+            "specs" : dict(BasicBrick.BRICK_SPECS[self.brick_system]),
+            "bricks" : [row for rows in self.get_file_row_batches() for row in rows],
+            "baseplates" : self.get_baseplate_rows(),
+            "camera" : self.get_camera(),
+            "width" : width,
+            "height" : height,
+            "fit" : fit,
+            "studs" : studs,
+        }
+
+    def render_to_file(self, path, width = 1024, height = 768, fit = True, studs = True):
+        """Render the scene offscreen to a PNG file (works for headless scenes, no canvas needed)
+
+        Args:
+            path (str): PNG file to write
+            width, height, fit, studs: see get_render_job
+
+        Returns:
+            str: the written path
+        """
+        from brickstack_render import render_job
+        return render_job(self.get_render_job(path, width, height, fit, studs))
+
+    def export_booklet(self, output_dir, width = 1024, height = 768, name = "step_{index:03d}.png", highlight = True, studs = True, page = "booklet.html"):
+        """Render building instructions: one PNG per construction step and an HTML page with parts lists
+
+        Every step is drawn on top of the previous image (each brick is rasterized once);
+        bricks of earlier steps are faded so the new bricks stand out.
+
+        Args:
+            output_dir (str): target directory (created if missing)
+            width (int, optional): image width in pixels. Defaults to 1024.
+            height (int, optional): image height in pixels. Defaults to 768.
+            name (str, optional): image file pattern, formatted with the step index. Defaults to "step_{index:03d}.png".
+            highlight (bool, optional): fade the bricks of earlier steps. Defaults to True.
+            studs (bool, optional): see get_render_job. Defaults to True.
+            page (str, optional): HTML file name, None for images only. Defaults to "booklet.html".
+
+        Returns:
+            list: written image paths in step order
+        """
+        from brickstack_booklet import export_booklet
+        job = self.get_render_job(None, width, height, True, studs)
+        del job["path"]
+        bricks = job.pop("bricks")
+        # mapped bricks come first and belong to the first step
+        mapped = bricks[:len(bricks) - len(self.store)]
+        job["steps"] = [(mapped if index == 0 else []) + self.get_step_rows(index) for index in range(len(self.step_starts))]
+        job["highlight"] = highlight
+        return export_booklet(job, output_dir, name, page)
+
+    @traced("auto_z")
     def calculate_z_pos(self, length, width, height, x_pos, y_pos, orientation):
         # Adjust dimensions based on orientation for correct collision detection
-        if orientation == NORTH or orientation == SOUTH:
-            grid_length = length
-            grid_width = width
-        else:  # EAST or WEST - dimensions are swapped
-            grid_length = width
-            grid_width = length
+        x_extension, y_extension = get_grid_footprint(length, width, orientation)
             
         # Find smallest possible z
-        z = self.grid.get_next_z(x_pos, y_pos, grid_width, grid_length)
+        z = self.grid.get_next_z(x_pos, y_pos, x_extension, y_extension)
         # round up to next valid height
         if self.brick_system == "duplo":
             # round to multiples of 1/2
@@ -303,6 +1062,94 @@ class BrickScene:
     def calculate_xyz_range(self):
         xyz_range = self.grid.get_xyz_range(self)       
 
+    def check_collision(self, x, y, z, x_extension, y_extension, height, index):
+        """Strict scenes: index a new brick or reject/report it if it intersects another one
+
+        Free placements are added to scene.collisions (so they count for later bricks),
+        intersecting ones are not. The check takes O(footprint * log k), see brickstack_collision.
+
+        Args:
+            x, y, z (int): position of the brick in grid units
+            x_extension, y_extension (int): footprint, see get_grid_footprint
+            height (int): see add_brick
+            index (int): store index the brick will get
+
+        Returns:
+            bool: True if the placement is free
+
+        Raises:
+            BrickCollisionError: the brick intersects another one and the project has strict="reject"
+        """
+        from brickstack_collision import find_map_collision
+        offset = self.get_mapped_count()
+        hit = self.collisions.find_collision(x, y, z, x_extension, y_extension, height)
+        if hit is not None:
+            cell, other = hit[0], hit[1] + offset
+        else:
+            # mapped bricks are checked directly in the map (cell unknown)
+            cell = None
+            other = find_map_collision(self.brick_map, x, y, z, x_extension, y_extension, height) if self.brick_map is not None else None
+            if other is None:
+                self.collisions.add_brick(x, y, z, x_extension, y_extension, height, index)
+                return True
+
+        if GLOBAL_DEBUG and GRID_DEBUG: print(f"Collision of brick {offset + index} with brick {other}")
+        if self.options.strict == "reject":
+            raise BrickCollisionError(cell, other)
+        self.collision_reports.append((offset + index, other))
+        self.unindexed_rows.add(index)
+        return False
+
+    def validate(self):
+        """Check the whole scene for intersecting bricks (mapped bricks and store, any strict mode)
+
+        One vectorized sweep over all occupied cells, see brickstack_collision.find_overlapping_pairs.
+
+        Returns:
+            list: (index, index) pairs of intersecting bricks, see get_row_indices
+        """
+        from brickstack_collision import find_overlapping_pairs, get_footprint_columns
+        columns = get_footprint_columns(row for batch in self.get_file_row_batches() for row in batch)
+        indices = self.get_row_indices()
+        return [(indices[first], indices[second]) for first, second in find_overlapping_pairs(*columns).tolist()]
+
+    def get_mapped_count(self):
+        return len(self.brick_map) if self.brick_map is not None else 0
+
+    def get_row_indices(self):
+        """Scene-wide index of every brick in get_file_row_batches order
+
+        Mapped bricks keep their record index, store bricks get the number of mapped
+        bricks + their store row (removed rows are skipped, but keep their index free).
+        Collision reports, validate and the connectivity analysis use these indices.
+
+        Returns:
+            list: int per brick row
+        """
+        offset = self.get_mapped_count()
+        return list(range(offset)) + [offset + index for index in range(self.store.row_count) if not self.store.is_removed(index)]
+
+    def get_connectivity(self):
+        """Stud connections of the scene: floating bricks, components, weak joints
+
+        The ConnectivityIndex (brickstack_connectivity) is built from all bricks on the
+        first call and then kept up to date while bricks are added and removed (undo,
+        redo). Rows are indices as in get_row_indices.
+
+        Returns:
+            ConnectivityIndex: e.g. get_floating(), get_components(), get_weak_joints()
+        """
+        if self.connectivity is None:
+            from brickstack_connectivity import ConnectivityIndex
+            connectivity = ConnectivityIndex()
+            rows = (row for batch in self.get_file_row_batches() for row in batch)
+            for index, (brick_type, length, width, height, x, y, z, brick_color, orientation) in zip(self.get_row_indices(), rows):
+                x_extension, y_extension = get_grid_footprint(length, width, ORIENTATIONS[orientation])
+                connectivity.add_brick(index, x, y, z, x_extension, y_extension, height)
+            self.connectivity = connectivity
+        return self.connectivity
+
+    @traced("add_brick")
     def add_brick(self, brick_type : str = "rect", length : int = 4, width : int = 2, height : int = 1, x_pos : int = 0, y_pos : int = 0, z_pos : int = 0, brick_color : vector = color.red, brick_orientation : vector = NORTH):
         """Add a new brick to your project/scene
 
@@ -316,9 +1163,17 @@ class BrickScene:
             z_pos (int): see above
             brick_color (vector): vector(r, g, b) or predefined color.x
             brick_orientation (vector): NORTH, SOUTH, EAST, WEST
+
+        Returns:
+            RectangularBrick: the new brick (without 3d-object while the scene is headless),
+            BrickRecord if the project has brick_objects=False
+
+        Raises:
+            ValueError: length, width, x_pos or y_pos is not a whole number (2.0 and numpy ints are fine)
         """
+        length, width, x_pos, y_pos = to_grid_ints(length, width, x_pos, y_pos)
         # auto-z or not
-        if self.project.auto_z:
+        if self.auto_z:
             z_pos = self.calculate_z_pos(length, width, height, x_pos, y_pos, brick_orientation)
         else:
             z_pos = z_pos
@@ -327,6 +1182,23 @@ class BrickScene:
             print(f"Call to add_brick in BrickScene:\nz-pos after get_min: {z_pos}")
             print(f"brickFactory call with: {brick_type}, l={length}, w={width}, h={height}, x={x_pos}, y={y_pos}, z={z_pos}")
 
+        x_extension, y_extension = get_grid_footprint(length, width, brick_orientation)
+        if self.collisions is not None:
+            self.check_collision(x_pos, y_pos, z_pos, x_extension, y_extension, height, self.store.row_count)
+        TRACER.count("bricks")
+
+        # record-only scenes: no brick object at all
+        if not self.brick_objects:
+            if brick_color == "random":
+                brick_color = BrickFactory.choose_random_color()
+            index = self.store.append(brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation)
+            with TRACER.span("grid.insert"):
+                self.grid.add_brick(x_pos, y_pos, z_pos, x_extension, y_extension, height)
+                if self.connectivity is not None:
+                    self.connectivity.add_brick(self.get_mapped_count() + index, x_pos, y_pos, z_pos, x_extension, y_extension, height)
+            self.push_history("add", [index])
+            return self.store.get(index)
+
         brick = BrickFactory.create_brick(self.brick_system,
                                           brick_type, 
                                           length, 
@@ -336,31 +1208,401 @@ class BrickScene:
                                           y_pos, 
                                           z_pos, 
                                           brick_color,
-                                          brick_orientation)
+                                          brick_orientation,
+                                          False)
         
-        self.bricks.append(brick)
+        self._bricks.append(brick)
+        brick.store_index = self.store.append(brick_type, length, width, height, x_pos, y_pos, z_pos, brick.brick_color, brick_orientation)
+        self.store_bricks.append(brick)
+        self.push_history("add", [brick.store_index])
 
         # Add math model of brick to occupancy grid (for z-calculation)
-        # IMPORTANT: Adjust length/width based on orientation for correct collision detection
-        if brick_orientation == NORTH or brick_orientation == SOUTH:
-            grid_length = length
-            grid_width = width
-        else:  # EAST or WEST - dimensions are swapped
-            grid_length = width  # What was width becomes length in the grid
-            grid_width = length  # What was length becomes width in the grid
-            
-        self.grid.add_brick(x_pos, y_pos, z_pos, grid_length, grid_width, height)
+        # IMPORTANT: Adjust length/width based on orientation - same footprint as used for z-calculation
+        with TRACER.span("grid.insert"):
+            self.grid.add_brick(x_pos, y_pos, z_pos, x_extension, y_extension, height)
+            if self.connectivity is not None:
+                self.connectivity.add_brick(self.get_mapped_count() + brick.store_index, x_pos, y_pos, z_pos, x_extension, y_extension, height)
+        if self.chunks is not None:
+            self.chunks.add_part(brick)
+
+        # Hide covered studs before the brick gets its 3d-object
+        if self.culler is not None:
+            with TRACER.span("culling"):
+                self.cull_studs(brick)
+        if self.render_enabled:
+            self.generate_bricks([brick])
 
         # update camera view
         self.update_camera_position()
 
+        return brick
+
+    # argument order of add_brick, used by add_bricks for tuples and columns
+    BRICK_FIELDS = ("brick_type", "length", "width", "height", "x_pos", "y_pos", "z_pos", "brick_color", "brick_orientation")
+    BRICK_DEFAULTS = ("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+
+    @traced("add_bricks")
+    def add_bricks(self, bricks = None, auto_z = None, return_bricks = True, **columns):
+        """Add many bricks in one go
+
+        Same result as calling add_brick for every brick in order, but auto-z and the
+        grid are handled in one pass, bricks are generated afterwards and the camera
+        is only updated once at the end.
+
+        Bricks are given either as an iterable of dicts (add_brick keyword arguments)
+        or tuples (add_brick argument order), or as columns: one keyword per add_brick
+        argument holding a list/array, single values are used for all bricks, e.g.
+
+            scene.add_bricks(length=4, width=2, x_pos=[0, 4, 8], brick_color=color.red)
+
+        Args:
+            bricks (iterable, optional): dicts or tuples, see above
+            auto_z (bool, optional): override the auto_z option for this batch (e.g. when loading stored z values). Defaults to None.
+            return_bricks (bool, optional): False returns None instead of the new bricks (bulk loading of records). Defaults to True.
+            **columns: add_brick arguments as columns, see above
+
+        Returns:
+            list: the new bricks (BrickRecords if the project has brick_objects=False)
+
+        Raises:
+            ValueError: a length, width or position that is not a whole number, see add_brick
+        """
+        if bricks is not None and columns:
+            raise ValueError("add_bricks takes either bricks or columns, not both")
+        if auto_z is None:
+            auto_z = self.auto_z
+
+        defaults = self.BRICK_DEFAULTS
+        if columns:
+            bricks = self._zip_brick_columns(columns, defaults)
+
+        # 1. resolve z and fill the grid in placement order
+        placed = []
+        calculate_z_pos = self.calculate_z_pos
+        add_to_grid = self.grid.add_brick
+        if TRACER.enabled:
+            # per-brick grid spans only while tracing, the loop stays as it is otherwise
+            add_to_grid = traced("grid.insert")(add_to_grid)
+        first_index = self.store.row_count
+        report_count = len(self.collision_reports)
+        indexed = None  # collision entry of the brick being placed, until it is in placed
+        try:
+            for brick_args in bricks:
+                if isinstance(brick_args, dict):
+                    brick_args = tuple(brick_args.get(name, default) for name, default in zip(self.BRICK_FIELDS, defaults))
+                elif len(brick_args) < len(defaults):
+                    brick_args = tuple(brick_args) + defaults[len(brick_args):]
+                brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation = brick_args
+                length, width, x_pos, y_pos = to_grid_ints(length, width, x_pos, y_pos)
+
+                if auto_z:
+                    z_pos = calculate_z_pos(length, width, height, x_pos, y_pos, brick_orientation)
+                x_extension, y_extension = get_grid_footprint(length, width, brick_orientation)
+                if self.collisions is not None and self.check_collision(x_pos, y_pos, z_pos, x_extension, y_extension, height,
+                                                                        first_index + len(placed)):
+                    indexed = (x_pos, y_pos, z_pos, x_extension, y_extension, height, first_index + len(placed))
+                add_to_grid(x_pos, y_pos, z_pos, x_extension, y_extension, height)
+                placed.append((brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation))
+                indexed = None
+        except Exception:
+            # the batch is added completely or not at all (strict="reject", invalid arguments, ...)
+            if indexed is not None:
+                self.collisions.remove_brick(*indexed)
+            for index, (brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation) in enumerate(placed, first_index):
+                x_extension, y_extension = get_grid_footprint(length, width, brick_orientation)
+                self.grid.remove_brick(x_pos, y_pos, z_pos, x_extension, y_extension, height)
+                if self.collisions is not None and index not in self.unindexed_rows:
+                    self.collisions.remove_brick(x_pos, y_pos, z_pos, x_extension, y_extension, height, index)
+            del self.collision_reports[report_count:]
+            self.unindexed_rows.difference_update(range(first_index, first_index + len(placed) + 1))
+            raise
+
+        if GLOBAL_DEBUG and BRICK_DEBUG: print(f"add_bricks: {len(placed)} bricks placed")
+        if self.connectivity is not None:
+            with TRACER.span("grid.insert"):
+                offset = self.get_mapped_count()
+                for index, (brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation) in enumerate(placed, first_index):
+                    x_extension, y_extension = get_grid_footprint(length, width, brick_orientation)
+                    self.connectivity.add_brick(offset + index, x_pos, y_pos, z_pos, x_extension, y_extension, height)
+        TRACER.count("bricks", len(placed))
+
+        if not self.brick_objects:
+            placed = [brick_args if brick_args[7] != "random" else brick_args[:7] + (BrickFactory.choose_random_color(), brick_args[8])
+                      for brick_args in placed]
+            indices = self.store.extend(placed)
+            self.push_history("add", indices)
+            return [self.store.get(index) for index in indices] if return_bricks else None
+
+        # 2. create bricks, hide covered studs, then generate (headless scenes skip the 3d-objects)
+        create_brick = BrickFactory.create_brick
+        new_bricks = [create_brick(self.brick_system, *brick_args, False) for brick_args in placed]
+        self._bricks.extend(new_bricks)
+        indices = self.store.extend(brick_args[:7] + (brick.brick_color, brick_args[8]) for brick_args, brick in zip(placed, new_bricks))
+        for index, brick in zip(indices, new_bricks):
+            brick.store_index = index
+        self.store_bricks.extend(new_bricks)
+        self.push_history("add", indices)
+        if self.chunks is not None:
+            for brick in new_bricks:
+                self.chunks.add_part(brick)
+        if self.culler is not None:
+            with TRACER.span("culling"):
+                for brick in new_bricks:
+                    self.cull_studs(brick)
+        if self.render_enabled:
+            # chunked scenes rebuild every touched chunk once
+            self.generate_bricks(new_bricks)
+
+        # 3. one camera update for the whole batch
+        if new_bricks:
+            self.update_camera_position()
+
+        return new_bricks if return_bricks else None
+
+    def _zip_brick_columns(self, columns, defaults):
+        """Turn add_bricks columns into argument tuples, broadcasting single values"""
+        unknown = set(columns) - set(self.BRICK_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown brick arguments: {', '.join(sorted(unknown))}")
+        values = []
+        count = None
+        for name, default in zip(self.BRICK_FIELDS, defaults):
+            value = columns.get(name, default)
+            if hasattr(value, "tolist"):  # numpy arrays
+                value = value.tolist()
+            # colors and orientations are vectors, so a single one is never mistaken for a column
+            if isinstance(value, (list, tuple)):
+                if count is not None and len(value) != count:
+                    raise ValueError(f"Column {name} has {len(value)} entries, expected {count}")
+                count = len(value)
+            values.append(value)
+        if count is None:
+            count = 1
+        return list(zip(*[value if isinstance(value, (list, tuple)) else [value] * count for value in values]))
+
+    async def add_bricks_async(self, bricks = None, auto_z = None, return_bricks = True, frame_rate = 30, scheduler = None, **columns):
+        """Add many bricks over several frames, handing control to the event loop in between (asyncio)
+
+        Same bricks as add_bricks, added in batches sized by a FrameScheduler (see
+        brickstack_progressive): every batch stays within its share of the frame time,
+        so the canvas shows the model growing and other tasks keep running. Bricks may
+        come from a generator, it is consumed batch by batch.
+
+        Cancelling the task stops after the current batch, the bricks added so far stay
+        in the scene. undo() takes back all bricks added by the call. With strict="reject"
+        a collision only rolls back its own batch.
+
+        Args:
+            bricks, auto_z, return_bricks, **columns: see add_bricks
+            frame_rate (float, optional): target frames per second. Defaults to 30.
+            scheduler (FrameScheduler, optional): frame timing and batch sizes, replaces frame_rate. Defaults to None.
+
+        Returns:
+            list: the new bricks (see add_bricks), None if return_bricks is False
+        """
+        from itertools import islice
+        from brickstack_progressive import FrameScheduler, run_frames
+        if bricks is not None and columns:
+            raise ValueError("add_bricks_async takes either bricks or columns, not both")
+        if columns:
+            bricks = self._zip_brick_columns(columns, self.BRICK_DEFAULTS)
+        remaining = iter(bricks if bricks is not None else ())
+        new_bricks = []
+        last_entry = None  # history entry of the previous batch
+
+        def add_batch(batch_size):
+            nonlocal last_entry
+            batch = list(islice(remaining, batch_size))
+            if not batch:
+                return 0
+            added = self.add_bricks(batch, auto_z, return_bricks)
+            if return_bricks:
+                new_bricks.extend(added)
+            # merge the batches into one undo step, unless something else changed the scene in between
+            entry = self.history[-1]
+            if last_entry is not None and len(self.history) > 1 and self.history[-2] is last_entry:
+                entry = ("add", range(last_entry[1].start, entry[1].stop))
+                self.history[-2:] = [entry]
+            last_entry = entry
+            return len(batch)
+
+        await run_frames(add_batch, scheduler or FrameScheduler(frame_rate))
+        return new_bricks if return_bricks else None
+
+    def push_history(self, action, indices):
+        """Record an undoable action ("add" or "remove" of store rows); clears the redo history"""
+        self.history.append((action, indices))
+        self.redo_history.clear()
+
+    def get_store_index(self, brick):
+        """Store row of a brick: row index or a brick/record returned by add_brick/add_bricks"""
+        index = brick if isinstance(brick, int) else getattr(brick, "store_index", None)
+        if index is None:
+            raise KeyError(f"{brick!r} is not a brick of the store (baseplates and mapped bricks cannot be removed)")
+        return index
+
+    def remove_brick(self, brick):
+        """Remove a brick from the scene (undoable, see undo)
+
+        Grid, bounds, collision index, culled studs and 3d-objects are updated for the
+        brick alone: the cost depends on its footprint, not on the size of the scene.
+        The store keeps the row (marked removed), so row indices stay valid.
+
+        Args:
+            brick (int or RectangularBrick or BrickRecord): store row index or a brick returned by add_brick/add_bricks
+
+        Returns:
+            BrickRecord: the removed brick
+
+        Raises:
+            KeyError: the brick is not in the scene (removed already, baseplate or mapped brick)
+        """
+        index = self.get_store_index(brick)
+        self.remove_rows([index])
+        self.push_history("remove", [index])
+        self.update_camera_position()
+        return self.store.get(index)
+
+    def undo(self):
+        """Undo the last add_brick, add_bricks (whole batch) or remove_brick
+
+        Returns:
+            bool: False if there is nothing to undo
+        """
+        if not self.history:
+            return False
+        action, indices = self.history[-1]
+        if action == "add":
+            self.remove_rows(indices)
+        else:
+            self.restore_rows(indices)
+        self.redo_history.append(self.history.pop())
+        self.update_camera_position()
+        return True
+
+    def redo(self):
+        """Repeat the last undone action
+
+        Returns:
+            bool: False if there is nothing to redo
+        """
+        if not self.redo_history:
+            return False
+        action, indices = self.redo_history[-1]
+        if action == "add":
+            self.restore_rows(indices)
+        else:
+            self.remove_rows(indices)
+        self.history.append(self.redo_history.pop())
+        self.update_camera_position()
+        return True
+
+    def get_row_footprint(self, index):
+        """(x, y, z, x-extension, y-extension, height) of a store row, as passed to the grid"""
+        brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation = self.store.get(index).as_args()
+        x_extension, y_extension = get_grid_footprint(length, width, brick_orientation)
+        return x_pos, y_pos, z_pos, x_extension, y_extension, height
+
+    def remove_rows(self, indices):
+        """Take store rows out of the scene, last row first (see remove_brick)"""
+        indices = list(indices)
+        for index in indices:
+            if not 0 <= index < self.store.row_count or self.store.is_removed(index):
+                raise KeyError(f"No brick at store index {index}")
+        offset = self.get_mapped_count()
+        for index in reversed(indices):
+            if self.connectivity is not None:
+                self.connectivity.remove_brick(offset + index)
+            self.unplace_row(index)
+            if not self.brick_objects:
+                continue
+
+            brick = self.store_bricks[index]
+            self.removed_parts.add(brick)
+            if self.culler is not None:
+                for other, studs in self.culler.remove_part(brick).items():
+                    other.refresh_studs(studs)
+                    if self.chunks is not None and other.compound is not None and self.chunks.mark_dirty(other):
+                        other.compound.visible = False
+            if self.chunks is not None:
+                self.chunks.remove_part(brick)
+            elif brick.compound is not None:
+                brick.compound.visible = False
+        # headless chunked scenes keep their dirty chunks for render()
+        if self.chunks is not None and self.render_enabled:
+            self.rebuild_chunks()
+        if GLOBAL_DEBUG and BRICK_DEBUG: print(f"Removed {len(indices)} bricks")
+
+    def unplace_row(self, index):
+        """Take a store row out of grid, collision index and store (no 3d-objects)"""
+        footprint = self.get_row_footprint(index)
+        self.grid.remove_brick(*footprint)
+        if self.collisions is not None:
+            if index in self.unindexed_rows:
+                self.unindexed_rows.discard(index)
+            else:
+                self.collisions.remove_brick(*footprint, index)
+        self.store.remove(index)
+
+    def restore_rows(self, indices):
+        """Bring removed store rows back, in placement order (undo of remove_brick, redo of add)
+
+        Raises:
+            BrickCollisionError: strict="reject" and a brick is in the way; no row is restored then
+        """
+        indices = list(indices)
+        restored = []
+        try:
+            for index in indices:
+                footprint = self.get_row_footprint(index)
+                if self.collisions is not None:
+                    self.check_collision(*footprint, index)
+                self.grid.add_brick(*footprint)
+                self.store.restore(index)
+                restored.append(index)
+        except BrickCollisionError:
+            for index in reversed(restored):
+                self.unplace_row(index)
+            raise
+        if self.connectivity is not None:
+            offset = self.get_mapped_count()
+            for index in indices:
+                self.connectivity.add_brick(offset + index, *self.get_row_footprint(index))
+        if not self.brick_objects:
+            return
+
+        bricks = [self.store_bricks[index] for index in indices]
+        for brick in bricks:
+            if brick in self.removed_parts:
+                self.removed_parts.discard(brick)  # still in _bricks, at its old position
+            else:
+                self._bricks.append(brick)
+        for brick in bricks:
+            if self.chunks is not None:
+                self.chunks.add_part(brick)
+            if self.culler is not None:
+                self.cull_studs(brick)
+        # culled studs and chunks need new 3d-objects, otherwise the old ones are shown again
+        missing = []
+        for brick in bricks:
+            if brick.compound is not None and self.culler is None and self.chunks is None:
+                brick.compound.visible = True
+            elif self.render_enabled:
+                if brick.compound is not None:
+                    brick.compound.visible = False
+                    brick.compound = None
+                    brick.lod_compounds = {}
+                missing.append(brick)
+        if missing:
+            self.generate_bricks(missing)
+
     def get_my_scene_index(self):
         return self.project.get_scene_index(self)
 
 
 class BrickFactory:
     @staticmethod
-    def create_brick(brick_system, brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation):
+    def create_brick(brick_system, brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, brick_orientation, render = True):
         if brick_color == "random":
             final_brick_color = BrickFactory.choose_random_color()
         else:
@@ -375,7 +1617,8 @@ class BrickFactory:
                                      y_pos, 
                                      z_pos, 
                                      final_brick_color,
-                                     brick_orientation)
+                                     brick_orientation,
+                                     render)
         else:
             brick = RectangularBrick(brick_system,
                                      length, 
@@ -385,16 +1628,17 @@ class BrickFactory:
                                      y_pos, 
                                      z_pos, 
                                      final_brick_color,
-                                     brick_orientation)
+                                     brick_orientation,
+                                     render)
 
         return brick  
 
     @staticmethod
-    def create_baseplate(brick_system, baseplate_color, baseplate_custom_length, baseplate_custom_width, baseplate_center_x, baseplate_center_y):
+    def create_baseplate(brick_system, baseplate_color, baseplate_custom_length, baseplate_custom_width, baseplate_center_x, baseplate_center_y, render = True):
         # custom_x/y: center (standard: 0,0)
         if GLOBAL_DEBUG and CALC_DEBUG: print(f"Baseplate values: x: {baseplate_center_x}, y: {baseplate_center_y}, length: {baseplate_custom_length}, width: {baseplate_custom_width}")
 
-        baseplate = Baseplate(brick_system, baseplate_color, baseplate_custom_length, baseplate_custom_width, baseplate_center_x, baseplate_center_y)
+        baseplate = Baseplate(brick_system, baseplate_color, baseplate_custom_length, baseplate_custom_width, baseplate_center_x, baseplate_center_y, render)
 
         return baseplate
 
@@ -413,6 +1657,191 @@ class BrickFactory:
         return vector(red, green, blue)
 
 
+def build_buffer_compound(positions, normals, indices, part_color):
+    """Compound of vpython triangles from vertex buffers (see brickstack_buffers)
+
+    Vertices keep their scene coordinates, so the compound needs no move or rotation.
+    Triangles share the vertex objects of the buffers: one vpython.vertex per buffer
+    vertex, not per triangle corner.
+    """
+    vpython = get_vpython()
+    rgb = to_vpython(part_color)
+    vertices = [vpython.vertex(pos = vpython.vec(*position), normal = vpython.vec(*normal), color = rgb)
+                for position, normal in zip(positions.tolist(), normals.tolist())]
+    return vpython.compound([vpython.triangle(vs = [vertices[first], vertices[second], vertices[third]])
+                             for first, second, third in indices.tolist()])
+
+
+class StudTemplateCache:
+    """Cache of invisible stud templates, one per (canvas, brick_system, hollow)
+
+    Building a stud from scratch (cylinder, or circle shape + extrusion for hollow
+    duplo studs) is the most expensive part of generating a brick. Each stud kind
+    is built once per canvas and then cloned at every stud position.
+    """
+    templates = {}
+
+    @classmethod
+    def get_template(cls, brick, hollow):
+        """Return the template stud for the brick's system, building it on first use
+
+        Args:
+            brick (obj::BasicBrick): any brick of the wanted brick_system
+            hollow (bool): hollow (extrusion) or massive (cylinder) stud
+        """
+        vpython = get_vpython()
+        current_canvas = vpython.canvas.get_selected()
+        key = (id(current_canvas), brick.brick_system, hollow)
+        template = cls.templates.get(key)
+        if template is None:
+            # template sits at the origin; generate_stud(...) is the reference geometry
+            template = brick.generate_stud(vpython.vec(0, 0, 0), hollow)
+            template.visible = False
+            cls.templates[key] = template
+            if GLOBAL_DEBUG and STUD_DEBUG: print(f"New stud template: {key}")
+        return template
+
+    @classmethod
+    def clear(cls):
+        """Drop all templates (e.g. after changing BRICK_SPECS)"""
+        cls.templates = {}
+
+
+class BrickMeshCache:
+    """LRU cache of finished brick compounds keyed by (system, length, width, height, color, stud kind)
+
+    Culled bricks (see StudCuller) additionally key on their hidden studs.
+
+    Compounds are stored invisible, at the origin and in NORTH orientation - a cache
+    hit only costs a clone plus rotate and move. Entries are per canvas, since
+    vpython objects belong to one canvas. The cache empties itself (and the
+    StudTemplateCache) as soon as the BasicBrick.BRICK_SPECS of a brick system are
+    replaced or changed; every lookup compares them with a flat copy (no
+    serialization of the nested dict).
+    """
+    def __init__(self, max_size = 256):
+        """BrickMeshCache init
+
+        Args:
+            max_size (int, optional): maximum number of cached compounds, least recently used ones are evicted. Defaults to 256.
+        """
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.specs = {}  # brick_system -> (BRICK_SPECS entry, flat copy of it)
+
+    def make_key(self, brick):
+        brick_color = brick.brick_color
+        vpython = get_vpython()
+        return (id(vpython.canvas.get_selected()),
+                brick.brick_system,
+                brick.stud_y_counter,  # length
+                brick.stud_x_counter,  # width
+                brick.height,
+                (brick_color.x, brick_color.y, brick_color.z),
+                brick.get_stud_kind(),
+                frozenset(brick.hidden_studs))
+
+    def check_specs(self, brick_system):
+        """Invalidate everything if the BRICK_SPECS of brick_system differ from the specs the cache was filled with"""
+        specs = BasicBrick.BRICK_SPECS[brick_system]
+        known = self.specs.get(brick_system)
+        if known is not None and known[0] is specs and known[1] == specs:
+            return
+        if known is not None:
+            if GLOBAL_DEBUG and BRICK_DEBUG: print("BRICK_SPECS changed, clearing mesh cache")
+            self.clear()
+            StudTemplateCache.clear()
+        self.specs[brick_system] = (specs, dict(specs))
+
+    def instance(self, brick):
+        """Return a new visible compound for brick (at origin, NORTH orientation)
+
+        Args:
+            brick (obj::RectangularBrick): brick providing the key and build_compound() on a miss
+        """
+        self.check_specs(brick.brick_system)
+        key = self.make_key(brick)
+        template = self.entries.get(key)
+        if template is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            template = brick.build_compound()
+            template.visible = False
+            self.entries[key] = template
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+        return template.clone()
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size as dict"""
+        return {
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "evictions" : self.evictions,
+            "size" : len(self.entries),
+            "max_size" : self.max_size
+        }
+
+
+class BaseplateCache(BrickMeshCache):
+    """LRU cache of finished baseplate compounds keyed by (system, size, color, stud kind)
+
+    Templates are built centered at the origin; a new baseplate is a clone moved to
+    its center. Entries are per canvas like BrickMeshCache entries.
+    """
+    def make_key(self, baseplate):
+        baseplate_color = baseplate.brick_color
+        vpython = get_vpython()
+        return (id(vpython.canvas.get_selected()),
+                baseplate.brick_system,
+                baseplate.stud_x_counter,
+                baseplate.stud_y_counter,
+                (baseplate_color.x, baseplate_color.y, baseplate_color.z),
+                baseplate.get_stud_kind(),
+                frozenset(baseplate.hidden_studs))
+
+
+class BaseplateStudField:
+    """Stud layout of baseplates, computed once per (brick_system, size) and shared by all baseplates
+
+    Holds (x_stud, y_stud, offset_x, offset_y) for every existing stud, with offsets in mm
+    from the baseplate center, plus the same entries grouped by row. The duplo corner
+    check runs once while the field is built, not for every generated baseplate.
+    """
+    fields = {}
+
+    @classmethod
+    def get_field(cls, baseplate):
+        """Return (studs, rows): list of stud entries (x_stud major) and dict y_stud -> list of entries"""
+        specs = baseplate.specs
+        key = (baseplate.brick_system, int(baseplate.stud_x_counter), int(baseplate.stud_y_counter),
+               specs["xy_factor"], specs["stud_xy_offset"], specs["stud_spacing"])
+        field = cls.fields.get(key)
+        if field is None:
+            from brickstack_layout import baseplate_studs, stud_centers
+            columns, rows = int(baseplate.stud_x_counter), int(baseplate.stud_y_counter)
+            stud_array = baseplate_studs(columns, rows, specs["baseplate_corner_studs"])
+            centers = stud_centers(stud_array, baseplate.stud_x_counter, baseplate.stud_y_counter,
+                                   specs["xy_factor"], specs["stud_xy_offset"], specs["stud_spacing"])
+            studs = [(x_stud, y_stud, offset_x, offset_y)
+                     for (x_stud, y_stud), (offset_x, offset_y) in zip(stud_array.tolist(), centers.tolist())]
+            rows = {}
+            for stud in sorted(studs, key = lambda stud: (stud[1], stud[0])):
+                rows.setdefault(stud[1], []).append(stud)
+            field = cls.fields[key] = (studs, rows)
+            if GLOBAL_DEBUG and STUD_DEBUG: print(f"New baseplate stud field: {key}")
+        return field
+
+
 class BasicBrick:
     """Parent class for all bricks containing general information and a testing format
     """
@@ -433,7 +1862,8 @@ class BasicBrick:
             "stud_wall_thickness": 0,
             "is_hollow": False,
             "baseplate_height" : 0.15,
-            "baseplate_roundness" : 0.02
+            "baseplate_roundness" : 0.02,
+            "baseplate_corner_studs" : True
         },
 
         # due to likely render issues, stud diameter is reduced by half of wall thickness
@@ -447,7 +1877,8 @@ class BasicBrick:
             "stud_wall_thickness": 2.2,
             "is_hollow": True,
             "baseplate_height" : 0.15,
-            "baseplate_roundness" : 0.08          
+            "baseplate_roundness" : 0.08,
+            "baseplate_corner_studs" : False  # duplo baseplates have no corner studs
         },
 
         "test": {
@@ -472,6 +1903,82 @@ class BasicBrick:
         """
         self.brick_system = brick_system
         self.specs = self.BRICK_SPECS[brick_system]
+        # stud level of detail (see brickstack_lod) and hidden 3d-objects of other tiers, by stud kind
+        self.lod = "full"
+        self.lod_compounds = {}
+
+    def get_stud_kind(self, lod = None):
+        """Stud geometry of a tier: "hollow", "solid" or None (no studs)
+
+        Args:
+            lod (str, optional): tier, the current one if None. Defaults to None.
+        """
+        lod = lod or self.lod
+        if lod == "flat":
+            return None
+        return "hollow" if lod == "full" and self.specs["is_hollow"] else "solid"
+
+    def set_lod(self, lod):
+        """Switch the stud level of detail ("full", "solid" or "flat")
+
+        Rendered parts swap their 3d-object; the previous one is kept invisible and
+        reused when switching back. Tiers with the same geometry (e.g. "full" and
+        "solid" for lego) do not touch the 3d-object.
+
+        Returns:
+            bool: True if the 3d-object changed
+        """
+        old_kind, new_kind = self.get_stud_kind(), self.get_stud_kind(lod)
+        self.lod = lod
+        if old_kind == new_kind or self.compound is None:
+            return False
+        self.compound.visible = False
+        self.lod_compounds[old_kind] = self.compound
+        self.compound = self.lod_compounds.pop(new_kind, None)
+        if self.compound is None:
+            self.compound = self.generate()
+        else:
+            self.compound.visible = True
+        return True
+
+    # "template": clone studs from StudTemplateCache (fast)
+    # "per_call": build every stud with generate_stud (reference, for benchmarks)
+    STUD_MODE = "template"
+    # "primitives" or "buffers", set by the scene from BrickProject(geometry=...)
+    geometry = "primitives"
+
+    def generate_from_buffers(self, buffers = None):
+        """3d-object from vertex buffers (see brickstack_buffers)
+
+        Args:
+            buffers (tuple, optional): (positions, normals, indices) of this part, computed here if None. Defaults to None.
+        """
+        if buffers is None:
+            from brickstack_buffers import generate_buffers
+            buffers = next(generate_buffers([self.get_mesh_part()], self.specs, 1))
+        return build_buffer_compound(*buffers, self.brick_color)
+
+    def make_stud(self, pos, hollow=False, wall_thickness = None):
+        """Create one stud for a compound, using the configured STUD_MODE
+
+        Args: see generate_stud
+        """
+        if self.STUD_MODE == "per_call":
+            return self.generate_stud(pos, hollow, wall_thickness)
+        return self.instance_stud(pos, hollow)
+
+    def instance_stud(self, pos, hollow=False):
+        """Clone the cached template stud to pos (center point of stud basis)
+
+        Returns:
+            cylinder or compound (obj::vpython): see generate_stud
+        """
+        vpython = get_vpython()
+        if GLOBAL_DEBUG and STUD_DEBUG: print(f"Cloning 3d-stud to {pos}.")
+        template = StudTemplateCache.get_template(self, hollow)
+        # extrusions are positioned by their center, cylinders by their basis
+        z_offset = self.specs["stud_height"] / 2 if hollow else 0
+        return template.clone(pos=vpython.vec(pos.x, pos.y, pos.z + z_offset), color=to_vpython(self.brick_color))
 
     def generate_stud(self, pos, hollow=False, wall_thickness = None):
         """3d-function to generate and render individual studs for compound
@@ -486,36 +1993,40 @@ class BasicBrick:
         Returns:
             cylinder or extrusion (obj::vpython): returns a cylinder or an extruded circle (hollow cylinder) representing one stud
         """
+        vpython = get_vpython()
         if GLOBAL_DEBUG and STUD_DEBUG: print(f"Generating 3d-stud at {pos}.")
         if not hollow:
-            generated_stud = cylinder(
-                pos=pos,
+            generated_stud = vpython.cylinder(
+                pos=to_vpython(pos),
                 radius=self.specs["stud_diameter"] / 2,
-                axis=vec(0.0, 0.0, self.specs["stud_height"]),
-                color=self.brick_color
+                axis=vpython.vec(0.0, 0.0, self.specs["stud_height"]),
+                color=to_vpython(self.brick_color)
             )
         else:
-            cyl_base = shapes.circle(
+            cyl_base = vpython.shapes.circle(
                 radius = self.specs["stud_diameter"]/2, 
                 thickness = self.specs["stud_wall_thickness"]
             )
 
             cyl_path = [
-                vec(pos.x, pos.y, pos.z),
-                vec(pos.x, pos.y, pos.z + self.specs["stud_height"])
+                vpython.vec(pos.x, pos.y, pos.z),
+                vpython.vec(pos.x, pos.y, pos.z + self.specs["stud_height"])
             ]
 
-            generated_stud = extrusion(
+            generated_stud = vpython.extrusion(
                 shape = cyl_base, 
                 path = cyl_path, 
-                color = self.brick_color
+                color = to_vpython(self.brick_color)
             )
  
         return generated_stud
 
 
 class Baseplate(BasicBrick):
-    def __init__(self, brick_system, baseplate_color, baseplate_length : int = None, baseplate_width : int = None, baseplate_center_x : int = None, baseplate_center_y : int = None):
+    # shared by all baseplates; set to None to always build from scratch
+    compound_cache = BaseplateCache(max_size = 16)
+
+    def __init__(self, brick_system, baseplate_color, baseplate_length : int = None, baseplate_width : int = None, baseplate_center_x : int = None, baseplate_center_y : int = None, render : bool = True):
         super().__init__(brick_system)
         self.stud_x_counter = (
             baseplate_width if baseplate_width is not None
@@ -553,59 +2064,187 @@ class Baseplate(BasicBrick):
         self.lower_left_y = self.baseplate_center_y - self.baseplate_length * 0.5
         # Keep to make baseplate a child of rectangularbrick later
         self.lower_left_z = -0.15
+        # lower left corner in grid units (stud cells), for stud culling
+        self.grid_lower_left_x = (baseplate_center_x or 0) - self.stud_x_counter / 2
+        self.grid_lower_left_y = (baseplate_center_y or 0) - self.stud_y_counter / 2
 
-        self.generate()
+        # stud culling (see BrickScene / StudCuller): covered studs and one compound per stud row
+        self.hidden_studs = set()
+        self.stud_row_compounds = None
 
-    def generate(self):
-        # add baseplate to OccupancyGrid?
-        # 1: extrude baseplate from shape
-        baseplate_linepath_z = [vec(0, 0, self.lower_left_z * self.specs["xy_factor"]), 
-                                vec(0, 0, 0)
+        # 3d-object, built later by BrickScene.render() for headless scenes
+        self.compound = self.generate() if render else None
+
+    def has_stud(self, x_stud, y_stud):
+        """duplo: corner-studs do not exist on baseplate"""
+        return not (not self.specs["baseplate_corner_studs"] and 
+                    (x_stud == 0 or x_stud == int(self.stud_x_counter)-1) and 
+                    (y_stud == 0 or y_stud == int(self.stud_y_counter)-1))
+
+    def stud_indices(self):
+        """Yield (x_stud, y_stud) for every stud of the baseplate"""
+        studs, rows = BaseplateStudField.get_field(self)
+        for x_stud, y_stud, offset_x, offset_y in studs:
+            yield x_stud, y_stud
+
+    def stud_cells(self):
+        """Yield ((cell_x, cell_y), (x_stud, y_stud)) for every stud, see StudCuller"""
+        for x_stud, y_stud in self.stud_indices():
+            yield (self.grid_lower_left_x + x_stud, self.grid_lower_left_y + y_stud), (x_stud, y_stud)
+
+    def get_grid_z_range(self):
+        """Bottom and top of the baseplate in brick heights; bricks on the baseplate start at 0"""
+        return self.lower_left_z, 0
+
+    def get_box(self):
+        """Lower and upper corner of the baseplate in mm"""
+        return ((self.lower_left_x, self.lower_left_y, -self.height),
+                (self.lower_left_x + self.baseplate_width, self.lower_left_y + self.baseplate_length, 0))
+
+    def get_stud_kind(self, lod = None):
+        """Baseplate studs are always solid, see BasicBrick.get_stud_kind"""
+        return None if (lod or self.lod) == "flat" else "solid"
+
+    def set_lod(self, lod):
+        """Switch the stud level of detail, see BasicBrick.set_lod
+
+        Culled baseplates keep their studs in row compounds: those are shown or hidden
+        (and built if missing), the plate itself stays.
+        """
+        if self.stud_row_compounds is None or self.compound is None:
+            return super().set_lod(lod)
+        changed = self.get_stud_kind(lod) != self.get_stud_kind()
+        self.lod = lod
+        if changed:
+            if self.get_stud_kind() is not None:
+                self.build_missing_stud_rows()
+            for stud_row in self.stud_row_compounds.values():
+                stud_row.visible = self.get_stud_kind() is not None
+        return changed
+
+    def build_stud(self, offset_x, offset_y, center_x, center_y):
+        """One stud at offset (see BaseplateStudField) from the baseplate center"""
+        vpython = get_vpython()
+        # duplo: baseplate studs are massive, not hollow
+        stud_center = vpython.vec(center_x + offset_x, center_y + offset_y, self.lower_left_z + self.height)
+
+        return self.make_stud(
+            pos = stud_center,
+            hollow = False,
+            wall_thickness = self.specs["stud_wall_thickness"]
+        )
+
+    def build_stud_row(self, y_stud):
+        """Compound of the visible studs in one row (or None if all are hidden)"""
+        studs, rows = BaseplateStudField.get_field(self)
+        with TRACER.span("studs"):
+            row_studs = [self.build_stud(offset_x, offset_y, self.baseplate_center_x, self.baseplate_center_y)
+                         for x_stud, y_stud, offset_x, offset_y in rows.get(y_stud, ())
+                         if (x_stud, y_stud) not in self.hidden_studs]
+        TRACER.count("studs", len(row_studs))
+        if not row_studs:
+            return None
+        vpython = get_vpython()
+        return vpython.compound(row_studs)
+
+    def build_missing_stud_rows(self):
+        """Build the row compounds that do not exist yet (culled baseplates)"""
+        for y_stud in range(int(self.stud_y_counter)):
+            if y_stud not in self.stud_row_compounds:
+                stud_row = self.build_stud_row(y_stud)
+                if stud_row is not None:
+                    self.stud_row_compounds[y_stud] = stud_row
+
+    def refresh_studs(self, changed_studs):
+        """Rebuild the 3d-object after studs got hidden (only the affected rows if split into rows)"""
+        if self.compound is None:
+            return
+        if self.stud_row_compounds is None:
+            self.compound.visible = False
+            self.compound = self.generate()
+            self.lod_compounds = {}
+            return
+        for y_stud in {y_stud for x_stud, y_stud in changed_studs}:
+            old_row = self.stud_row_compounds.pop(y_stud, None)
+            if old_row is not None:
+                old_row.visible = False
+            # flat baseplates rebuild their rows when studs are shown again
+            if self.get_stud_kind() is None:
+                continue
+            new_row = self.build_stud_row(y_stud)
+            if new_row is not None:
+                self.stud_row_compounds[y_stud] = new_row
+
+    def build_plate(self, center_x, center_y):
+        """The plate itself (rounded rectangle extrusion, top at z = 0)"""
+        vpython = get_vpython()
+        baseplate_linepath_z = [vpython.vec(0, 0, self.lower_left_z * self.specs["xy_factor"]), 
+                                vpython.vec(0, 0, 0)
         ]
-        baseplate_shape = shapes.rectangle(
-            pos=[self.baseplate_center_x, self.baseplate_center_y],
+        baseplate_shape = vpython.shapes.rectangle(
+            pos=[center_x, center_y],
             width = self.baseplate_width,
             height = self.baseplate_length,
             roundness = self.specs["baseplate_roundness"]
         )
-        baseplate_extrusion = extrusion(
+        return vpython.extrusion(
             shape = baseplate_shape,
             path = baseplate_linepath_z,
-            color = self.brick_color
+            color = to_vpython(self.brick_color)
         )
-        baseplate_compound = [baseplate_extrusion]
-
-        # 2: add studs
-        # duplo: corner-studs do not exist on baseplate
-        # duplo: baseplate studs are massive, not hollow
-        for x_stud in (range(int(self.stud_x_counter))):
-            for y_stud in (range(int(self.stud_y_counter))):
-                if (self.brick_system == "duplo" and 
-                    (x_stud == 0 or x_stud == int(self.stud_x_counter)-1) and 
-                    (y_stud == 0 or y_stud == int(self.stud_y_counter)-1)):
-                    pass
-                else:
-                    stud_center = vec(
-                        self.lower_left_x + self.specs["stud_xy_offset"] + (x_stud * self.specs["stud_spacing"]),
-                        self.lower_left_y + self.specs["stud_xy_offset"] + (y_stud * self.specs["stud_spacing"]),
-                        self.lower_left_z + self.height)
-
-                    stud = self.generate_stud(
-                        pos = stud_center,
-                        hollow = False,
-                        wall_thickness = self.specs["stud_wall_thickness"]
-                    )
 
-                    baseplate_compound.append(stud)
-
-        return compound(baseplate_compound)
+    def build_compound(self, center_x = 0, center_y = 0):
+        """Plate and visible studs around (center_x, center_y); at the origin for the compound cache"""
+        baseplate_compound = [self.build_plate(center_x, center_y)]
+        studs, rows = BaseplateStudField.get_field(self)
+        with TRACER.span("studs"):
+            for x_stud, y_stud, offset_x, offset_y in studs:
+                if (x_stud, y_stud) not in self.hidden_studs:
+                    baseplate_compound.append(self.build_stud(offset_x, offset_y, center_x, center_y))
+        TRACER.count("studs", len(baseplate_compound) - 1)
+        vpython = get_vpython()
+        return vpython.compound(baseplate_compound)
+
+    def get_mesh_part(self):
+        """Part tuple for brickstack_buffers (grid units)"""
+        return ("baseplate", (self.grid_lower_left_x, self.grid_lower_left_y, int(self.stud_x_counter), int(self.stud_y_counter)),
+                self.get_stud_kind(), frozenset(self.hidden_studs), self.specs["baseplate_corner_studs"])
+
+    @traced("compound")
+    def generate(self):
+        if self.geometry == "buffers":
+            return self.generate_from_buffers()
+        # add baseplate to OccupancyGrid?
+        # 1: culled baseplates keep one compound per stud row, so covering a stud only rebuilds its row
+        if self.stud_row_compounds is not None:
+            baseplate_extrusion = self.build_plate(self.baseplate_center_x, self.baseplate_center_y)
+            self.stud_row_compounds = {}
+            if self.get_stud_kind() is not None:
+                self.build_missing_stud_rows()
+            return baseplate_extrusion
+
+        # flat level of detail: plate only
+        if self.get_stud_kind() is None:
+            return self.build_plate(self.baseplate_center_x, self.baseplate_center_y)
+
+        # 2: plate with studs, cloned from the cache (same size and color in the same canvas)
+        if self.compound_cache is None:
+            return self.build_compound(self.baseplate_center_x, self.baseplate_center_y)
+        vpython = get_vpython()
+        baseplate_compound = self.compound_cache.instance(self)
+        baseplate_compound.pos = baseplate_compound.pos + vpython.vec(self.baseplate_center_x, self.baseplate_center_y, 0)
+        return baseplate_compound
 
 
 class RectangularBrick(BasicBrick):
+    # shared by all rectangular bricks; set to None to always build from scratch
+    mesh_cache = BrickMeshCache()
+
     def __init__(self, brick_system: str, length: int, width: int, height: int, 
                  x: int, y: int, z: int, 
                  brick_color: vector,
-                 orientation: vector):
+                 orientation: vector,
+                 render: bool = True):
         """Rectangular Brick __init__
 
         Generates a 3d-object of a rectangular brick with specified options.
@@ -621,6 +2260,7 @@ class RectangularBrick(BasicBrick):
             z (int, optional): Z-Position of front left corner of brick. Defaults to 0.
             brick_color (vector or vpython color, optional): vector(R, G, B) or color.name (from vpython std). Defaults to color.red.
             orientation (vector): user input to determine the orientation of the brick, use NORTH, EAST, SOUTH, WEST
+            render (bool, optional): False skips the 3d-object (headless scenes), see BrickScene.render(). Defaults to True.
         """
         super().__init__(brick_system)
         self.stud_x_counter = width # x-axis in NORTH orientation (0,1,0)
@@ -633,142 +2273,211 @@ class RectangularBrick(BasicBrick):
         self.z = z * self.specs["z_factor"]
         self.brick_color = brick_color
         self.orientation = orientation
+        # position and height in grid units (studs / brick heights)
+        self.grid_x = x
+        self.grid_y = y
+        self.grid_z = z
+        self.grid_height = height
+        # (x_stud, y_stud) of studs covered by other bricks, see StudCuller
+        self.hidden_studs = set()
 
-        self.generate()
+        self.compound = self.generate() if render else None
 
-    def generate(self):
-        """Generate / render brick, is called from __init__ with self (Brick-object)
+    def stud_cells(self):
+        """Yield ((cell_x, cell_y), (x_stud, y_stud)) for every stud, see StudCuller
 
-        Generates a box (obj::vpython) first, then calculates stud center and calls generate_stud n times (row x column)
+        x_stud/y_stud count along width/length in NORTH orientation; the cell is the
+        grid cell the stud ends up on after rotation.
+        """
+        from brickstack_layout import ORIENTATION_INDEX, get_stud_cells
+        x, y = self.grid_x, self.grid_y
+        for (offset_x, offset_y), stud in get_stud_cells(int(self.stud_x_counter), int(self.stud_y_counter),
+                                                         ORIENTATION_INDEX[orientation_to_code(self.orientation)]):
+            yield (x + offset_x, y + offset_y), stud
+
+    def get_grid_z_range(self):
+        """Bottom and top of the brick in brick heights"""
+        return self.grid_z, self.grid_z + self.grid_height
+
+    def get_box(self):
+        """Lower and upper corner of the brick in mm"""
+        x_extension, y_extension = get_grid_footprint(self.stud_y_counter, self.stud_x_counter, self.orientation)
+        return ((self.x, self.y, self.z),
+                (self.x + x_extension * self.specs["xy_factor"], self.y + y_extension * self.specs["xy_factor"], self.z + self.height))
+
+    def get_mesh_part(self):
+        """Part tuple for brickstack_buffers (grid units), covered studs as offsets from the lower left cell"""
+        x_extension, y_extension = get_grid_footprint(self.stud_y_counter, self.stud_x_counter, self.orientation)
+        hidden = frozenset()
+        if self.hidden_studs:
+            hidden = frozenset((cell_x - self.grid_x, cell_y - self.grid_y) for (cell_x, cell_y), stud in self.stud_cells()
+                               if stud in self.hidden_studs)
+        return ("brick", (self.grid_x, self.grid_y, self.grid_z, x_extension, y_extension, self.grid_height),
+                self.get_stud_kind(), hidden)
+
+    def refresh_studs(self, changed_studs = None):
+        """Rebuild the 3d-object after studs got hidden (nothing to do while not rendered)"""
+        if self.compound is None:
+            return
+        self.compound.visible = False
+        self.compound = self.generate()
+        # objects of other tiers still show the covered studs
+        self.lod_compounds = {}
+
+    def build_compound(self):
+        """Build the brick compound from scratch, at origin in NORTH orientation
+
+        Generates a box (obj::vpython) first, then calculates stud center and calls make_stud n times (row x column)
         to be added to the final compound
 
         Returns:
-            compound (obj::vpython): 3d compound representing the rendered brick
+            compound (obj::vpython): brick body and studs
         """
-        if GLOBAL_DEBUG and (STUD_DEBUG or BRICK_DEBUG): 
-            print(f"Generating 3d-brick:\n-------------------\nX: {self.x}, Y: {self.y}, Z: {self.z}")
-            print(f'length: {self.length}, width: {self.width}, height: {self.height}')
-            print(f"stud-x-counter: {self.stud_x_counter}, stud-y-counter: {self.stud_y_counter}")
-        
+        vpython = get_vpython()
         # 1. Create box at origin in NORTH orientation first
-        brick_basis = box(
-            pos = vec(0, 0, 0),  # Create at origin
-            axis = vector(0,1,0), # North orientation  
+        brick_basis = vpython.box(
+            pos = vpython.vec(0, 0, 0),  # Create at origin
+            axis = vpython.vector(0,1,0), # North orientation  
             length = self.length,
             height = self.height,
             width = self.width,
-            color = self.brick_color,
-            up = vector(0,0,1)
+            color = to_vpython(self.brick_color),
+            up = vpython.vector(0,0,1)
         )
 
         brick_components = [brick_basis]
-
-        # 2. Add studs relative to brick center (at origin)
-        for x_stud in range(int(self.stud_x_counter)):
-            for y_stud in range(int(self.stud_y_counter)):
-                stud_center = vec(
-                    -self.width/2 + self.specs["stud_xy_offset"] + (x_stud * self.specs["stud_spacing"]),
-                    -self.length/2 + self.specs["stud_xy_offset"] + (y_stud * self.specs["stud_spacing"]),
-                    self.height/2
-                )
-                stud = self.generate_stud(
-                    pos = stud_center,
-                    hollow = self.specs["is_hollow"],
+        stud_kind = self.get_stud_kind()
+        if stud_kind is None:
+            # flat level of detail: body only
+            return vpython.compound(brick_components)
+
+        # 2. Add studs relative to brick center (at origin), except covered ones
+        from brickstack_layout import get_stud_centers
+        with TRACER.span("studs"):
+            for x_stud, y_stud, offset_x, offset_y in get_stud_centers(int(self.stud_x_counter), int(self.stud_y_counter), self.specs["xy_factor"],
+                                                                       self.specs["stud_xy_offset"], self.specs["stud_spacing"]):
+                if (x_stud, y_stud) in self.hidden_studs:
+                    continue
+                stud = self.make_stud(
+                    pos = vpython.vec(offset_x, offset_y, self.height/2),
+                    hollow = stud_kind == "hollow",
                     wall_thickness = self.specs["stud_wall_thickness"]
                 )
                 brick_components.append(stud)
+        TRACER.count("studs", len(brick_components) - 1)
 
         # 3. Create compound
-        brick_compound = compound(brick_components)
+        return vpython.compound(brick_components)
+
+    def generate(self):
+        """Generate / render brick, is called from __init__ with self (Brick-object)
+
+        Takes the compound from mesh_cache (or builds it with build_compound if the
+        cache is disabled), then rotates and moves it into place
+
+        Returns:
+            compound (obj::vpython): 3d compound representing the rendered brick
+        """
+        if GLOBAL_DEBUG and (STUD_DEBUG or BRICK_DEBUG): 
+            print(f"Generating 3d-brick:\n-------------------\nX: {self.x}, Y: {self.y}, Z: {self.z}")
+            print(f'length: {self.length}, width: {self.width}, height: {self.height}')
+            print(f"stud-x-counter: {self.stud_x_counter}, stud-y-counter: {self.stud_y_counter}")
+        if self.geometry == "buffers":
+            with TRACER.span("compound"):
+                return self.generate_from_buffers()
+
+        # 1.-3. Brick compound at origin in NORTH orientation
+        with TRACER.span("compound"):
+            if self.mesh_cache is not None:
+                brick_compound = self.mesh_cache.instance(self)
+            else:
+                brick_compound = self.build_compound()
 
         # 4. Rotate if needed
         rotation_angle = self.orientation.rotation
         if rotation_angle != 0:
-            brick_compound.rotate(angle=rotation_angle, axis=vector(0,0,1))
-
-        # 5. Calculate final position based on orientation
-        if self.orientation == NORTH:
-            final_pos = vector(
-                self.x + self.width/2, 
-                self.y + self.length/2, 
-                self.z + self.height/2
-            )
-        elif self.orientation == EAST:
-            final_pos = vector(
-                self.x + self.length/2,  # Swapped because of rotation
-                self.y + self.width/2, 
-                self.z + self.height/2
-            )
-        elif self.orientation == SOUTH:
-            final_pos = vector(
-                self.x + self.width/2, 
-                self.y + self.length/2, 
-                self.z + self.height/2
-            )
-        elif self.orientation == WEST:
-            final_pos = vector(
-                self.x + self.length/2,  # Swapped because of rotation
-                self.y + self.width/2, 
-                self.z + self.height/2
-            )
+            with TRACER.span("rotate"):
+                brick_compound.rotate(angle=rotation_angle, axis=to_vpython(vector(0,0,1)))
+
+        # 5. Final position: center of the footprint (EAST/WEST swap length and width, see get_grid_footprint)
+        x_extension, y_extension = get_grid_footprint(self.stud_y_counter, self.stud_x_counter, self.orientation)
+        final_pos = vector(
+            self.x + x_extension * self.specs["xy_factor"] / 2,
+            self.y + y_extension * self.specs["xy_factor"] / 2,
+            self.z + self.height/2
+        )
 
         # 6. Move to final position
-        brick_compound.pos = final_pos
+        # vpython places compounds by their bounding box center, which lies half a stud height
+        # above the body center for studded bricks - bricks without studs get the same body position
+        studs_shown = self.get_stud_kind() is not None and len(self.hidden_studs) < self.stud_x_counter * self.stud_y_counter
+        if not studs_shown:
+            final_pos.z -= self.specs["stud_height"] / 2
+        brick_compound.pos = to_vpython(final_pos)
 
         if GLOBAL_DEBUG and BRICK_DEBUG: 
             print(f"Final compound pos: {brick_compound.pos}")
 
         return brick_compound
 
-my_project = BrickProject("duplo")
-my_project.add_scene()
-my_project.brick_scenes[0].add_baseplate(color.green * 0.4, 16, 20)
-
-# def hello_world():
-#     my_project.brick_scenes[0].add_brick(
-#         "rect", 8, 1, 1, -5, -2, 0, color.black, EAST
-#     )
-#     my_project.brick_scenes[0].add_brick(
-#         "rect", 8, 1, 1, -2, -2, 0, color.black, EAST 
-#     )
-#     my_project.brick_scenes[0].add_brick(
-    #     "rect", 2, 1, 1, -4, 1, 0, color.black 
-    # )
-    # my_project.brick_scenes[0].add_brick(
-    #     "rect", 1, 8, 1, 0, -2, 0, color.black 
-    # )
-    # my_project.brick_scenes[0].add_brick(
-    #     "rect", 1, 6, 1, 2, 0, 0, color.black 
-    # )
-    # my_project.brick_scenes[0].add_brick(
-    #     "rect", 1, 1, 1, 2, -2, 0, color.black 
-    # )
-    # my_project.brick_scenes[0].add_brick(
-    #     "rect", 8, 1, 1, -5, -4, 0, color.red 
-    # )
-    # my_project.brick_scenes[0].add_brick(
-    #     "rect", 8, 1, 1, -5, -5, 0, color.yellow 
-    # )
+def demo():
+    """Small duplo demo scene with axis markers"""
+    my_project = BrickProject("duplo")
+    my_project.add_scene()
+    my_project.brick_scenes[0].add_baseplate(color.green * 0.4, 16, 20)
+
+    # def hello_world():
+    #     my_project.brick_scenes[0].add_brick(
+    #         "rect", 8, 1, 1, -5, -2, 0, color.black, EAST
+    #     )
+    #     my_project.brick_scenes[0].add_brick(
+    #         "rect", 8, 1, 1, -2, -2, 0, color.black, EAST 
+    #     )
+    #     my_project.brick_scenes[0].add_brick(
+        #     "rect", 2, 1, 1, -4, 1, 0, color.black 
+        # )
+        # my_project.brick_scenes[0].add_brick(
+        #     "rect", 1, 8, 1, 0, -2, 0, color.black 
+        # )
+        # my_project.brick_scenes[0].add_brick(
+        #     "rect", 1, 6, 1, 2, 0, 0, color.black 
+        # )
+        # my_project.brick_scenes[0].add_brick(
+        #     "rect", 1, 1, 1, 2, -2, 0, color.black 
+        # )
+        # my_project.brick_scenes[0].add_brick(
+        #     "rect", 8, 1, 1, -5, -4, 0, color.red 
+        # )
+        # my_project.brick_scenes[0].add_brick(
+        #     "rect", 8, 1, 1, -5, -5, 0, color.yellow 
+        # )
+        # my_project.brick_scenes[0].add_brick(
+        #     "rect", 8, 1, 1, -5, -6, 0, color.blue 
+        # )
+
+    # hello_world()
+
     # my_project.brick_scenes[0].add_brick(
-    #     "rect", 8, 1, 1, -5, -6, 0, color.blue 
+    #         "rect", 8, 2, 1, 0, 0, 0, color.black, NORTH
     # )
 
-# hello_world()
+    my_project.brick_scenes[0].add_brick(
+        "rect", 4, 2, 1, 0, 0, 0, color.blue, EAST
+    )
 
-# my_project.brick_scenes[0].add_brick(
-#         "rect", 8, 2, 1, 0, 0, 0, color.black, NORTH
-# )
+    # axis markers are plain vpython objects
+    vpython = get_vpython()
+    x_marker = vpython.curve(pos=[vpython.vec(-15 * 9.6, 0, 0.5), vpython.vec(15 * 9.6, 0, 0.5)], color=vpython.color.yellow)
+    y_marker = vpython.curve(pos=[vpython.vec(0, -15 * 9.6, 0.5), vpython.vec(0, 15 * 9.6, 0.5)], color=vpython.color.blue)
+    z_marker = vpython.curve(pos=[vpython.vec(0, 0, -15 * 9.6), vpython.vec(0, 0, 15 * 9.6)], color=vpython.color.red)
+    x_text = vpython.label(pos=vpython.vec(-8 * 9.6, 0, 0.5), text='x-axis', xoffset=-1 * 9.6, yoffset= 2 * 9.6, space= 3, height= 16, border=4, font='sans', background = vpython.color.white, color = vpython.color.black)
+    y_text = vpython.label(pos=vpython.vec(0, -8 * 9.6, 0.5), text='y-axis', xoffset=-1 * 9.6, yoffset= 2 * 9.6, space= 3, height= 16, border=4, font='sans', background = vpython.color.white, color = vpython.color.black)
 
-my_project.brick_scenes[0].add_brick(
-    "rect", 4, 2, 1, 0, 0, 0, color.blue, EAST
-)
 
-x_marker = curve(pos=[vec(-15 * 9.6, 0, 0.5), vec(15 * 9.6, 0, 0.5)], color=color.yellow)
-y_marker = curve(pos=[vec(0, -15 * 9.6, 0.5), vec(0, 15 * 9.6, 0.5)], color=color.blue)
-z_marker = curve(pos=[vec(0, 0, -15 * 9.6), vec(0, 0, 15 * 9.6)], color=color.red)
-x_text = label(pos=vec(-8 * 9.6, 0, 0.5), text='x-axis', xoffset=-1 * 9.6, yoffset= 2 * 9.6, space= 3, height= 16, border=4, font='sans', background = color.white, color = color.black)
-y_text = label(pos=vec(0, -8 * 9.6, 0.5), text='y-axis', xoffset=-1 * 9.6, yoffset= 2 * 9.6, space= 3, height= 16, border=4, font='sans', background = color.white, color = color.black)
+    my_project.brick_scenes[0].bricks.append(x_marker)
+    my_project.brick_scenes[0].bricks.append(y_marker)
+    return my_project
 
 
-my_project.brick_scenes[0].bricks.append(x_marker)
-my_project.brick_scenes[0].bricks.append(y_marker)
+if __name__ == "__main__":
+    demo()
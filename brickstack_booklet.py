@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Building Instruction Booklets
+One image per construction step (new bricks highlighted, see brickstack_render.render_steps)
+plus a parts list per step, collected in a single HTML page.
+
+Steps are given as lists of brick rows in project file layout (see brickstack_files),
+each list holding only the bricks added in that step.
+"""
+
+import html
+import os
+from collections import Counter
+
+from brickstack_render import render_steps
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; }}
+.step {{ page-break-after: always; margin-bottom: 2em; }}
+.swatch {{ display: inline-block; width: 1em; height: 1em; border: 1px solid #444; vertical-align: middle; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{steps}
+</body>
+</html>
+"""
+
+STEP_TEMPLATE = """<div class="step">
+<h2>Step {number}</h2>
+<ul>
+{parts}
+</ul>
+<img src="{image}" alt="Step {number}">
+</div>"""
+
+
+def get_parts_list(rows):
+    """Count the bricks of a step by size and color
+
+    Returns:
+        list: ((length, width, height, brick_type), (r, g, b), count), largest count first
+    """
+    parts = Counter(((length, width, height, brick_type), tuple(brick_color))
+                    for brick_type, length, width, height, x, y, z, brick_color, orientation in rows)
+    return [(shape, brick_color, count) for (shape, brick_color), count in parts.most_common()]
+
+def format_height(height):
+    """Brick heights are multiples of 1/3 (lego plates) or 1/2 (duplo)"""
+    for denominator in (1, 2, 3):
+        if abs(height * denominator - round(height * denominator)) < 1e-9:
+            numerator = round(height * denominator)
+            return str(numerator) if denominator == 1 else f"{numerator}/{denominator}"
+    return f"{height:g}"
+
+def format_part(shape, brick_color, count):
+    (length, width, height, brick_type) = shape
+    rgb = "#" + "".join(f"{min(max(round(value * 255), 0), 255):02x}" for value in brick_color)
+    return (f'<li>{count} x <span class="swatch" style="background: {rgb}"></span> '
+            f"{html.escape(str(brick_type))} {length}x{width}x{format_height(height)}</li>")
+
+def write_booklet_page(path, image_names, steps, title = "Building instructions"):
+    """Write the HTML page of a booklet (images are referenced relative to the page)"""
+    blocks = []
+    for number, (image_name, rows) in enumerate(zip(image_names, steps), start = 1):
+        parts = "\n".join(format_part(*part) for part in get_parts_list(rows))
+        blocks.append(STEP_TEMPLATE.format(number = number, parts = parts, image = html.escape(image_name)))
+    with open(path, "w", encoding = "utf-8") as page_file:
+        page_file.write(PAGE_TEMPLATE.format(title = html.escape(title), steps = "\n".join(blocks)))
+
+def export_booklet(job, output_dir, name = "step_{index:03d}.png", page = "booklet.html", title = "Building instructions"):
+    """Render all steps of a render_steps job into output_dir and write the booklet page
+
+    Args:
+        job (dict): render_steps job without "paths"
+        output_dir (str): target directory (created if missing)
+        name (str, optional): image file pattern, formatted with the step index. Defaults to "step_{index:03d}.png".
+        page (str, optional): HTML file name, None to write images only. Defaults to "booklet.html".
+        title (str, optional): page title. Defaults to "Building instructions".
+
+    Returns:
+        list: written image paths in step order
+    """
+    os.makedirs(output_dir, exist_ok = True)
+    image_names = [name.format(index = index) for index in range(len(job["steps"]))]
+    paths = render_steps(dict(job, paths = [os.path.join(output_dir, image_name) for image_name in image_names]))
+    if page:
+        write_booklet_page(os.path.join(output_dir, page), image_names, job["steps"], title)
+    return paths
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Running Bounds
+Min/max x, y and z of the bricks in an occupancy grid, kept up to date while
+bricks are added and removed
+"""
+
+from heapq import heapify, heappop, heappush
+
+BOUND_KEYS = ("min_x", "max_x", "min_y", "max_y", "min_z", "max_z")
+
+
+class BoundsIndex:
+    """One heap per bound with lazy deletion
+
+    Every bound is a heap of values (maxima negated) plus the number of bricks per
+    value. Adding or removing a brick costs O(log n); removed values are dropped
+    from the top of a heap when the bounds are read. A value is in its heap at
+    most once, and a heap holding more than twice as many values as are in use
+    is rebuilt, so remove/undo cycles do not grow the heaps. The same (x, y, z,
+    length, width, height) arguments as for add_brick have to be passed to
+    remove_brick.
+    """
+    def __init__(self):
+        self.heaps = tuple([] for _ in BOUND_KEYS)
+        self.heaped = tuple(set() for _ in BOUND_KEYS)  # values in the heap, in use or not
+        self.counts = tuple({} for _ in BOUND_KEYS)  # value -> number of bricks
+        self.brick_count = 0
+
+    @staticmethod
+    def get_values(x, y, z, length, width, height):
+        return (x, -(x + length - 1), y, -(y + width - 1), z, -(z + height))
+
+    def add_brick(self, x, y, z, length, width, height):
+        for heap, heaped, counts, value in zip(self.heaps, self.heaped, self.counts, self.get_values(x, y, z, length, width, height)):
+            counts[value] = counts.get(value, 0) + 1
+            if value not in heaped:
+                heaped.add(value)
+                heappush(heap, value)
+        self.brick_count += 1
+
+    def remove_brick(self, x, y, z, length, width, height):
+        """Forget a brick (the caller makes sure it was added)"""
+        for heap, heaped, counts, value in zip(self.heaps, self.heaped, self.counts, self.get_values(x, y, z, length, width, height)):
+            count = counts[value] - 1
+            if count:
+                counts[value] = count
+                continue
+            del counts[value]
+            if len(heap) > 2 * len(counts) + 16:
+                heap[:] = counts
+                heapify(heap)
+                heaped.clear()
+                heaped.update(counts)
+        self.brick_count -= 1
+
+    def get_bounds(self):
+        """Return min/max x, y (occupied cells) and z (intervals) as dict, or None without bricks"""
+        if not self.brick_count:
+            return None
+        bounds = {}
+        for key, heap, heaped, counts in zip(BOUND_KEYS, self.heaps, self.heaped, self.counts):
+            while heap[0] not in counts:
+                heaped.discard(heappop(heap))
+            bounds[key] = -heap[0] if key.startswith("max") else heap[0]
+        return bounds
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Vertex Buffers
+Brick and baseplate geometry as vertex/normal/index arrays, built in worker
+processes (no vpython)
+
+BrickProject(geometry="buffers") computes the meshes of many parts in a process
+pool; the main thread only turns the arrays into 3d-objects. Parts are plain
+tuples (picklable, see RectangularBrick/Baseplate.get_mesh_part):
+
+    ("brick", (x, y, z, x_extension, y_extension, height), studs, hidden)
+    ("baseplate", (lower_left_x, lower_left_y, width, length), studs, hidden, corner_studs)
+
+in grid units; studs is the stud kind (BasicBrick.get_stud_kind: "solid",
+"hollow" or None), hidden holds the (x, y) offsets of covered studs from the
+lower left corner, corner_studs is False for duplo baseplates.
+
+Triangles share their vertices wherever position and normal are the same: the
+sides of a box have four vertices each (flat), stud walls one ring of vertices
+at the bottom and top (smooth), stud tops one vertex per ring point plus the
+center. The main thread creates one 3d-vertex per buffer vertex, so this keeps
+its work at about a third of one vertex per triangle corner.
+"""
+
+from functools import lru_cache
+from math import pi
+
+import numpy as np
+
+from brickstack_layout import baseplate_studs, layout_bricks
+from brickstack_mesh import BOX_FACES, Mesh, stud_cell_centers
+
+STUD_SEGMENTS = 16
+BUFFER_BATCH_SIZE = 2000  # parts per worker job
+
+
+class VertexBuffers:
+    """Buffers of several parts, concatenated
+
+    positions and normals are float32 (n, 3), indices uint32 (m, 3) counted from
+    the first vertex of their part; part i owns vertices offsets[i]:offsets[i + 1]
+    and triangles index_offsets[i]:index_offsets[i + 1].
+    """
+    def __init__(self, positions, normals, indices, offsets, index_offsets):
+        self.positions = positions
+        self.normals = normals
+        self.indices = indices
+        self.offsets = offsets
+        self.index_offsets = index_offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Buffers from (positions, normals, indices) per part"""
+        positions, normals, indices, counts, index_counts = [], [], [], [0], [0]
+        for part_positions, part_normals, part_indices in parts:
+            positions.append(part_positions)
+            normals.append(part_normals)
+            indices.append(part_indices)
+            counts.append(len(part_positions))
+            index_counts.append(len(part_indices))
+        return cls(np.concatenate(positions or [np.zeros((0, 3))]).astype(np.float32),
+                   np.concatenate(normals or [np.zeros((0, 3))]).astype(np.float32),
+                   np.concatenate(indices or [np.zeros((0, 3))]).astype(np.uint32),
+                   np.cumsum(counts), np.cumsum(index_counts))
+
+    def get_part(self, index):
+        """Return (positions, normals, indices) of one part"""
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return (self.positions[start:stop], self.normals[start:stop],
+                self.indices[self.index_offsets[index]:self.index_offsets[index + 1]])
+
+
+# the sides of BOX_FACES as quads: 4 corners and 2 triangles (corner numbers 0..3) per side
+BOX_SIDE_CORNERS = np.array([list(dict.fromkeys(side)) for side in BOX_FACES.reshape(6, 6).tolist()])
+BOX_SIDE_TRIANGLES = np.array([[corners.index(corner) for corner in side] for corners, side
+                               in zip(BOX_SIDE_CORNERS.tolist(), BOX_FACES.reshape(6, 6).tolist())]).reshape(6, 2, 3)
+
+def box_buffers(x0, y0, z0, x1, y1, z1):
+    """(positions, normals, indices) of a box, four vertices per side"""
+    corners = np.array([(x1 if corner & 1 else x0, y1 if corner & 2 else y0, z1 if corner & 4 else z0) for corner in range(8)])
+    normals = np.repeat(Mesh(corners, BOX_FACES).get_normals()[::2], 4, axis = 0)
+    indices = (BOX_SIDE_TRIANGLES + 4 * np.arange(6)[:, None, None]).reshape(-1, 3)
+    return corners[BOX_SIDE_CORNERS].reshape(-1, 3), normals, indices
+
+def stud_buffers(z0, z1, radius, inner_radius, segments):
+    """(positions, normals, indices) of one stud around the z-axis, hollow if inner_radius > 0
+
+    Walls are smooth (radial normals shared by the neighboring quads), the top is
+    flat. Hollow studs (duplo) get an inner wall facing inwards and a ring on top;
+    their inside is closed by the brick below.
+    """
+    angles = 2 * pi * np.arange(segments) / segments
+    ring = np.stack((np.cos(angles), np.sin(angles), np.zeros(segments)), axis = 1)
+    index = np.arange(segments)
+    following = (index + 1) % segments
+    positions, normals, indices = [], [], []
+
+    def add(part_positions, part_normals, part_indices):
+        indices.append(part_indices + sum(map(len, positions)))
+        positions.append(part_positions)
+        normals.append(part_normals)
+
+    def wall(wall_radius, outwards):
+        # vertices 0..segments-1 at z0, segments.. at z1
+        lower, upper = ring * wall_radius + (0, 0, z0), ring * wall_radius + (0, 0, z1)
+        triangles = np.concatenate((np.stack((index, following, segments + index), axis = 1),
+                                    np.stack((following, segments + following, segments + index), axis = 1)))
+        add(np.concatenate((lower, upper)), np.tile(ring if outwards else -ring, (2, 1)),
+            triangles if outwards else triangles[:, ::-1])
+
+    wall(radius, True)
+    up = np.array([(0, 0, 1)] * segments, dtype = float)
+    if inner_radius > 0:
+        wall(inner_radius, False)
+        # ring on top: outer vertices 0..segments-1, inner ones segments..
+        add(np.concatenate((ring * radius + (0, 0, z1), ring * inner_radius + (0, 0, z1))), np.tile(up, (2, 1)),
+            np.concatenate((np.stack((index, following, segments + index), axis = 1),
+                            np.stack((following, segments + following, segments + index), axis = 1))))
+    else:
+        add(np.concatenate((ring * radius + (0, 0, z1), [(0, 0, z1)])), np.concatenate((up, [(0, 0, 1)])),
+            np.stack((index, following, np.full(segments, segments)), axis = 1))
+    return np.concatenate(positions), np.concatenate(normals), np.concatenate(indices)
+
+def studs_buffers(centers, z0, z1, radius, inner_radius, segments):
+    """stud_buffers tiled to every (x, y) in centers in one step"""
+    positions, normals, indices = stud_buffers(z0, z1, radius, inner_radius, segments)
+    count = len(centers)
+    offsets = np.zeros((count, 1, 3))
+    offsets[:, 0, :2] = centers
+    return ((positions[None] + offsets).reshape(-1, 3), np.tile(normals, (count, 1)),
+            (indices[None] + (np.arange(count) * len(positions))[:, None, None]).reshape(-1, 3))
+
+def concatenate_buffers(buffers):
+    """One (positions, normals, indices) from several, indices shifted accordingly"""
+    offsets = np.cumsum([0] + [len(positions) for positions, normals, indices in buffers[:-1]])
+    return (np.concatenate([positions for positions, normals, indices in buffers]),
+            np.concatenate([normals for positions, normals, indices in buffers]).astype(np.float32),
+            np.concatenate([indices + offset for (positions, normals, indices), offset in zip(buffers, offsets)]).astype(np.uint32))
+
+def get_inner_radius(studs, stud_radius, specs):
+    """Inner radius of a stud kind, 0 for solid studs"""
+    return max(stud_radius - specs["stud_wall_thickness"], 0) if studs == "hollow" else 0
+
+@lru_cache(maxsize = 256)
+def get_indexed_shape(kind, shape_args):
+    """(positions, normals, indices) of a brick or baseplate shape with its lower left corner at the origin, cached
+
+    Args:
+        kind (str): "brick" (body from z = 0) or "baseplate" (top of the plate at z = 0)
+        shape_args (tuple): (x_extension, y_extension, body_height, xy_factor, stud_radius, inner_radius,
+            stud_height, studs, stud_segments, hidden) with body_height in mm; baseplates add corner_studs
+
+    Returns:
+        tuple: read-only positions, normals (float32) and indices (uint32)
+    """
+    x_extension, y_extension, body_height, xy_factor, stud_radius, inner_radius, stud_height, studs, stud_segments, hidden = shape_args[:10]
+    if kind == "brick":
+        z_top = body_height
+        centers = stud_cell_centers(x_extension, y_extension, xy_factor, hidden)
+    else:
+        z_top = 0
+        cells = baseplate_studs(x_extension, y_extension, shape_args[10])
+        if hidden:
+            cells = cells[[cell not in hidden for cell in map(tuple, cells.tolist())]]
+        centers = (cells + 0.5) * xy_factor
+    buffers = [box_buffers(0, 0, z_top - body_height, x_extension * xy_factor, y_extension * xy_factor, z_top)]
+    if studs:
+        buffers.append(studs_buffers(centers, z_top, z_top + stud_height, stud_radius, inner_radius, stud_segments))
+    shape = concatenate_buffers(buffers)
+    for array in shape:
+        array.flags.writeable = False
+    return shape
+
+def part_shape(part, specs, stud_segments = STUD_SEGMENTS):
+    """Cached (positions, normals, indices) of one part tuple (see module doc) with its lower left corner at the origin"""
+    xy_factor, z_factor = specs["xy_factor"], specs["z_factor"]
+    stud_radius, stud_height = specs["stud_diameter"] / 2, specs["stud_height"]
+    if part[0] == "brick":
+        kind, (x, y, z, x_extension, y_extension, height), studs, hidden = part
+        return get_indexed_shape("brick", (x_extension, y_extension, height * z_factor, xy_factor, stud_radius,
+                                           get_inner_radius(studs, stud_radius, specs), stud_height, studs, stud_segments, hidden))
+    kind, (lower_left_x, lower_left_y, width, length), studs, hidden, corner_studs = part
+    return get_indexed_shape("baseplate", (width, length, specs["baseplate_height"] * xy_factor, xy_factor, stud_radius,
+                                           get_inner_radius(studs, stud_radius, specs), stud_height, studs, stud_segments, hidden,
+                                           corner_studs))
+
+def get_part_origins(parts, specs):
+    """(n, 3) lower left corners in mm of part tuples, the bricks placed in one layout_bricks call"""
+    origins = np.zeros((len(parts), 3))
+    bricks = [index for index, part in enumerate(parts) if part[0] == "brick"]
+    if bricks:
+        x, y, z, x_extension, y_extension, height = zip(*(parts[index][1] for index in bricks))
+        # the extensions of a part are already rotated: a NORTH brick of width x_extension and length y_extension
+        origins[bricks] = layout_bricks(y_extension, x_extension, height, x, y, z, np.zeros(len(bricks), dtype = np.int64),
+                                        specs, studs = False).origins
+    baseplates = [index for index, part in enumerate(parts) if part[0] != "brick"]
+    if baseplates:
+        origins[baseplates, :2] = np.array([parts[index][1][:2] for index in baseplates], dtype = float) * specs["xy_factor"]
+    return origins
+
+def part_buffers(part, specs, stud_segments = STUD_SEGMENTS):
+    """Positions (in mm), normals and indices of one part tuple (see module doc), e.g. to check build_buffers"""
+    positions, normals, indices = part_shape(part, specs, stud_segments)
+    return positions + get_part_origins((part,), specs)[0], normals, indices
+
+def build_buffers(job):
+    """Process pool worker: (specs, parts, stud_segments) -> VertexBuffers
+
+    The cached shapes are concatenated first and moved to their places in one step.
+    """
+    specs, parts, stud_segments = job
+    buffers = VertexBuffers.concatenate(part_shape(part, specs, stud_segments) for part in parts)
+    offsets = np.repeat(get_part_origins(parts, specs), np.diff(buffers.offsets), axis = 0)
+    buffers.positions = (buffers.positions + offsets).astype(np.float32)
+    return buffers
+
+def generate_buffers(parts, specs, processes = None, batch_size = BUFFER_BATCH_SIZE, stud_segments = STUD_SEGMENTS):
+    """Buffers of many parts, batches in parallel with a process pool
+
+    Args:
+        parts (list): part tuples, see module doc
+        specs (dict): BRICK_SPECS of the brick system
+        processes (int, optional): worker processes, None = one per CPU, 1 = no pool. Defaults to None.
+        batch_size (int, optional): parts per worker job; a single batch runs without pool. Defaults to BUFFER_BATCH_SIZE.
+
+    Yields:
+        tuple: (positions, normals, indices) per part, in part order
+    """
+    from brickstack_render import run_in_pool
+    jobs = [(specs, parts[start:start + batch_size], stud_segments) for start in range(0, len(parts), batch_size)]
+    for buffers in run_in_pool(build_buffers, jobs, processes):
+        for index in range(len(buffers)):
+            yield buffers.get_part(index)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Chunked Scenes
+Groups bricks into spatial chunks (chunk_size x chunk_size studs, one brick layer)
+so that a scene can merge each chunk into a single 3d-object
+"""
+
+from math import floor
+
+
+class ChunkIndex:
+    """Assignment of bricks to chunks plus the bookkeeping for rebuilding them
+
+    A chunk is addressed by (chunk_x, chunk_y, layer): the brick's lower left grid
+    cell divided by chunk_size and the floored z (in brick heights). Chunks whose
+    member list changed are collected in dirty until the scene rebuilds them.
+
+    Parts need grid_x, grid_y and grid_z (see RectangularBrick).
+    """
+    def __init__(self, chunk_size = 16):
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.chunk_size = chunk_size
+        self.members = {}    # chunk key -> list of parts
+        self.part_keys = {}  # part -> chunk key
+        self.compounds = {}  # chunk key -> merged 3d-object (filled by the scene)
+        self.dirty = set()
+
+    def chunk_key(self, x, y, z):
+        """Chunk of the grid cell (x, y) at height z; z gets a small epsilon for 1/3-steps"""
+        size = self.chunk_size
+        return (floor(x / size), floor(y / size), floor(z + 1e-6))
+
+    def add_part(self, part):
+        """Assign a part to its chunk and mark the chunk dirty
+
+        Returns:
+            tuple: chunk key
+        """
+        key = self.chunk_key(part.grid_x, part.grid_y, part.grid_z)
+        self.members.setdefault(key, []).append(part)
+        self.part_keys[part] = key
+        self.dirty.add(key)
+        return key
+
+    def remove_part(self, part):
+        """Take a part out of its chunk and mark the chunk dirty
+
+        Returns:
+            tuple: chunk key, None if the part is not in any chunk
+        """
+        key = self.part_keys.pop(part, None)
+        if key is None:
+            return None
+        members = self.members[key]
+        members.pop(next(index for index, member in enumerate(members) if member is part))
+        if not members:
+            del self.members[key]
+        self.dirty.add(key)
+        return key
+
+    def mark_dirty(self, part):
+        """Mark the chunk of part for rebuilding
+
+        Returns:
+            bool: False if the part is not in any chunk (e.g. baseplates)
+        """
+        key = self.part_keys.get(part)
+        if key is None:
+            return False
+        self.dirty.add(key)
+        return True
+
+    def pop_dirty(self):
+        """Return the dirty chunk keys (sorted, bottom layer first) and reset them"""
+        keys = sorted(self.dirty, key = lambda key: (key[2], key[0], key[1]))
+        self.dirty.clear()
+        return keys
+
+    def get_chunk_count(self):
+        return len(self.members)
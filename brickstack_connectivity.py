@@ -0,0 +1,276 @@
+"""
+Brick Stack - Connectivity
+Which bricks hold together (no vpython)
+
+Two bricks are connected if one sits directly on the other (top of the lower one =
+bottom of the upper one) on at least one grid cell, i.e. they share studs. Bricks
+with their bottom at z <= 0 stand on the ground (baseplate), which connects them
+with each other. Every brick carries the label of its component, so asking
+whether the model holds together needs no graph search.
+
+Adding a brick merges the components it touches (the smaller one is relabeled).
+Removing a brick can split its component: searches from the bricks it touched run
+side by side until all but one are done, so only the parts that came loose are
+relabeled, not the rest of the model.
+
+Bricks are identified by the row index the scene uses for them (see
+BrickScene.get_row_indices).
+"""
+
+from bisect import bisect_left
+from collections import Counter
+
+
+def z_key(z):
+    """Round z (in brick heights) so that 1/3-steps compare equal"""
+    return round(z, 6)
+
+
+class ConnectivityIndex:
+    """Stud contacts per grid cell plus a component label per brick
+
+    cells maps (x, y) to the (z_bottom, z_top, row) entries of the bricks covering
+    that cell, sorted by z (the intervals of OccupancyGrid plus the brick). Node 0 is
+    the ground, brick rows are nodes row + 1; labels maps nodes to their component,
+    members components to their nodes.
+    Adding a brick costs O(footprint * log k) for k bricks per cell (scenes without
+    intersecting bricks, see BrickScene.validate), removing one in addition the size
+    of the parts that come loose (or of the smaller part, if the component splits).
+    """
+    GROUND = 0
+
+    def __init__(self):
+        self.cells = {}
+        self.footprints = {}  # row -> (x, y, length, width, entry)
+        self.labels = {self.GROUND: self.GROUND}
+        self.members = {self.GROUND: {self.GROUND}}
+        self.next_label = 1
+        self.brick_count = 0
+
+    def find(self, node):
+        """Component label of a node"""
+        return self.labels[node]
+
+    def union(self, first, second):
+        """Merge the components of two nodes, relabeling the smaller one"""
+        first, second = self.labels[first], self.labels[second]
+        if first == second:
+            return
+        if len(self.members[first]) < len(self.members[second]):
+            first, second = second, first
+        moved = self.members.pop(second)
+        labels = self.labels
+        for node in moved:
+            labels[node] = first
+        self.members[first] |= moved
+
+    def add_brick(self, row, x, y, z, length, width, height):
+        """Register a brick and connect it to the bricks it touches with studs
+
+        Args:
+            row (int): row index of the brick
+            x, y, z: position in grid units
+            length, width (int): extension along x and y in grid cells (see get_grid_footprint)
+            height (float): height in brick heights
+        """
+        node = row + 1
+        if node in self.labels:
+            raise KeyError(f"Row {row} is already registered")
+        label = self.next_label
+        self.next_label += 1
+        self.labels[node] = label
+        self.members[label] = {node}
+        self.brick_count += 1
+
+        entry = (z_key(z), z_key(z + height), row)
+        self.footprints[row] = (x, y, length, width, entry)
+        bottom, top = entry[0], entry[1]
+        if bottom <= 0:
+            self.union(node, self.GROUND)
+        cells = self.cells
+        for cell_x in range(x, x + length):
+            for cell_y in range(y, y + width):
+                entries = cells.get((cell_x, cell_y))
+                if entries is None:
+                    cells[(cell_x, cell_y)] = [entry]
+                    continue
+                # bricks above start at top, bricks below end at bottom (just before it in z order)
+                above = bisect_left(entries, (top,))
+                below = bisect_left(entries, (bottom,), 0, above)
+                entries.insert(bisect_left(entries, entry, below, above), entry)
+                above += 1
+                while above < len(entries) and entries[above][0] == top:
+                    self.union(node, entries[above][2] + 1)
+                    above += 1
+                below -= 1
+                while below >= 0 and entries[below][1] >= bottom:
+                    if entries[below][1] == bottom:
+                        self.union(node, entries[below][2] + 1)
+                    below -= 1
+
+    def get_neighbors(self, row):
+        """Nodes of the bricks touching a registered brick with studs (the ground is not included)"""
+        x, y, length, width, (bottom, top, _) = self.footprints[row]
+        neighbors = set()
+        cells = self.cells
+        for cell_x in range(x, x + length):
+            for cell_y in range(y, y + width):
+                entries = cells[(cell_x, cell_y)]
+                above = bisect_left(entries, (top,))
+                while above < len(entries) and entries[above][0] == top:
+                    neighbors.add(entries[above][2] + 1)
+                    above += 1
+                below = bisect_left(entries, (bottom,), 0, above) - 1
+                while below >= 0 and entries[below][1] >= bottom:
+                    if entries[below][1] == bottom:
+                        neighbors.add(entries[below][2] + 1)
+                    below -= 1
+        return neighbors
+
+    def remove_brick(self, row):
+        """Unregister a brick and split its component if the brick held it together
+
+        Raises:
+            KeyError: if the row is not registered
+        """
+        neighbors = self.get_neighbors(row)
+        x, y, length, width, entry = self.footprints.pop(row)
+        cells = self.cells
+        for cell_x in range(x, x + length):
+            for cell_y in range(y, y + width):
+                entries = cells[(cell_x, cell_y)]
+                del entries[bisect_left(entries, entry)]
+                if not entries:
+                    del cells[(cell_x, cell_y)]
+        node = row + 1
+        label = self.labels.pop(node)
+        self.members[label].discard(node)
+        if not self.members[label]:
+            del self.members[label]
+        self.brick_count -= 1
+        if entry[0] <= 0:
+            neighbors.add(self.GROUND)
+        if len(neighbors) > 1:
+            self._split(label, neighbors)
+
+    def _split(self, label, starts):
+        """Relabel the parts of component label that are no longer connected to each other
+
+        One depth-first search per start node, expanded one node per turn. Searches
+        that meet are merged; all searches that reach the ground are merged into one,
+        which is not expanded any further (the rest of the component hangs on it). A
+        search that runs out of nodes has found a loose part; once a single search is
+        left, it holds the rest of the component, which keeps label.
+        """
+        footprints = self.footprints
+        owner = {start: index for index, start in enumerate(starts)}  # node -> search
+        nodes = [{start} for start in starts]
+        stacks = [[start] for start in starts]
+        active = set(range(len(starts)))
+        ground = None  # search that reached the ground
+
+        def touches_ground(node):
+            return node == self.GROUND or footprints[node - 1][4][0] <= 0
+
+        def merge(first, second):
+            # the smaller search moves into the bigger one
+            nonlocal ground
+            if len(nodes[first]) < len(nodes[second]):
+                first, second = second, first
+            for node in nodes[second]:
+                owner[node] = first
+            nodes[first] |= nodes[second]
+            stacks[first].extend(stacks[second])
+            nodes[second] = stacks[second] = None
+            active.discard(second)
+            if ground == second:
+                ground = first
+            return first
+
+        def reach_ground(index):
+            nonlocal ground
+            if ground is None:
+                ground = index
+            elif ground != index:
+                index = merge(index, ground)
+            return index
+
+        for index, start in enumerate(starts):
+            if touches_ground(start):
+                reach_ground(owner[start])
+        while len(active) > 1:
+            for index in sorted(active):
+                if len(active) == 1:
+                    break
+                if index not in active or index == ground:
+                    continue
+                if not stacks[index]:
+                    # loose part
+                    active.discard(index)
+                    new_label = self.next_label
+                    self.next_label += 1
+                    for node in nodes[index]:
+                        self.labels[node] = new_label
+                    self.members[label] -= nodes[index]
+                    self.members[new_label] = nodes[index]
+                    continue
+                node = stacks[index].pop()
+                for neighbor in self.get_neighbors(node - 1):
+                    other = owner.get(neighbor)
+                    if other is None:
+                        owner[neighbor] = index
+                        nodes[index].add(neighbor)
+                        stacks[index].append(neighbor)
+                        if touches_ground(neighbor):
+                            index = reach_ground(index)
+                    elif other != index:
+                        index = merge(index, other)
+
+    def is_grounded(self, row):
+        return self.find(row + 1) == self.find(self.GROUND)
+
+    def get_floating(self):
+        """Rows of bricks without a connection to the ground, ascending"""
+        ground = self.find(self.GROUND)
+        return sorted(node - 1 for node, label in self.labels.items() if label != ground)
+
+    def get_components(self):
+        """Groups of connected bricks; all bricks on the ground form one group (through the baseplate)
+
+        Returns:
+            list: lists of rows (ascending), largest component first
+        """
+        groups = [sorted(node - 1 for node in nodes if node != self.GROUND) for nodes in self.members.values()]
+        return sorted((rows for rows in groups if rows), key = lambda rows: (-len(rows), rows[0]))
+
+    def is_connected(self):
+        """True if all bricks form a single structure, see get_components"""
+        return sum(1 for nodes in self.members.values() if len(nodes) > (self.GROUND in nodes)) <= 1
+
+    def get_contacts(self):
+        """Number of shared studs for every pair of touching bricks
+
+        Returns:
+            Counter: (lower row, upper row) -> number of cells where they touch
+        """
+        contacts = Counter()
+        for entries in self.cells.values():
+            count = len(entries)
+            for index in range(count - 1):
+                top, row = entries[index][1], entries[index][2]
+                above = index + 1
+                if entries[above][0] > top:
+                    continue
+                above = bisect_left(entries, (top,), above)
+                while above < count and entries[above][0] == top:
+                    contacts[(row, entries[above][2])] += 1
+                    above += 1
+        return contacts
+
+    def get_weak_joints(self, max_studs = 1):
+        """Pairs of touching bricks held together by at most max_studs studs
+
+        Returns:
+            list: (lower row, upper row, studs), sorted
+        """
+        return sorted((lower, upper, studs) for (lower, upper), studs in self.get_contacts().items() if studs <= max_studs)
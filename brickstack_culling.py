@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Hidden Stud Culling
+Keeps track of studs that are covered by a brick sitting directly on top of them
+"""
+
+
+def z_key(z):
+    """Round z (in brick heights) so that 1/3-steps compare equal as dict keys"""
+    return round(z, 6)
+
+
+class StudCuller:
+    """Index of stud tops and brick bottoms per grid cell
+
+    A stud is hidden if a brick starts exactly at the stud's top height on the
+    stud's cell. Parts (bricks and baseplates) provide:
+
+        stud_cells()      -> iterable of ((cell_x, cell_y), stud_index)
+        get_grid_z_range() -> (z_bottom, z_top) in brick heights, z_top = stud basis
+        hidden_studs      -> set of stud_index, maintained by the culler
+
+    Cost per added or removed part is proportional to its number of studs.
+    """
+    def __init__(self):
+        self.tops = {}     # (cell_x, cell_y, z_top) -> list of (part, stud_index)
+        self.bottoms = {}  # (cell_x, cell_y, z_bottom) -> list of parts starting there
+        self.stud_count = 0
+        self.hidden_count = 0
+
+    def add_part(self, part, covers_studs = True):
+        """Register a part, hide its own covered studs and the studs it covers
+
+        Args:
+            part (obj): RectangularBrick or Baseplate (see class doc)
+            covers_studs (bool, optional): False for parts that never sit on studs (baseplates). Defaults to True.
+
+        Returns:
+            dict: {other part: set of stud indices} for parts registered earlier whose studs got hidden
+        """
+        changed = {}
+        z_bottom, z_top = part.get_grid_z_range()
+        z_bottom, z_top = z_key(z_bottom), z_key(z_top)
+
+        for (cell_x, cell_y), stud in part.stud_cells():
+            self.stud_count += 1
+
+            # studs below this part
+            if covers_studs:
+                for other, other_stud in self.tops.get((cell_x, cell_y, z_bottom), ()):
+                    if other_stud not in other.hidden_studs:
+                        other.hidden_studs.add(other_stud)
+                        self.hidden_count += 1
+                        changed.setdefault(other, set()).add(other_stud)
+                self.bottoms.setdefault((cell_x, cell_y, z_bottom), []).append(part)
+
+            # studs of this part, covered by parts placed earlier (manual z)
+            if (cell_x, cell_y, z_top) in self.bottoms and stud not in part.hidden_studs:
+                part.hidden_studs.add(stud)
+                self.hidden_count += 1
+            self.tops.setdefault((cell_x, cell_y, z_top), []).append((part, stud))
+
+        return changed
+
+    def remove_part(self, part):
+        """Unregister a part and show the studs that only it was covering
+
+        The part's own hidden_studs are cleared (add_part hides them again).
+
+        Returns:
+            dict: {other part: set of stud indices} for parts whose studs became visible
+        """
+        changed = {}
+        z_bottom, z_top = part.get_grid_z_range()
+        z_bottom, z_top = z_key(z_bottom), z_key(z_top)
+
+        for (cell_x, cell_y), stud in part.stud_cells():
+            self.stud_count -= 1
+            if stud in part.hidden_studs:
+                self.hidden_count -= 1
+            tops = self.tops[(cell_x, cell_y, z_top)]
+            tops.pop(next(index for index, (other, other_stud) in enumerate(tops) if other is part and other_stud == stud))
+            if not tops:
+                del self.tops[(cell_x, cell_y, z_top)]
+
+            bottoms = self.bottoms.get((cell_x, cell_y, z_bottom))
+            position = next((index for index, other in enumerate(bottoms or ()) if other is part), None)
+            if position is None:
+                continue  # part never covered studs (baseplate)
+            bottoms.pop(position)
+            if bottoms:
+                continue  # another part still starts here
+            del self.bottoms[(cell_x, cell_y, z_bottom)]
+            for other, other_stud in self.tops.get((cell_x, cell_y, z_bottom), ()):
+                if other_stud in other.hidden_studs:
+                    other.hidden_studs.discard(other_stud)
+                    self.hidden_count -= 1
+                    changed.setdefault(other, set()).add(other_stud)
+
+        part.hidden_studs.clear()
+        return changed
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Mesh Export
+Writes scenes as STL (binary), OBJ (+ MTL) or binary glTF (.glb), in the dimensions
+of BasicBrick.BRICK_SPECS (millimeters)
+
+Bricks are read in batches of rows (project file layout, see brickstack_files) and
+written batch by batch, so the complete mesh of a scene never exists in memory:
+
+- STL and OBJ write the mesh of every batch (brickstack_mesh.scene_mesh, placed with
+  brickstack_layout.layout_rows), OBJ with indexed faces and one material per color
+- glTF stores every distinct brick shape and the stud once and places them with
+  EXT_mesh_gpu_instancing: one node per (shape, color) and per stud color, holding
+  the translations of all its instances. The rows are read twice: once to count the
+  instances (the file layout must be known before writing), once to write them.
+
+Exporters take a function returning the row batches (e.g. BrickScene.get_file_row_batches).
+"""
+
+import json
+import os
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+from brickstack_layout import layout_rows
+from brickstack_mesh import baseplate_mesh, baseplate_stud_positions, cylinder_mesh, get_brick_shape, scene_mesh
+
+STL_TRIANGLE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")])
+STUD_SEGMENTS = 16
+
+GLB_MAGIC = b"glTF"
+GLB_JSON = b"JSON"
+GLB_BIN = b"BIN\x00"
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+INSTANCING = "EXT_mesh_gpu_instancing"
+# brick coordinates are millimeters with z up, glTF uses meters with y up
+ROOT_ROTATION = [-0.7071067811865476, 0, 0, 0.7071067811865476]
+ROOT_SCALE = [0.001, 0.001, 0.001]
+
+
+def get_export_format(path):
+    """Format from the file extension: "stl", "obj" or "glb" """
+    extension = os.path.splitext(str(path))[1].lower().lstrip(".")
+    if extension not in ("stl", "obj", "glb"):
+        raise ValueError(f"Unknown mesh format: {path} (use .stl, .obj or .glb)")
+    return extension
+
+def get_color_name(brick_color):
+    return "color_" + "".join(f"{min(max(round(value * 255), 0), 255):02x}" for value in brick_color)
+
+
+##### STL #####
+
+def write_stl_triangles(stl_file, mesh):
+    triangles = np.zeros(len(mesh), dtype = STL_TRIANGLE)
+    triangles["normal"] = mesh.get_normals()
+    triangles["vertices"] = mesh.get_triangles()
+    stl_file.write(triangles.tobytes())
+    return len(triangles)
+
+def export_stl(path, get_batches, baseplates, specs, studs = True):
+    """Binary STL (no colors); the triangle count is filled in at the end
+
+    Returns:
+        int: number of triangles
+    """
+    with open(path, "wb") as stl_file:
+        stl_file.write(b"brickstack".ljust(80, b" ") + struct.pack("<I", 0))
+        count = write_stl_triangles(stl_file, scene_mesh((), baseplates, specs, studs))
+        for rows in get_batches():
+            count += write_stl_triangles(stl_file, scene_mesh(rows, (), specs, studs))
+        stl_file.seek(80)
+        stl_file.write(struct.pack("<I", count))
+    return count
+
+
+##### OBJ #####
+
+def write_obj_mesh(obj_file, mesh, vertex_offset):
+    """Append vertices and faces of a mesh (face indices of OBJ start at 1)"""
+    np.savetxt(obj_file, mesh.vertices, fmt = "v %.4f %.4f %.4f")
+    np.savetxt(obj_file, mesh.faces + vertex_offset + 1, fmt = "f %d %d %d")
+    return vertex_offset + len(mesh.vertices)
+
+def export_obj(path, get_batches, baseplates, specs, studs = True):
+    """OBJ with indexed faces and a material per color (written to a .mtl file next to it)
+
+    Returns:
+        int: number of triangles
+    """
+    material_path = os.path.splitext(path)[0] + ".mtl"
+    materials = OrderedDict()
+    vertex_offset = 0
+    count = 0
+    with open(path, "w") as obj_file:
+        obj_file.write(f"# brickstack\nmtllib {os.path.basename(material_path)}\n")
+        for baseplate in baseplates:
+            materials.setdefault(get_color_name(baseplate[0]), baseplate[0])
+            obj_file.write(f"usemtl {get_color_name(baseplate[0])}\n")
+            mesh = baseplate_mesh(baseplate, specs, studs)
+            vertex_offset = write_obj_mesh(obj_file, mesh, vertex_offset)
+            count += len(mesh)
+        for rows in get_batches():
+            # one material switch per color and batch
+            by_color = OrderedDict()
+            for row in rows:
+                by_color.setdefault(tuple(row[7]), []).append(row)
+            for brick_color, color_rows in by_color.items():
+                materials.setdefault(get_color_name(brick_color), brick_color)
+                obj_file.write(f"usemtl {get_color_name(brick_color)}\n")
+                mesh = scene_mesh(color_rows, (), specs, studs)
+                vertex_offset = write_obj_mesh(obj_file, mesh, vertex_offset)
+                count += len(mesh)
+
+    with open(material_path, "w") as material_file:
+        for name, (red, green, blue) in materials.items():
+            material_file.write(f"newmtl {name}\nKd {red:.4f} {green:.4f} {blue:.4f}\n\n")
+    return count
+
+
+##### glTF #####
+
+class GlbBuffer:
+    """Layout of the binary chunk: buffer views are appended with 4-byte alignment"""
+    def __init__(self):
+        self.size = 0
+        self.buffer_views = []
+        self.accessors = []
+        self.blobs = []  # (offset, bytes) known in advance
+
+    def add_view(self, byte_length, target = None):
+        self.size += -self.size % 4
+        view = {"buffer": 0, "byteOffset": self.size, "byteLength": byte_length}
+        if target is not None:
+            view["target"] = target
+        self.buffer_views.append(view)
+        self.size += byte_length
+        return len(self.buffer_views) - 1
+
+    def add_data(self, array, target = None):
+        data = array.tobytes()
+        view = self.add_view(len(data), target)
+        self.blobs.append((self.buffer_views[view]["byteOffset"], data))
+        return view
+
+    def add_accessor(self, view, component_type, count, accessor_type, **extra):
+        self.accessors.append(dict(bufferView = view, componentType = component_type, count = count, type = accessor_type, **extra))
+        return len(self.accessors) - 1
+
+    def add_geometry(self, vertices, faces):
+        """Position and index accessors of a mesh
+
+        Returns:
+            dict: primitive attributes and indices
+        """
+        vertices = np.asarray(vertices, dtype = "<f4")
+        index_type, index_dtype = (UNSIGNED_SHORT, "<u2") if len(vertices) < 65536 else (UNSIGNED_INT, "<u4")
+        positions = self.add_accessor(self.add_data(vertices, ARRAY_BUFFER), FLOAT, len(vertices), "VEC3",
+                                      min = vertices.min(axis = 0).tolist(), max = vertices.max(axis = 0).tolist())
+        indices = self.add_accessor(self.add_data(np.asarray(faces, dtype = index_dtype), ELEMENT_ARRAY_BUFFER),
+                                    index_type, faces.size, "SCALAR")
+        return {"attributes": {"POSITION": positions}, "indices": indices}
+
+def get_instances(rows, specs, studs):
+    """Instance translations of a batch of brick rows, grouped as the nodes of export_glb (groups in row order)
+
+    Returns:
+        OrderedDict: ("body", (x_extension, y_extension, height), color) or ("stud", color) -> (n, 3) translations
+    """
+    rows = list(rows)
+    if not rows:
+        return OrderedDict()
+    layout = layout_rows(rows, specs, studs)
+    bodies = OrderedDict()  # key -> brick indices
+    groups = OrderedDict()  # body and stud keys in row order -> group number
+    stud_groups = []  # group number of the studs of every brick
+    for index, (row, x_extension, y_extension) in enumerate(zip(rows, layout.x_extension.tolist(), layout.y_extension.tolist())):
+        brick_color = tuple(row[7])
+        body = ("body", (x_extension, y_extension, row[3]), brick_color)
+        bodies.setdefault(body, []).append(index)
+        groups.setdefault(body, len(groups))
+        if studs:
+            stud_groups.append(groups.setdefault(("stud", brick_color), len(groups)))
+    stud_group = np.array(stud_groups, dtype = np.int64)[layout.brick]
+    instances = OrderedDict()
+    for key, group in groups.items():
+        positions = layout.origins[bodies[key]] if key[0] == "body" else layout.positions[stud_group == group]
+        if len(positions):
+            instances[key] = positions
+    return instances
+
+def export_glb(path, get_batches, baseplates, specs, studs = True):
+    """Binary glTF with one instanced node per brick shape and color (EXT_mesh_gpu_instancing)
+
+    Returns:
+        int: number of instances (bricks and studs)
+    """
+    # pass 1: count instances per group, a group is ("body", shape, color) or ("stud", color)
+    counts = OrderedDict()
+    baseplate_studs = [(tuple(baseplate[0]), baseplate_stud_positions(baseplate, specs)) for baseplate in baseplates] if studs else []
+    for baseplate_color, positions in baseplate_studs:
+        counts[("stud", baseplate_color)] = counts.get(("stud", baseplate_color), 0) + len(positions)
+    for rows in get_batches():
+        for key, positions in get_instances(rows, specs, studs).items():
+            counts[key] = counts.get(key, 0) + len(positions)
+
+    layout = GlbBuffer()
+    materials = OrderedDict()
+    def material(brick_color):
+        if brick_color not in materials:
+            materials[brick_color] = len(materials)
+        return materials[brick_color]
+
+    meshes, nodes = [], []
+    def add_mesh(primitive, brick_color, name):
+        meshes.append({"name": name, "primitives": [dict(primitive, material = material(brick_color))]})
+        return len(meshes) - 1
+
+    # geometry: every shape once, shared by all colors
+    for baseplate in baseplates:
+        mesh = baseplate_mesh(baseplate, specs)
+        nodes.append({"mesh": add_mesh(layout.add_geometry(mesh.vertices, mesh.faces), tuple(baseplate[0]), "baseplate")})
+    shapes = {}
+    for key in counts:
+        if key[0] == "body" and key[1] not in shapes:
+            x_extension, y_extension, height = key[1]
+            vertices, faces = get_brick_shape(x_extension, y_extension, height, specs["xy_factor"], specs["z_factor"],
+                                              specs["stud_diameter"] / 2, specs["stud_height"], False, STUD_SEGMENTS)
+            shapes[key[1]] = layout.add_geometry(vertices, faces)
+        elif key[0] == "stud" and "stud" not in shapes:
+            stud = cylinder_mesh(0, 0, 0, specs["stud_height"], specs["stud_diameter"] / 2, (0, 0, 0), STUD_SEGMENTS)
+            shapes["stud"] = layout.add_geometry(stud.vertices, stud.faces)
+
+    # instance translations: one buffer view per group, filled in pass 2
+    group_offsets = {}
+    for key, count in counts.items():
+        view = layout.add_view(count * 12)
+        group_offsets[key] = layout.buffer_views[view]["byteOffset"]
+        translations = layout.add_accessor(view, FLOAT, count, "VEC3")
+        if key[0] == "body":
+            mesh = add_mesh(shapes[key[1]], key[2], "brick {}x{}x{:g}".format(*key[1]))
+        else:
+            mesh = add_mesh(shapes["stud"], key[1], "stud")
+        nodes.append({"mesh": mesh, "extensions": {INSTANCING: {"attributes": {"TRANSLATION": translations}}}})
+
+    bin_size = layout.size + -layout.size % 4
+    document = {
+        "asset": {"version": "2.0", "generator": "brickstack"},
+        "extensionsUsed": [INSTANCING],
+        "extensionsRequired": [INSTANCING],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"name": "brickstack", "rotation": ROOT_ROTATION, "scale": ROOT_SCALE,
+                   "children": list(range(1, len(nodes) + 1))}] + nodes,
+        "meshes": meshes,
+        "materials": [{"name": get_color_name(brick_color),
+                       "pbrMetallicRoughness": {"baseColorFactor": list(brick_color) + [1], "metallicFactor": 0, "roughnessFactor": 0.6}}
+                      for brick_color in materials],
+        "accessors": layout.accessors,
+        "bufferViews": layout.buffer_views,
+        "buffers": [{"byteLength": bin_size}],
+    }
+    if not nodes:
+        document["nodes"][0].pop("children")
+    json_chunk = json.dumps(document, separators = (",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_start = 12 + 8 + len(json_chunk) + 8
+
+    with open(path, "wb") as glb_file:
+        glb_file.write(GLB_MAGIC + struct.pack("<II", 2, bin_start + bin_size))
+        glb_file.write(struct.pack("<I", len(json_chunk)) + GLB_JSON + json_chunk)
+        glb_file.write(struct.pack("<I", bin_size) + GLB_BIN)
+        glb_file.truncate(bin_start + bin_size)
+        for offset, data in layout.blobs:
+            glb_file.seek(bin_start + offset)
+            glb_file.write(data)
+
+        # pass 2: translations, appended to their group's buffer view batch by batch
+        written = dict.fromkeys(counts, 0)
+        for baseplate_color, positions in baseplate_studs:
+            key = ("stud", baseplate_color)
+            glb_file.seek(bin_start + group_offsets[key] + written[key] * 12)
+            glb_file.write(np.asarray(positions, dtype = "<f4").tobytes())
+            written[key] += len(positions)
+        for rows in get_batches():
+            for key, positions in get_instances(rows, specs, studs).items():
+                glb_file.seek(bin_start + group_offsets[key] + written[key] * 12)
+                glb_file.write(np.asarray(positions, dtype = "<f4").tobytes())
+                written[key] += len(positions)
+    if written != counts:
+        raise ValueError("brick rows changed between the two export passes")
+    return sum(counts.values())
+
+
+EXPORTERS = {"stl": export_stl, "obj": export_obj, "glb": export_glb}
+
+def export_mesh(path, get_batches, baseplates, specs, studs = True, file_format = None):
+    """Write a scene in the format given by file_format or the file extension
+
+    Args:
+        path (str): target file
+        get_batches (callable): returns an iterable of brick row lists; called twice for glTF
+        baseplates (list): baseplate rows, see brickstack_mesh
+        specs (dict): BasicBrick.BRICK_SPECS of the brick system
+        studs (bool, optional): include studs. Defaults to True.
+        file_format (str, optional): "stl", "obj" or "glb" (any case). Defaults to None.
+
+    Returns:
+        int: triangles written (STL/OBJ) or instances (glTF)
+
+    Raises:
+        ValueError: unsupported format
+    """
+    file_format = (file_format or get_export_format(path)).lower()
+    if file_format not in EXPORTERS:
+        raise ValueError(f"unsupported export format {file_format!r}, use one of: {', '.join(EXPORTERS)}")
+    return EXPORTERS[file_format](path, get_batches, baseplates, specs, studs)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Project Files
+Streaming reader/writer for project files, as line-oriented text (.bricks) or packed binary (.brickb)
+
+Both formats store the same content, in order:
+
+    project   brick_system, auto_z
+    scene     starts a new scene
+    baseplate (r, g, b), length, width, center_x, center_y
+    bricks    rows of (brick_type, length, width, height, x, y, z, (r, g, b), orientation)
+
+Everything is in grid units (studs / brick heights); orientation is one of "N", "E", "S", "W".
+Colors are plain (r, g, b) tuples - BrickProject.save/load convert from and to vpython vectors.
+"""
+
+import struct
+
+ORIENTATION_CODES = ("N", "E", "S", "W")
+TEXT_HEADER = "# brickstack project v1"
+BINARY_MAGIC = b"BRKS\x01"
+BATCH_SIZE = 10_000
+
+# binary brick row: type, length, width, height, x, y, z, color, orientation
+BRICK_ROW = struct.Struct("<BHHdiidHB")
+BASEPLATE_ROW = struct.Struct("<dddHHdd")
+COLOR_ROW = struct.Struct("<Hddd")
+COUNT = struct.Struct("<I")
+
+
+def get_file_format(path):
+    """Format from the file extension: "binary" for .brickb, "text" otherwise"""
+    return "binary" if str(path).endswith(".brickb") else "text"
+
+def sniff_file_format(path):
+    """Format from the first bytes of an existing file"""
+    with open(path, "rb") as project_file:
+        return "binary" if project_file.read(len(BINARY_MAGIC)) == BINARY_MAGIC else "text"
+
+def format_number(value):
+    """Shortest text for a number that reads back unchanged (ints stay ints)"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def parse_number(text):
+    """Inverse of format_number"""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class TextProjectWriter:
+    """Writes a .bricks file line by line, nothing is buffered beyond the file object"""
+    def __init__(self, path, brick_system, auto_z):
+        self.file = open(path, "w", encoding = "utf-8")
+        self.file.write(f"{TEXT_HEADER}\nproject {brick_system} {int(bool(auto_z))}\n")
+
+    def begin_scene(self):
+        self.file.write("scene\n")
+
+    def write_baseplate(self, baseplate_color, length, width, center_x, center_y):
+        values = (*baseplate_color, length, width, center_x, center_y)
+        self.file.write("baseplate " + " ".join(format_number(value) for value in values) + "\n")
+
+    def write_bricks(self, rows):
+        """Write brick rows (see module doc)"""
+        lines = []
+        for brick_type, length, width, height, x, y, z, (r, g, b), orientation in rows:
+            lines.append(f"brick {brick_type} {length} {width} {format_number(height)} {x} {y} {format_number(z)} "
+                         f"{format_number(r)} {format_number(g)} {format_number(b)} {orientation}\n")
+        self.file.writelines(lines)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BinaryProjectWriter:
+    """Writes a .brickb file: tagged blocks, brick rows packed with BRICK_ROW
+
+    Brick types and colors are written once as palette entries ("T"/"C" blocks)
+    and referenced by index in the brick rows.
+    """
+    def __init__(self, path, brick_system, auto_z):
+        self.file = open(path, "wb")
+        system = brick_system.encode("utf-8")
+        self.file.write(BINARY_MAGIC + bytes([len(system)]) + system + bytes([int(bool(auto_z))]))
+        self.type_codes = {}
+        self.color_codes = {}
+
+    def begin_scene(self):
+        self.file.write(b"S")
+
+    def write_baseplate(self, baseplate_color, length, width, center_x, center_y):
+        self.file.write(b"P" + BASEPLATE_ROW.pack(*baseplate_color, length, width, center_x, center_y))
+
+    def type_code(self, brick_type):
+        code = self.type_codes.get(brick_type)
+        if code is None:
+            code = len(self.type_codes)
+            self.type_codes[brick_type] = code
+            name = brick_type.encode("utf-8")
+            self.file.write(b"T" + bytes([code, len(name)]) + name)
+        return code
+
+    def color_code(self, brick_color):
+        code = self.color_codes.get(brick_color)
+        if code is None:
+            code = len(self.color_codes)
+            self.color_codes[brick_color] = code
+            self.file.write(b"C" + COLOR_ROW.pack(code, *brick_color))
+        return code
+
+    def write_bricks(self, rows):
+        """Write brick rows (see module doc) as one block"""
+        packed = bytearray()
+        count = 0
+        pack = BRICK_ROW.pack
+        for brick_type, length, width, height, x, y, z, brick_color, orientation in rows:
+            type_code = self.type_code(brick_type)
+            color_code = self.color_code(tuple(brick_color))
+            packed += pack(type_code, length, width, height, x, y, z, color_code, ORIENTATION_CODES.index(orientation))
+            count += 1
+        if count:
+            self.file.write(b"B" + COUNT.pack(count) + packed)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_writer(path, brick_system, auto_z, file_format = None):
+    """Open a project writer
+
+    Args:
+        path (str): target file
+        brick_system (str): "duplo", "lego" or "test"
+        auto_z (bool): stored with the project
+        file_format (str, optional): "text" or "binary", from the extension if None. Defaults to None.
+
+    Returns:
+        TextProjectWriter or BinaryProjectWriter
+    """
+    file_format = file_format or get_file_format(path)
+    if file_format == "text":
+        return TextProjectWriter(path, brick_system, auto_z)
+    if file_format == "binary":
+        return BinaryProjectWriter(path, brick_system, auto_z)
+    raise ValueError(f"Unknown file format: {file_format}")
+
+
+def read_text_project(path, batch_size = BATCH_SIZE):
+    """Yield (event, data) from a .bricks file, see read_project"""
+    with open(path, encoding = "utf-8") as project_file:
+        batch = []
+        for line_number, line in enumerate(project_file, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            kind = fields[0]
+            if kind == "brick":
+                if len(fields) != 12:
+                    raise ValueError(f"{path}:{line_number}: brick needs 11 values, got {len(fields) - 1}")
+                batch.append((fields[1], int(fields[2]), int(fields[3]), parse_number(fields[4]),
+                              int(fields[5]), int(fields[6]), parse_number(fields[7]),
+                              (float(fields[8]), float(fields[9]), float(fields[10])), fields[11]))
+                if len(batch) >= batch_size:
+                    yield "bricks", batch
+                    batch = []
+                continue
+            if batch:
+                yield "bricks", batch
+                batch = []
+            if kind == "project":
+                yield "project", {"brick_system": fields[1], "auto_z": fields[2] == "1"}
+            elif kind == "scene":
+                yield "scene", None
+            elif kind == "baseplate":
+                values = [parse_number(field) for field in fields[1:]]
+                yield "baseplate", (tuple(float(value) for value in values[:3]), *values[3:])
+            else:
+                raise ValueError(f"{path}:{line_number}: unknown entry {kind!r}")
+        if batch:
+            yield "bricks", batch
+
+def read_exactly(project_file, size):
+    data = project_file.read(size)
+    if len(data) != size:
+        raise ValueError(f"{project_file.name}: unexpected end of file")
+    return data
+
+def read_binary_project(path, batch_size = BATCH_SIZE):
+    """Yield (event, data) from a .brickb file, see read_project"""
+    with open(path, "rb") as project_file:
+        if project_file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path}: not a binary brickstack project")
+        system_length = read_exactly(project_file, 1)[0]
+        brick_system = read_exactly(project_file, system_length).decode("utf-8")
+        yield "project", {"brick_system": brick_system, "auto_z": read_exactly(project_file, 1) == b"\x01"}
+
+        types = {}
+        colors = {}
+        while True:
+            tag = project_file.read(1)
+            if not tag:
+                break
+            if tag == b"S":
+                yield "scene", None
+            elif tag == b"P":
+                r, g, b, *values = BASEPLATE_ROW.unpack(read_exactly(project_file, BASEPLATE_ROW.size))
+                values = [int(value) if isinstance(value, float) and value.is_integer() else value for value in values]
+                yield "baseplate", ((r, g, b), *values)
+            elif tag == b"T":
+                code, name_length = read_exactly(project_file, 2)
+                types[code] = read_exactly(project_file, name_length).decode("utf-8")
+            elif tag == b"C":
+                code, *rgb = COLOR_ROW.unpack(read_exactly(project_file, COLOR_ROW.size))
+                colors[code] = tuple(rgb)
+            elif tag == b"B":
+                (count,) = COUNT.unpack(read_exactly(project_file, COUNT.size))
+                # read the block in slices so huge blocks never sit in memory at once
+                while count:
+                    rows = min(count, batch_size)
+                    data = read_exactly(project_file, rows * BRICK_ROW.size)
+                    yield "bricks", [(types[type_code], length, width, height, x, y, z, colors[color_code], ORIENTATION_CODES[orientation])
+                                     for type_code, length, width, height, x, y, z, color_code, orientation in BRICK_ROW.iter_unpack(data)]
+                    count -= rows
+            else:
+                raise ValueError(f"{path}: unknown block {tag!r} at offset {project_file.tell() - 1}")
+
+def read_project(path, batch_size = BATCH_SIZE, file_format = None):
+    """Stream a project file as events
+
+    Yields ("project", {"brick_system", "auto_z"}) first, then ("scene", None),
+    ("baseplate", (color, length, width, center_x, center_y)) and
+    ("bricks", [rows]) in file order. Brick rows come in batches of at most batch_size.
+
+    Args:
+        path (str): project file
+        batch_size (int, optional): maximum brick rows per event. Defaults to BATCH_SIZE.
+        file_format (str, optional): "text" or "binary", detected from the file if None. Defaults to None.
+    """
+    file_format = file_format or sniff_file_format(path)
+    if file_format == "binary":
+        return read_binary_project(path, batch_size)
+    if file_format == "text":
+        return read_text_project(path, batch_size)
+    raise ValueError(f"Unknown file format: {file_format}")
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Heightmap Occupancy Grid
+Array-backed alternative to the dict-of-lists OccupancyGrid
+"""
+
+import numpy as np
+
+from brickstack_bounds import BoundsIndex
+from brickstack_records import to_grid_ints
+
+
+class HeightmapOccupancyGrid:
+    """Occupancy grid keeping a dense top-of-stack heightmap plus a compact interval store
+
+    Drop-in replacement for OccupancyGrid (brickstack.py and brickstack_simple.py):
+    get_next_z only needs the highest z_end per cell, so the heightmap answers it
+    with a single max-reduction over the footprint instead of walking every
+    stored interval. The intervals themselves are kept as one row per brick
+    footprint (x, y, length, width, z_start, z_end, order) for everything else;
+    order counts the insertions, rows of removed bricks are reused.
+
+    Every footprint is also listed in the CHUNK_SIZE x CHUNK_SIZE chunks it
+    overlaps, so removing a brick only looks at the footprints near it.
+
+    The heightmap grows on demand and accepts negative coordinates.
+    """
+    FOOTPRINT_COLUMNS = 7
+    CHUNK_SIZE = 16
+
+    def __init__(self, initial_size=64):
+        """HeightmapOccupancyGrid init
+
+        Args:
+            initial_size (int, optional): initial edge length of the heightmap in studs, centered at (0, 0). Defaults to 64.
+        """
+        self.heights = np.zeros((initial_size, initial_size), dtype=np.float64)
+        # grid coordinate of heights[0, 0]
+        self.origin_x = -(initial_size // 2)
+        self.origin_y = -(initial_size // 2)
+
+        # compact interval store: one row per footprint, free rows have length 0
+        self.footprints = np.zeros((64, self.FOOTPRINT_COLUMNS), dtype=np.float64)
+        self.footprint_count = 0
+        self.row_count = 0  # rows in use or free
+        self.free_rows = []
+        self.insertions = 0
+        # (chunk x, chunk y) -> footprint rows overlapping the chunk
+        self.chunks = {}
+
+        # running min/max x, y, z
+        self.bounds = BoundsIndex()
+
+    def _ensure_region(self, x, y, length, width):
+        """Grow the heightmap so that the cells [x, x+length) x [y, y+width) are covered"""
+        size_x, size_y = self.heights.shape
+        min_x = min(x, self.origin_x)
+        min_y = min(y, self.origin_y)
+        max_x = max(x + length, self.origin_x + size_x)
+        max_y = max(y + width, self.origin_y + size_y)
+
+        if (min_x, min_y) == (self.origin_x, self.origin_y) and (max_x - min_x, max_y - min_y) == (size_x, size_y):
+            return
+
+        # grow geometrically in the direction(s) we ran out of space
+        if min_x < self.origin_x: min_x = min(min_x, self.origin_x - size_x)
+        if min_y < self.origin_y: min_y = min(min_y, self.origin_y - size_y)
+        if max_x > self.origin_x + size_x: max_x = max(max_x, self.origin_x + 2 * size_x)
+        if max_y > self.origin_y + size_y: max_y = max(max_y, self.origin_y + 2 * size_y)
+
+        grown = np.zeros((max_x - min_x, max_y - min_y), dtype=np.float64)
+        off_x = self.origin_x - min_x
+        off_y = self.origin_y - min_y
+        grown[off_x:off_x + size_x, off_y:off_y + size_y] = self.heights
+        self.heights = grown
+        self.origin_x = min_x
+        self.origin_y = min_y
+
+    def _get_chunks(self, x, y, length, width):
+        """Keys of the chunks overlapping [x, x+length) x [y, y+width)"""
+        size = self.CHUNK_SIZE
+        return [(chunk_x, chunk_y) for chunk_x in range(x // size, (x + length - 1) // size + 1)
+                for chunk_y in range(y // size, (y + width - 1) // size + 1)]
+
+    def _get_nearby_rows(self, chunks):
+        """Footprint rows listed in any of the chunks, as int array"""
+        rows = [self.chunks.get(chunk, ()) for chunk in chunks]
+        if len(rows) == 1:
+            return np.array(rows[0], dtype=np.int64)
+        return np.unique(np.fromiter((row for chunk_rows in rows for row in chunk_rows), dtype=np.int64))
+
+    def _append_footprint(self, x, y, length, width, z_start, z_end):
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            if self.row_count == len(self.footprints):
+                self.footprints = np.concatenate((self.footprints, np.zeros_like(self.footprints)))
+            row = self.row_count
+            self.row_count += 1
+        self.footprints[row] = (x, y, length, width, z_start, z_end, self.insertions)
+        self.insertions += 1
+        self.footprint_count += 1
+        for chunk in self._get_chunks(x, y, length, width):
+            self.chunks.setdefault(chunk, []).append(row)
+
+    def add_brick(self, x, y, z, length, width, height):
+        """Store brick footprint and raise the heightmap below it
+
+        Args:
+            x (int): x-location of brick
+            y (int): y-location of brick
+            z (int): z-location of brick
+            length (int): extension of the brick along x in multiples of basic unit
+            width (int): extension of the brick along y, see above
+            height (int): see above
+        """
+        length, width, x, y = to_grid_ints(length, width, x, y)
+        if length <= 0 or width <= 0:
+            return
+        self._ensure_region(x, y, length, width)
+        ix = x - self.origin_x
+        iy = y - self.origin_y
+        cells = self.heights[ix:ix + length, iy:iy + width]
+        np.maximum(cells, z + height, out=cells)
+        self._append_footprint(x, y, length, width, z, z + height)
+        self.bounds.add_brick(x, y, z, length, width, height)
+
+    def remove_brick(self, x, y, z, length, width, height):
+        """Remove a brick stored with add_brick (same arguments) and lower the heightmap below it
+
+        Only the footprints in the chunks below the brick are looked at.
+
+        Raises:
+            KeyError: if the brick is not stored in the grid
+        """
+        if length <= 0 or width <= 0:
+            return
+        # the brick is listed in the chunk of its first cell
+        size = self.CHUNK_SIZE
+        nearby = self._get_nearby_rows([(x // size, y // size)])
+        rows = self.footprints[nearby]
+        match = np.flatnonzero((rows[:, 0] == x) & (rows[:, 1] == y) &
+                               (rows[:, 2] == length) & (rows[:, 3] == width) &
+                               (rows[:, 4] == z) & (rows[:, 5] == z + height))
+        if not len(match):
+            raise KeyError(f"No brick stored at ({x},{y}) with z=({z}, {z + height})")
+
+        # drop the most recent matching row
+        row = int(nearby[match[np.argmax(rows[match, 6])]])
+        chunks = self._get_chunks(x, y, length, width)
+        for chunk in chunks:
+            chunk_rows = self.chunks[chunk]
+            chunk_rows.remove(row)
+            if not chunk_rows:
+                del self.chunks[chunk]
+        self.footprints[row] = 0
+        self.free_rows.append(row)
+        self.footprint_count -= 1
+
+        self.bounds.remove_brick(x, y, z, length, width, height)
+
+        # rebuild the heightmap inside the footprint from the remaining intervals,
+        # unless the brick is below the top of every cell
+        ix = x - self.origin_x
+        iy = y - self.origin_y
+        cells = self.heights[ix:ix + length, iy:iy + width]
+        if cells.min() > z + height:
+            return
+        cells[:] = 0
+        rows = self.footprints[self._get_nearby_rows(chunks)]
+        overlap = np.flatnonzero((rows[:, 0] < x + length) & (rows[:, 0] + rows[:, 2] > x) &
+                                 (rows[:, 1] < y + width) & (rows[:, 1] + rows[:, 3] > y))
+        for ox, oy, o_length, o_width, _, o_end, _ in rows[overlap].tolist():
+            x0, x1 = max(int(ox), x), min(int(ox + o_length), x + length)
+            y0, y1 = max(int(oy), y), min(int(oy + o_width), y + width)
+            part = cells[x0 - x:x1 - x, y0 - y:y1 - y]
+            np.maximum(part, o_end, out=part)
+
+    # naming used by brickstack_simple.OccupancyGrid
+    add_brick_footprint = add_brick
+    remove_brick_footprint = remove_brick
+
+    def get_bounds(self):
+        """Return min/max x, y (occupied cells) and z (intervals) as dict, or None if empty"""
+        return self.bounds.get_bounds()
+
+    def get_xyz_range(self):
+        """Construction range including the origin, as returned by brickstack.OccupancyGrid.get_xyz_range"""
+        bounds = self.get_bounds()
+        if bounds is None:
+            return dict.fromkeys(["min_x", "max_x", "min_y", "max_y", "min_z", "max_z"], 0)
+        return {
+            "min_x": min(bounds["min_x"], 0),
+            "max_x": max(bounds["max_x"], 0),
+            "min_y": min(bounds["min_y"], 0),
+            "max_y": max(bounds["max_y"], 0),
+            "min_z": min(bounds["min_z"], 0),
+            "max_z": max(bounds["max_z"], 0),
+        }
+
+    def get_next_z(self, x, y, length, width):
+        """Return the highest z_end below the footprint [x, x+length) x [y, y+width), or 0 if nothing is there
+
+        Args:
+            x (int): x-location of brick
+            y (int): y-location of brick
+            length (int): extension of the brick along x
+            width (int): extension of the brick along y
+        """
+        size_x, size_y = self.heights.shape
+        ix0 = max(x - self.origin_x, 0)
+        iy0 = max(y - self.origin_y, 0)
+        ix1 = min(x + length - self.origin_x, size_x)
+        iy1 = min(y + width - self.origin_y, size_y)
+        if ix0 >= ix1 or iy0 >= iy1:
+            return 0
+        return float(self.heights[ix0:ix1, iy0:iy1].max())
+
+    def get_intervals(self, x, y):
+        """List (z_start, z_end) intervals stored for one cell, in insertion order"""
+        rows = self.footprints[self._get_nearby_rows(self._get_chunks(x, y, 1, 1))]
+        rows = rows[(rows[:, 0] <= x) & (x < rows[:, 0] + rows[:, 2]) &
+                    (rows[:, 1] <= y) & (y < rows[:, 1] + rows[:, 3])]
+        rows = rows[np.argsort(rows[:, 6], kind="stable")]
+        return [(z_start, z_end) for z_start, z_end in rows[:, 4:6].tolist()]
+
+    @property
+    def points(self):
+        """Dict-of-lists view {(x, y): [(z_start, z_end), ...]} as stored by OccupancyGrid
+
+        Built on demand from the interval store - meant for debugging and
+        compatibility, not for hot paths.
+        """
+        points = {}
+        rows = self.footprints[:self.row_count]
+        rows = rows[rows[:, 2] > 0]
+        for x, y, length, width, z_start, z_end, _ in rows[np.argsort(rows[:, 6], kind="stable")].tolist():
+            x, y, length, width = int(x), int(y), int(length), int(width)
+            for dx in range(length):
+                for dy in range(width):
+                    points.setdefault((x + dx, y + dy), []).append((z_start, z_end))
+        return points
+
+    def print_grid_status(self, title="Grid Status"):
+        """Print current heightmap to console (same layout as brickstack_simple.OccupancyGrid)."""
+        print(f"\n=== {title} ===")
+        if not self.footprint_count:
+            print("Grid is empty")
+            return
+
+        bounds = self.get_bounds()
+        min_x, max_x = bounds["min_x"], bounds["max_x"]
+        min_y, max_y = bounds["min_y"], bounds["max_y"]
+        print(f"Grid bounds: X({min_x}-{max_x}), Y({min_y}-{max_y})")
+
+        occupied = self.points
+        print("\nOccupancy Map (# = occupied, . = free):")
+        print("Y\\X ", end="")
+        for x in range(min_x, max_x + 1):
+            print(f"{x:2}", end="")
+        print()
+
+        for y in range(max_y, min_y - 1, -1):  # Top to bottom
+            print(f"{y:2}: ", end="")
+            for x in range(min_x, max_x + 1):
+                if (x, y) in occupied:
+                    print(f"{int(self.heights[x - self.origin_x, y - self.origin_y]):2}", end="")
+                else:
+                    print(" .", end="")
+            print()
+        print("=" * 50)
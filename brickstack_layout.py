@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Stud Layout
+Stud positions and brick placement as numpy arrays (no vpython)
+
+Studs are counted as (x_stud, y_stud) along width/length of a brick in NORTH
+orientation, x_stud major (the order BasicBrick builds them in). An orientation
+turns the stud grid around its center with one of the rotation matrices in
+ROTATION_MATRICES (the angles of DirectionalVector.rotation), so every layout
+is one matrix product instead of a branch per orientation:
+
+    cell offset = R @ (stud - (width - 1, length - 1) / 2) + (x_extension - 1, y_extension - 1) / 2
+
+layout_bricks does this for a whole batch of bricks at once (meshes, export,
+vertex buffers and scene bounds place their bricks with it); the per-shape
+functions are cached, since scenes repeat a few brick sizes many times.
+Orientations are the codes of brickstack_files.ORIENTATION_CODES.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from brickstack_files import ORIENTATION_CODES
+from brickstack_records import get_grid_footprint
+
+# N, E, S, W: rotation by 0, 3/2 pi, pi and pi/2 around the z-axis
+ROTATION_MATRICES = np.array([
+    [[1, 0], [0, 1]],
+    [[0, 1], [-1, 0]],
+    [[-1, 0], [0, -1]],
+    [[0, -1], [1, 0]],
+], dtype = np.int64)
+ORIENTATION_INDEX = {code: index for index, code in enumerate(ORIENTATION_CODES)}
+
+
+def get_orientation_indices(orientations):
+    """Orientation codes ("N", ...) -> int array of indices into ROTATION_MATRICES"""
+    return np.array([ORIENTATION_INDEX[code] for code in orientations], dtype = np.int64).reshape(-1)
+
+def stud_grid(columns, rows):
+    """(columns * rows, 2) array of (x_stud, y_stud), x_stud major"""
+    studs = np.empty((columns * rows, 2), dtype = np.int64)
+    studs[:, 0] = np.repeat(np.arange(columns), rows)
+    studs[:, 1] = np.tile(np.arange(rows), columns)
+    return studs
+
+def baseplate_studs(columns, rows, corner_studs = True):
+    """Stud grid of a baseplate, without the four corner studs unless corner_studs (duplo has none)"""
+    studs = stud_grid(columns, rows)
+    if corner_studs:
+        return studs
+    corner = np.isin(studs[:, 0], (0, columns - 1)) & np.isin(studs[:, 1], (0, rows - 1))
+    return studs[~corner]
+
+def stud_centers(studs, columns, rows, xy_factor, stud_xy_offset, stud_spacing):
+    """(n, 2) stud centers in mm from the center of a columns x rows stud field"""
+    first = np.array([-columns * xy_factor / 2 + stud_xy_offset, -rows * xy_factor / 2 + stud_xy_offset])
+    return first + studs * stud_spacing
+
+def rotate_studs(studs, width, length, orientation_index):
+    """Grid cell offsets (from the lower left corner of the footprint) of studs after rotation
+
+    Args:
+        studs (numpy.ndarray): (n, 2) x_stud/y_stud
+        width, length (int or numpy.ndarray): studs along x/y in NORTH orientation, per stud
+        orientation_index (int or numpy.ndarray): index into ROTATION_MATRICES, per stud
+
+    Returns:
+        numpy.ndarray: (n, 2) int cell offsets
+    """
+    width, length = np.asarray(width), np.asarray(length)
+    orientation_index = np.asarray(orientation_index)
+    x_extension, y_extension = get_grid_footprint(length, width, orientation_index)
+    # doubled coordinates keep the half-stud centers integral
+    centered = 2 * studs - np.stack(np.broadcast_arrays(width - 1, length - 1), axis = -1)
+    rotated = np.einsum("...ij,...j->...i", ROTATION_MATRICES[orientation_index], centered)
+    return (rotated + np.stack(np.broadcast_arrays(x_extension - 1, y_extension - 1), axis = -1)) // 2
+
+@lru_cache(maxsize = 256)
+def get_stud_cells(width, length, orientation_index):
+    """((cell offset x, cell offset y), (x_stud, y_stud)) per stud of a brick shape, cached
+
+    Returns:
+        tuple: pairs of int tuples, x_stud major
+    """
+    studs = stud_grid(width, length)
+    cells = rotate_studs(studs, width, length, orientation_index)
+    return tuple(zip(map(tuple, cells.tolist()), map(tuple, studs.tolist())))
+
+@lru_cache(maxsize = 256)
+def get_stud_centers(columns, rows, xy_factor, stud_xy_offset, stud_spacing):
+    """Stud centers in mm from the center of a brick (see stud_centers) with their studs, cached
+
+    Returns:
+        tuple: (x_stud, y_stud, offset_x, offset_y) per stud, x_stud major
+    """
+    studs = stud_grid(columns, rows)
+    centers = stud_centers(studs, columns, rows, xy_factor, stud_xy_offset, stud_spacing)
+    return tuple((x_stud, y_stud, offset_x, offset_y) for (x_stud, y_stud), (offset_x, offset_y) in zip(studs.tolist(), centers.tolist()))
+
+
+class BrickLayout:
+    """Placement and studs of a batch of bricks, all arrays
+
+    Per brick (n): x_extension, y_extension (grid cells), rotation (angle around
+    z as in DirectionalVector.rotation), centers (n, 3) body centers and origins
+    (n, 3) lower left bottom corners in mm.
+    Per stud (total of all bricks): brick (index of its brick), studs (x_stud,
+    y_stud), cells (grid cells), positions (mm, center of the stud bottom on top
+    of the brick).
+    """
+    def __init__(self, x_extension, y_extension, rotation, centers, origins, brick, studs, cells, positions):
+        self.x_extension = x_extension
+        self.y_extension = y_extension
+        self.rotation = rotation
+        self.centers = centers
+        self.origins = origins
+        self.brick = brick
+        self.studs = studs
+        self.cells = cells
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.centers)
+
+    def get_brick_studs(self, index):
+        """Slice of the stud arrays belonging to brick index (studs are grouped by brick)"""
+        start, stop = np.searchsorted(self.brick, (index, index + 1))
+        return slice(start, stop)
+
+
+def layout_bricks(length, width, height, x, y, z, orientations, specs, studs = True):
+    """Lay out a batch of bricks in a few array operations
+
+    Args:
+        length, width, height, x, y, z (array-like): one entry per brick in grid units (project file rows)
+        orientations (array-like): orientation codes ("N", ... or a string like "NNEW") or indices into ROTATION_MATRICES
+        specs (dict): BRICK_SPECS of the brick system
+        studs (bool, optional): False leaves the stud arrays empty (placement only). Defaults to True.
+
+    Returns:
+        BrickLayout
+    """
+    length = np.asarray(length, dtype = np.int64).reshape(-1)
+    width = np.asarray(width, dtype = np.int64).reshape(-1)
+    height = np.asarray(height, dtype = float).reshape(-1)
+    x = np.asarray(x, dtype = np.int64).reshape(-1)
+    y = np.asarray(y, dtype = np.int64).reshape(-1)
+    z = np.asarray(z, dtype = float).reshape(-1)
+    orientation_index = np.asarray(list(orientations) if isinstance(orientations, str) else orientations).reshape(-1)
+    if orientation_index.dtype.kind not in "iu":
+        orientation_index = get_orientation_indices(orientation_index)
+    xy_factor, z_factor = specs["xy_factor"], specs["z_factor"]
+
+    x_extension, y_extension = get_grid_footprint(length, width, orientation_index)
+    rotation = np.array([0, 3 * np.pi / 2, np.pi, np.pi / 2])[orientation_index]
+    centers = np.stack(((x + x_extension / 2) * xy_factor, (y + y_extension / 2) * xy_factor,
+                        (z + height / 2) * z_factor), axis = 1)
+    origins = np.stack((x * xy_factor, y * xy_factor, z * z_factor), axis = 1).astype(float)
+
+    # one row per stud: brick index and x_stud/y_stud from the position within the brick
+    counts = width * length if studs else np.zeros_like(width)
+    brick = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(len(brick)) - np.repeat(np.cumsum(counts) - counts, counts)
+    brick_studs = np.stack((local // length[brick], local % length[brick]), axis = 1) if len(brick) else np.zeros((0, 2), dtype = np.int64)
+    cells = rotate_studs(brick_studs, width[brick], length[brick], orientation_index[brick]) + np.stack((x[brick], y[brick]), axis = 1)
+    positions = np.empty((len(brick), 3))
+    positions[:, :2] = cells * xy_factor + specs["stud_xy_offset"]
+    positions[:, 2] = (z + height)[brick] * z_factor
+    return BrickLayout(x_extension, y_extension, rotation, centers, origins, brick, brick_studs, cells, positions)
+
+def layout_rows(rows, specs, studs = True):
+    """layout_bricks for a list of brick rows in project file layout (see brickstack_files)"""
+    columns = list(zip(*rows)) if len(rows) else [()] * 9
+    brick_type, length, width, height, x, y, z, brick_color, orientation = columns
+    return layout_bricks(length, width, height, x, y, z, orientation, specs, studs)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Level of Detail
+Chooses how detailed the studs of a brick or baseplate are drawn (no vpython)
+
+Tiers, from most to least primitives:
+
+    full   studs as specified (hollow extrusions for duplo bricks)
+    solid  every stud a plain cylinder
+    flat   no studs, only the brick body
+
+With BrickScene.set_lod("auto") the tier follows the size of a stud on screen: studs
+that cover only a few pixels are drawn solid, sub-pixel studs are left out.
+"""
+
+from math import tan, pi
+
+LOD_TIERS = ("full", "solid", "flat")
+LOD_SETTINGS = LOD_TIERS + ("auto",)
+# minimum stud diameter on screen (pixels) for the full and solid tier
+LOD_PIXELS = {"full": 12, "solid": 2}
+DEFAULT_FOV = pi / 3  # vpython's default field of view
+
+
+def check_lod(lod):
+    """Raise ValueError for unknown tiers/settings"""
+    if lod not in LOD_SETTINGS:
+        raise ValueError(f"Unknown level of detail {lod!r}, use one of {', '.join(LOD_SETTINGS)}")
+    return lod
+
+def get_box_distance(point, lower, upper):
+    """Distance from a point to the nearest point of an axis aligned box (0 inside)"""
+    return sum(max(low - value, 0, value - high) ** 2 for value, low, high in zip(point, lower, upper)) ** 0.5
+
+def get_stud_pixels(stud_diameter, distance, viewport_height, fov = DEFAULT_FOV):
+    """Approximate stud diameter on screen in pixels (perspective projection, vpython's fov is vertical)"""
+    if distance <= 0:
+        return float("inf")
+    return stud_diameter * (viewport_height / 2) / tan(fov / 2) / distance
+
+def choose_lod(stud_pixels, thresholds = LOD_PIXELS):
+    """Tier for a stud of the given size on screen"""
+    if stud_pixels >= thresholds["full"]:
+        return "full"
+    if stud_pixels >= thresholds["solid"]:
+        return "solid"
+    return "flat"
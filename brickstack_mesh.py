@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Triangle Meshes
+Plain vertex/face arrays for bricks and baseplates (no vpython), used by the
+offscreen renderer and exporters
+
+Bricks are given as project file rows (see brickstack_files):
+(brick_type, length, width, height, x, y, z, (r, g, b), orientation code),
+baseplates as ((r, g, b), length, width, center_x, center_y).
+All coordinates are scaled with the brick system's specs (BasicBrick.BRICK_SPECS).
+Bricks are placed in batches with brickstack_layout.layout_rows: one array
+operation for all bodies and one for all studs of a batch.
+"""
+
+from functools import lru_cache
+from math import cos, sin, pi
+
+import numpy as np
+
+from brickstack_layout import baseplate_studs, layout_rows, stud_grid
+
+
+class Mesh:
+    """Triangles as vertex array (n, 3), face index array (m, 3) and face colors (m, 3) in 0..1"""
+    def __init__(self, vertices = None, faces = None, face_colors = None):
+        self.vertices = np.zeros((0, 3)) if vertices is None else np.asarray(vertices, dtype = float)
+        self.faces = np.zeros((0, 3), dtype = np.int64) if faces is None else np.asarray(faces, dtype = np.int64)
+        self.face_colors = np.zeros((0, 3)) if face_colors is None else np.asarray(face_colors, dtype = float)
+
+    def __len__(self):
+        return len(self.faces)
+
+    @staticmethod
+    def concatenate(meshes):
+        """One mesh from many, face indices are shifted accordingly"""
+        meshes = [mesh for mesh in meshes if len(mesh)]
+        if not meshes:
+            return Mesh()
+        offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes[:-1]])
+        return Mesh(np.concatenate([mesh.vertices for mesh in meshes]),
+                    np.concatenate([mesh.faces + offset for mesh, offset in zip(meshes, offsets)]),
+                    np.concatenate([mesh.face_colors for mesh in meshes]))
+
+    def get_triangles(self):
+        """Vertex coordinates per face, shape (m, 3, 3)"""
+        return self.vertices[self.faces]
+
+    def get_normals(self):
+        """Unit face normals (counter-clockwise faces point outwards)"""
+        triangles = self.get_triangles()
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        lengths = np.linalg.norm(normals, axis = 1, keepdims = True)
+        return normals / np.where(lengths == 0, 1, lengths)
+
+
+# corners 0..7: bit 0 = x, bit 1 = y, bit 2 = z; faces counter-clockwise seen from outside
+BOX_FACES = np.array([
+    [0, 2, 1], [1, 2, 3],  # bottom
+    [4, 5, 6], [5, 7, 6],  # top
+    [0, 1, 4], [1, 5, 4],  # front (y min)
+    [2, 6, 3], [3, 6, 7],  # back (y max)
+    [0, 4, 2], [2, 4, 6],  # left (x min)
+    [1, 3, 5], [3, 7, 5],  # right (x max)
+])
+BOX_CORNERS = np.array([(corner & 1, corner >> 1 & 1, corner >> 2 & 1) for corner in range(8)], dtype = float)
+
+def box_mesh(x0, y0, z0, x1, y1, z1, face_color):
+    vertices = [(x1 if corner & 1 else x0, y1 if corner & 2 else y0, z1 if corner & 4 else z0) for corner in range(8)]
+    return Mesh(vertices, BOX_FACES, np.tile(face_color, (len(BOX_FACES), 1)))
+
+def cylinder_mesh(center_x, center_y, z0, z1, radius, face_color, segments = 8):
+    """Closed-top cylinder (the bottom sits on a brick and is never visible)"""
+    angles = [2 * pi * index / segments for index in range(segments)]
+    ring = [(center_x + radius * cos(angle), center_y + radius * sin(angle)) for angle in angles]
+    vertices = [(x, y, z0) for x, y in ring] + [(x, y, z1) for x, y in ring] + [(center_x, center_y, z1)]
+    faces = []
+    for index in range(segments):
+        following = (index + 1) % segments
+        faces.append((index, following, segments + index))
+        faces.append((following, segments + following, segments + index))
+        faces.append((segments + index, segments + following, 2 * segments))
+    return Mesh(vertices, faces, np.tile(face_color, (len(faces), 1)))
+
+def cylinders_mesh(centers, z0, z1, radius, face_color, segments = 8):
+    """One cylinder_mesh per (x, y) in centers, tiled from a single cylinder in one step"""
+    cylinder = cylinder_mesh(0, 0, z0, z1, radius, face_color, segments)
+    count = len(centers)
+    offsets = np.zeros((count, 1, 3))
+    offsets[:, 0, :2] = centers
+    vertices = (cylinder.vertices[None] + offsets).reshape(-1, 3)
+    faces = (cylinder.faces[None] + (np.arange(count) * len(cylinder.vertices))[:, None, None]).reshape(-1, 3)
+    return Mesh(vertices, faces, np.tile(cylinder.face_colors, (count, 1)))
+
+def stud_cell_centers(x_extension, y_extension, xy_factor, hidden = frozenset()):
+    """(n, 2) centers in mm of the studs of a footprint (lower left corner at the origin) without the hidden cells"""
+    cells = stud_grid(x_extension, y_extension)
+    if hidden:
+        cells = cells[[cell not in hidden for cell in map(tuple, cells.tolist())]]
+    return (cells + 0.5) * xy_factor
+
+@lru_cache(maxsize = 256)
+def get_brick_shape(x_extension, y_extension, height, xy_factor, z_factor, stud_radius, stud_height, studs, stud_segments, hidden = frozenset()):
+    """Vertices and faces of a brick with its lower left corner at the origin, cached per shape
+
+    Scenes repeat a few brick shapes many times, so placing a brick only shifts a cached shape.
+    hidden holds (cell_x, cell_y) offsets of covered studs that are left out.
+
+    Returns:
+        tuple: (vertices, faces) arrays, read-only
+    """
+    z_top = height * z_factor
+    meshes = [box_mesh(0, 0, 0, x_extension * xy_factor, y_extension * xy_factor, z_top, (0, 0, 0))]
+    if studs:
+        meshes.append(cylinders_mesh(stud_cell_centers(x_extension, y_extension, xy_factor, hidden),
+                                     z_top, z_top + stud_height, stud_radius, (0, 0, 0), stud_segments))
+    shape = Mesh.concatenate(meshes)
+    shape.vertices.flags.writeable = False
+    shape.faces.flags.writeable = False
+    return shape.vertices, shape.faces
+
+def bricks_mesh(brick_rows, specs, studs = True, stud_segments = 8):
+    """Mesh of a batch of brick rows, brick by brick: body box, then one stud per covered grid cell
+
+    Bodies and studs are written to their places in the vertex and face arrays in
+    one step each, so the output does not depend on how rows are split into batches.
+    """
+    brick_rows = list(brick_rows)
+    if not brick_rows:
+        return Mesh()
+    layout = layout_rows(brick_rows, specs, studs)
+    stud = cylinder_mesh(0, 0, 0, specs["stud_height"], specs["stud_diameter"] / 2, (0, 0, 0), stud_segments)
+    stud_vertices, stud_faces = len(stud.vertices), len(stud.faces)
+    stud_counts = np.bincount(layout.brick, minlength = len(layout))
+    vertex_counts = len(BOX_CORNERS) + stud_counts * stud_vertices
+    face_counts = len(BOX_FACES) + stud_counts * stud_faces
+    vertex_starts = np.cumsum(vertex_counts) - vertex_counts
+    face_starts = np.cumsum(face_counts) - face_counts
+
+    vertices = np.empty((vertex_counts.sum(), 3))
+    faces = np.empty((face_counts.sum(), 3), dtype = np.int64)
+    # centers are the middle of the body, so the upper corner lies as far beyond them as the origin before
+    size = 2 * (layout.centers - layout.origins)
+    vertices[vertex_starts[:, None] + np.arange(len(BOX_CORNERS))] = layout.origins[:, None] + BOX_CORNERS[None] * size[:, None]
+    faces[face_starts[:, None] + np.arange(len(BOX_FACES))] = BOX_FACES[None] + vertex_starts[:, None, None]
+    if len(layout.brick):
+        # number of each stud within its brick
+        local = np.arange(len(layout.brick)) - (np.cumsum(stud_counts) - stud_counts)[layout.brick]
+        first_vertex = vertex_starts[layout.brick] + len(BOX_CORNERS) + local * stud_vertices
+        first_face = face_starts[layout.brick] + len(BOX_FACES) + local * stud_faces
+        vertices[first_vertex[:, None] + np.arange(stud_vertices)] = stud.vertices[None] + layout.positions[:, None]
+        faces[first_face[:, None] + np.arange(stud_faces)] = stud.faces[None] + first_vertex[:, None, None]
+    brick_colors = np.array([row[7] for row in brick_rows], dtype = float)
+    return Mesh(vertices, faces, np.repeat(brick_colors, face_counts, axis = 0))
+
+def brick_mesh(row, specs, studs = True, stud_segments = 8):
+    """Mesh of one brick row: body box plus one stud per covered grid cell"""
+    return bricks_mesh((row,), specs, studs, stud_segments)
+
+def baseplate_stud_positions(baseplate, specs):
+    """(n, 3) bottom centers in mm of the studs of a baseplate row (top of the plate is z = 0)
+
+    Duplo baseplates have no corner studs (specs["baseplate_corner_studs"]).
+    """
+    baseplate_color, length, width, center_x, center_y = baseplate
+    width, length = int(width), int(length)
+    cells = baseplate_studs(width, length, specs.get("baseplate_corner_studs", True))
+    positions = np.zeros((len(cells), 3))
+    positions[:, 0] = (center_x - width / 2 + cells[:, 0] + 0.5) * specs["xy_factor"]
+    positions[:, 1] = (center_y - length / 2 + cells[:, 1] + 0.5) * specs["xy_factor"]
+    return positions
+
+def baseplate_mesh(baseplate, specs, studs = False, stud_segments = 8):
+    """Plate of a baseplate row, top at z = 0, with studs if studs is set"""
+    baseplate_color, length, width, center_x, center_y = baseplate
+    xy_factor = specs["xy_factor"]
+    plate = box_mesh((center_x - width / 2) * xy_factor, (center_y - length / 2) * xy_factor,
+                     -specs["baseplate_height"] * xy_factor,
+                     (center_x + width / 2) * xy_factor, (center_y + length / 2) * xy_factor, 0, baseplate_color)
+    if not studs:
+        return plate
+    return Mesh.concatenate([plate, cylinders_mesh(baseplate_stud_positions(baseplate, specs)[:, :2], 0, specs["stud_height"],
+                                                   specs["stud_diameter"] / 2, baseplate_color, stud_segments)])
+
+def scene_mesh(brick_rows, baseplates, specs, studs = True):
+    """One mesh for all bricks and baseplates of a scene"""
+    return Mesh.concatenate([baseplate_mesh(baseplate, specs, studs) for baseplate in baseplates] +
+                            [bricks_mesh(brick_rows, specs, studs)])
+
+def get_scene_bounds(brick_rows, baseplates, specs, studs = True):
+    """Lower and upper corner of everything scene_mesh would draw, computed from the rows alone
+
+    Returns:
+        numpy.ndarray: [[min_x, min_y, min_z], [max_x, max_y, max_z]], or None for an empty scene
+    """
+    xy_factor = specs["xy_factor"]
+    stud_height = specs["stud_height"] if studs else 0
+    lower, upper = [], []
+    for baseplate_color, length, width, center_x, center_y in baseplates:
+        lower.append(((center_x - width / 2) * xy_factor, (center_y - length / 2) * xy_factor, -specs["baseplate_height"] * xy_factor))
+        upper.append(((center_x + width / 2) * xy_factor, (center_y + length / 2) * xy_factor, stud_height))
+    brick_rows = list(brick_rows)
+    if brick_rows:
+        layout = layout_rows(brick_rows, specs, studs = False)
+        lower.extend(layout.origins.min(axis = 0, keepdims = True))
+        upper.extend((2 * layout.centers - layout.origins).max(axis = 0, keepdims = True) + (0, 0, stud_height))
+    if not lower:
+        return None
+    return np.array([np.min(lower, axis = 0), np.max(upper, axis = 0)])
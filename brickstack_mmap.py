@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Memory-Mapped Brick Maps
+Fixed-width brick records in a file (.brickmap), opened with numpy.memmap
+
+Layout:
+
+    magic (8 bytes) | header length (uint32) | JSON header | tile table | records
+
+Records are sorted by tile (tile_size x tile_size studs, by lower left corner) and
+the tile table stores the record range of every tile, so region queries only page
+in the records of the tiles they touch. Bounds are stored in the header: opening a
+map reads header and tile table only, independent of the number of bricks.
+
+Rows for write_brick_map use the project file layout (see brickstack_files):
+(brick_type, length, width, height, x, y, z, (r, g, b), orientation code).
+"""
+
+import json
+import os
+import struct
+from math import floor
+
+import numpy as np
+
+from brickstack_files import BATCH_SIZE, ORIENTATION_CODES
+from brickstack_records import get_grid_footprint
+
+MAGIC = b"BRKMAP1\n"
+HEADER_LENGTH = struct.Struct("<I")
+ALIGNMENT = 64
+DEFAULT_TILE_SIZE = 64
+
+RECORD_DTYPE = np.dtype([
+    ("type", "u1"), ("length", "<u2"), ("width", "<u2"), ("height", "<f8"),
+    ("x", "<i4"), ("y", "<i4"), ("z", "<f8"), ("color", "<u2"), ("orientation", "u1"),
+])
+TILE_DTYPE = np.dtype([("tile_x", "<i4"), ("tile_y", "<i4"), ("start", "<i8"), ("stop", "<i8")])
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_brick_map(path, brick_system, rows, tile_size = DEFAULT_TILE_SIZE, batch_size = BATCH_SIZE):
+    """Write rows to a brick map, sorted by tile
+
+    Rows are streamed to a temporary file first and sorted afterwards, so only
+    the sort keys (16 bytes per brick) are held in memory at once.
+
+    Args:
+        path (str): target file
+        brick_system (str): "duplo", "lego" or "test"
+        rows (iterable): brick rows, see module doc
+        tile_size (int, optional): tile edge in studs. Defaults to DEFAULT_TILE_SIZE.
+        batch_size (int, optional): rows converted per step. Defaults to BATCH_SIZE.
+
+    Returns:
+        int: number of bricks written
+    """
+    types = {}
+    colors = {}
+    orientation_index = {code: index for index, code in enumerate(ORIENTATION_CODES)}
+    unsorted_path = path + ".unsorted"
+
+    count = 0
+    with open(unsorted_path, "wb") as unsorted_file:
+        batch = []
+        for brick_type, length, width, height, x, y, z, brick_color, orientation in rows:
+            type_code = types.setdefault(brick_type, len(types))
+            color_code = colors.setdefault(tuple(brick_color), len(colors))
+            batch.append((type_code, length, width, height, x, y, z, color_code, orientation_index[orientation]))
+            if len(batch) >= batch_size:
+                unsorted_file.write(np.array(batch, dtype = RECORD_DTYPE).tobytes())
+                count += len(batch)
+                batch = []
+        if batch:
+            unsorted_file.write(np.array(batch, dtype = RECORD_DTYPE).tobytes())
+            count += len(batch)
+
+    try:
+        if count:
+            unsorted = np.memmap(unsorted_path, dtype = RECORD_DTYPE, mode = "r")
+            tile_x = np.floor_divide(unsorted["x"], tile_size).astype(np.int64)
+            tile_y = np.floor_divide(unsorted["y"], tile_size).astype(np.int64)
+            order = np.lexsort((tile_y, tile_x))
+            tile_x, tile_y = tile_x[order], tile_y[order]
+            starts = np.flatnonzero(np.r_[True, (tile_x[1:] != tile_x[:-1]) | (tile_y[1:] != tile_y[:-1])])
+            tiles = np.zeros(len(starts), dtype = TILE_DTYPE)
+            tiles["tile_x"] = tile_x[starts]
+            tiles["tile_y"] = tile_y[starts]
+            tiles["start"] = starts
+            tiles["stop"] = np.r_[starts[1:], count]
+            del tile_x, tile_y
+
+            x_extension, y_extension = get_grid_footprint(unsorted["length"].astype(np.int64), unsorted["width"].astype(np.int64),
+                                                          unsorted["orientation"])
+            bounds = {
+                "min_x": int(unsorted["x"].min()),
+                "max_x": int((unsorted["x"] + x_extension - 1).max()),
+                "min_y": int(unsorted["y"].min()),
+                "max_y": int((unsorted["y"] + y_extension - 1).max()),
+                "min_z": float(unsorted["z"].min()),
+                "max_z": float((unsorted["z"] + unsorted["height"]).max()),
+            }
+            max_extension = int(max(x_extension.max(), y_extension.max()))
+            del x_extension, y_extension
+        else:
+            unsorted = order = None
+            tiles = np.zeros(0, dtype = TILE_DTYPE)
+            bounds = None
+            max_extension = 0
+
+        header = json.dumps({
+            "brick_system": brick_system,
+            "count": count,
+            "tile_size": tile_size,
+            "tile_count": len(tiles),
+            "max_extension": max_extension,
+            "bounds": bounds,
+            "types": list(types),
+            "colors": [list(brick_color) for brick_color in colors],
+        }).encode("utf-8")
+        tiles_offset = align(len(MAGIC) + HEADER_LENGTH.size + len(header))
+        records_offset = align(tiles_offset + tiles.nbytes)
+
+        with open(path, "wb") as map_file:
+            map_file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+            map_file.seek(tiles_offset)
+            map_file.write(tiles.tobytes())
+            map_file.truncate(records_offset + count * RECORD_DTYPE.itemsize)
+
+        if count:
+            records = np.memmap(path, dtype = RECORD_DTYPE, mode = "r+", offset = records_offset, shape = (count,))
+            for start in range(0, count, batch_size * 10):
+                stop = min(start + batch_size * 10, count)
+                records[start:stop] = unsorted[order[start:stop]]
+            records.flush()
+            del records, unsorted
+    finally:
+        os.remove(unsorted_path)
+    return count
+
+
+class BrickMap:
+    """Read-only view of a .brickmap file
+
+    Records stay on disk until a query touches them (numpy.memmap); the tile table
+    maps (tile_x, tile_y) to record ranges.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as map_file:
+            if map_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}: not a brick map")
+            (header_length,) = HEADER_LENGTH.unpack(map_file.read(HEADER_LENGTH.size))
+            header = json.loads(map_file.read(header_length).decode("utf-8"))
+
+        self.path = path
+        self.brick_system = header["brick_system"]
+        self.count = header["count"]
+        self.tile_size = header["tile_size"]
+        self.max_extension = header["max_extension"]
+        self.bounds = header["bounds"]
+        self.types = header["types"]
+        self.colors = [tuple(brick_color) for brick_color in header["colors"]]
+
+        tiles_offset = align(len(MAGIC) + HEADER_LENGTH.size + header_length)
+        records_offset = align(tiles_offset + header["tile_count"] * TILE_DTYPE.itemsize)
+        tiles = np.fromfile(path, dtype = TILE_DTYPE, count = header["tile_count"], offset = tiles_offset)
+        self.tiles = {(int(tile["tile_x"]), int(tile["tile_y"])): (int(tile["start"]), int(tile["stop"])) for tile in tiles}
+        if self.count:
+            self.records = np.memmap(path, dtype = RECORD_DTYPE, mode = "r", offset = records_offset, shape = (self.count,))
+        else:
+            self.records = np.zeros(0, dtype = RECORD_DTYPE)
+
+    def __len__(self):
+        return self.count
+
+    def get_bounds(self):
+        """Stored min/max x, y (occupied cells) and z, or None for an empty map (same keys as the grids)"""
+        return dict(self.bounds) if self.bounds is not None else None
+
+    def get_region_indices(self, min_x, min_y, max_x, max_y):
+        """Record indices of bricks overlapping the cells min_x..max_x / min_y..max_y (inclusive)
+
+        Only the records of tiles that can hold such bricks are read.
+
+        Returns:
+            numpy.ndarray: record indices (int64)
+        """
+        size = self.tile_size
+        reach = self.max_extension - 1  # bricks starting up to this far left/below can still overlap
+        ranges = []
+        for tile_x in range(floor((min_x - reach) / size), floor(max_x / size) + 1):
+            for tile_y in range(floor((min_y - reach) / size), floor(max_y / size) + 1):
+                record_range = self.tiles.get((tile_x, tile_y))
+                if record_range is not None:
+                    ranges.append(np.arange(*record_range))
+        if not ranges:
+            return np.zeros(0, dtype = np.int64)
+        indices = np.concatenate(ranges)
+        records = self.records[indices]
+        x_extension, y_extension = get_grid_footprint(records["length"].astype(np.int64), records["width"].astype(np.int64),
+                                                      records["orientation"])
+        overlap = ((records["x"] <= max_x) & (records["x"] + x_extension > min_x) &
+                   (records["y"] <= max_y) & (records["y"] + y_extension > min_y))
+        return indices[overlap]
+
+    def get_next_z(self, x, y, width, length):
+        """Highest brick top over the footprint (same semantics and argument order as OccupancyGrid.get_next_z)"""
+        if width <= 0 or length <= 0:
+            return 0
+        indices = self.get_region_indices(x, y, x + width - 1, y + length - 1)
+        if not len(indices):
+            return 0
+        records = self.records[indices]
+        return max(0, float((records["z"] + records["height"]).max()))
+
+    def rows(self, indices = None, convert_color = None, convert_orientation = None):
+        """Yield records as tuples in add_brick argument order (all records if indices is None)
+
+        Args:
+            indices (iterable, optional): record indices, e.g. from get_region_indices. Defaults to None.
+            convert_color (callable, optional): applied once per palette color to (r, g, b). Defaults to None.
+            convert_orientation (callable, optional): applied once per orientation code. Defaults to None.
+        """
+        colors = [convert_color(value) for value in self.colors] if convert_color else self.colors
+        orientations = [convert_orientation(code) for code in ORIENTATION_CODES] if convert_orientation else ORIENTATION_CODES
+        if indices is None:
+            slices = (self.records[start:start + BATCH_SIZE] for start in range(0, self.count, BATCH_SIZE))
+        else:
+            indices = np.asarray(indices, dtype = np.int64)
+            slices = (self.records[indices[start:start + BATCH_SIZE]] for start in range(0, len(indices), BATCH_SIZE))
+        for records in slices:
+            for type_code, length, width, height, x, y, z, color_code, orientation in records.tolist():
+                yield (self.types[type_code], length, width, height, x, y, z, colors[color_code], orientations[orientation])
+
+
+class MappedOccupancyGrid:
+    """Occupancy grid on top of a BrickMap: mapped bricks are read-only, new bricks go to overlay
+
+    Provides the grid interface BrickScene uses (add_brick, remove_brick, get_next_z,
+    get_bounds, get_xyz_range).
+    """
+    def __init__(self, brick_map, overlay):
+        self.brick_map = brick_map
+        self.overlay = overlay
+
+    def add_brick(self, x, y, z, length, width, height):
+        self.overlay.add_brick(x, y, z, length, width, height)
+
+    def remove_brick(self, x, y, z, length, width, height):
+        """Remove an overlay brick (mapped bricks are read-only, KeyError for them)"""
+        self.overlay.remove_brick(x, y, z, length, width, height)
+
+    def get_next_z(self, x, y, width, length):
+        return max(self.brick_map.get_next_z(x, y, width, length), self.overlay.get_next_z(x, y, width, length))
+
+    def get_bounds(self):
+        map_bounds = self.brick_map.get_bounds()
+        overlay_bounds = self.overlay.get_bounds()
+        if map_bounds is None or overlay_bounds is None:
+            return map_bounds or overlay_bounds
+        return {key: (min if key.startswith("min") else max)(map_bounds[key], overlay_bounds[key]) for key in map_bounds}
+
+    def get_xyz_range(self):
+        """Construction range as dict; always includes the origin"""
+        bounds = self.get_bounds()
+        if bounds is None:
+            return dict.fromkeys(["min_x", "max_x", "min_y", "max_y", "min_z", "max_z"], 0)
+        return {key: min(value, 0) if key.startswith("min") else max(value, 0) for key, value in bounds.items()}
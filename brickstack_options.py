@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Project Options
+Settings of a BrickProject and its scenes in one object (no vpython)
+
+    BrickProject("lego", render=False, strict=True)
+    BrickProject("lego", ProjectOptions(render=False, strict=True))  # the same
+
+Scenes use the options of their project unless add_scene is given changes for
+that scene alone, e.g. project.add_scene(lod="flat"). Options are never changed
+in place; replace returns a copy with some fields changed.
+"""
+
+from brickstack_collision import check_strict
+from brickstack_lod import check_lod
+
+GEOMETRY_MODES = ("primitives", "buffers")
+
+
+class ProjectOptions:
+    """Validated settings of a project or scene
+
+    Attributes:
+        auto_z (bool): True (standard), change to define own z-values
+        grid_backend (str): "dict" (standard) or "heightmap"; see create_occupancy_grid
+        render (bool): True (standard); False keeps scenes headless until BrickScene.render() is called
+        cull_hidden_studs (bool): False (standard); True omits studs directly covered by a brick
+        chunk_size (int): None (standard, one 3d-object per brick) or chunk edge in studs for chunked scenes
+        brick_objects (bool): True (standard); False stores bricks only in BrickScene.store until render()
+        lod (str): "full" (standard), "solid", "flat" or "auto"; see BrickScene.set_lod
+        strict (bool/str): False (standard), "reject" (also for True) or "report"; see BrickScene.check_collision
+        geometry (str): "primitives" (standard, vpython boxes and cylinders) or "buffers" (triangles from vertex arrays
+            computed in worker processes, for loading large projects)
+        geometry_processes (int): worker processes for geometry="buffers", None = one per CPU, 1 = no pool
+    """
+    FIELDS = ("auto_z", "grid_backend", "render", "cull_hidden_studs", "chunk_size", "brick_objects", "lod", "strict",
+              "geometry", "geometry_processes")
+
+    def __init__(self, auto_z = True, grid_backend = "dict", render = True, cull_hidden_studs = False, chunk_size = None,
+                 brick_objects = True, lod = "full", strict = False, geometry = "primitives", geometry_processes = None):
+        """ProjectOptions init, arguments see class docstring
+
+        Raises:
+            ValueError: brick_objects=False combined with render, cull_hidden_studs or chunk_size; unknown lod, strict or geometry mode
+        """
+        if not brick_objects and (render or cull_hidden_studs or chunk_size):
+            raise ValueError("brick_objects=False needs render=False and no culling/chunks")
+        if geometry not in GEOMETRY_MODES:
+            raise ValueError(f"Unknown geometry mode {geometry!r}, use 'primitives' or 'buffers'")
+        self.auto_z = auto_z
+        self.grid_backend = grid_backend
+        self.render = render
+        self.cull_hidden_studs = cull_hidden_studs
+        self.chunk_size = chunk_size
+        self.brick_objects = brick_objects
+        self.lod = check_lod(lod)
+        self.strict = check_strict(strict)
+        self.geometry = geometry
+        self.geometry_processes = geometry_processes
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def replace(self, **changes):
+        """Copy with some fields changed (validated like a new object)
+
+        Raises:
+            TypeError: unknown field
+        """
+        if not changes:
+            return self
+        unknown = set(changes) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown project options: {', '.join(sorted(unknown))}")
+        return ProjectOptions(**{**self.as_dict(), **changes})
+
+    def __eq__(self, other):
+        return isinstance(other, ProjectOptions) and self.as_dict() == other.as_dict()
+
+    def __repr__(self):
+        return "ProjectOptions(" + ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items()) + ")"
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Progressive Building
+Frame scheduling for asyncio builds and step playback (no vpython)
+
+BrickScene.add_bricks_async adds bricks in batches and hands control back to the
+event loop after every batch, so the canvas (and everything else running in the
+loop) is updated while a large model is built:
+
+    async def main():
+        task = asyncio.create_task(scene.add_bricks_async(bricks, frame_rate=30))
+        ...  # task.cancel() stops after the current batch
+        await task
+
+    asyncio.run(main())
+
+A FrameScheduler measures the time per brick and sizes the next batch so that
+adding it takes at most its share of the frame time; the rest of the frame is
+left to the event loop.
+"""
+
+import asyncio
+from time import perf_counter
+
+DEFAULT_FRAME_RATE = 30
+
+
+class FrameScheduler:
+    """Batch sizes that keep the work of every frame within budget
+
+    budget = share * frame time. After each batch the time per brick is updated
+    (moving average) and the next batch gets as many bricks as fit the budget,
+    but at most twice as many as the batch before, so a slow first brick (e.g.
+    building a mesh cache) does not lead to one huge batch.
+    """
+    def __init__(self, frame_rate = DEFAULT_FRAME_RATE, share = 0.5, batch_size = 16, max_batch_size = 10_000):
+        """FrameScheduler init
+
+        Args:
+            frame_rate (float, optional): target frames per second. Defaults to DEFAULT_FRAME_RATE.
+            share (float, optional): part of the frame time for adding bricks. Defaults to 0.5.
+            batch_size (int, optional): bricks in the first batch. Defaults to 16.
+            max_batch_size (int, optional): upper limit for a batch. Defaults to 10_000.
+        """
+        if frame_rate <= 0 or not 0 < share <= 1:
+            raise ValueError("frame_rate must be positive and share in (0, 1]")
+        self.frame_seconds = 1 / frame_rate
+        self.budget = share * self.frame_seconds
+        self.batch_size = max(1, min(batch_size, max_batch_size))
+        self.max_batch_size = max_batch_size
+        self.seconds_per_brick = None
+        self.frames = 0
+        self.over_budget = 0  # frames whose batch took longer than the budget
+
+    def record(self, count, seconds):
+        """Account a finished batch of count bricks that took seconds; sets the next batch_size"""
+        self.frames += 1
+        if seconds > self.budget:
+            self.over_budget += 1
+        if count <= 0:
+            return
+        measured = seconds / count
+        if self.seconds_per_brick is None:
+            self.seconds_per_brick = measured
+        else:
+            self.seconds_per_brick = (self.seconds_per_brick + measured) / 2
+        fitting = int(self.budget / self.seconds_per_brick) if self.seconds_per_brick > 0 else self.max_batch_size
+        self.batch_size = max(1, min(fitting, 2 * count, self.max_batch_size))
+
+    async def next_frame(self, seconds = 0.0):
+        """Yield to the event loop for the rest of a frame whose work took seconds"""
+        await asyncio.sleep(max(0.0, self.frame_seconds - seconds))
+
+
+async def run_frames(work, scheduler):
+    """Call work(batch_size) once per frame until it returns 0 (nothing left)
+
+    Args:
+        work (callable): does up to batch_size units of work, returns the number done
+        scheduler (FrameScheduler): frame timing and batch sizes
+
+    Returns:
+        int: units of work done in total
+    """
+    total = 0
+    while True:
+        start = perf_counter()
+        count = work(scheduler.batch_size)
+        if not count:
+            return total
+        total += count
+        seconds = perf_counter() - start
+        scheduler.record(count, seconds)
+        await scheduler.next_frame(seconds)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Compact Brick Records
+Logical brick data (no 3d-objects) as columns of typed arrays
+"""
+
+from array import array
+from numbers import Real
+from operator import index as to_index
+
+
+def to_grid_int(value, name = "value"):
+    """Grid coordinate or stud count as int: ints, numpy ints and whole floats (2.0) are accepted
+
+    Raises:
+        ValueError: fractional or non-numeric values
+    """
+    try:
+        return to_index(value)
+    except TypeError:
+        pass
+    if not (isinstance(value, Real) and float(value).is_integer()):
+        raise ValueError(f"{name} must be a whole number of grid cells, got {value!r}")
+    return int(value)
+
+def to_grid_ints(length, width, x, y):
+    """length, width, x and y as ints, see to_grid_int (plain ints pass without conversion)"""
+    if type(length) is int and type(width) is int and type(x) is int and type(y) is int:
+        return length, width, x, y
+    return to_grid_int(length, "length"), to_grid_int(width, "width"), to_grid_int(x, "x"), to_grid_int(y, "y")
+
+def get_grid_footprint(length, width, orientation):
+    """Return the cells a brick covers as (x-extension, y-extension)
+
+    Matches the rendered brick: in NORTH/SOUTH orientation the length runs along
+    the y-axis, in EAST/WEST orientation along the x-axis. Every module takes the
+    footprint from here; numpy columns are handled element-wise.
+
+    Args:
+        length (int or numpy.ndarray): brick length in studs
+        width (int or numpy.ndarray): brick width in studs
+        orientation: NORTH, EAST, SOUTH, WEST (vector), code ("N", ...) or index into
+            brickstack_files.ORIENTATION_CODES (int or int array, as in brick maps)
+    """
+    if hasattr(orientation, "x"):
+        # NORTH and SOUTH point along y (x == 0); cheaper than comparing vectors
+        along_y = orientation.x == 0
+    elif isinstance(orientation, str):
+        along_y = orientation in ("N", "S")
+    else:
+        along_y = orientation % 2 == 0  # N = 0, S = 2
+    if along_y is True:
+        return width, length
+    if along_y is False:
+        return length, width
+    along_x = ~along_y
+    return width * along_y + length * along_x, length * along_y + width * along_x
+
+
+def value_key(value):
+    """Hashable key for colors/orientations (vpython vectors are compared by x, y, z)"""
+    if hasattr(value, "x") and hasattr(value, "y") and hasattr(value, "z"):
+        return (value.x, value.y, value.z)
+    return value
+
+
+class BrickRecord:
+    """One logical brick: grid units (studs / brick heights), no 3d-object
+
+    Returned by BrickStore.get and by scenes running without brick objects.
+    store_index is the row in the store it came from (None for records built directly).
+    """
+    __slots__ = ("brick_system", "brick_type", "length", "width", "height",
+                 "x", "y", "z", "brick_color", "orientation", "store_index")
+
+    def __init__(self, brick_system, brick_type, length, width, height, x, y, z, brick_color, orientation, store_index = None):
+        self.brick_system = brick_system
+        self.brick_type = brick_type
+        self.length = length
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.z = z
+        self.brick_color = brick_color
+        self.orientation = orientation
+        self.store_index = store_index
+
+    def as_args(self):
+        """Arguments in BrickScene.add_brick order"""
+        return (self.brick_type, self.length, self.width, self.height, self.x, self.y, self.z, self.brick_color, self.orientation)
+
+    def __eq__(self, other):
+        if not isinstance(other, BrickRecord):
+            return NotImplemented
+        return (self.brick_system == other.brick_system
+                and self.as_args()[:7] == other.as_args()[:7]
+                and value_key(self.brick_color) == value_key(other.brick_color)
+                and value_key(self.orientation) == value_key(other.orientation))
+
+    def __repr__(self):
+        return (f"BrickRecord({self.brick_system!r}, {self.brick_type!r}, l={self.length}, w={self.width}, h={self.height}, "
+                f"x={self.x}, y={self.y}, z={self.z}, color={value_key(self.brick_color)}, orientation={value_key(self.orientation)})")
+
+
+class Palette:
+    """Interns repeated values (brick types, colors, orientations) as small integer codes"""
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        key = value_key(value)
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.values)
+            self.codes[key] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class BrickStore:
+    """Struct-of-arrays store for the logical bricks of one scene
+
+    Every brick is a row index; numbers live in typed arrays, brick types, colors
+    and orientations are palette codes. About 30 bytes per brick.
+    The brick system is shared by the whole store (one system per scene).
+
+    Removed bricks keep their row (see remove), so row indices stay valid for
+    construction steps and undo; len() counts the bricks that are not removed.
+    """
+    def __init__(self, brick_system):
+        self.brick_system = brick_system
+        self.types = Palette()
+        self.colors = Palette()
+        self.orientations = Palette()
+        self.type_codes = array("B")
+        self.lengths = array("H")
+        self.widths = array("H")
+        self.heights = array("d")
+        self.xs = array("i")
+        self.ys = array("i")
+        self.zs = array("d")
+        self.color_codes = array("H")
+        self.orientation_codes = array("B")
+        self.removed = set()  # row indices of removed bricks
+
+    def __len__(self):
+        return len(self.xs) - len(self.removed)
+
+    @property
+    def row_count(self):
+        """Number of rows including removed bricks (the index the next brick gets)"""
+        return len(self.xs)
+
+    def remove(self, index):
+        """Mark a row as removed, O(1)
+
+        Raises:
+            KeyError: row does not exist or is removed already
+        """
+        if not 0 <= index < len(self.xs) or index in self.removed:
+            raise KeyError(f"No brick at store index {index}")
+        self.removed.add(index)
+
+    def restore(self, index):
+        """Bring a removed row back
+
+        Raises:
+            KeyError: row is not removed
+        """
+        self.removed.remove(index)
+
+    def is_removed(self, index):
+        return index in self.removed
+
+    def append(self, brick_type, length, width, height, x, y, z, brick_color, orientation):
+        """Add one brick (add_brick argument order)
+
+        Returns:
+            int: row index of the brick
+        """
+        self.type_codes.append(self.types.code(brick_type))
+        self.lengths.append(length)
+        self.widths.append(width)
+        self.heights.append(height)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.zs.append(z)
+        self.color_codes.append(self.colors.code(brick_color))
+        self.orientation_codes.append(self.orientations.code(orientation))
+        return len(self.xs) - 1
+
+    def extend(self, rows):
+        """Add many bricks given as tuples in add_brick argument order
+
+        Returns:
+            range: row indices of the new bricks
+        """
+        start = len(self.xs)
+        rows = list(rows)  # keeps the row objects alive, so id() is a valid cache key below
+        if not rows:
+            return range(start, start)
+        brick_types, lengths, widths, heights, xs, ys, zs, brick_colors, orientations = zip(*rows)
+
+        self.type_codes.extend(self._codes(self.types, brick_types))
+        self.lengths.extend(lengths)
+        self.widths.extend(widths)
+        self.heights.extend(heights)
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.zs.extend(zs)
+        self.color_codes.extend(self._codes(self.colors, brick_colors))
+        self.orientation_codes.extend(self._codes(self.orientations, orientations))
+        return range(start, len(self.xs))
+
+    @staticmethod
+    def _codes(palette, values):
+        """Palette codes for values, looking up every distinct object only once"""
+        cache = {}
+        codes = []
+        for value in values:
+            code = cache.get(id(value))
+            if code is None:
+                code = cache[id(value)] = palette.code(value)
+            codes.append(code)
+        return codes
+
+    def get(self, index):
+        """Return row index as BrickRecord (also for removed rows)"""
+        return BrickRecord(self.brick_system,
+                           self.types.values[self.type_codes[index]],
+                           self.lengths[index],
+                           self.widths[index],
+                           self.heights[index],
+                           self.xs[index],
+                           self.ys[index],
+                           self.zs[index],
+                           self.colors.values[self.color_codes[index]],
+                           self.orientations.values[self.orientation_codes[index]],
+                           index)
+
+    def rows(self, start = 0, stop = None, convert_color = None, convert_orientation = None):
+        """Yield bricks as tuples in add_brick argument order (faster than get for bulk access), removed rows are skipped
+
+        Args:
+            start (int, optional): first row. Defaults to 0.
+            stop (int, optional): end row (exclusive), all if None. Defaults to None.
+            convert_color (callable, optional): applied once per palette color. Defaults to None.
+            convert_orientation (callable, optional): applied once per palette orientation. Defaults to None.
+        """
+        stop = len(self.xs) if stop is None else min(stop, len(self.xs))
+        types = self.types.values
+        colors = [convert_color(value) for value in self.colors.values] if convert_color else self.colors.values
+        orientations = ([convert_orientation(value) for value in self.orientations.values]
+                        if convert_orientation else self.orientations.values)
+        removed = self.removed
+        for index in range(start, stop):
+            if removed and index in removed:
+                continue
+            yield (types[self.type_codes[index]], self.lengths[index], self.widths[index], self.heights[index],
+                   self.xs[index], self.ys[index], self.zs[index],
+                   colors[self.color_codes[index]], orientations[self.orientation_codes[index]])
+
+    def __iter__(self):
+        for index in range(len(self.xs)):
+            if index not in self.removed:
+                yield self.get(index)
+
+    def get_nbytes(self):
+        """Memory of the columns in bytes (palettes excluded, they do not grow with the brick count)"""
+        columns = [self.type_codes, self.lengths, self.widths, self.heights, self.xs, self.ys, self.zs,
+                   self.color_codes, self.orientation_codes]
+        return sum(column.itemsize * len(column) for column in columns)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Offscreen Rendering
+Renders scenes to PNG files without a canvas: numpy z-buffer rasterizer with flat
+shading and a small PNG writer (zlib only). No vpython import, so process pool
+workers start quickly.
+
+A render job is a plain dict (picklable):
+
+    {"path": "scene_000.png", "specs": {...}, "bricks": [rows], "baseplates": [...],
+     "camera": {"pos": (x, y, z), "axis": (x, y, z)}, "width": 1024, "height": 768}
+
+Rows and baseplates use the project file layout (see brickstack_files).
+"""
+
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from math import tan, pi
+
+import numpy as np
+
+from brickstack_mesh import get_scene_bounds, scene_mesh
+
+BACKGROUND = (0, 1, 1)  # color.cyan, as in BrickScene.set_scene
+FOV = pi / 3            # vpython's default field of view
+LIGHT = np.array([0.3, -0.5, 0.8]) / np.linalg.norm([0.3, -0.5, 0.8])
+NEAR = 1.0
+STAMP_SIZES = (4, 16, 64)  # triangles up to this many pixels wide are rasterized in vectorized batches
+STAMP_PIXELS = 1 << 21     # candidate pixels per vectorized batch
+
+
+def write_png(path, image):
+    """Write an (height, width, 3) uint8 array as 8-bit RGB PNG"""
+    height, width, _ = image.shape
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    # every scanline starts with filter type 0
+    raw = np.concatenate([np.zeros((height, 1), dtype = np.uint8), image.reshape(height, width * 3)], axis = 1)
+    with open(path, "wb") as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n")
+        png_file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        png_file.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        png_file.write(chunk(b"IEND", b""))
+
+
+class Camera:
+    """Pinhole camera with vpython conventions: pos, axis (view direction), up = z"""
+    def __init__(self, pos, axis, width, height, fov = FOV):
+        self.pos = np.asarray(pos, dtype = float)
+        self.forward = np.asarray(axis, dtype = float) / np.linalg.norm(axis)
+        right = np.cross(self.forward, (0, 0, 1))
+        if np.linalg.norm(right) < 1e-9:  # looking straight up/down
+            right = np.array([1.0, 0, 0])
+        self.right = right / np.linalg.norm(right)
+        self.up = np.cross(self.right, self.forward)
+        self.width = width
+        self.height = height
+        self.focal = (min(width, height) / 2) / tan(fov / 2)
+
+    def to_camera(self, points):
+        """World points (n, 3) -> camera coordinates (right, up, depth)"""
+        offset = points - self.pos
+        return np.stack([offset @ self.right, offset @ self.up, offset @ self.forward], axis = -1)
+
+    def fit(self, corners, margin = 1.1):
+        """Move the camera along its axis so that all corners are in view, aimed at their center
+
+        Keeps the view direction (the existing camera logic decides where we look from).
+        """
+        corners = np.asarray(corners, dtype = float)
+        center = (corners.min(axis = 0) + corners.max(axis = 0)) / 2
+        self.pos = center
+        local = self.to_camera(corners)
+        half_width = (self.width / 2) / self.focal
+        half_height = (self.height / 2) / self.focal
+        distance = max(np.max(np.abs(local[:, 0]) * margin / half_width - local[:, 2]),
+                       np.max(np.abs(local[:, 1]) * margin / half_height - local[:, 2]),
+                       NEAR * 2)
+        self.pos = center - self.forward * distance
+
+
+def shade(mesh):
+    """Flat-shaded face colors as uint8 (ambient + diffuse, two-sided)"""
+    intensity = 0.45 + 0.55 * np.abs(mesh.get_normals() @ LIGHT)
+    return np.clip(mesh.face_colors * intensity[:, None] * 255, 0, 255).astype(np.uint8)
+
+
+def project(camera, mesh):
+    """Screen coordinates (m, 3, 2) and inverse depth (m, 3) of every face; faces behind the near plane are dropped
+
+    Returns:
+        tuple: (screen, inverse_depth, face_index)
+    """
+    local = camera.to_camera(mesh.vertices)[mesh.faces]
+    visible = np.all(local[:, :, 2] > NEAR, axis = 1)
+    local = local[visible]
+    inverse_depth = 1 / local[:, :, 2]
+    screen = np.empty(local.shape[:2] + (2,))
+    screen[:, :, 0] = camera.width / 2 + local[:, :, 0] * inverse_depth * camera.focal
+    screen[:, :, 1] = camera.height / 2 - local[:, :, 1] * inverse_depth * camera.focal
+    return screen, inverse_depth, np.flatnonzero(visible)
+
+
+def rasterize_batch(screen, inverse_depth, size, width, height):
+    """Covered pixels of triangles whose bounding box fits into size x size pixels
+
+    Returns:
+        tuple: (triangle index, flat pixel index, inverse depth) per covered pixel
+    """
+    min_x = np.floor(screen[:, :, 0].min(axis = 1)).astype(np.int64)
+    min_y = np.floor(screen[:, :, 1].min(axis = 1)).astype(np.int64)
+    offsets = np.arange(size)
+    pixel_x = min_x[:, None, None] + offsets[None, None, :]       # (t, 1, size)
+    pixel_y = min_y[:, None, None] + offsets[None, :, None]       # (t, size, 1)
+    center_x = pixel_x + 0.5
+    center_y = pixel_y + 0.5
+
+    (x0, y0), (x1, y1), (x2, y2) = [(screen[:, corner, 0][:, None, None], screen[:, corner, 1][:, None, None]) for corner in range(3)]
+    area = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+    safe_area = np.where(area == 0, 1, area)
+    weight0 = ((x1 - center_x) * (y2 - center_y) - (x2 - center_x) * (y1 - center_y)) / safe_area
+    weight1 = ((x2 - center_x) * (y0 - center_y) - (x0 - center_x) * (y2 - center_y)) / safe_area
+    weight2 = 1 - weight0 - weight1
+    inside = ((weight0 >= 0) & (weight1 >= 0) & (weight2 >= 0) & (area != 0) &
+              (pixel_x >= 0) & (pixel_x < width) & (pixel_y >= 0) & (pixel_y < height))
+
+    depth = (weight0 * inverse_depth[:, 0, None, None] + weight1 * inverse_depth[:, 1, None, None] +
+             weight2 * inverse_depth[:, 2, None, None])
+    triangle, row, column = np.nonzero(inside)
+    pixels = pixel_y[triangle, row, 0] * width + pixel_x[triangle, 0, column]
+    return triangle, pixels, depth[triangle, row, column]
+
+
+def iter_fragments(screen, inverse_depth, width, height):
+    """Yield (triangle index, flat pixel index, inverse depth) arrays for all triangles, in batches"""
+    extent = np.maximum(np.ceil(screen[:, :, 0].max(axis = 1)) - np.floor(screen[:, :, 0].min(axis = 1)),
+                        np.ceil(screen[:, :, 1].max(axis = 1)) - np.floor(screen[:, :, 1].min(axis = 1))) + 1
+    # triangles completely outside the image never produce pixels
+    on_screen = ((screen[:, :, 0].max(axis = 1) >= 0) & (screen[:, :, 0].min(axis = 1) < width) &
+                 (screen[:, :, 1].max(axis = 1) >= 0) & (screen[:, :, 1].min(axis = 1) < height))
+    lower = 0
+    for size in STAMP_SIZES + (None,):
+        selected = np.flatnonzero(on_screen & (extent > lower) & ((extent <= size) if size else True))
+        if size is None:
+            # large triangles one by one, clipped to the image
+            for index in selected:
+                triangle, pixels, depth = rasterize_large(screen[index:index + 1], inverse_depth[index:index + 1], width, height)
+                yield np.full(len(pixels), index), pixels, depth
+            break
+        step = max(1, STAMP_PIXELS // (size * size))
+        for start in range(0, len(selected), step):
+            indices = selected[start:start + step]
+            triangle, pixels, depth = rasterize_batch(screen[indices], inverse_depth[indices], size, width, height)
+            yield indices[triangle], pixels, depth
+        lower = size
+
+
+def rasterize_large(screen, inverse_depth, width, height):
+    """One big triangle: only rasterize the part of its bounding box inside the image"""
+    min_x = max(int(np.floor(screen[0, :, 0].min())), 0)
+    min_y = max(int(np.floor(screen[0, :, 1].min())), 0)
+    max_x = min(int(np.ceil(screen[0, :, 0].max())), width - 1)
+    max_y = min(int(np.ceil(screen[0, :, 1].max())), height - 1)
+    if max_x < min_x or max_y < min_y:
+        empty = np.zeros(0, dtype = np.int64)
+        return empty, empty, np.zeros(0)
+    shifted = screen.copy()
+    shifted[:, :, 0] -= min_x
+    shifted[:, :, 1] -= min_y
+    box_size = max(max_x - min_x, max_y - min_y) + 1
+    triangle, pixels, depth = rasterize_batch(shifted, inverse_depth, box_size, box_size, box_size)
+    local_y, local_x = np.divmod(pixels, box_size)
+    keep = (local_x + min_x < width) & (local_y + min_y < height)
+    return triangle[keep], ((local_y + min_y) * width + local_x + min_x)[keep], depth[keep]
+
+
+class IncrementalRenderer:
+    """Z-buffer and image that keep their contents between meshes
+
+    Bricks are only ever added, so drawing a new mesh on top of the previous result
+    gives the same image as rendering everything again: every mesh is rasterized once.
+    """
+    def __init__(self, camera, background = BACKGROUND):
+        self.camera = camera
+        size = camera.width * camera.height
+        self.zbuffer = np.zeros(size)  # inverse depth: larger is nearer, 0 = background
+        self.image = np.empty((size, 3), dtype = np.uint8)
+        self.image[:] = np.clip(np.asarray(background) * 255, 0, 255).astype(np.uint8)
+
+    def add_mesh(self, mesh):
+        """Draw a mesh over the current image
+
+        Returns:
+            numpy.ndarray: flat bool mask of the pixels that now show the new mesh
+        """
+        covered = np.zeros(len(self.zbuffer), dtype = bool)
+        if not len(mesh):
+            return covered
+        width, height = self.camera.width, self.camera.height
+        colors = shade(mesh)
+        screen, inverse_depth, face_index = project(self.camera, mesh)
+        previous = self.zbuffer.copy()
+        for triangle, pixels, depth in iter_fragments(screen, inverse_depth, width, height):
+            np.maximum.at(self.zbuffer, pixels, depth)
+        covered = self.zbuffer > previous
+        for triangle, pixels, depth in iter_fragments(screen, inverse_depth, width, height):
+            front = covered[pixels] & (depth >= self.zbuffer[pixels])
+            self.image[pixels[front]] = colors[face_index[triangle[front]]]
+        return covered
+
+    def get_image(self, highlight = None, fade = 0.6):
+        """Copy of the current image as (height, width, 3) uint8
+
+        Args:
+            highlight (numpy.ndarray, optional): mask from add_mesh; all other drawn pixels are faded towards white. Defaults to None.
+            fade (float, optional): 0 = no fading, 1 = white. Defaults to 0.6.
+        """
+        image = self.image.copy()
+        if highlight is not None:
+            faded = (self.zbuffer > 0) & ~highlight
+            image[faded] = (image[faded] * (1 - fade) + 255 * fade).astype(np.uint8)
+        return image.reshape(self.camera.height, self.camera.width, 3)
+
+
+def render_mesh(mesh, camera, background = BACKGROUND):
+    """Rasterize a mesh with a z-buffer
+
+    Returns:
+        numpy.ndarray: (height, width, 3) uint8 image
+    """
+    renderer = IncrementalRenderer(camera, background)
+    renderer.add_mesh(mesh)
+    return renderer.get_image()
+
+
+def get_job_camera(job, bounds):
+    """Camera of a job, fitted to the scene bounds unless job["fit"] is False"""
+    camera_settings = job["camera"]
+    camera = Camera(camera_settings["pos"], camera_settings["axis"], job.get("width", 1024), job.get("height", 768))
+    if job.get("fit", True):
+        camera.fit(bounds if bounds is not None else [[-1, -1, -1], [1, 1, 1]])
+    return camera
+
+
+def render_job(job):
+    """Render one job dict (see module doc) to its PNG file
+
+    Returns:
+        str: the written path
+    """
+    studs = job.get("studs", True)
+    baseplates = job.get("baseplates", ())
+    camera = get_job_camera(job, get_scene_bounds(job["bricks"], baseplates, job["specs"], studs))
+    mesh = scene_mesh(job["bricks"], baseplates, job["specs"], studs)
+    write_png(job["path"], render_mesh(mesh, camera, job.get("background", BACKGROUND)))
+    return job["path"]
+
+
+def render_steps(job):
+    """Render construction steps incrementally, one PNG per step
+
+    The job holds "steps" (one list of brick rows per step, only the bricks added in
+    that step) and "paths" (one file per step) instead of "bricks" and "path". The
+    camera is fitted to the finished model, so all images share one view; each step
+    only rasterizes its own bricks on top of the previous image.
+    With job["highlight"] (default True) the bricks of earlier steps are faded.
+
+    Returns:
+        list: the written paths
+    """
+    studs = job.get("studs", True)
+    specs = job["specs"]
+    baseplates = job.get("baseplates", ())
+    steps = job["steps"]
+    bounds = get_scene_bounds((row for rows in steps for row in rows), baseplates, specs, studs)
+    renderer = IncrementalRenderer(get_job_camera(job, bounds), job.get("background", BACKGROUND))
+    renderer.add_mesh(scene_mesh((), baseplates, specs, studs))
+    for rows, path in zip(steps, job["paths"]):
+        new_pixels = renderer.add_mesh(scene_mesh(rows, (), specs, studs))
+        write_png(path, renderer.get_image(new_pixels if job.get("highlight", True) else None))
+    return list(job["paths"][:len(steps)])
+
+
+def run_in_pool(function, jobs, processes = None):
+    """Run function over jobs, in a process pool unless processes == 1
+
+    Returns:
+        list: results in job order
+    """
+    jobs = list(jobs)
+    if processes == 1 or len(jobs) <= 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers = processes) as pool:
+        return list(pool.map(function, jobs))
+
+
+def render_jobs(jobs, processes = None):
+    """Render many jobs, in parallel with a process pool (processes = None: one per CPU)"""
+    return run_in_pool(render_job, jobs, processes)
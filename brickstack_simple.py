@@ -6,10 +6,11 @@ Brick Stack - Simple Working Version
 Fixed rotation and height model for LEGO/Duplo visualization
 """
 
-from vpython import *
 import random
 from math import ceil, pi
 
+from brickstack_vector import color, get_vpython, to_vpython, vector
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
@@ -24,6 +25,10 @@ class DebugConfig:
 # =============================================================================
 
 class DirectionalVector(vector):
+    # orientations are never changed, so they can be dict keys
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
     @property
     def rotation(self):
         return {
@@ -45,6 +50,8 @@ WEST = DirectionalVector(-1,0,0)
 class OccupancyGrid:
     def __init__(self):
         self.points = {}
+        self.bounds = None        # running min/max x, y, z; None while empty
+        self.bounds_dirty = False # set when a removal touched the bounds
         
     def add_brick_footprint(self, x, y, z, length, width, height):
         if DebugConfig.GLOBAL_DEBUG and DebugConfig.GRID_DEBUG:
@@ -57,6 +64,56 @@ class OccupancyGrid:
                     self.points[point] = []
                 self.points[point].append((z, z + height))
 
+        if length > 0 and width > 0:
+            self._extend_bounds(x, y, z, length, width, height)
+
+    def remove_brick_footprint(self, x, y, z, length, width, height):
+        """Remove a footprint stored with add_brick_footprint (same arguments)."""
+        for dx in range(length):
+            for dy in range(width):
+                point = (x + dx, y + dy)
+                if point not in self.points or (z, z + height) not in self.points[point]:
+                    raise KeyError(f"No brick stored at {point} with z=({z}, {z + height})")
+
+        for dx in range(length):
+            for dy in range(width):
+                point = (x + dx, y + dy)
+                self.points[point].remove((z, z + height))
+                if not self.points[point]:
+                    del self.points[point]
+
+        # Only a footprint on the edge of the bounds can shrink them
+        b = self.bounds
+        if b is not None and length > 0 and width > 0:
+            if (x == b["min_x"] or x + length - 1 == b["max_x"] or
+                    y == b["min_y"] or y + width - 1 == b["max_y"] or
+                    z == b["min_z"] or z + height == b["max_z"]):
+                self.bounds_dirty = True
+
+    def _extend_bounds(self, x, y, z, length, width, height):
+        b = self.bounds
+        if b is None:
+            self.bounds = {"min_x": x, "max_x": x + length - 1,
+                           "min_y": y, "max_y": y + width - 1,
+                           "min_z": z, "max_z": z + height}
+            return
+        b["min_x"] = min(b["min_x"], x)
+        b["max_x"] = max(b["max_x"], x + length - 1)
+        b["min_y"] = min(b["min_y"], y)
+        b["max_y"] = max(b["max_y"], y + width - 1)
+        b["min_z"] = min(b["min_z"], z)
+        b["max_z"] = max(b["max_z"], z + height)
+
+    def get_bounds(self):
+        """Return min/max x, y, z of the construction as dict (None if empty)."""
+        if self.bounds_dirty:
+            self.bounds = None
+            self.bounds_dirty = False
+            for (x, y), intervals in self.points.items():
+                for z_start, z_end in intervals:
+                    self._extend_bounds(x, y, z_start, 1, 1, z_end - z_start)
+        return self.bounds
+
     def get_next_z(self, x, y, length, width):
         max_height = 0
         for dx in range(length):
@@ -75,10 +132,9 @@ class OccupancyGrid:
             return
             
         # Find bounds
-        min_x = min(point[0] for point in self.points.keys())
-        max_x = max(point[0] for point in self.points.keys())
-        min_y = min(point[1] for point in self.points.keys())  
-        max_y = max(point[1] for point in self.points.keys())
+        bounds = self.get_bounds()
+        min_x, max_x = bounds["min_x"], bounds["max_x"]
+        min_y, max_y = bounds["min_y"], bounds["max_y"]
         
         print(f"Grid bounds: X({min_x}-{max_x}), Y({min_y}-{max_y})")
         
@@ -99,15 +155,26 @@ class OccupancyGrid:
                     print(" .", end="")
             print()
         print("=" * 50)
+
+def create_occupancy_grid(grid_backend="dict"):
+    """Create occupancy grid: "dict" (OccupancyGrid) or "heightmap" (numpy-backed)."""
+    if grid_backend == "dict":
+        return OccupancyGrid()
+    elif grid_backend == "heightmap":
+        from brickstack_heightmap import HeightmapOccupancyGrid
+        return HeightmapOccupancyGrid()
+    raise ValueError(f"Unknown grid backend: {grid_backend}")
+
 # =============================================================================
 # BRICK PROJECT & SCENE
 # =============================================================================
 
 class BrickProject:
-    def __init__(self, brick_system, auto_z=True):
+    def __init__(self, brick_system, auto_z=True, grid_backend="dict"):
         self.brick_scenes = []
         self.brick_system = brick_system
         self.auto_z = auto_z
+        self.grid_backend = grid_backend
 
     def add_scene(self):
         scene = BrickScene(self)
@@ -120,23 +187,25 @@ class BrickScene:
         self.brick_system = project.brick_system
         self.auto_z = project.auto_z
         self.bricks = []
-        self.grid = OccupancyGrid()
+        self.grid = create_occupancy_grid(project.grid_backend)
         self.scene = self._setup_scene()
 
     def _setup_scene(self):
-        scene = canvas(
+        # vpython is imported with the first scene, not with this module
+        vpython = get_vpython()
+        scene = vpython.canvas(
             width=1024, height=768,
-            center=vector(0,0,0),
-            background=color.cyan,
-            up=vector(0,0,1)
+            center=vpython.vector(0,0,0),
+            background=vpython.color.cyan,
+            up=vpython.vector(0,0,1)
         )
         
         if self.brick_system == "duplo":
-            scene.camera.pos = vector(260,-60,160)
-            scene.camera.axis = vector(0,60,-60)
+            scene.camera.pos = vpython.vector(260,-60,160)
+            scene.camera.axis = vpython.vector(0,60,-60)
         else:
-            scene.camera.pos = vector(130,-30,80)
-            scene.camera.axis = vector(0,30,-30)
+            scene.camera.pos = vpython.vector(130,-30,80)
+            scene.camera.axis = vpython.vector(0,30,-30)
         
         return scene
 
@@ -183,17 +252,100 @@ class BrickScene:
         self._update_camera()
         
         return brick
+
+    BRICK_FIELDS = ("brick_type", "length", "width", "height", "x_pos",
+                    "y_pos", "z_pos", "brick_color", "orientation")
+
+    def add_bricks(self, bricks=None, **columns):
+        """Add many bricks at once - same result as add_brick in a loop.
+
+        Auto-z and grid insertion run in one pass in placement order, then all
+        bricks are generated and the camera is updated once at the end.
+
+        Args:
+            bricks: iterable of dicts (add_brick keywords) or tuples (add_brick order)
+            **columns: alternatively add_brick keywords holding lists; single
+                values are used for every brick
+
+        Raises:
+            ValueError: bricks and columns given together, or columns of different lengths
+            TypeError: unknown column names
+        """
+        if bricks is not None and columns:
+            raise ValueError("add_bricks takes either bricks or columns, not both")
+        defaults = ("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+        if columns:
+            bricks = self._zip_brick_columns(columns, defaults)
+        elif bricks is None:
+            return []
+
+        # 1. Auto-z and grid in placement order
+        placed = []
+        for args in bricks:
+            if isinstance(args, dict):
+                args = tuple(args.get(name, default) for name, default in zip(self.BRICK_FIELDS, defaults))
+            else:
+                args = tuple(args) + defaults[len(args):]
+            brick_type, length, width, height, x_pos, y_pos, z_pos, brick_color, orientation = args
+
+            if orientation in [NORTH, SOUTH]:
+                grid_length, grid_width = length, width
+            else:  # EAST or WEST
+                grid_length, grid_width = width, length
+
+            if self.auto_z:
+                z_pos = self.grid.get_next_z(x_pos, y_pos, grid_length, grid_width)
+                if self.brick_system == "duplo":
+                    z_pos = ceil(z_pos * 2) / 2
+                else:
+                    z_pos = ceil(z_pos * 3) / 3
+
+            self.grid.add_brick_footprint(x_pos, y_pos, z_pos, grid_length, grid_width, height)
+            placed.append((length, width, height, x_pos, y_pos, z_pos, brick_color, orientation))
+
+        if DebugConfig.GLOBAL_DEBUG and DebugConfig.BRICK_DEBUG:
+            print(f"Adding {len(placed)} bricks in one batch")
+
+        # 2. Generate geometry
+        new_bricks = [RectangularBrick(self.brick_system, *args) for args in placed]
+        self.bricks.extend(new_bricks)
+
+        # 3. One camera update for the whole batch
+        if new_bricks:
+            self._update_camera()
+
+        return new_bricks
+
+    def _zip_brick_columns(self, columns, defaults):
+        """Turn add_bricks columns into argument tuples, broadcasting single values"""
+        unknown = set(columns) - set(self.BRICK_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown brick arguments: {', '.join(sorted(unknown))}")
+        values = []
+        count = None
+        for name, default in zip(self.BRICK_FIELDS, defaults):
+            value = columns.get(name, default)
+            if hasattr(value, "tolist"):  # numpy arrays
+                value = value.tolist()
+            # colors and orientations are vectors, so a single one is never mistaken for a column
+            if isinstance(value, (list, tuple)):
+                if count is not None and len(value) != count:
+                    raise ValueError(f"Column {name} has {len(value)} entries, expected {count}")
+                count = len(value)
+            values.append(value)
+        if count is None:
+            count = 1
+        return list(zip(*[value if isinstance(value, (list, tuple)) else [value] * count for value in values]))
     
     def _update_camera(self):
         """Automatically adjust camera to center on construction."""
-        if not self.grid.points:
+        bounds = self.grid.get_bounds()
+        if bounds is None:
             return
             
-        # Find construction bounds
-        min_x = min(point[0] for point in self.grid.points.keys())
-        max_x = max(point[0] for point in self.grid.points.keys())
-        min_y = min(point[1] for point in self.grid.points.keys())
-        max_y = max(point[1] for point in self.grid.points.keys())
+        # Construction bounds are maintained by the grid
+        min_x, max_x = bounds["min_x"], bounds["max_x"]
+        min_y, max_y = bounds["min_y"], bounds["max_y"]
         
         # Calculate center in world coordinates
         center_x = (min_x + max_x) / 2
@@ -210,11 +362,11 @@ class BrickScene:
         
         # Update camera position to center on construction
         if self.brick_system == "duplo":
-            self.scene.camera.pos = vector(world_center_x + 100, world_center_y - 60, 160)
-            self.scene.camera.axis = vector(-100, 60, -60)
+            self.scene.camera.pos = to_vpython(vector(world_center_x + 100, world_center_y - 60, 160))
+            self.scene.camera.axis = to_vpython(vector(-100, 60, -60))
         else:
-            self.scene.camera.pos = vector(world_center_x + 50, world_center_y - 30, 80)
-            self.scene.camera.axis = vector(-50, 30, -30)
+            self.scene.camera.pos = to_vpython(vector(world_center_x + 50, world_center_y - 30, 80))
+            self.scene.camera.axis = to_vpython(vector(-50, 30, -30))
             
         if DebugConfig.GLOBAL_DEBUG:
             print(f"Camera updated: center=({world_center_x:.1f},{world_center_y:.1f})")
@@ -241,21 +393,22 @@ class BasicBrick:
         self.specs = self.BRICK_SPECS[brick_system]
 
     def generate_stud(self, pos, hollow=False):
+        vpython = get_vpython()
         if not hollow:
-            return cylinder(
+            return vpython.cylinder(
                 pos=pos,
                 radius=self.specs["stud_diameter"] / 2,
-                axis=vec(0, 0, self.specs["stud_height"]),
-                color=self.brick_color
+                axis=vpython.vec(0, 0, self.specs["stud_height"]),
+                color=to_vpython(self.brick_color)
             )
         else:
-            circle_shape = shapes.circle(
+            circle_shape = vpython.shapes.circle(
                 radius=self.specs["stud_diameter"]/2, 
                 thickness=self.specs["stud_wall_thickness"]
             )
-            path = [vec(pos.x, pos.y, pos.z), 
-                   vec(pos.x, pos.y, pos.z + self.specs["stud_height"])]
-            return extrusion(shape=circle_shape, path=path, color=self.brick_color)
+            path = [vpython.vec(pos.x, pos.y, pos.z), 
+                   vpython.vec(pos.x, pos.y, pos.z + self.specs["stud_height"])]
+            return vpython.extrusion(shape=circle_shape, path=path, color=to_vpython(self.brick_color))
 
 class Baseplate(BasicBrick):
     def __init__(self, brick_system, baseplate_color, custom_length=None, custom_width=None):
@@ -273,12 +426,13 @@ class Baseplate(BasicBrick):
         self._generate()
 
     def _generate(self):
+        vpython = get_vpython()
         components = []
         
         # Base
-        base_shape = shapes.rectangle(pos=[0, 0], width=self.width, height=self.length)
-        base_path = [vec(0, 0, -self.height), vec(0, 0, 0)]
-        base = extrusion(shape=base_shape, path=base_path, color=self.brick_color)
+        base_shape = vpython.shapes.rectangle(pos=[0, 0], width=self.width, height=self.length)
+        base_path = [vpython.vec(0, 0, -self.height), vpython.vec(0, 0, 0)]
+        base = vpython.extrusion(shape=base_shape, path=base_path, color=to_vpython(self.brick_color))
         components.append(base)
         
         # Studs
@@ -287,7 +441,7 @@ class Baseplate(BasicBrick):
                 if not (self.brick_system == "duplo" and 
                        (x == 0 or x == self.stud_columns-1) and 
                        (y == 0 or y == self.stud_rows-1)):
-                    stud_pos = vec(
+                    stud_pos = vpython.vec(
                         -self.width/2 + self.specs["stud_xy_offset"] + x * self.specs["stud_spacing"],
                         -self.length/2 + self.specs["stud_xy_offset"] + y * self.specs["stud_spacing"],
                         0
@@ -295,7 +449,7 @@ class Baseplate(BasicBrick):
                     stud = self.generate_stud(stud_pos, hollow=False)
                     components.append(stud)
         
-        return compound(components)
+        return vpython.compound(components)
 class RectangularBrick(BasicBrick):
     def __init__(self, brick_system, length, width, height, x, y, z, brick_color, orientation):
         super().__init__(brick_system)
@@ -318,24 +472,25 @@ class RectangularBrick(BasicBrick):
         self._generate()
 
     def _generate(self):
+        vpython = get_vpython()
         components = []
         
         # 1. Create brick body at origin
-        brick_body = box(
-            pos=vec(0, 0, 0),
-            axis=vector(0, 1, 0),  # NORTH orientation
+        brick_body = vpython.box(
+            pos=vpython.vec(0, 0, 0),
+            axis=vpython.vector(0, 1, 0),  # NORTH orientation
             length=self.length,
             width=self.width,
             height=self.height,
-            color=self.brick_color,
-            up=vector(0, 0, 1)
+            color=to_vpython(self.brick_color),
+            up=vpython.vector(0, 0, 1)
         )
         components.append(brick_body)
         
         # 2. Add studs relative to center
         for x_stud in range(self.stud_columns):
             for y_stud in range(self.stud_rows):
-                stud_center = vec(
+                stud_center = vpython.vec(
                     -self.width/2 + self.specs["stud_xy_offset"] + x_stud * self.specs["stud_spacing"],
                     -self.length/2 + self.specs["stud_xy_offset"] + y_stud * self.specs["stud_spacing"],
                     self.height/2
@@ -344,12 +499,12 @@ class RectangularBrick(BasicBrick):
                 components.append(stud)
         
         # 3. Create compound
-        brick_compound = compound(components)
+        brick_compound = vpython.compound(components)
         
         # 4. Rotate if needed
         rotation_angle = self.orientation.rotation
         if rotation_angle != 0:
-            brick_compound.rotate(angle=rotation_angle, axis=vector(0, 0, 1))
+            brick_compound.rotate(angle=rotation_angle, axis=vpython.vector(0, 0, 1))
         
         # 5. Move to final position
         if self.orientation == NORTH:
@@ -364,7 +519,7 @@ class RectangularBrick(BasicBrick):
             # Default to NORTH
             final_pos = vector(self.x + self.width/2, self.y + self.length/2, self.z + self.height/2)
         
-        brick_compound.pos = final_pos
+        brick_compound.pos = to_vpython(final_pos)
         
         return brick_compound
 
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Tracing
+Per-stage timers and counters for the placement and render pipeline (no vpython)
+
+brickstack wraps its stages in TRACER.span(stage) or decorates them with traced(stage):
+
+    add_brick / add_bricks   whole call
+    auto_z                   z lookup in the occupancy grid
+    grid.insert              occupancy grid and connectivity index
+    culling                  hiding covered studs
+    generate                 3d-objects of new bricks (rendered scenes)
+    compound                 brick compound from the mesh cache or built from scratch
+    studs                    stud generation of a compound
+    rotate                   rotating a brick compound into its orientation
+    camera                   camera update
+
+Nothing is measured while no sink is attached; a span then costs one method call.
+Attach sinks for a block of code:
+
+    aggregate = AggregateSink()
+    with tracing(aggregate, JsonLinesSink("trace.jsonl")):
+        scene.add_bricks(bricks)
+    print(aggregate.format_table())
+
+The GLOBAL_DEBUG/..._DEBUG flags still print details for interactive debugging.
+"""
+
+import cProfile
+import json
+import pstats
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter, time
+
+
+class TraceSink:
+    """Base class for sinks; every hook is optional"""
+    def enter(self, stage, depth):
+        """A span starts; depth is the number of enclosing spans"""
+
+    def record(self, stage, seconds, self_seconds, depth):
+        """A span ended after seconds, self_seconds without its nested spans"""
+
+    def count(self, name, value):
+        """A counter was increased by value"""
+
+    def close(self):
+        """The sink was detached (see tracing)"""
+
+
+class AggregateSink(TraceSink):
+    """Calls, total/self/min/max seconds per stage plus counter totals, in memory"""
+    def __init__(self):
+        self.stages = {}  # stage -> [calls, total, self, min, max]
+        self.counters = Counter()
+
+    def record(self, stage, seconds, self_seconds, depth):
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [1, seconds, self_seconds, seconds, seconds]
+            return
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += self_seconds
+        if seconds < entry[3]:
+            entry[3] = seconds
+        if seconds > entry[4]:
+            entry[4] = seconds
+
+    def count(self, name, value):
+        self.counters[name] += value
+
+    def report(self):
+        """Return {"stages": {stage: {...}}, "counters": {...}}, stages by total time"""
+        stages = {}
+        for stage, (calls, total, self_total, minimum, maximum) in sorted(self.stages.items(), key = lambda item: -item[1][1]):
+            stages[stage] = {
+                "calls" : calls,
+                "total_s" : total,
+                "self_s" : self_total,
+                "mean_s" : total / calls,
+                "min_s" : minimum,
+                "max_s" : maximum
+            }
+        return {"stages" : stages, "counters" : dict(self.counters)}
+
+    def format_table(self):
+        """Stages and counters as text table"""
+        report = self.report()
+        lines = [f"{'stage':<16}{'calls':>9}{'total [ms]':>12}{'self [ms]':>12}{'mean [us]':>12}{'max [us]':>12}"]
+        for stage, entry in report["stages"].items():
+            lines.append(f"{stage:<16}{entry['calls']:>9}{entry['total_s'] * 1e3:>12.2f}{entry['self_s'] * 1e3:>12.2f}"
+                         f"{entry['mean_s'] * 1e6:>12.1f}{entry['max_s'] * 1e6:>12.1f}")
+        for name, value in sorted(report["counters"].items()):
+            lines.append(f"{name:<16}{value:>9}")
+        return "\n".join(lines)
+
+    def clear(self):
+        self.stages = {}
+        self.counters = Counter()
+
+
+class JsonLinesSink(TraceSink):
+    """One JSON object per span and counter event, e.g. for log shipping
+
+    Spans: {"stage", "seconds", "self_seconds", "depth", "time"}, counters:
+    {"counter", "value", "time"}; time is the unix time of the event.
+    """
+    def __init__(self, path_or_file):
+        """JsonLinesSink init
+
+        Args:
+            path_or_file (str or file): path (opened for appending, closed by close()) or open text file
+        """
+        if isinstance(path_or_file, str):
+            self.file = open(path_or_file, "a")
+            self.owns_file = True
+        else:
+            self.file = path_or_file
+            self.owns_file = False
+
+    def record(self, stage, seconds, self_seconds, depth):
+        self.file.write(json.dumps({"stage" : stage, "seconds" : seconds, "self_seconds" : self_seconds,
+                                    "depth" : depth, "time" : time()}) + "\n")
+
+    def count(self, name, value):
+        self.file.write(json.dumps({"counter" : name, "value" : value, "time" : time()}) + "\n")
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class ProfileSink(TraceSink):
+    """cProfile restricted to the traced calls
+
+    The profiler runs while an outermost span is open (e.g. during add_brick), so
+    the statistics show the functions below the instrumented stages only.
+    """
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def enter(self, stage, depth):
+        if depth == 0:
+            self.profiler.enable()
+
+    def record(self, stage, seconds, self_seconds, depth):
+        if depth == 0:
+            self.profiler.disable()
+
+    def get_stats(self, sort = "cumulative"):
+        """Return pstats.Stats of everything profiled so far"""
+        return pstats.Stats(self.profiler).sort_stats(sort)
+
+
+class Span:
+    __slots__ = ("tracer", "stage", "start", "child_seconds")
+
+    def __init__(self, tracer, stage):
+        self.tracer = tracer
+        self.stage = stage
+        self.child_seconds = 0.0
+
+    def __enter__(self):
+        tracer = self.tracer
+        depth = len(tracer.stack)
+        for sink in tracer.sinks:
+            sink.enter(self.stage, depth)
+        tracer.stack.append(self)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = perf_counter() - self.start
+        stack = self.tracer.stack
+        stack.pop()
+        if stack:
+            stack[-1].child_seconds += seconds
+        for sink in self.tracer.sinks:
+            sink.record(self.stage, seconds, seconds - self.child_seconds, len(stack))
+        return False
+
+
+class NullSpan:
+    """Span handed out while tracing is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Dispatches spans and counters to the attached sinks
+
+    enabled is True while at least one sink is attached.
+    """
+    def __init__(self):
+        self.sinks = []
+        self.stack = []  # open spans
+        self.enabled = False
+
+    def span(self, stage):
+        """Context manager timing one stage (NULL_SPAN if tracing is off)"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    def count(self, name, value = 1):
+        if self.enabled:
+            for sink in self.sinks:
+                sink.count(name, value)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        self.enabled = True
+        return sink
+
+    def remove_sink(self, sink):
+        """Detach and close a sink"""
+        self.sinks.remove(sink)
+        self.enabled = bool(self.sinks)
+        sink.close()
+
+
+TRACER = Tracer()
+
+
+def traced(stage, tracer = TRACER):
+    """Decorator running every call of a function in a span of stage"""
+    def decorate(function):
+        @wraps(function)
+        def traced_function(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with Span(tracer, stage):
+                return function(*args, **kwargs)
+        return traced_function
+    return decorate
+
+
+@contextmanager
+def tracing(*sinks, tracer = TRACER):
+    """Attach sinks for the duration of a with block
+
+    Yields:
+        tuple: the sinks
+    """
+    for sink in sinks:
+        tracer.add_sink(sink)
+    try:
+        yield sinks
+    finally:
+        for sink in sinks:
+            tracer.remove_sink(sink)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Brick Stack - Vectors and Colors
+vpython-compatible vector and color for the scene logic (no vpython)
+
+Importing vpython creates a canvas and starts its server, which takes longer than
+everything else brickstack does at import. Positions, orientations and colors are
+plain vectors from this module; vpython is imported on the first render
+(get_vpython) and to_vpython converts the values handed to 3d-objects.
+"""
+
+
+class vector:
+    """x, y, z triple with the arithmetic of vpython's vector
+
+    Compares equal to anything with the same x, y and z (also vpython vectors).
+    """
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x = 0.0, y = 0.0, z = 0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __repr__(self):
+        return f"<{self.x:.6g}, {self.y:.6g}, {self.z:.6g}>"
+
+    def __eq__(self, other):
+        try:
+            return (self.x, self.y, self.z) == (other.x, other.y, other.z)
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __add__(self, other):
+        return vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, factor):
+        return vector(self.x * factor, self.y * factor, self.z * factor)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, divisor):
+        return vector(self.x / divisor, self.y / divisor, self.z / divisor)
+
+    def __neg__(self):
+        return vector(-self.x, -self.y, -self.z)
+
+    @property
+    def mag(self):
+        return (self.x ** 2 + self.y ** 2 + self.z ** 2) ** 0.5
+
+vec = vector
+
+
+class color:
+    """The predefined colors of vpython's color"""
+    black = vector(0, 0, 0)
+    white = vector(1, 1, 1)
+
+    red = vector(1, 0, 0)
+    green = vector(0, 1, 0)
+    blue = vector(0, 0, 1)
+
+    yellow = vector(1, 1, 0)
+    cyan = vector(0, 1, 1)
+    magenta = vector(1, 0, 1)
+
+    orange = vector(1, 0.6, 0)
+    purple = vector(0.4, 0.2, 0.6)
+
+    @staticmethod
+    def gray(luminance):
+        return vector(luminance, luminance, luminance)
+
+
+_vpython = None
+
+def get_vpython():
+    """The module 3d-objects are built with: vpython (imported on first use) or the one given to use_vpython"""
+    global _vpython
+    if _vpython is None:
+        import vpython
+        _vpython = vpython
+    return _vpython
+
+def use_vpython(module):
+    """Build 3d-objects with module instead of vpython (e.g. a stand-in in tests); None goes back to vpython"""
+    global _vpython
+    _vpython = module
+
+def to_vpython(value):
+    """vector (or anything with x, y and z) -> vpython vector, imports vpython on first use"""
+    return get_vpython().vector(value.x, value.y, value.z)
@@ -81,6 +81,9 @@ def build_house_walls(scene, row, offset_x, offset_y, brick_color,
     """
     Baut die 4 Wände des Hauses für eine Reihe.
     
+    Alle Steine einer Reihe werden gesammelt und mit einem einzigen
+    scene.add_bricks-Aufruf platziert (ein Grid-Durchlauf, ein Kamera-Update).
+    
     Args:
         scene: BrickScene Objekt
         row: Aktuelle Reihe (0-basiert)
@@ -89,6 +92,7 @@ def build_house_walls(scene, row, offset_x, offset_y, brick_color,
         house_width, house_depth: Haus-Dimensionen
         brick_length, brick_width: Stein-Dimensionen
     """
+    bricks = []
     
     # NORDWAND (oben, Y=house_depth-brick_width)
     print(f"    Building North wall...")
@@ -96,11 +100,11 @@ def build_house_walls(scene, row, offset_x, offset_y, brick_color,
     for x in range(0, house_width - brick_length + 1, brick_length):
         x_pos = x + offset_x
         if x_pos + brick_length <= house_width:  # Prüfe Grenzen
-            scene.add_brick(
+            bricks.append(dict(
                 length=brick_length, width=brick_width, height=1,
                 x_pos=x_pos, y_pos=y_north, 
                 brick_color=brick_color, orientation=NORTH
-            )
+            ))
     
     # SÜDWAND (unten, Y=0)  
     print(f"    Building South wall...")
@@ -108,11 +112,11 @@ def build_house_walls(scene, row, offset_x, offset_y, brick_color,
     for x in range(0, house_width - brick_length + 1, brick_length):
         x_pos = x + offset_x
         if x_pos + brick_length <= house_width:  # Prüfe Grenzen
-            scene.add_brick(
+            bricks.append(dict(
                 length=brick_length, width=brick_width, height=1,
                 x_pos=x_pos, y_pos=y_south,
                 brick_color=brick_color, orientation=NORTH
-            )
+            ))
     
     # OSTWAND (rechts, X=house_width-brick_width)
     print(f"    Building East wall...")
@@ -120,11 +124,11 @@ def build_house_walls(scene, row, offset_x, offset_y, brick_color,
     for y in range(brick_width, house_depth - brick_width - brick_length + 1, brick_length):
         y_pos = y + offset_y
         if y_pos + brick_length <= house_depth - brick_width:  # Prüfe Grenzen, vermeide Überlappung
-            scene.add_brick(
+            bricks.append(dict(
                 length=brick_length, width=brick_width, height=1,
                 x_pos=x_east, y_pos=y_pos,
                 brick_color=brick_color, orientation=EAST
-            )
+            ))
     
     # WESTWAND (links, X=0)
     print(f"    Building West wall...")
@@ -132,27 +136,31 @@ def build_house_walls(scene, row, offset_x, offset_y, brick_color,
     for y in range(brick_width, house_depth - brick_width - brick_length + 1, brick_length):
         y_pos = y + offset_y  
         if y_pos + brick_length <= house_depth - brick_width:  # Prüfe Grenzen, vermeide Überlappung
-            scene.add_brick(
+            bricks.append(dict(
                 length=brick_length, width=brick_width, height=1,
                 x_pos=x_west, y_pos=y_pos,
                 brick_color=brick_color, orientation=WEST
-            )
+            ))
+    
+    # Alle Steine der Reihe auf einmal platzieren
+    scene.add_bricks(bricks)
 
 def add_coordinate_markers(scene):
     """Fügt Koordinatenreferenz-Linien hinzu."""
     print("Adding coordinate reference markers...")
+    import vpython
     
     # X-Achse (rot)
-    x_line = curve(pos=[vec(-20, 0, 1), vec(200, 0, 1)], color=color.red)
+    x_line = vpython.curve(pos=[vpython.vec(-20, 0, 1), vpython.vec(200, 0, 1)], color=vpython.color.red)
     
     # Y-Achse (grün)  
-    y_line = curve(pos=[vec(0, -20, 1), vec(0, 200, 1)], color=color.green)
+    y_line = vpython.curve(pos=[vpython.vec(0, -20, 1), vpython.vec(0, 200, 1)], color=vpython.color.green)
     
     # Labels
-    x_label = label(pos=vec(180, -10, 5), text='X-axis', color=color.red, 
-                   height=16, border=4, background=color.white)
-    y_label = label(pos=vec(-10, 180, 5), text='Y-axis', color=color.green,
-                   height=16, border=4, background=color.white)
+    x_label = vpython.label(pos=vpython.vec(180, -10, 5), text='X-axis', color=vpython.color.red, 
+                   height=16, border=4, background=vpython.color.white)
+    y_label = vpython.label(pos=vpython.vec(-10, 180, 5), text='Y-axis', color=vpython.color.green,
+                   height=16, border=4, background=vpython.color.white)
 
 if __name__ == "__main__":
     try:
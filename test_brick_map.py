@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for memory-mapped brick maps (BrickScene.save_map / BrickProject.open_map)
+
+A random headless scene is written to a map; every query on the map must give
+the same answer as the scene's own occupancy grid.
+"""
+
+import os
+import random
+import tempfile
+
+from brickstack import *
+from brickstack_mmap import BrickMap
+
+
+def temp_path(name):
+    return os.path.join(tempfile.mkdtemp(), name)
+
+def random_scene(count=1500, seed=3):
+    rng = random.Random(seed)
+    scene = BrickProject("lego", render=False, brick_objects=False).add_scene()
+    scene.add_bricks([("rect", rng.choice([1, 2, 4, 8]), rng.choice([1, 2]), rng.choice([1 / 3, 1, 2]),
+                       rng.randint(-150, 150), rng.randint(-150, 150), 0,
+                       rng.choice([color.red, color.blue, color.yellow]), rng.choice([NORTH, EAST, SOUTH, WEST]))
+                      for _ in range(count)])
+    return scene
+
+def brute_force_region(scene, min_x, min_y, max_x, max_y):
+    rows = []
+    for row in scene.store.rows(convert_color=color_to_tuple, convert_orientation=orientation_to_code):
+        x_extension, y_extension = get_grid_footprint(row[1], row[2], ORIENTATIONS[row[8]])
+        if row[4] <= max_x and row[4] + x_extension > min_x and row[5] <= max_y and row[5] + y_extension > min_y:
+            rows.append(row)
+    return sorted(rows)
+
+def test_map_matches_grid():
+    """Bounds, auto-z lookups and rows of the map equal the source scene."""
+    scene = random_scene()
+    path = temp_path("city.brickmap")
+    assert scene.save_map(path, tile_size=16) == 1500
+
+    brick_map = BrickMap(path)
+    assert len(brick_map) == 1500
+    assert brick_map.get_bounds() == scene.grid.get_bounds()
+    source_rows = list(scene.store.rows(convert_color=color_to_tuple, convert_orientation=orientation_to_code))
+    assert sorted(brick_map.rows()) == sorted(source_rows)
+
+    rng = random.Random(9)
+    for _ in range(500):
+        x, y = rng.randint(-170, 170), rng.randint(-170, 170)
+        width, length = rng.randint(1, 12), rng.randint(1, 12)
+        assert brick_map.get_next_z(x, y, width, length) == scene.grid.get_next_z(x, y, width, length)
+
+def test_region_query():
+    """Region queries return exactly the overlapping bricks."""
+    scene = random_scene(800, seed=5)
+    path = temp_path("region.brickmap")
+    scene.save_map(path, tile_size=8)
+    brick_map = BrickMap(path)
+    for region in [(0, 0, 20, 20), (-150, -150, -140, 150), (37, -3, 37, -3), (500, 500, 600, 600)]:
+        indices = brick_map.get_region_indices(*region)
+        assert sorted(brick_map.rows(indices)) == brute_force_region(scene, *region)
+
+def test_mapped_scene():
+    """Opened maps feed auto-z and bounds; new bricks go on top, regions become brick objects."""
+    scene = BrickProject("duplo", render=False).add_scene()
+    scene.add_bricks(length=2, width=2, x_pos=[0, 0, 0, 10])
+    path = temp_path("tower.brickmap")
+    scene.save_map(path)
+
+    project = BrickProject.open_map(path, render=False)
+    mapped = project.brick_scenes[0]
+    assert project.brick_system == "duplo"
+    assert mapped.grid.get_bounds() == scene.grid.get_bounds()
+    brick = mapped.add_brick("rect", 2, 2, 1, 1, 1, 0, color.red, NORTH)
+    assert brick.z / brick.specs["z_factor"] == 3
+    assert mapped.grid.get_next_z(1, 1, 1, 1) == 4
+
+    new_bricks = mapped.render_region(0, 0, 3, 3)
+    assert sorted(b.grid_z for b in new_bricks) == [0, 1, 2]
+    assert mapped.render_region(0, 0, 20, 20)[0].grid_x == 10
+    assert mapped.get_draw_object_count() == 5
+
+def test_save_mapped_project():
+    """Project files of mapped scenes contain mapped and new bricks."""
+    scene = BrickProject("lego", render=False).add_scene()
+    scene.add_bricks(length=2, width=2, x_pos=[0, 4])
+    path = temp_path("base.brickmap")
+    scene.save_map(path)
+    project = BrickProject.open_map(path, render=False)
+    project.brick_scenes[0].add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+
+    project_path = temp_path("mapped.bricks")
+    project.save(project_path)
+    loaded = BrickProject.load(project_path, render=False)
+    assert [r.z for r in loaded.brick_scenes[0].store] == [0, 0, 1]
+
+def test_empty_map():
+    """Empty scenes give empty maps."""
+    path = temp_path("empty.brickmap")
+    BrickProject("lego", render=False).add_scene().save_map(path)
+    brick_map = BrickMap(path)
+    assert len(brick_map) == 0 and brick_map.get_bounds() is None
+    assert brick_map.get_next_z(0, 0, 4, 4) == 0
+
+def run_all_tests():
+    """Run the complete brick map test suite."""
+    print("Brick Stack - Brick Map Tests")
+    print("=" * 40)
+
+    tests = [
+        test_map_matches_grid,
+        test_region_query,
+        test_mapped_scene,
+        test_save_mapped_project,
+        test_empty_map,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All brick map tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for mesh export (BrickScene.export_mesh, brickstack_export)
+
+Runs headless; the written STL, OBJ and glTF files are parsed back and compared with
+the scene.
+"""
+
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from brickstack import *
+from brickstack_buffers import STUD_SEGMENTS, generate_buffers, part_buffers
+from brickstack_export import export_mesh, INSTANCING
+from brickstack_mesh import Mesh, baseplate_mesh, brick_mesh, get_brick_shape, get_scene_bounds, scene_mesh
+from brickstack_records import get_grid_footprint
+
+
+def temp_path(name):
+    return os.path.join(tempfile.mkdtemp(), name)
+
+def build_scene(**options):
+    scene = BrickProject("lego", render=False, **options).add_scene()
+    scene.add_baseplate(color.green * 0.5, 16, 12, 2, 2)
+    scene.add_bricks([("rect", [4, 2, 1][index % 3], 2, [1, 1 / 3][index % 2], index % 5, index % 4, 0,
+                       [color.red, color.blue][index // 12 % 2], [NORTH, EAST, SOUTH, WEST][index % 4])
+                      for index in range(40)])
+    return scene
+
+def get_rows(scene):
+    return [row for rows in scene.get_file_row_batches() for row in rows]
+
+def get_specs(scene):
+    return BasicBrick.BRICK_SPECS[scene.brick_system]
+
+def read_glb(path):
+    with open(path, "rb") as glb_file:
+        data = glb_file.read()
+    magic, version, length = struct.unpack("<4sII", data[:12])
+    assert magic == b"glTF" and version == 2 and length == len(data)
+    json_length, json_type = struct.unpack("<I4s", data[12:20])
+    assert json_type == b"JSON" and json_length % 4 == 0
+    document = json.loads(data[20:20 + json_length])
+    bin_length, bin_type = struct.unpack("<I4s", data[20 + json_length:28 + json_length])
+    assert bin_type == b"BIN\x00" and bin_length == document["buffers"][0]["byteLength"]
+    return document, data[28 + json_length:28 + json_length + bin_length]
+
+def read_accessor(document, binary, index):
+    accessor = document["accessors"][index]
+    view = document["bufferViews"][accessor["bufferView"]]
+    assert view["byteOffset"] % 4 == 0 and view["byteOffset"] + view["byteLength"] <= len(binary)
+    dtype = {5126: "<f4", 5123: "<u2", 5125: "<u4"}[accessor["componentType"]]
+    width = {"SCALAR": 1, "VEC3": 3}[accessor["type"]]
+    values = np.frombuffer(binary, dtype=dtype, count=accessor["count"] * width, offset=view["byteOffset"])
+    return values.reshape(-1, width) if width > 1 else values
+
+def test_batch_placement():
+    """A batch mesh places every brick like its cached shape moved to the brick, in row order."""
+    scene = build_scene()
+    rows, specs = get_rows(scene), get_specs(scene)
+    mesh = scene_mesh(rows, (), specs)
+    start = 0
+    for brick_type, length, width, height, x, y, z, brick_color, orientation in rows:
+        x_extension, y_extension = get_grid_footprint(length, width, orientation)
+        vertices, faces = get_brick_shape(x_extension, y_extension, height, specs["xy_factor"], specs["z_factor"],
+                                          specs["stud_diameter"] / 2, specs["stud_height"], True, 8)
+        expected = vertices[faces] + (x * specs["xy_factor"], y * specs["xy_factor"], z * specs["z_factor"])
+        placed = mesh.get_triangles()[start:start + len(faces)]
+        assert np.allclose(sorted(map(tuple, np.round(placed.reshape(-1, 3), 6))), sorted(map(tuple, np.round(expected.reshape(-1, 3), 6))))
+        assert np.allclose(mesh.face_colors[start:start + len(faces)], brick_color)
+        start += len(faces)
+    assert start == len(mesh)
+
+def test_stl():
+    """Binary STL holds every triangle of the scene mesh, in BRICK_SPECS millimeters."""
+    scene = build_scene()
+    path = temp_path("scene.stl")
+    count = scene.export_mesh(path)
+    mesh = scene_mesh(get_rows(scene), scene.get_baseplate_rows(), get_specs(scene))
+    assert count == len(mesh)
+    assert os.path.getsize(path) == 84 + 50 * count
+    with open(path, "rb") as stl_file:
+        stl_file.seek(80)
+        assert struct.unpack("<I", stl_file.read(4))[0] == count
+        triangles = np.frombuffer(stl_file.read(), dtype=[("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attributes", "<u2")])
+    vertices = triangles["vertices"].reshape(-1, 3)
+    bounds = get_scene_bounds(get_rows(scene), scene.get_baseplate_rows(), get_specs(scene))
+    assert np.allclose([vertices.min(axis=0), vertices.max(axis=0)], bounds, atol=1e-4)
+
+def test_obj():
+    """OBJ faces reference earlier vertices; every color gets a material."""
+    scene = build_scene()
+    path = temp_path("scene.obj")
+    count = scene.export_mesh(path)
+    vertex_count, faces, used = 0, [], set()
+    with open(path) as obj_file:
+        for line in obj_file:
+            kind, *values = line.split()
+            if kind == "v":
+                vertex_count += 1
+            elif kind == "f":
+                indices = [int(value) for value in values]
+                assert all(1 <= index <= vertex_count for index in indices)
+                faces.append(indices)
+            elif kind == "usemtl":
+                used.add(values[0])
+    assert len(faces) == count
+    with open(os.path.splitext(path)[0] + ".mtl") as material_file:
+        defined = {line.split()[1] for line in material_file if line.startswith("newmtl")}
+    assert used == defined == {"color_008000", "color_ff0000", "color_0000ff"}
+
+def test_glb_instancing():
+    """glTF stores each brick shape once and places bricks and studs as instances."""
+    scene = build_scene()
+    path = temp_path("scene.glb")
+    rows = get_rows(scene)
+    specs = get_specs(scene)
+    instances = scene.export_mesh(path)
+    document, binary = read_glb(path)
+    assert document["extensionsRequired"] == [INSTANCING]
+    assert len(document["materials"]) == 3
+
+    bricks, studs = [], []
+    for node in document["nodes"][1:]:
+        mesh = document["meshes"][node["mesh"]]
+        if INSTANCING not in node.get("extensions", {}):
+            assert mesh["name"] == "baseplate"
+            continue
+        translations = read_accessor(document, binary, node["extensions"][INSTANCING]["attributes"]["TRANSLATION"])
+        primitive = mesh["primitives"][0]
+        positions = read_accessor(document, binary, primitive["attributes"]["POSITION"])
+        assert np.allclose(positions.min(axis=0), document["accessors"][primitive["attributes"]["POSITION"]]["min"])
+        assert read_accessor(document, binary, primitive["indices"]).max() < len(positions)
+        color = tuple(document["materials"][primitive["material"]]["pbrMetallicRoughness"]["baseColorFactor"][:3])
+        (studs if mesh["name"] == "stud" else bricks).extend((tuple(np.round(t, 3)), color) for t in translations)
+
+    expected_bricks = sorted((tuple(np.round(np.array([x * specs["xy_factor"], y * specs["xy_factor"], z * specs["z_factor"]], dtype="<f4"), 3)), tuple(c))
+                             for _, _, _, _, x, y, z, c, _ in rows)
+    assert sorted(bricks) == expected_bricks
+    # bricks plus the 16 x 12 baseplate studs
+    stud_count = sum(row[1] * row[2] for row in rows) + 16 * 12
+    assert len(studs) == stud_count and instances == len(rows) + stud_count
+
+    # shapes are shared between colors: fewer position accessors than brick meshes
+    brick_meshes = [mesh for mesh in document["meshes"] if mesh["name"].startswith("brick")]
+    shared = {mesh["primitives"][0]["attributes"]["POSITION"] for mesh in brick_meshes}
+    assert len(shared) < len(brick_meshes)
+
+def test_streamed_batches():
+    """Small batches give the same files as one batch (glTF reads the rows twice)."""
+    scene = build_scene(brick_objects=False)
+    rows = get_rows(scene)
+    specs = get_specs(scene)
+    calls = []
+    def small_batches():
+        calls.append(True)
+        return (rows[start:start + 7] for start in range(0, len(rows), 7))
+    for extension in ["stl", "glb"]:
+        batched, whole = temp_path("batched." + extension), temp_path("whole." + extension)
+        export_mesh(batched, small_batches, scene.get_baseplate_rows(), specs)
+        export_mesh(whole, lambda: [rows], scene.get_baseplate_rows(), specs)
+        with open(batched, "rb") as batched_file, open(whole, "rb") as whole_file:
+            assert batched_file.read() == whole_file.read()
+    assert len(calls) == 3
+
+def test_unknown_format():
+    """Unknown extensions raise ValueError; file_format overrides the extension."""
+    scene = build_scene()
+    try:
+        scene.export_mesh(temp_path("scene.fbx"))
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+    assert scene.export_mesh(temp_path("scene.mesh"), file_format="stl") > 0
+    assert scene.export_mesh(temp_path("scene.mesh"), file_format="STL") > 0
+    for file_format in ["ply", "Ply"]:
+        try:
+            scene.export_mesh(temp_path("scene.mesh"), file_format=file_format)
+            assert False, "ValueError expected"
+        except ValueError as error:
+            assert "unsupported export format" in str(error) and "stl, obj, glb" in str(error)
+
+def test_baseplate_studs():
+    """Baseplates are exported with studs (duplo without corner studs) unless studs=False."""
+    for brick_system, stud_count in [("lego", 16 * 12), ("duplo", 16 * 12 - 4)]:
+        scene = BrickProject(brick_system, render=False).add_scene()
+        scene.add_baseplate(color.green, 16, 12)
+        specs = get_specs(scene)
+        baseplate = scene.get_baseplate_rows()[0]
+        flat, studded = baseplate_mesh(baseplate, specs), baseplate_mesh(baseplate, specs, studs=True)
+        assert len(flat) == 12 and len(studded) == 12 + stud_count * 3 * 8
+        top = studded.vertices[:, 2].max()
+        assert np.isclose(top, specs["stud_height"])
+        path = temp_path("baseplate.stl")
+        assert scene.export_mesh(path) == len(studded) and scene.export_mesh(path, studs=False) == len(flat)
+        bounds = get_scene_bounds((), [baseplate], specs)
+        assert np.allclose(bounds, [studded.vertices.min(axis=0), studded.vertices.max(axis=0)])
+
+def test_vertex_buffers():
+    """Buffers hold the brick meshes with shared vertices; a process pool gives the same arrays."""
+    scene = build_scene()
+    specs = get_specs(scene)
+    bricks = scene.bricks[1:]
+    parts = [brick.get_mesh_part() for brick in bricks]
+    serial = list(generate_buffers(parts, specs, processes=1))
+    pooled = list(generate_buffers(parts, specs, processes=2, batch_size=7))
+    assert len(serial) == len(pooled) == len(bricks)
+    for part, (positions, normals, indices), other in zip(parts, serial, pooled):
+        assert all(np.array_equal(array, other_array) for array, other_array in zip((positions, normals, indices), other))
+        # batches move all their parts in one step, like part_buffers does per part
+        reference = part_buffers(part, specs)
+        assert np.allclose(positions, reference[0], atol=1e-4) and all(np.array_equal(array, other_array) for array, other_array in zip((normals, indices), reference[1:]))
+        assert positions.dtype == normals.dtype == np.float32 and indices.dtype == np.uint32
+        assert indices.max() == len(positions) - 1 and np.allclose(np.linalg.norm(normals, axis=1), 1)
+        # counter-clockwise triangles face the way of their vertex normals
+        face_normals = Mesh(positions, indices).get_normals()
+        assert (np.einsum("ij,ij->i", face_normals, normals[indices].mean(axis=1)) > 0).all()
+        # box: 4 vertices per side, solid stud: 2 rings for the wall, 1 ring plus center on top
+        studs = (len(indices) - 12) // (3 * STUD_SEGMENTS)
+        assert len(positions) == 24 + studs * (3 * STUD_SEGMENTS + 1)
+
+    rows = get_rows(scene)
+    assert [len(indices) for positions, normals, indices in serial] == [len(brick_mesh(row, specs, stud_segments=STUD_SEGMENTS)) for row in rows]
+    positions = np.concatenate([positions for positions, normals, indices in serial])
+    bounds = get_scene_bounds(rows, (), specs)
+    assert np.allclose([positions.min(axis=0), positions.max(axis=0)], bounds, atol=1e-3)
+
+def test_vertex_buffers_culled_studs():
+    """Covered studs and duplo baseplate corners are left out of the buffers."""
+    scene = BrickProject("duplo", render=False, cull_hidden_studs=True, geometry="buffers").add_scene()
+    baseplate = scene.add_baseplate(color.green, 6, 6)
+    lower = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    scene.add_brick("rect", 2, 1, 1, 0, 0, 0, color.blue, EAST)
+    specs = get_specs(scene)
+    buffers = list(generate_buffers([part.get_mesh_part() for part in scene.bricks], specs, processes=1))
+    # baseplate studs are solid, duplo brick studs hollow (outer and inner wall, ring on top)
+    stud_triangles, hollow_triangles = 3 * STUD_SEGMENTS, 6 * STUD_SEGMENTS
+    assert len(buffers[0][2]) == 12 + (36 - 4 - 4) * stud_triangles
+    assert len(lower.hidden_studs) == 2 and len(buffers[1][2]) == 12 + 2 * hollow_triangles
+    assert len(buffers[2][2]) == 12 + 2 * hollow_triangles
+    positions, normals, indices = buffers[2]
+    assert len(positions) == 24 + 2 * 6 * STUD_SEGMENTS
+    assert (np.einsum("ij,ij->i", Mesh(positions, indices).get_normals(), normals[indices].mean(axis=1)) > 0).all()
+    # lower tiers: solid studs, no studs
+    for brick in scene.bricks:
+        brick.set_lod("solid")
+    assert len(next(generate_buffers([scene.bricks[2].get_mesh_part()], specs, processes=1))[2]) == 12 + 2 * stud_triangles
+    for brick in scene.bricks:
+        brick.set_lod("flat")
+    assert [len(part[2]) for part in generate_buffers([part.get_mesh_part() for part in scene.bricks], specs, processes=1)] == [12] * 3
+    try:
+        BrickProject("duplo", render=False, geometry="triangles")
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+
+def run_all_tests():
+    """Run the complete mesh export test suite."""
+    print("Brick Stack - Mesh Export Tests")
+    print("=" * 40)
+
+    tests = [
+        test_batch_placement,
+        test_stl,
+        test_obj,
+        test_glb_instancing,
+        test_streamed_batches,
+        test_unknown_format,
+        test_baseplate_studs,
+        test_vertex_buffers,
+        test_vertex_buffers_culled_studs,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All mesh export tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,755 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for headless projects (BrickProject(..., render=False))
+
+No canvas and no 3d-objects may be created - these tests run without a browser.
+"""
+
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from brickstack import *
+from brickstack_layout import layout_bricks, rotate_studs, stud_grid
+from brickstack_options import ProjectOptions
+from brickstack_progressive import FrameScheduler
+from brickstack_lod import LOD_TIERS, choose_lod, get_box_distance, get_stud_pixels
+from brickstack_trace import TRACER, AggregateSink, JsonLinesSink, ProfileSink, tracing
+
+
+def test_headless_scene_has_no_canvas():
+    """Headless scenes skip set_scene and brick generation."""
+    project = BrickProject("duplo", render=False)
+    scene = project.add_scene()
+    assert scene.scene is None
+
+    baseplate = scene.add_baseplate(color.green * 0.4, 12, 12)
+    brick = scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert baseplate.compound is None
+    assert brick.compound is None
+    assert scene.bricks == [baseplate, brick]
+
+def test_import_loads_no_backend():
+    """Importing brickstack and building a headless scene loads neither vpython nor numpy."""
+    code = ("import sys\n"
+            "from brickstack import *\n"
+            "BrickProject('lego', render=False).add_scene().add_brick('rect', 4, 2, 1, 0, 0, 0, color.red, EAST)\n"
+            "print([name for name in ('vpython', 'numpy') if name in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.stdout.strip() == "[]"
+
+def test_headless_auto_z():
+    """Placement logic works as in rendered scenes."""
+    project = BrickProject("duplo", auto_z=True, render=False)
+    scene = project.add_scene()
+
+    bricks = [scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.blue, NORTH) for _ in range(5)]
+    assert [brick.z / brick.specs["z_factor"] for brick in bricks] == [0, 1, 2, 3, 4]
+    assert scene.grid.get_xyz_range()["max_z"] == 5
+
+def test_headless_manual_z():
+    """auto_z=False keeps the given z values."""
+    project = BrickProject("lego", auto_z=False, render=False)
+    scene = project.add_scene()
+    brick = scene.add_brick("rect", 4, 2, 1, 3, 3, 7, color.red, EAST)
+    assert brick.z == 7 * brick.specs["z_factor"]
+    assert scene.grid.get_next_z(3, 3, 1, 1) == 8
+
+def test_headless_heightmap_backend():
+    """Headless scenes with the numpy grid backend."""
+    project = BrickProject("lego", grid_backend="heightmap", render=False)
+    scene = project.add_scene()
+    for i in range(3):
+        scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert scene.grid.get_bounds()["max_z"] == 3
+
+def test_many_bricks():
+    """Large headless builds only cost placement logic."""
+    project = BrickProject("lego", render=False)
+    scene = project.add_scene()
+    for i in range(5000):
+        scene.add_brick("rect", 2, 2, 1, (i % 50) * 2, (i // 50 % 50) * 2, 0, color.red, NORTH)
+    assert len(scene.bricks) == 5000
+    assert scene.grid.get_xyz_range()["max_z"] == 2
+
+def brick_summary(bricks):
+    return [(b.x, b.y, b.z, b.length, b.width, b.height, b.orientation) for b in bricks]
+
+def test_add_bricks_matches_add_brick():
+    """Batch placement gives the same bricks and grid as single calls."""
+    placements = [
+        ("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH),
+        ("rect", 4, 2, 1, 1, 0, 0, color.red, EAST),
+        ("rect", 2, 2, 1, 1, 1, 0, color.red, SOUTH),
+        ("rect", 2, 1, 2, 0, 1, 0, color.red, WEST),
+        ("rect", 8, 1, 1, -2, 1, 0, color.red, NORTH),
+    ]
+    single = BrickProject("duplo", render=False).add_scene()
+    for placement in placements:
+        single.add_brick(*placement)
+
+    batch = BrickProject("duplo", render=False).add_scene()
+    new_bricks = batch.add_bricks(placements)
+    assert brick_summary(new_bricks) == brick_summary(single.bricks)
+    assert batch.grid.points == single.grid.points
+
+def test_add_bricks_dicts_and_columns():
+    """Dicts use add_brick keywords, columns broadcast single values."""
+    scene = BrickProject("lego", render=False).add_scene()
+    scene.add_bricks([{"length": 2, "width": 2, "x_pos": 0}, {"length": 2, "width": 2, "x_pos": 0}])
+    assert [b.z for b in scene.bricks] == [0, 9.6]
+
+    scene = BrickProject("lego", render=False).add_scene()
+    bricks = scene.add_bricks(length=2, width=2, x_pos=[0, 0, 4], brick_color=color.blue)
+    assert [b.z / b.specs["z_factor"] for b in bricks] == [0, 1, 0]
+    assert all(b.brick_color == color.blue for b in bricks)
+
+def test_whole_float_positions():
+    """Whole floats and numpy numbers are accepted as positions, fractional ones raise ValueError."""
+    import numpy as np
+    for brick_objects in [True, False]:
+        for grid_backend in ["dict", "heightmap"]:
+            scene = BrickProject("lego", render=False, brick_objects=brick_objects, grid_backend=grid_backend).add_scene()
+            scene.add_brick("rect", 4, 2, 1, 2.0, 0, 0)
+            scene.add_bricks(x_pos=np.array([0., 4., 8.]), y_pos=np.int64(1), length=np.float64(2.0), width=2)
+            assert [row[4:7] for row in scene.store.rows()] == [(2, 0, 0), (0, 1, 0), (4, 1, 0), (8, 1, 0)]
+            assert all(type(value) is int for row in scene.store.rows() for value in row[1:3] + row[4:6])
+            assert scene.grid.get_next_z(2, 0, 1, 1) == 1
+            for bad in [0.5, "1"]:
+                try:
+                    scene.add_brick("rect", 4, 2, 1, bad, 0, 0)
+                    assert False, "ValueError expected"
+                except ValueError as error:
+                    assert "x must be a whole number" in str(error)
+            assert len(scene.store) == 4
+    grid = OccupancyGrid()
+    grid.add_brick(np.float64(1.0), 0, 0, 2.0, 2, 1)
+    assert grid.get_next_z(2, 1, 1, 1) == 1
+
+def test_add_bricks_manual_z_override():
+    """auto_z=False keeps the given z values even in auto-z projects."""
+    scene = BrickProject("lego", auto_z=True, render=False).add_scene()
+    bricks = scene.add_bricks(z_pos=[0, 5], x_pos=[0, 10], auto_z=False)
+    assert [b.z / b.specs["z_factor"] for b in bricks] == [0, 5]
+
+def test_cull_stacked_bricks():
+    """A brick on top hides exactly the studs below its footprint."""
+    scene = BrickProject("lego", render=False, cull_hidden_studs=True).add_scene()
+    lower = scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+    upper = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.blue, NORTH)
+    assert len(lower.hidden_studs) == 4
+    assert not upper.hidden_studs
+    assert scene.get_stud_counts() == {"total": 12, "hidden": 4}
+
+def test_cull_rotated_bricks():
+    """Hidden studs follow the grid footprint of rotated bricks."""
+    scene = BrickProject("lego", render=False, cull_hidden_studs=True).add_scene()
+    lower = scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, EAST)
+    scene.add_brick("rect", 1, 1, 1, 3, 1, 0, color.blue, NORTH)
+    assert len(lower.hidden_studs) == 1
+    hidden_cells = [cell for cell, stud in lower.stud_cells() if stud in lower.hidden_studs]
+    assert hidden_cells == [(3, 1)]
+
+def test_cull_baseplate_studs():
+    """Bricks on the baseplate hide baseplate studs, batch placement included."""
+    scene = BrickProject("duplo", render=False, cull_hidden_studs=True).add_scene()
+    baseplate = scene.add_baseplate(color.green * 0.4, 8, 8)
+    scene.add_bricks(length=2, width=2, x_pos=[0, 2])
+    assert len(baseplate.hidden_studs) == 8
+
+def test_cull_manual_z_covers_new_brick():
+    """A brick placed below an existing brick (manual z) starts with hidden studs."""
+    scene = BrickProject("lego", auto_z=False, render=False, cull_hidden_studs=True).add_scene()
+    upper = scene.add_brick("rect", 2, 2, 1, 0, 0, 1, color.blue, NORTH)
+    lower = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert len(lower.hidden_studs) == 4
+    assert not upper.hidden_studs
+
+def test_no_culling_by_default():
+    """Without cull_hidden_studs every stud is kept."""
+    scene = BrickProject("lego", render=False).add_scene()
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert scene.culler is None
+    assert scene.get_stud_counts() == {"total": 8, "hidden": 0}
+
+def test_chunked_scene_groups_bricks():
+    """Chunked scenes keep one draw object per chunk (16x16 studs, one layer)."""
+    scene = BrickProject("lego", render=False, chunk_size=16).add_scene()
+    scene.add_bricks(length=2, width=2, x_pos=[0, 2, 14, 16, 30, 32], y_pos=0)
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert sorted(scene.chunks.members) == [(0, 0, 0), (0, 0, 1), (1, 0, 0), (2, 0, 0)]
+    assert len(scene.chunks.members[(0, 0, 0)]) == 3
+    assert scene.get_draw_object_count() == 4
+
+def test_chunked_scene_third_heights():
+    """Layers follow the floored z, 1/3-steps stay in their layer."""
+    scene = BrickProject("lego", render=False, chunk_size=8).add_scene()
+    bricks = [scene.add_brick("rect", 2, 2, 1 / 3, 0, 0, 0, color.red, NORTH) for _ in range(4)]
+    assert [scene.chunks.part_keys[brick][2] for brick in bricks] == [0, 0, 0, 1]
+
+def test_draw_object_count_without_chunks():
+    """Standard scenes draw one object per brick."""
+    scene = BrickProject("lego", render=False).add_scene()
+    scene.add_baseplate()
+    scene.add_bricks(length=2, width=2, x_pos=[0, 2, 4])
+    assert scene.get_draw_object_count() == 4
+
+def test_store_mirrors_brick_objects():
+    """Every scene keeps the logical bricks in its BrickStore."""
+    scene = BrickProject("duplo", render=False).add_scene()
+    scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, EAST)
+    scene.add_bricks(length=2, width=2, x_pos=[0, 6])
+    records = list(scene.store)
+    assert [r.as_args()[:7] for r in records] == [("rect", 4, 2, 1, 0, 0, 0), ("rect", 2, 2, 1, 0, 0, 1), ("rect", 2, 2, 1, 6, 0, 0)]
+    assert records[0].orientation == EAST and records[1].brick_color == color.red
+
+def test_record_only_scene():
+    """brick_objects=False gives the same placement without brick objects."""
+    placements = [("rect", 4, 2, 1, x % 7, x % 5, 0, color.blue, [NORTH, EAST, SOUTH, WEST][x % 4]) for x in range(40)]
+    objects = BrickProject("lego", render=False).add_scene()
+    objects.add_bricks(placements)
+    records = BrickProject("lego", render=False, brick_objects=False).add_scene()
+    new_records = records.add_bricks(placements[:20])
+    new_records += [records.add_brick(*placement) for placement in placements[20:]]
+    assert records.bricks == []
+    assert new_records == list(objects.store)
+    assert records.grid.points == objects.grid.points
+    assert records.store.get_nbytes() < 40 * len(records.store)
+
+def test_record_only_needs_headless():
+    """Record-only projects cannot render, cull or chunk while placing."""
+    for options in [{}, {"render": False, "chunk_size": 16}, {"render": False, "cull_hidden_studs": True}]:
+        try:
+            BrickProject("lego", brick_objects=False, **options)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"ValueError expected for {options}")
+
+def test_lod_tiers():
+    """Explicit tiers apply to all parts; "full" and "solid" share the stud geometry of lego bricks."""
+    scene = BrickProject("duplo", render=False, lod="solid").add_scene()
+    baseplate = scene.add_baseplate(color.green * 0.4, 12, 12)
+    scene.add_bricks(length=2, width=2, x_pos=[0, 2, 4])
+    scene.render_enabled = False  # make sure nothing is generated
+    assert scene.set_lod("flat") == 0  # no 3d-objects yet, nothing to swap
+    assert scene.get_lod_counts() == {"full": 0, "solid": 0, "flat": 4}
+    assert baseplate.get_stud_kind() is None
+    assert [brick.get_stud_kind(lod) for brick in scene.bricks[1:2] for lod in LOD_TIERS] == ["hollow", "solid", None]
+    lego_brick = BrickProject("lego", render=False).add_scene().add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert lego_brick.get_stud_kind("full") == lego_brick.get_stud_kind("solid") == "solid"
+    try:
+        scene.set_lod("medium")
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+
+def test_lod_auto_by_distance():
+    """In auto mode near parts get full studs, far parts lose them; grid and store stay untouched."""
+    scene = BrickProject("lego", render=False, lod="auto").add_scene()
+    scene.add_bricks(length=2, width=2, y_pos=[0, 40, 4000])
+    scene.update_lod()
+    near, middle, far = scene.bricks
+    camera_pos = scene.get_camera()["pos"]
+    assert get_box_distance(camera_pos, *near.get_box()) < get_box_distance(camera_pos, *far.get_box())
+    assert (near.lod, middle.lod, far.lod) == ("full", "solid", "flat")
+    assert choose_lod(get_stud_pixels(4.8, 200, 768)) == "full"
+    assert choose_lod(get_stud_pixels(4.8, 1000, 768)) == "solid"
+    assert choose_lod(get_stud_pixels(4.8, 1e5, 768)) == "flat"
+    assert len(scene.store) == 3 and scene.grid.get_next_z(0, 0, 2, 2) == 1
+
+def test_baseplate_stud_field_shared():
+    """Baseplates of the same size share one precomputed stud field across scenes and projects."""
+    first = BrickProject("duplo", render=False).add_scene().add_baseplate(color.green, 24, 24)
+    second = BrickProject("duplo", render=False).add_scene().add_baseplate(color.blue, 24, 24, 5, 5)
+    studs, rows = BaseplateStudField.get_field(first)
+    assert BaseplateStudField.get_field(second)[0] is studs
+    # duplo baseplates have no corner studs
+    assert len(studs) == 24 * 24 - 4 and (0, 0) not in {stud[:2] for stud in studs}
+    assert sum(len(row) for row in rows.values()) == len(studs)
+    # offsets from the center are symmetric and one stud spacing apart
+    offsets_x = sorted({stud[2] for stud in studs})
+    assert abs(offsets_x[0] + offsets_x[-1]) < 1e-9
+    assert abs(offsets_x[1] - offsets_x[0] - first.specs["stud_spacing"]) < 1e-9
+    cells = {cell for cell, stud in second.stud_cells()}
+    assert (5 - 12, 5 - 12) not in cells and (5 - 12, 5 - 11) in cells and len(cells) == len(studs)
+
+def test_stud_layout_matches_orientations():
+    """Rotation matrices give the stud cells of every orientation, also for a whole batch at once."""
+    width, length = 2, 3
+    expected = {
+        "N": lambda x_stud, y_stud: (x_stud, y_stud),
+        "E": lambda x_stud, y_stud: (y_stud, width - 1 - x_stud),
+        "S": lambda x_stud, y_stud: (width - 1 - x_stud, length - 1 - y_stud),
+        "W": lambda x_stud, y_stud: (length - 1 - y_stud, x_stud),
+    }
+    studs = stud_grid(width, length)
+    for index, code in enumerate("NESW"):
+        cells = rotate_studs(studs, width, length, index).tolist()
+        assert cells == [list(expected[code](x_stud, y_stud)) for x_stud, y_stud in studs.tolist()]
+
+    scene = BrickProject("lego", render=False).add_scene()
+    bricks = [scene.add_brick("rect", 3 + index, 2, 1, 4 * index, index, 0, color.red, orientation)
+              for index, orientation in enumerate((NORTH, EAST, SOUTH, WEST))]
+    layout = layout_bricks([3, 4, 5, 6], [2] * 4, [1] * 4, [0, 4, 8, 12], [0, 1, 2, 3], [0] * 4, "NESW",
+                           bricks[0].specs)
+    for index, brick in enumerate(bricks):
+        studs = layout.get_brick_studs(index)
+        assert list(zip(map(tuple, layout.cells[studs].tolist()), map(tuple, layout.studs[studs].tolist()))) == list(brick.stud_cells())
+        (lower_x, lower_y, lower_z), (upper_x, upper_y, upper_z) = brick.get_box()
+        center = ((lower_x + upper_x) / 2, (lower_y + upper_y) / 2, (lower_z + upper_z) / 2)
+        assert all(abs(value - expected) < 1e-9 for value, expected in zip(layout.centers[index].tolist(), center))
+        assert layout.rotation[index] == brick.orientation.rotation
+    assert layout.positions[0].tolist() == [3.9, 3.9, 9.6]
+
+def test_add_bricks_async_matches_add_bricks():
+    """Progressive adding gives the same scene in several frames, one undo takes it all back."""
+    footprints = [("rect", 2 + index % 3, 2, 1, index % 7, index % 5, 0, color.red, NORTH) for index in range(300)]
+    expected = BrickProject("lego", render=False).add_scene()
+    expected.add_bricks(footprints)
+
+    scene = BrickProject("lego", render=False).add_scene()
+    scene.add_brick("rect", 2, 2, 1, 20, 20, 0, color.blue, NORTH)
+    scheduler = FrameScheduler(frame_rate=1000, batch_size=8, max_batch_size=32)
+    added = asyncio.run(scene.add_bricks_async(iter(footprints), scheduler=scheduler))
+    assert len(added) == 300 and scheduler.frames >= 300 // 32
+    assert [row[6] for row in scene.store.rows(1)] == [row[6] for row in expected.store.rows()]
+    assert scene.undo() and len(scene.store) == 1 and scene.grid.get_next_z(0, 0, 7, 5) == 0
+    assert scene.redo() and len(scene.store) == 301
+
+    # columns, record-only scenes
+    records = BrickProject("lego", render=False, brick_objects=False).add_scene()
+    added = asyncio.run(records.add_bricks_async(length=4, width=2, x_pos=[0, 0, 0], frame_rate=1000))
+    assert [record.z for record in added] == [0, 1, 2]
+
+def test_add_bricks_async_cancel():
+    """Cancelling a progressive build keeps the bricks of the finished batches."""
+    scene = BrickProject("duplo", render=False).add_scene()
+    frames = []
+
+    async def build():
+        scheduler = FrameScheduler(frame_rate=1000, batch_size=10, max_batch_size=10)
+        task = asyncio.create_task(scene.add_bricks_async(
+            [("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)] * 1000, scheduler=scheduler))
+        while len(scene.store) < 30:
+            frames.append(len(scene.store))
+            await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+            assert False, "CancelledError expected"
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(build())
+    count = len(scene.store)
+    assert 30 <= count < 1000 and len(set(frames)) > 1
+    assert scene.grid.get_next_z(0, 0, 2, 2) == count
+    assert scene.undo() and len(scene.store) == 0
+
+def test_frame_scheduler_adapts():
+    """Batch sizes follow the measured time per brick, growing at most twice per frame."""
+    scheduler = FrameScheduler(frame_rate=50, share=0.5, batch_size=100)  # 10 ms budget
+    scheduler.record(100, 0.1)  # 1 ms per brick
+    assert scheduler.batch_size == 10 and scheduler.over_budget == 1
+    scheduler.record(10, 0.000001)  # faster now: grows, but at most twice the last batch
+    assert 10 < scheduler.batch_size <= 20
+    for _ in range(20):
+        scheduler.record(scheduler.batch_size, scheduler.batch_size * 1e-6)
+    assert scheduler.batch_size > 5_000 and scheduler.frames == 22
+    try:
+        FrameScheduler(frame_rate=0)
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+
+def test_play_steps():
+    """Step playback shows every step in turn and ends with the complete model."""
+    project = BrickProject("duplo", render=False)
+    for step in range(3):
+        scene = project.add_step()
+        scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    shown = []
+    assert asyncio.run(scene.play_steps(delay=0, on_step=shown.append)) == 3
+    assert shown == [0, 1, 2]
+
+def test_mesh_cache_spec_changes():
+    """The mesh cache clears itself when the specs of a brick system are changed in place or replaced."""
+    cache = BrickMeshCache()
+    specs = BasicBrick.BRICK_SPECS["test"]
+    cache.check_specs("test")
+    cache.entries["entry"] = None
+    cache.check_specs("test")
+    cache.check_specs("lego")
+    assert "entry" in cache.entries
+    try:
+        specs["stud_height"] += 1
+        cache.check_specs("test")
+        assert not cache.entries
+        cache.entries["entry"] = None
+        BasicBrick.BRICK_SPECS["test"] = dict(specs)
+        cache.check_specs("test")
+        assert not cache.entries
+    finally:
+        specs["stud_height"] -= 1
+        BasicBrick.BRICK_SPECS["test"] = specs
+
+def test_project_options():
+    """Keywords and an options object configure a project the same way; scenes can override single options."""
+    options = ProjectOptions(render=False, strict=True, lod="flat")
+    project = BrickProject("lego", options, auto_z=False)
+    assert project.options == BrickProject("lego", auto_z=False, render=False, strict="reject", lod="flat").options
+    assert project.strict == "reject" and project.auto_z is False and options.auto_z is True
+    scene, loose = project.add_scene(), project.add_scene(strict=False, lod="full")
+    assert scene.collisions is not None and scene.lod == "flat"
+    assert loose.collisions is None and loose.lod == "full" and loose.auto_z is False
+    for changes, error in [({"strict": "warn"}, ValueError), ({"brick_objects": False}, ValueError), ({"colour": "red"}, TypeError)]:
+        try:
+            BrickProject("lego", **changes)
+            assert False, f"{error.__name__} expected"
+        except error:
+            pass
+
+def test_project_auto_z_positional():
+    """auto_z is still the second positional argument; other objects there are rejected."""
+    assert BrickProject("duplo", False, render=False).auto_z is False
+    assert BrickProject("duplo", True, render=False).auto_z is True
+    for args, changes in [((False,), {"auto_z": True}), (({"auto_z": False},), {}), (("false",), {})]:
+        try:
+            BrickProject("duplo", *args, **changes)
+            assert False, "TypeError expected"
+        except TypeError:
+            pass
+
+def test_strict_rejects_overlap():
+    """Strict scenes reject intersecting manual-z bricks, touching ones are fine."""
+    scene = BrickProject("lego", auto_z=False, render=False, strict=True).add_scene()
+    scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)      # cells x 0..1, y 0..3
+    scene.add_brick("rect", 4, 2, 1 / 3, 0, 0, 1, color.red, EAST)   # on top
+    scene.add_brick("rect", 2, 2, 1, 2, 0, 0, color.red, NORTH)      # beside
+    try:
+        scene.add_brick("rect", 4, 1, 1, 1, 3, 0.5, color.blue, EAST)  # crosses the first brick at (1, 3)
+        assert False, "BrickCollisionError expected"
+    except BrickCollisionError as error:
+        assert error.cell == (1, 3) and error.other == 0
+    assert len(scene.bricks) == 3 and len(scene.store) == 3
+    # a failing batch adds nothing
+    try:
+        scene.add_bricks([("rect", 2, 2, 1, 6, 6, 0), ("rect", 2, 2, 1 / 3, 2, 0, 0.5)])
+        assert False, "BrickCollisionError expected"
+    except BrickCollisionError as error:
+        assert error.other == 2
+    assert len(scene.store) == 3 and scene.grid.get_next_z(6, 6, 2, 2) == 0
+    scene.add_bricks([("rect", 2, 2, 1, 6, 6, 0)])
+    assert scene.validate() == []
+
+def test_strict_batch_grid_failure():
+    """A batch that fails in the grid insert leaves no collision entry behind, not even for the failing brick."""
+    scene = BrickProject("lego", auto_z=False, render=False, strict=True).add_scene()
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    add_to_grid = scene.grid.add_brick
+    def failing_add(x, y, z, *args):
+        if (x, y) == (6, 6):
+            raise MemoryError("grid full")
+        return add_to_grid(x, y, z, *args)
+    scene.grid.add_brick = failing_add
+    try:
+        scene.add_bricks([("rect", 2, 2, 1, 2, 0, 0), ("rect", 2, 2, 1, 6, 6, 0)])
+        assert False, "MemoryError expected"
+    except MemoryError:
+        pass
+    scene.grid.add_brick = add_to_grid
+    assert len(scene.store) == 1 and scene.collisions.find_collision(6, 6, 0, 2, 2, 1) is None
+    assert scene.collisions.find_collision(2, 0, 0, 2, 2, 1) is None
+    scene.add_bricks([("rect", 2, 2, 1, 2, 0, 0), ("rect", 2, 2, 1, 6, 6, 0)])
+    assert len(scene.store) == 3 and scene.validate() == []
+
+def test_strict_report_mode():
+    """strict="report" keeps intersecting bricks and lists them."""
+    scene = BrickProject("duplo", auto_z=False, render=False, brick_objects=False, strict="report").add_scene()
+    scene.add_bricks([("rect", 2, 2, 1, 0, 0, 0), ("rect", 2, 2, 1, 1, 1, 0.5), ("rect", 2, 2, 1, 1, 1, 1)])
+    assert len(scene.store) == 3
+    # reported bricks stay out of the index, validate finds all of them
+    assert scene.collision_reports == [(1, 0)]
+    assert scene.validate() == [(0, 1), (1, 2)]
+
+def test_add_bricks_rolls_back_on_error():
+    """Any error in the middle of a batch leaves store, grid, reports and history as they were."""
+    for strict in (False, "report"):
+        scene = BrickProject("lego", auto_z=False, render=False, brick_objects=False, strict=strict).add_scene()
+        scene.add_brick("rect", 2, 2, 1, 0, 0, 0)
+        history, reports = list(scene.history), list(scene.collision_reports)
+        try:
+            scene.add_bricks([("rect", 2, 2, 1, 4, 4, 0), ("rect", 2, 2, 1, 0, 0, 0.5), ("rect", 2, 2, 1, 0.5, 0, 2)])
+            assert False, "ValueError expected"
+        except ValueError:
+            pass
+        assert len(scene.store) == 1 and scene.history == history and scene.collision_reports == reports
+        assert scene.grid.get_next_z(4, 4, 2, 2) == 0 and scene.grid.get_next_z(0, 0, 2, 2) == 1
+        scene.add_bricks([("rect", 2, 2, 1, 4, 4, 0), ("rect", 2, 2, 1, 0, 0, 1)])
+        assert scene.validate() == []
+
+def test_validate_matches_brute_force():
+    """The vectorized validate finds every intersecting pair of a random manual-z scene."""
+    scene = BrickProject("lego", auto_z=False, render=False, brick_objects=False).add_scene()
+    rng = random.Random(7)
+    scene.add_bricks([("rect", rng.choice([1, 2, 4]), rng.choice([1, 2]), rng.choice([1 / 3, 1]), rng.randrange(12), rng.randrange(12),
+                       rng.randrange(12) / 3, color.red, rng.choice([NORTH, EAST, SOUTH, WEST])) for _ in range(300)])
+    rows = [row for batch in scene.get_file_row_batches() for row in batch]
+    cells = []
+    for brick_type, length, width, height, x, y, z, brick_color, orientation in rows:
+        x_extension, y_extension = (width, length) if orientation in ("N", "S") else (length, width)
+        cells.append({(x + dx, y + dy) for dx in range(x_extension) for dy in range(y_extension)})
+    expected = {(i, j) for i in range(len(rows)) for j in range(i + 1, len(rows))
+                if cells[i] & cells[j] and rows[i][6] < rows[j][6] + rows[j][3] - 1e-6 and rows[j][6] < rows[i][6] + rows[i][3] - 1e-6}
+    found = scene.validate()
+    assert expected and found == sorted(expected)
+
+    # a tall brick hides the overlap of two short ones above its bottom from a running-maximum check
+    scene = BrickProject("lego", auto_z=False, render=False).add_scene()
+    scene.add_bricks([("rect", 1, 1, 5, 0, 0, 0), ("rect", 1, 1, 1, 0, 0, 1), ("rect", 1, 1, 1, 0, 0, 1.5), ("rect", 1, 1, 1, 0, 0, 4)])
+    assert scene.validate() == [(0, 1), (0, 2), (0, 3), (1, 2)]
+    assert BrickProject("lego", render=False).add_scene().validate() == []
+
+def test_remove_brick_and_undo():
+    """remove_brick, undo and redo keep grid, bounds and store in step with the bricks."""
+    for grid_backend in ["dict", "heightmap"]:
+        scene = BrickProject("duplo", grid_backend=grid_backend, render=False).add_scene()
+        bricks = [scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.blue, NORTH) for _ in range(3)]
+        wide = scene.add_brick("rect", 4, 2, 1, 5, 0, 0, color.red, EAST)
+        assert scene.grid.get_bounds()["max_x"] == 8
+
+        record = scene.remove_brick(wide)
+        assert record.store_index == 3 and wide not in scene.bricks
+        assert scene.grid.get_bounds() == {"min_x": 0, "max_x": 1, "min_y": 0, "max_y": 1, "min_z": 0, "max_z": 3}
+        scene.remove_brick(bricks[2])
+        assert scene.grid.get_next_z(0, 0, 2, 2) == 2 and len(scene.store) == 2
+        assert [row[6] for batch in scene.get_file_row_batches() for row in batch] == [0, 1]
+        try:
+            scene.remove_brick(bricks[2])
+            assert False, "KeyError expected"
+        except KeyError:
+            pass
+
+        assert scene.undo() and scene.grid.get_next_z(0, 0, 2, 2) == 3
+        assert scene.undo() and scene.grid.get_bounds()["max_x"] == 8 and len(scene.bricks) == 4
+        assert scene.redo() and scene.grid.get_bounds()["max_x"] == 1
+        # a new action drops the redo history
+        scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.blue, NORTH)
+        assert not scene.redo()
+
+def test_undo_batch_record_only():
+    """Undo takes back a whole add_bricks batch, also without brick objects."""
+    scene = BrickProject("lego", render=False, brick_objects=False).add_scene()
+    scene.add_bricks(length=2, width=2, x_pos=[0, 2, 4])
+    scene.add_bricks(length=2, width=2, x_pos=[0, 2, 4])
+    assert scene.grid.get_bounds()["max_z"] == 2
+    assert scene.undo() and len(scene.store) == 3 and scene.grid.get_bounds()["max_z"] == 1
+    assert scene.undo() and len(scene.store) == 0 and scene.grid.get_bounds() is None
+    assert not scene.undo()
+    assert scene.redo() and scene.redo() and len(scene.store) == 6
+    scene.remove_brick(1)
+    assert [record.x for record in scene.store] == [0, 4, 0, 2, 4]
+    assert scene.grid.get_next_z(2, 0, 2, 2) == 2 and scene.grid.get_next_z(2, 0, 1, 1) == 2
+
+def test_remove_uncovers_culled_studs():
+    """Removing a brick shows the studs it was covering again."""
+    scene = BrickProject("lego", render=False, cull_hidden_studs=True).add_scene()
+    bottom = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    top = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert len(bottom.hidden_studs) == 4
+    scene.remove_brick(top)
+    assert not bottom.hidden_studs and scene.get_stud_counts() == {"total": 4, "hidden": 0}
+    scene.undo()
+    assert len(bottom.hidden_studs) == 4 and scene.get_stud_counts() == {"total": 8, "hidden": 4}
+
+def test_strict_undo():
+    """Removed bricks leave the collision index, undo puts them back."""
+    scene = BrickProject("lego", auto_z=False, render=False, strict=True).add_scene()
+    first = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    scene.remove_brick(first)
+    scene.add_brick("rect", 2, 2, 1, 1, 1, 0, color.blue, NORTH)
+    try:
+        scene.add_brick("rect", 2, 2, 1, 0, 0, 0.5, color.red, NORTH)
+        assert False, "BrickCollisionError expected"
+    except BrickCollisionError as error:
+        assert error.other == 1
+    assert scene.undo() and scene.undo()
+    assert [record.store_index for record in scene.store] == [0]
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 1, color.red, NORTH)
+    assert scene.validate() == [] and len(scene.collisions.cells[(0, 0)]) == 2
+
+def test_connectivity():
+    """Floating bricks, components and single-stud joints; bricks placed below connect too."""
+    scene = BrickProject("lego", auto_z=False, render=False).add_scene()
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)      # 0: on the ground
+    scene.add_brick("rect", 2, 2, 1 / 3, 1, 1, 1, color.red, NORTH)  # 1: on 0, one stud
+    connectivity = scene.get_connectivity()
+    scene.add_brick("rect", 4, 2, 1, 1, 1, 4 / 3, color.red, EAST)   # 2: on 1 (4 studs)
+    scene.add_brick("rect", 2, 2, 1, 10, 10, 1, color.red, NORTH)    # 3: floating
+    scene.add_brick("rect", 2, 2, 1, 20, 0, 5, color.red, NORTH)     # 4: floating
+    assert scene.get_connectivity() is connectivity
+    assert connectivity.get_floating() == [3, 4]
+    assert connectivity.get_components() == [[0, 1, 2], [3], [4]] and not connectivity.is_connected()
+    assert connectivity.get_weak_joints() == [(0, 1, 1)]
+    assert connectivity.get_contacts()[(1, 2)] == 4
+
+    scene.add_brick("rect", 2, 2, 1, 10, 11, 0, color.red, NORTH)    # 5: holds 3 from below
+    scene.add_brick("rect", 2, 2, 1, 20, 0, 4, color.red, NORTH)     # 6: under 4, still floating
+    assert connectivity.get_floating() == [4, 6]
+    assert connectivity.get_components() == [[0, 1, 2, 3, 5], [4, 6]]
+    # removals split components in place
+    scene.remove_brick(5)
+    assert scene.get_connectivity() is connectivity
+    assert connectivity.get_floating() == [3, 4, 6]
+    assert connectivity.get_components() == [[0, 1, 2], [4, 6], [3]]
+    scene.undo()
+    assert connectivity.get_floating() == [4, 6]
+    try:
+        scene.remove_brick(7)
+        assert False, "KeyError expected"
+    except KeyError:
+        pass
+
+def test_connectivity_with_removals():
+    """Removing, undoing and redoing keeps the analysis equal to a fresh one."""
+    scene = BrickProject("duplo", render=False, brick_objects=False).add_scene()
+    connectivity = scene.get_connectivity()
+    rng = random.Random(5)
+    scene.add_bricks([("rect", rng.choice([2, 4]), 2, 1, rng.randrange(12), rng.randrange(12), 0, color.red,
+                       rng.choice([NORTH, EAST])) for _ in range(300)])
+    # a bridge that holds two towers together
+    scene.add_bricks([("rect", 2, 2, 1, 30, 0, 5), ("rect", 2, 2, 1, 34, 0, 5), ("rect", 6, 2, 1, 30, 0, 6, color.red, EAST)])
+    for step in range(120):
+        action = rng.random()
+        if action < 0.6:
+            rows = [record.store_index for record in scene.store]
+            scene.remove_brick(rng.choice(rows))
+        elif action < 0.8:
+            scene.undo()
+        else:
+            scene.redo()
+        assert scene.get_connectivity() is connectivity
+        if step % 10 == 0:
+            scene.connectivity = None
+            fresh = scene.get_connectivity()
+            scene.connectivity = connectivity
+            assert connectivity.get_components() == fresh.get_components()
+            assert connectivity.get_floating() == fresh.get_floating()
+            assert connectivity.get_contacts() == fresh.get_contacts()
+
+def test_connectivity_of_loaded_project():
+    """The analysis built from a loaded project matches the incremental one."""
+    project = BrickProject("duplo", render=False)
+    scene = project.add_scene()
+    scene.get_connectivity()
+    rng = random.Random(3)
+    scene.add_bricks([("rect", rng.choice([2, 4]), 2, 1, rng.randrange(20), rng.randrange(20), 0, color.red,
+                       rng.choice([NORTH, EAST])) for _ in range(400)])
+    path = os.path.join(tempfile.mkdtemp(), "random.bricks")
+    project.save(path)
+    loaded = BrickProject.load(path, render=False).brick_scenes[0].get_connectivity()
+    incremental = scene.get_connectivity()
+    assert loaded.get_components() == incremental.get_components() and loaded.is_connected()
+    assert loaded.get_weak_joints(2) == incremental.get_weak_joints(2)
+
+def test_tracing_stages():
+    """Sinks see every stage of add_brick/add_bricks; nothing is recorded outside tracing()."""
+    scene = BrickProject("lego", auto_z=True, render=False, cull_hidden_studs=True).add_scene()
+    aggregate, lines = AggregateSink(), io.StringIO()
+    with tracing(aggregate, JsonLinesSink(lines)):
+        scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+        scene.add_bricks([("rect", 2, 2, 1, 0, 0, 0, color.blue, EAST)] * 3)
+    scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+    assert not TRACER.enabled and not TRACER.stack
+
+    stages = aggregate.report()["stages"]
+    assert stages["add_brick"]["calls"] == 1 and stages["add_bricks"]["calls"] == 1
+    assert stages["auto_z"]["calls"] == 4 and stages["grid.insert"]["calls"] == 4
+    assert stages["culling"]["calls"] == 2 and stages["camera"]["calls"] == 2
+    assert all(0 <= entry["self_s"] <= entry["total_s"] for entry in stages.values())
+    assert stages["add_brick"]["self_s"] < stages["add_brick"]["total_s"]
+    assert aggregate.counters == {"bricks": 4}
+
+    events = [json.loads(line) for line in lines.getvalue().splitlines()]
+    assert [event["stage"] for event in events if event.get("depth") == 0] == ["add_brick", "add_bricks"]
+    assert sum(event.get("value", 0) for event in events if event.get("counter") == "bricks") == 4
+
+def test_profile_sink():
+    """ProfileSink profiles the traced calls only."""
+    scene = BrickProject("duplo", render=False).add_scene()
+    profile = ProfileSink()
+    with tracing(profile):
+        scene.add_bricks(length=2, width=2, x_pos=list(range(0, 20, 2)))
+    scene.get_connectivity()
+    functions = {function for filename, line, function in profile.get_stats().stats}
+    assert "get_next_z" in functions and "get_connectivity" not in functions
+
+def run_all_tests():
+    """Run the complete headless test suite."""
+    print("Brick Stack - Headless Tests")
+    print("=" * 40)
+
+    tests = [
+        test_headless_scene_has_no_canvas,
+        test_import_loads_no_backend,
+        test_headless_auto_z,
+        test_headless_manual_z,
+        test_headless_heightmap_backend,
+        test_many_bricks,
+        test_add_bricks_matches_add_brick,
+        test_add_bricks_dicts_and_columns,
+        test_whole_float_positions,
+        test_add_bricks_manual_z_override,
+        test_cull_stacked_bricks,
+        test_cull_rotated_bricks,
+        test_cull_baseplate_studs,
+        test_cull_manual_z_covers_new_brick,
+        test_no_culling_by_default,
+        test_chunked_scene_groups_bricks,
+        test_chunked_scene_third_heights,
+        test_draw_object_count_without_chunks,
+        test_store_mirrors_brick_objects,
+        test_record_only_scene,
+        test_record_only_needs_headless,
+        test_lod_tiers,
+        test_lod_auto_by_distance,
+        test_baseplate_stud_field_shared,
+        test_stud_layout_matches_orientations,
+        test_add_bricks_async_matches_add_bricks,
+        test_add_bricks_async_cancel,
+        test_frame_scheduler_adapts,
+        test_play_steps,
+        test_mesh_cache_spec_changes,
+        test_project_options,
+        test_project_auto_z_positional,
+        test_strict_rejects_overlap,
+        test_strict_batch_grid_failure,
+        test_strict_report_mode,
+        test_add_bricks_rolls_back_on_error,
+        test_validate_matches_brute_force,
+        test_remove_brick_and_undo,
+        test_undo_batch_record_only,
+        test_remove_uncovers_culled_studs,
+        test_strict_undo,
+        test_connectivity,
+        test_connectivity_with_removals,
+        test_connectivity_of_loaded_project,
+        test_tracing_stages,
+        test_profile_sink,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All headless tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()
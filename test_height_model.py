@@ -3,6 +3,8 @@
 
 # Test file to demonstrate height model with rotation
 
+import vpython
+
 from brickstack import *
 
 # Create a project with auto-z enabled
@@ -47,5 +49,5 @@ print("- Yellow and green bricks should be stacked on top")
 print("- Orange brick should be at the highest level")
 
 # Add coordinate markers
-x_marker = curve(pos=[vec(-50, 0, 1), vec(50, 0, 1)], color=color.white)
-y_marker = curve(pos=[vec(0, -50, 1), vec(0, 50, 1)], color=color.white)
+x_marker = vpython.curve(pos=[vpython.vec(-50, 0, 1), vpython.vec(50, 0, 1)], color=vpython.color.white)
+y_marker = vpython.curve(pos=[vpython.vec(0, -50, 1), vpython.vec(0, 50, 1)], color=vpython.color.white)
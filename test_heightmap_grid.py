@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parity tests: HeightmapOccupancyGrid vs. the dict-of-lists OccupancyGrid
+
+Every scenario is played on both grids; get_next_z and the stored intervals
+must be identical. The heightmap replaces brickstack.OccupancyGrid in scenes
+(grid_backend="heightmap"), so the randomized scenarios also run against that one.
+"""
+
+import random
+from math import ceil
+
+import brickstack
+from brickstack_simple import OccupancyGrid
+from brickstack_heightmap import HeightmapOccupancyGrid
+
+
+def make_grids():
+    return OccupancyGrid(), HeightmapOccupancyGrid(initial_size=8)
+
+def assert_same_intervals(reference, heightmap):
+    assert heightmap.points == reference.points
+
+def auto_z(grid, x, y, length, width, brick_system="lego"):
+    z = grid.get_next_z(x, y, length, width)
+    if brick_system == "duplo":
+        return ceil(z * 2) / 2
+    return ceil(z * 3) / 3
+
+def test_empty_grid():
+    """Empty grids return 0 everywhere."""
+    reference, heightmap = make_grids()
+    for x, y in [(0, 0), (-50, 20), (1000, -1000)]:
+        assert heightmap.get_next_z(x, y, 4, 2) == reference.get_next_z(x, y, 4, 2) == 0
+
+def test_tower():
+    """Stacking on one footprint accumulates height."""
+    reference, heightmap = make_grids()
+    for level in range(20):
+        z_ref = auto_z(reference, 0, 0, 2, 2)
+        z_map = auto_z(heightmap, 0, 0, 2, 2)
+        assert z_ref == z_map == level
+        reference.add_brick_footprint(0, 0, z_ref, 2, 2, 1)
+        heightmap.add_brick(0, 0, z_map, 2, 2, 1)
+    assert_same_intervals(reference, heightmap)
+
+def test_growth_in_all_directions():
+    """Footprints far outside the initial heightmap (incl. negative coordinates)."""
+    reference, heightmap = make_grids()
+    for x, y in [(100, 3), (-77, -5), (4, 250), (-3, -300), (512, -512)]:
+        reference.add_brick_footprint(x, y, 0, 4, 2, 1)
+        heightmap.add_brick(x, y, 0, 4, 2, 1)
+    for x, y in [(100, 3), (-77, -5), (4, 250), (-3, -300), (512, -512), (101, 4), (0, 0)]:
+        assert heightmap.get_next_z(x, y, 4, 2) == reference.get_next_z(x, y, 4, 2)
+    assert_same_intervals(reference, heightmap)
+
+def test_partial_overlap_outside_heightmap():
+    """Queries partially outside the heightmap only consider the covered cells."""
+    reference, heightmap = make_grids()
+    reference.add_brick_footprint(0, 0, 0, 2, 2, 3)
+    heightmap.add_brick(0, 0, 0, 2, 2, 3)
+    assert heightmap.get_next_z(-40, -40, 41, 41) == reference.get_next_z(-40, -40, 41, 41) == 3
+
+def test_manual_z_below_existing_bricks():
+    """Intervals placed below the current top never lower the result."""
+    reference, heightmap = make_grids()
+    for z, height in [(5, 1), (0, 1), (2, 0.5), (-3, 1)]:
+        reference.add_brick_footprint(0, 0, z, 3, 3, height)
+        heightmap.add_brick(0, 0, z, 3, 3, height)
+        assert heightmap.get_next_z(0, 0, 3, 3) == reference.get_next_z(0, 0, 3, 3)
+    assert_same_intervals(reference, heightmap)
+
+def test_negative_only_intervals():
+    """A cell holding only intervals below zero reports 0, as the dict grid does."""
+    reference, heightmap = make_grids()
+    reference.add_brick_footprint(1, 1, -2, 1, 1, 1)
+    heightmap.add_brick(1, 1, -2, 1, 1, 1)
+    assert heightmap.get_next_z(1, 1, 1, 1) == reference.get_next_z(1, 1, 1, 1) == 0
+
+def test_empty_footprints():
+    """Zero-sized footprints store nothing."""
+    reference, heightmap = make_grids()
+    reference.add_brick_footprint(0, 0, 0, 0, 2, 1)
+    heightmap.add_brick(0, 0, 0, 0, 2, 1)
+    assert heightmap.get_next_z(0, 0, 2, 2) == reference.get_next_z(0, 0, 2, 2)
+    assert_same_intervals(reference, heightmap)
+
+def test_random_auto_z_builds():
+    """Random auto-z builds for both brick systems."""
+    for brick_system in ["lego", "duplo"]:
+        rng = random.Random(brick_system)
+        reference, heightmap = make_grids()
+        for _ in range(1500):
+            length = rng.choice([1, 2, 3, 4, 6, 8])
+            width = rng.choice([1, 2])
+            if rng.random() < 0.5:
+                length, width = width, length
+            height = rng.choice([1 / 3, 2 / 3, 1, 2]) if brick_system == "lego" else rng.choice([0.5, 1, 2])
+            x = rng.randint(-30, 30)
+            y = rng.randint(-30, 30)
+
+            z_ref = auto_z(reference, x, y, length, width, brick_system)
+            z_map = auto_z(heightmap, x, y, length, width, brick_system)
+            assert z_ref == z_map
+
+            reference.add_brick_footprint(x, y, z_ref, length, width, height)
+            heightmap.add_brick(x, y, z_map, length, width, height)
+        assert_same_intervals(reference, heightmap)
+
+def test_random_manual_z_queries():
+    """Random manual placements and random queries."""
+    rng = random.Random(42)
+    reference, heightmap = make_grids()
+    for _ in range(1000):
+        x, y = rng.randint(-60, 60), rng.randint(-60, 60)
+        length, width = rng.randint(1, 8), rng.randint(1, 8)
+        z = rng.choice([0, 1, 2, 3.5, 10, -1])
+        reference.add_brick_footprint(x, y, z, length, width, 1)
+        heightmap.add_brick(x, y, z, length, width, 1)
+
+        qx, qy = rng.randint(-80, 80), rng.randint(-80, 80)
+        ql, qw = rng.randint(1, 10), rng.randint(1, 10)
+        assert heightmap.get_next_z(qx, qy, ql, qw) == reference.get_next_z(qx, qy, ql, qw)
+
+    for point, intervals in reference.points.items():
+        assert heightmap.get_intervals(*point) == intervals
+
+def brute_force_bounds(points):
+    """Bounds by rescanning every cell, as the camera code used to do."""
+    if not points:
+        return None
+    intervals = [interval for cell in points.values() for interval in cell]
+    return {
+        "min_x": min(x for x, y in points), "max_x": max(x for x, y in points),
+        "min_y": min(y for x, y in points), "max_y": max(y for x, y in points),
+        "min_z": min(z_start for z_start, z_end in intervals),
+        "max_z": max(z_end for z_start, z_end in intervals),
+    }
+
+def test_running_bounds_with_removals():
+    """Running bounds match a full rescan after every add and remove."""
+    rng = random.Random(7)
+    reference, heightmap = make_grids()
+    placed = []
+    for step in range(600):
+        if placed and rng.random() < 0.35:
+            brick = placed.pop(rng.randrange(len(placed)))
+            reference.remove_brick_footprint(*brick)
+            heightmap.remove_brick(*brick)
+        else:
+            x, y = rng.randint(-20, 20), rng.randint(-20, 20)
+            length, width = rng.randint(1, 4), rng.randint(1, 4)
+            z = auto_z(reference, x, y, length, width)
+            brick = (x, y, z, length, width, 1)
+            placed.append(brick)
+            reference.add_brick_footprint(*brick)
+            heightmap.add_brick(*brick)
+
+        expected = brute_force_bounds(reference.points)
+        assert reference.get_bounds() == expected
+        assert heightmap.get_bounds() == expected
+        qx, qy = rng.randint(-22, 22), rng.randint(-22, 22)
+        assert heightmap.get_next_z(qx, qy, 3, 3) == reference.get_next_z(qx, qy, 3, 3)
+    assert_same_intervals(reference, heightmap)
+
+def test_bounds_heaps_after_churn():
+    """Adding and removing the same bricks again and again does not grow the bound heaps."""
+    for grid in (brickstack.OccupancyGrid(), HeightmapOccupancyGrid(initial_size=8)):
+        grid.add_brick(0, 0, 0, 8, 8, 1)
+        for step in range(10_000):
+            brick = (step % 5 + 1, 2, 1, 2, 2, 1)
+            grid.add_brick(*brick)
+            grid.remove_brick(*brick)
+            if step % 1000 == 999:
+                # new values each time, none of them an extreme bound
+                for offset in range(50):
+                    brick = (1, 1, 0.25 + step / 100_000 + offset / 100, 1, 1, 0.1)
+                    grid.add_brick(*brick)
+                    grid.remove_brick(*brick)
+        assert grid.get_bounds() == {"min_x": 0, "max_x": 7, "min_y": 0, "max_y": 7, "min_z": 0, "max_z": 1}
+        assert all(len(heap) <= 2 * len(counts) + 16 for heap, counts in zip(grid.bounds.heaps, grid.bounds.counts))
+
+def test_remove_unknown_brick():
+    """Removing a brick that was never added raises KeyError and changes nothing."""
+    for grid in make_grids():
+        grid.add_brick_footprint(0, 0, 0, 2, 2, 1)
+        try:
+            grid.remove_brick_footprint(0, 0, 1, 2, 2, 1)
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("KeyError expected")
+        assert grid.get_next_z(0, 0, 2, 2) == 1
+
+def test_remove_across_chunks():
+    """Bricks spanning several chunks (also below zero) are removed from all of them; rows are reused."""
+    reference, heightmap = make_grids()
+    bricks = [(-20, -3, 0, 40, 6, 1), (-20, -3, 1, 40, 6, 1), (15, 0, 0, 2, 2, 1)]
+    for brick in bricks:
+        reference.add_brick_footprint(*brick)
+        heightmap.add_brick(*brick)
+    for brick in bricks[:2]:
+        reference.remove_brick_footprint(*brick)
+        heightmap.remove_brick(*brick)
+    assert heightmap.get_next_z(-20, -3, 40, 6) == reference.get_next_z(-20, -3, 40, 6) == 1
+    assert sorted(heightmap.chunks) == [(0, 0), (1, 0)] and heightmap.footprint_count == 1
+    reference.add_brick_footprint(*bricks[0])
+    heightmap.add_brick(*bricks[0])
+    assert heightmap.row_count == 3
+    assert_same_intervals(reference, heightmap)
+
+def scene_grid_scenario(seed, removals):
+    """Random adds (auto and manual z) and removals on brickstack.OccupancyGrid and the heightmap"""
+    rng = random.Random(seed)
+    reference, heightmap = brickstack.OccupancyGrid(), HeightmapOccupancyGrid(initial_size=8)
+    placed = []
+    for step in range(800):
+        if removals and placed and rng.random() < 0.3:
+            brick = placed.pop(rng.randrange(len(placed)))
+            reference.remove_brick(*brick)
+            heightmap.remove_brick(*brick)
+        else:
+            x, y = rng.randint(-40, 40), rng.randint(-40, 40)
+            x_extension, y_extension = rng.randint(1, 8), rng.randint(1, 8)
+            if rng.random() < 0.8:
+                z = auto_z(reference, x, y, x_extension, y_extension)
+                assert z == auto_z(heightmap, x, y, x_extension, y_extension)
+            else:
+                z = rng.choice([0, 1, 2.5, 7, -1])
+            brick = (x, y, z, x_extension, y_extension, rng.choice([1 / 3, 1, 2]))
+            placed.append(brick)
+            reference.add_brick(*brick)
+            heightmap.add_brick(*brick)
+
+        qx, qy = rng.randint(-50, 50), rng.randint(-50, 50)
+        ql, qw = rng.randint(1, 10), rng.randint(1, 10)
+        assert heightmap.get_next_z(qx, qy, ql, qw) == reference.get_next_z(qx, qy, ql, qw)
+        assert heightmap.get_bounds() == reference.get_bounds()
+        assert heightmap.get_xyz_range() == reference.get_xyz_range()
+    # removing takes the first equal interval of a cell, which may come from another brick: compare as sets
+    assert ({cell: sorted(intervals) for cell, intervals in heightmap.points.items()} ==
+            {cell: sorted(intervals) for cell, intervals in reference.points.items()})
+
+def test_scene_grid_parity():
+    """Random builds: heightmap and brickstack.OccupancyGrid agree on next z, bounds and intervals."""
+    scene_grid_scenario(3, removals=False)
+
+def test_scene_grid_parity_with_removals():
+    """Same with removals in between (undo/remove_brick in scenes)."""
+    scene_grid_scenario(11, removals=True)
+
+def run_all_tests():
+    """Run the complete parity suite."""
+    print("Heightmap Occupancy Grid - Parity Tests")
+    print("=" * 40)
+
+    tests = [
+        test_empty_grid,
+        test_tower,
+        test_growth_in_all_directions,
+        test_partial_overlap_outside_heightmap,
+        test_manual_z_below_existing_bricks,
+        test_negative_only_intervals,
+        test_empty_footprints,
+        test_random_auto_z_builds,
+        test_random_manual_z_queries,
+        test_running_bounds_with_removals,
+        test_bounds_heaps_after_churn,
+        test_remove_unknown_brick,
+        test_remove_across_chunks,
+        test_scene_grid_parity,
+        test_scene_grid_parity_with_removals,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All parity tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()
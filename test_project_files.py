@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for project files (BrickProject.save / BrickProject.load)
+
+Runs headless; files are written to a temporary directory.
+"""
+
+import os
+import tempfile
+
+from brickstack import *
+from brickstack_files import read_project
+
+
+def temp_path(name):
+    return os.path.join(tempfile.mkdtemp(), name)
+
+def build_project(**options):
+    project = BrickProject("lego", render=False, **options)
+    scene = project.add_scene()
+    scene.add_baseplate(color.green * 0.4, 16, 12, 2, -3)
+    scene.add_bricks([("rect", 4, 2, h, x % 9, x % 7, 0, vector(0.1 * (x % 3), 0.5, 1 / 3), [NORTH, EAST, SOUTH, WEST][x % 4])
+                      for x, h in zip(range(60), [1 / 3, 2 / 3, 1, 2] * 15)])
+    second = project.add_scene()
+    second.add_brick("rect", 2, 2, 1, -5, 4, 0, color.blue, WEST)
+    return project
+
+def scene_summary(project):
+    return [(list(scene.store), sorted(scene.grid.points.items())) for scene in project.brick_scenes]
+
+def test_roundtrip_text_and_binary():
+    """Both formats restore scenes, bricks (incl. 1/3 heights and colors) and grids exactly."""
+    project = build_project()
+    for name in ["model.bricks", "model.brickb"]:
+        path = temp_path(name)
+        project.save(path)
+        loaded = BrickProject.load(path, render=False)
+        assert loaded.brick_system == "lego"
+        assert scene_summary(loaded) == scene_summary(project)
+
+def test_baseplate_roundtrip():
+    """Baseplate size, position and color survive saving."""
+    path = temp_path("baseplate.bricks")
+    build_project().save(path)
+    baseplate = BrickProject.load(path, render=False).brick_scenes[0].bricks[0]
+    assert isinstance(baseplate, Baseplate)
+    assert (baseplate.stud_y_counter, baseplate.stud_x_counter) == (16, 12)
+    assert (baseplate.grid_lower_left_x, baseplate.grid_lower_left_y) == (2 - 6, -3 - 8)
+    assert baseplate.brick_color == color.green * 0.4
+
+def test_format_detection():
+    """The loader detects the format from the content, not the extension."""
+    project = build_project()
+    path = temp_path("model.dat")
+    project.save(path, file_format="binary")
+    loaded = BrickProject.load(path, render=False)
+    assert scene_summary(loaded) == scene_summary(project)
+
+def test_record_only_roundtrip():
+    """Record-only projects save from their stores and load without brick objects."""
+    project = build_project(brick_objects=False)
+    path = temp_path("records.brickb")
+    project.save(path)
+    loaded = BrickProject.load(path, render=False, brick_objects=False)
+    assert [len(scene.store) for scene in loaded.brick_scenes] == [60, 1]
+    assert all(not isinstance(part, RectangularBrick) for scene in loaded.brick_scenes for part in scene.bricks)
+    assert scene_summary(loaded) == scene_summary(project)
+
+def test_streaming_batches():
+    """Bricks are read in batches of at most batch_size."""
+    project = BrickProject("duplo", render=False, brick_objects=False)
+    project.add_scene().add_bricks(length=2, width=2, x_pos=list(range(0, 2500, 2)))
+    for name in ["stream.bricks", "stream.brickb"]:
+        path = temp_path(name)
+        project.save(path)
+        sizes = [len(data) for kind, data in read_project(path, batch_size=300) if kind == "bricks"]
+        assert sum(sizes) == 1250 and max(sizes) <= 300
+
+def test_stored_auto_z():
+    """auto_z is stored, loading keeps the stored z values either way."""
+    project = BrickProject("duplo", auto_z=False, render=False)
+    project.add_scene().add_brick("rect", 2, 2, 1, 0, 0, 5, color.red, NORTH)
+    path = temp_path("manual.bricks")
+    project.save(path)
+    loaded = BrickProject.load(path, render=False)
+    assert loaded.auto_z is False
+    assert loaded.brick_scenes[0].store.get(0).z == 5
+    assert BrickProject.load(path, render=False, auto_z=True).brick_scenes[0].store.get(0).z == 5
+
+def test_invalid_text_file():
+    """Broken lines are reported with file and line number."""
+    path = temp_path("broken.bricks")
+    with open(path, "w") as project_file:
+        project_file.write("project lego 1\nscene\nbrick rect 4 2 1\n")
+    try:
+        BrickProject.load(path, render=False)
+    except ValueError as error:
+        assert ":3:" in str(error)
+    else:
+        raise AssertionError("ValueError expected")
+
+def run_all_tests():
+    """Run the complete project file test suite."""
+    print("Brick Stack - Project File Tests")
+    print("=" * 40)
+
+    tests = [
+        test_roundtrip_text_and_binary,
+        test_baseplate_roundtrip,
+        test_format_detection,
+        test_record_only_roundtrip,
+        test_streaming_batches,
+        test_stored_auto_z,
+        test_invalid_text_file,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All project file tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()
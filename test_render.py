@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for offscreen rendering (BrickProject.render_to_files, brickstack_render)
+and building instruction booklets (BrickProject.add_step, BrickScene.export_booklet)
+
+Runs headless; images are written to a temporary directory and read back with zlib.
+"""
+
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+from brickstack import *
+from brickstack_render import BACKGROUND
+
+
+def read_png(path):
+    """Decode the 8-bit RGB PNGs written by brickstack_render (filter type 0 only)"""
+    with open(path, "rb") as png_file:
+        data = png_file.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    position, chunks = 8, {}
+    while position < len(data):
+        (length,) = struct.unpack(">I", data[position:position + 4])
+        kind = data[position + 4:position + 8]
+        chunks[kind] = chunks.get(kind, b"") + data[position + 8:position + 8 + length]
+        position += 12 + length
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, width * 3 + 1)
+    assert not raw[:, 0].any()
+    return raw[:, 1:].reshape(height, width, 3)
+
+def background_pixel():
+    return np.array([round(value * 255) for value in BACKGROUND], dtype=np.uint8)
+
+def test_empty_scene():
+    """Scenes without bricks give a valid PNG of the requested size in background color."""
+    project = BrickProject("lego", render=False)
+    project.add_scene()
+    [path] = project.render_to_files(tempfile.mkdtemp(), width=64, height=48, processes=1)
+    image = read_png(path)
+    assert image.shape == (48, 64, 3)
+    assert (image == background_pixel()).all()
+
+def test_brick_in_view():
+    """A single brick is fitted into the image: drawn near the center, not touching the borders."""
+    scene = BrickProject("duplo", render=False).add_scene()
+    scene.add_brick("rect", 4, 2, 1, 10, 5, 0, color.red, NORTH)
+    image = read_png(scene.render_to_file(os.path.join(tempfile.mkdtemp(), "brick.png"), 160, 120))
+    covered = (image != background_pixel()).any(axis=2)
+    assert covered[60, 80]
+    assert not covered[0].any() and not covered[-1].any() and not covered[:, 0].any() and not covered[:, -1].any()
+    # the red brick is shaded, but stays red
+    red = image[covered]
+    assert (red[:, 0] > red[:, 1]).all() and (red[:, 0] > red[:, 2]).all()
+
+def test_camera_matches_canvas_logic():
+    """get_camera follows set_scene/update_camera_position, also for headless scenes."""
+    scene = BrickProject("lego", render=False).add_scene()
+    assert scene.get_camera() == {"pos": (130, -30, 80), "axis": (0, 30, -30)}
+    scene.add_brick("rect", 4, 2, 1, 10, 0, 0, color.red, NORTH)
+    # range includes the origin: x = 0..11 (NORTH: width along x)
+    assert scene.get_camera()["pos"] == ((11 - 11 / 2) * 7.8, -30, 80)
+
+def test_render_scenes_in_pool():
+    """Every scene of a project becomes one image; pool and serial rendering give the same pixels."""
+    project = BrickProject("lego", render=False)
+    for step in range(3):
+        scene = project.add_scene()
+        scene.add_baseplate(color.green * 0.5, 16, 16)
+        scene.add_bricks(length=2, width=2, x_pos=list(range(0, 2 * (step + 1), 2)))
+    output = tempfile.mkdtemp()
+    paths = project.render_to_files(os.path.join(output, "pool"), width=96, height=72, processes=2)
+    serial = project.render_to_files(os.path.join(output, "serial"), width=96, height=72, processes=1)
+    assert [os.path.basename(path) for path in paths] == ["scene_000.png", "scene_001.png", "scene_002.png"]
+    for pool_path, serial_path in zip(paths, serial):
+        assert (read_png(pool_path) == read_png(serial_path)).all()
+
+def test_render_project_files():
+    """Project files are loaded headless and rendered into one directory per file."""
+    directory = tempfile.mkdtemp()
+    project = BrickProject("lego", render=False)
+    project.add_scene().add_bricks(length=4, width=2, x_pos=[0, 0, 4])
+    project.add_scene().add_brick("rect", 2, 2, 1, 0, 0, 0, color.blue, EAST)
+    project.save(os.path.join(directory, "house.bricks"))
+    project.save(os.path.join(directory, "tower.brickb"))
+
+    results = render_project_files([os.path.join(directory, "house.bricks"), os.path.join(directory, "tower.brickb")],
+                                   os.path.join(directory, "renders"), processes=2, width=64, height=48)
+    assert [[os.path.relpath(path, directory) for path in paths] for paths in results] == [
+        [os.path.join("renders", "house", "scene_000.png"), os.path.join("renders", "house", "scene_001.png")],
+        [os.path.join("renders", "tower", "scene_000.png"), os.path.join("renders", "tower", "scene_001.png")],
+    ]
+    assert (read_png(results[0][0]) == read_png(results[1][0])).all()
+
+def build_steps():
+    project = BrickProject("duplo", render=False)
+    project.add_step().add_baseplate(color.green * 0.5, 12, 12, 2, 2)
+    scene = project.add_step()
+    scene.add_bricks(length=4, width=2, x_pos=[0, 4], brick_color=color.red)
+    project.add_step()
+    project.add_step()  # no bricks yet: still the same step
+    scene.add_brick("rect", 2, 2, 1, 2, 0, 0, color.blue, NORTH)
+    project.add_step().add_brick("rect", 2, 2, 1, 2, 0, 0, color.yellow, NORTH)
+    return project, scene
+
+def test_steps_share_one_scene():
+    """Steps are deltas of one scene: shared grid (auto-z across steps), one store."""
+    project, scene = build_steps()
+    assert len(project.brick_scenes) == 1
+    assert scene.get_step_ranges() == [(0, 2), (2, 3), (3, 4)]
+    assert [row[6] for row in scene.get_step_rows(1)] == [0] and [row[6] for row in scene.get_step_rows(2)] == [1]
+    assert len(scene.store) == 4
+
+def test_booklet_matches_full_render():
+    """Incremental step images end with the same picture as rendering the finished scene at once."""
+    project, scene = build_steps()
+    output = tempfile.mkdtemp()
+    paths = scene.export_booklet(output, 120, 90, highlight=False, page=None)
+    assert [os.path.basename(path) for path in paths] == ["step_000.png", "step_001.png", "step_002.png"]
+    full = read_png(scene.render_to_file(os.path.join(output, "full.png"), 120, 90))
+    assert (read_png(paths[-1]) == full).all()
+    # earlier steps show less
+    covered = [(read_png(path) != background_pixel()).any(axis=2).sum() for path in paths]
+    assert covered[0] <= covered[1] <= covered[2]
+
+def test_booklet_highlight():
+    """New bricks keep their colors, earlier bricks are faded; the page lists the parts of each step."""
+    project, scene = build_steps()
+    output = tempfile.mkdtemp()
+    plain = scene.export_booklet(os.path.join(output, "plain"), 120, 90, highlight=False, page=None)
+    highlighted = scene.export_booklet(os.path.join(output, "highlight"), 120, 90)
+    plain_image, highlighted_image = read_png(plain[-1]), read_png(highlighted[-1])
+    changed = (plain_image != highlighted_image).any(axis=2)
+    assert changed.any()
+    # the yellow brick of the last step is unchanged, faded pixels only get lighter
+    yellow = (plain_image[:, :, 0] > 100) & (plain_image[:, :, 1] > 100) & (plain_image[:, :, 2] < 50)
+    assert yellow.any() and not (changed & yellow).any()
+    assert (highlighted_image[changed] >= plain_image[changed]).all()
+
+    with open(os.path.join(output, "highlight", "booklet.html"), encoding="utf-8") as page_file:
+        page = page_file.read()
+    assert page.count('<div class="step">') == 3
+    assert "2 x" in page and "rect 4x2x1" in page and 'src="step_002.png"' in page
+
+def run_all_tests():
+    """Run the complete rendering test suite."""
+    print("Brick Stack - Render Tests")
+    print("=" * 40)
+
+    tests = [
+        test_empty_scene,
+        test_brick_in_view,
+        test_camera_matches_canvas_logic,
+        test_render_scenes_in_pool,
+        test_render_project_files,
+        test_steps_share_one_scene,
+        test_booklet_matches_full_render,
+        test_booklet_highlight,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All render tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -3,6 +3,8 @@
 
 # Test file to demonstrate fixed rotation functionality
 
+import vpython
+
 from brickstack import *
 
 # Create a project
@@ -36,8 +38,8 @@ test_project.brick_scenes[0].add_brick(
 )
 
 # Add some coordinate markers for reference
-x_marker = curve(pos=[vec(-50, 0, 1), vec(50, 0, 1)], color=color.white)
-y_marker = curve(pos=[vec(0, -50, 1), vec(0, 50, 1)], color=color.white)
+x_marker = vpython.curve(pos=[vpython.vec(-50, 0, 1), vpython.vec(50, 0, 1)], color=vpython.color.white)
+y_marker = vpython.curve(pos=[vpython.vec(0, -50, 1), vpython.vec(0, 50, 1)], color=vpython.color.white)
 
 print("Test completed! All four orientations should now be visible.")
 print("Blue=NORTH, Red=EAST, Yellow=SOUTH, Green=WEST")
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the 3d-object side of brickstack against a stand-in vpython module
+
+vpython needs a browser, so these tests hand brickstack a small module with the
+same constructors (brickstack_vector.use_vpython). Its objects know their bounds
+in scene coordinates, pos and visibility, and every created object is counted,
+so positions, object counts and cache behavior can be checked without a canvas.
+
+Like vpython, compounds are placed by the center of their bounding box, clone()
+always gives a visible object and cloned extrusions/compounds are compounds.
+"""
+
+import types
+from math import cos, sin
+
+from brickstack import *
+from brickstack_vector import use_vpython, vector
+
+
+##### stand-in vpython #####
+
+class StubObject:
+    """3d-object with bounds (lower and upper corner in scene coordinates), pos and visibility"""
+    def __init__(self, kind, lower, upper, pos = None, color = None, **attributes):
+        self.kind = kind
+        self.lower = tuple(lower)
+        self.upper = tuple(upper)
+        self._pos = tuple(pos) if pos is not None else tuple((low + high) / 2 for low, high in zip(self.lower, self.upper))
+        self.color = color
+        self.visible = True
+        self.attributes = attributes
+        STUB.objects.append(self)
+
+    @property
+    def pos(self):
+        return vector(*self._pos)
+
+    @pos.setter
+    def pos(self, value):
+        delta = (value.x - self._pos[0], value.y - self._pos[1], value.z - self._pos[2])
+        self.lower = tuple(low + step for low, step in zip(self.lower, delta))
+        self.upper = tuple(high + step for high, step in zip(self.upper, delta))
+        self._pos = (value.x, value.y, value.z)
+
+    def rotate(self, angle, axis, origin = None):
+        """Rotation around a z-axis through origin (default pos), bounds stay axis-aligned"""
+        assert (axis.x, axis.y) == (0, 0)
+        center = self._pos if origin is None else (origin.x, origin.y, origin.z)
+        corners = [(x - center[0], y - center[1]) for x in (self.lower[0], self.upper[0]) for y in (self.lower[1], self.upper[1])]
+        turned = [(round(x * cos(angle) - y * sin(angle), 9), round(x * sin(angle) + y * cos(angle), 9)) for x, y in corners]
+        self.lower = (center[0] + min(x for x, y in turned), center[1] + min(y for x, y in turned), self.lower[2])
+        self.upper = (center[0] + max(x for x, y in turned), center[1] + max(y for x, y in turned), self.upper[2])
+
+    def clone(self, **args):
+        kind = "compound" if self.kind in ("compound", "extrusion") else self.kind
+        copy = StubObject(kind, self.lower, self.upper, self._pos, self.color, **self.attributes)
+        copy.source = self
+        for name, value in args.items():
+            setattr(copy, name, value)
+        return copy
+
+    def size(self):
+        return tuple(round(high - low, 6) for low, high in zip(self.lower, self.upper))
+
+
+def stub_box(pos, axis, length, height, width, color = None, up = None):
+    # length runs along axis, height along z, width across
+    x_size, y_size = (length, width) if axis.x else (width, length)
+    return StubObject("box", (pos.x - x_size / 2, pos.y - y_size / 2, pos.z - height / 2),
+                      (pos.x + x_size / 2, pos.y + y_size / 2, pos.z + height / 2), pos = (pos.x, pos.y, pos.z), color = color)
+
+def stub_cylinder(pos, radius, axis, color = None):
+    return StubObject("cylinder", (pos.x - radius, pos.y - radius, pos.z), (pos.x + radius, pos.y + radius, pos.z + axis.z),
+                      pos = (pos.x, pos.y, pos.z), color = color)
+
+def stub_extrusion(shape, path, color = None):
+    x_min, y_min, x_max, y_max = shape
+    return StubObject("extrusion", (min(point.x for point in path) + x_min, min(point.y for point in path) + y_min, min(point.z for point in path)),
+                      (max(point.x for point in path) + x_max, max(point.y for point in path) + y_max, max(point.z for point in path)),
+                      color = color)
+
+def stub_compound(objects, **args):
+    for part in objects:
+        part.visible = False
+    compound = StubObject("compound", [min(part.lower[axis] for part in objects) for axis in range(3)],
+                          [max(part.upper[axis] for part in objects) for axis in range(3)], **args)
+    compound.parts = list(objects)
+    return compound
+
+def stub_vertex(pos, normal, color = None):
+    return types.SimpleNamespace(pos = pos, normal = normal, color = color)
+
+def stub_triangle(vs):
+    positions = [(vertex.pos.x, vertex.pos.y, vertex.pos.z) for vertex in vs]
+    triangle = StubObject("triangle", [min(axis) for axis in zip(*positions)], [max(axis) for axis in zip(*positions)])
+    triangle.vs = vs
+    return triangle
+
+
+class StubCanvas:
+    selected = None
+
+    def __init__(self, **args):
+        self.attributes = args
+        self.camera = types.SimpleNamespace(pos = None, axis = None)
+        STUB.canvases.append(self)
+        self.select()
+
+    def select(self):
+        StubCanvas.selected = self
+
+    @classmethod
+    def get_selected(cls):
+        return cls.selected
+
+
+STUB = types.ModuleType("vpython_stub")
+STUB.objects = []
+STUB.canvases = []
+STUB.vector = STUB.vec = vector
+STUB.color = color
+STUB.canvas = StubCanvas
+STUB.box = stub_box
+STUB.cylinder = stub_cylinder
+STUB.extrusion = stub_extrusion
+STUB.compound = stub_compound
+STUB.vertex = stub_vertex
+STUB.triangle = stub_triangle
+STUB.shapes = types.SimpleNamespace(
+    circle = lambda radius, thickness = None: (-radius, -radius, radius, radius),
+    rectangle = lambda pos, width, height, roundness = 0: (pos[0] - width / 2, pos[1] - height / 2, pos[0] + width / 2, pos[1] + height / 2))
+
+
+def stubbed(test):
+    """Run test with the stand-in module and empty 3d-object caches"""
+    def run():
+        STUB.objects.clear()
+        STUB.canvases.clear()
+        StudTemplateCache.clear()
+        use_vpython(STUB)
+        try:
+            test()
+        finally:
+            use_vpython(None)
+            StudTemplateCache.clear()
+            RectangularBrick.mesh_cache.clear()
+            Baseplate.compound_cache.clear()
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+def created(kind):
+    """Objects of a kind built from scratch (not cloned)"""
+    return sum(1 for part in STUB.objects if part.kind == kind and not hasattr(part, "source"))
+
+def brick_bounds(brick_system, length, width, height, x, y, orientation):
+    """Expected x/y bounds (mm) and height with studs of a brick"""
+    specs = BasicBrick.BRICK_SPECS[brick_system]
+    x_extension, y_extension = get_grid_footprint(length, width, orientation)
+    return ((x * specs["xy_factor"], y * specs["xy_factor"]),
+            ((x + x_extension) * specs["xy_factor"], (y + y_extension) * specs["xy_factor"]),
+            height * specs["z_factor"] + specs["stud_height"])
+
+def assert_brick_at(brick, length, width, height, x, y, orientation):
+    lower, upper, full_height = brick_bounds(brick.brick_system, length, width, height, x, y, orientation)
+    compound = brick.compound
+    assert [round(value, 6) for value in compound.lower[:2]] == [round(value, 6) for value in lower]
+    assert [round(value, 6) for value in compound.upper[:2]] == [round(value, 6) for value in upper]
+    assert round(compound.upper[2] - compound.lower[2], 6) == round(full_height, 6)
+
+
+##### stud templates #####
+
+@stubbed
+def test_stud_templates_are_cloned():
+    """Studs are clones of one invisible template per (canvas, system, stud kind); the bricks built from them are visible."""
+    scene = BrickProject("lego").add_scene()
+    RectangularBrick.mesh_cache, mesh_cache = None, RectangularBrick.mesh_cache
+    try:
+        first = scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+        second = scene.add_brick("rect", 2, 2, 1, 6, 0, 0, color.blue, EAST)
+    finally:
+        RectangularBrick.mesh_cache = mesh_cache
+    assert len(StudTemplateCache.templates) == 1 and created("cylinder") == 1
+    template = next(iter(StudTemplateCache.templates.values()))
+    assert template.visible is False
+    studs = [part for part in STUB.objects if getattr(part, "source", None) is template]
+    assert len(studs) == 8 + 4 and first.compound.visible and second.compound.visible
+    # parts keep the positions they were built at: stud centers around the body center at the origin
+    specs = BasicBrick.BRICK_SPECS["lego"]
+    assert all(part.size() == template.size() for part in studs)
+    assert sorted((round(part.pos.x, 6), round(part.pos.y, 6)) for part in first.compound.parts[1:]) == \
+        sorted((round(-specs["xy_factor"] + specs["stud_xy_offset"] + x_stud * specs["stud_spacing"], 6),
+                round(-2 * specs["xy_factor"] + specs["stud_xy_offset"] + y_stud * specs["stud_spacing"], 6))
+               for x_stud in range(2) for y_stud in range(4))
+    assert_brick_at(first, 4, 2, 1, 0, 0, NORTH)
+    assert_brick_at(second, 2, 2, 1, 6, 0, EAST)
+
+@stubbed
+def test_hollow_stud_clone_offset():
+    """Hollow duplo studs are extrusions placed by their center: the clone is moved up by half a stud height."""
+    scene = BrickProject("duplo").add_scene()
+    RectangularBrick.mesh_cache, mesh_cache = None, RectangularBrick.mesh_cache
+    try:
+        brick = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    finally:
+        RectangularBrick.mesh_cache = mesh_cache
+    specs = BasicBrick.BRICK_SPECS["duplo"]
+    (key, template), = StudTemplateCache.templates.items()
+    assert key[1:] == ("duplo", True) and template.kind == "extrusion" and created("extrusion") == 1
+    studs = brick.compound.parts[1:]
+    assert len(studs) == 4 and all(stud.kind == "compound" and stud.visible is False for stud in studs)
+    body = brick.compound.parts[0]
+    # every stud stands on the body, from its top up to one stud height
+    assert all(round(stud.lower[2] - body.upper[2], 6) == 0 for stud in studs)
+    assert all(round(stud.upper[2] - stud.lower[2], 6) == specs["stud_height"] for stud in studs)
+    assert_brick_at(brick, 2, 2, 1, 0, 0, NORTH)
+
+@stubbed
+def test_stud_templates_per_canvas():
+    """Each canvas gets its own templates, since 3d-objects belong to one canvas."""
+    project = BrickProject("lego")
+    first_scene, second_scene = project.add_scene(), project.add_scene()
+    RectangularBrick.mesh_cache, mesh_cache = None, RectangularBrick.mesh_cache
+    try:
+        first_scene.scene.select()
+        first_scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+        second_scene.scene.select()
+        second_scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    finally:
+        RectangularBrick.mesh_cache = mesh_cache
+    assert len(STUB.canvases) == 2 and len(StudTemplateCache.templates) == 2 and created("cylinder") == 2
+
+
+
+##### brick mesh cache #####
+
+@stubbed
+def test_mesh_cache_hits_and_positions():
+    """Bricks of one shape and color are clones of one cached compound, placed and turned per brick."""
+    scene = BrickProject("lego").add_scene()
+    cache = RectangularBrick.mesh_cache
+    hits, misses = cache.hits, cache.misses
+    placements = [(0, 0, NORTH), (6, 0, EAST), (0, 6, SOUTH), (6, 6, WEST)]
+    bricks = [scene.add_brick("rect", 4, 2, 1, x, y, 0, color.red, orientation) for x, y, orientation in placements]
+    assert (cache.hits - hits, cache.misses - misses) == (3, 1) and len(cache.entries) == 1
+    template, = cache.entries.values()
+    assert template.visible is False and all(brick.compound.source is template and brick.compound.visible for brick in bricks)
+    # the template is built once: one box, one stud template
+    assert created("box") == 1 and created("cylinder") == 1
+    for brick, (x, y, orientation) in zip(bricks, placements):
+        assert_brick_at(brick, 4, 2, 1, x, y, orientation)
+    assert len({brick.compound.lower[2] for brick in bricks}) == 1
+
+@stubbed
+def test_mesh_cache_keys():
+    """Size, color, stud kind and covered studs are part of the key; orientation and position are not."""
+    scene = BrickProject("duplo", cull_hidden_studs=True).add_scene()
+    cache = RectangularBrick.mesh_cache
+    scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    scene.add_brick("rect", 2, 2, 1, 4, 0, 0, color.red, EAST)
+    scene.add_brick("rect", 2, 2, 1, 8, 0, 0, color.blue, NORTH)
+    scene.add_brick("rect", 2, 4, 1, 0, 4, 0, color.red, NORTH)
+    keys = list(cache.entries)
+    assert len(keys) == 3 and {key[1:4] for key in keys} == {("duplo", 2, 2), ("duplo", 2, 4)}
+    assert all(key[6] == "hollow" and key[7] == frozenset() for key in keys)
+    # a brick on top hides two studs of the first one: that brick is rebuilt under a new key
+    scene.add_brick("rect", 2, 1, 1, 0, 0, 1, color.green, NORTH)
+    hidden = [key for key in cache.entries if key[7]]
+    assert len(hidden) == 1 and len(hidden[0][7]) == 2 and hidden[0][5] == (1, 0, 0)
+
+@stubbed
+def test_mesh_cache_eviction():
+    """The least recently used compound is evicted once the cache is full."""
+    cache = BrickMeshCache(max_size=2)
+    RectangularBrick.mesh_cache, mesh_cache = cache, RectangularBrick.mesh_cache
+    try:
+        scene = BrickProject("lego").add_scene()
+        for length in (1, 2, 1, 3):
+            scene.add_brick("rect", length, 1, 1, 0, length * 4, 0, color.red, NORTH)
+        assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2, "max_size": 2}
+        # 2 was used least recently and is gone, 1 is still there
+        assert sorted(key[2] for key in cache.entries) == [1, 3]
+        scene.add_brick("rect", 2, 1, 1, 0, 20, 0, color.red, NORTH)
+        scene.add_brick("rect", 3, 1, 1, 0, 24, 0, color.red, NORTH)
+        assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
+        assert created("box") == 4
+    finally:
+        RectangularBrick.mesh_cache = mesh_cache
+
+
+##### chunked scenes #####
+
+def chunk_merges():
+    """Compounds merged from clones of brick compounds (chunk compounds)"""
+    return [part for part in STUB.objects if part.kind == "compound" and getattr(part, "parts", None)
+            and all(getattr(member, "source", None) is not None and member.source.kind == "compound" for member in part.parts)
+            and not hasattr(part, "source")]
+
+@stubbed
+def test_chunks_merge_bricks():
+    """Each chunk is one visible compound of clones; brick compounds stay hidden as sources."""
+    scene = BrickProject("lego", chunk_size=4).add_scene()
+    first = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    second = scene.add_brick("rect", 2, 2, 1, 2, 0, 0, color.blue, NORTH)
+    single = scene.add_brick("rect", 2, 2, 1, 4, 0, 0, color.red, EAST)
+    compounds = scene.chunks.compounds
+    assert sorted(compounds) == [(0, 0, 0), (1, 0, 0)] and scene.get_draw_object_count() == 2
+    assert not any(brick.compound.visible for brick in (first, second, single))
+    merged = compounds[(0, 0, 0)]
+    assert merged.visible and [part.source for part in merged.parts] == [first.compound, second.compound]
+    assert merged.lower[:2] == first.compound.lower[:2] and merged.upper[:2] == second.compound.upper[:2]
+    # a chunk with one brick shows a visible clone of it
+    assert compounds[(1, 0, 0)].source is single.compound and compounds[(1, 0, 0)].visible
+
+@stubbed
+def test_chunks_rebuild_only_dirty():
+    """Adding or removing a brick rebuilds its chunk only; the replaced compound is hidden."""
+    scene = BrickProject("lego", chunk_size=4).add_scene()
+    scene.add_bricks([("rect", 1, 1, 1, x, 0, 0, color.red, NORTH) for x in range(8)])
+    assert len(chunk_merges()) == 2  # one merge per chunk for the whole batch
+    left, right = scene.chunks.compounds[(0, 0, 0)], scene.chunks.compounds[(1, 0, 0)]
+    added = scene.add_brick("rect", 1, 1, 1, 0, 1, 0, color.red, NORTH)
+    assert left.visible is False and scene.chunks.compounds[(1, 0, 0)] is right and right.visible
+    assert len(scene.chunks.compounds[(0, 0, 0)].parts) == 5 and len(chunk_merges()) == 3
+    scene.remove_brick(added)
+    assert len(scene.chunks.compounds[(0, 0, 0)].parts) == 4 and scene.chunks.compounds[(1, 0, 0)] is right
+    # the last brick of a chunk takes the chunk compound with it
+    for brick in list(scene.bricks)[4:]:
+        scene.remove_brick(brick)
+    assert sorted(scene.chunks.compounds) == [(0, 0, 0)] and right.visible is False
+
+
+##### level of detail #####
+
+@stubbed
+def test_lod_swaps_reuse_compounds():
+    """Switching tiers hides the old compound and shows the kept one again instead of building it twice."""
+    scene = BrickProject("lego").add_scene()
+    brick = scene.add_brick("rect", 4, 2, 1, 0, 0, 0, color.red, NORTH)
+    full = brick.compound
+    # lego studs are solid in both tiers: nothing to swap
+    assert scene.set_lod("solid") == 0 and brick.compound is full
+    assert scene.set_lod("flat") == 1 and full.visible is False
+    flat = brick.compound
+    assert flat.visible and len(flat.source.parts) == 1 and flat.source.parts[0].kind == "box"
+    specs = BasicBrick.BRICK_SPECS["lego"]
+    assert flat.lower[:2] == full.lower[:2] and flat.upper[:2] == full.upper[:2]
+    assert round(flat.upper[2] - flat.lower[2], 6) == specs["z_factor"]
+    # bodies stay where they were (both tiers start at the same height)
+    assert round(flat.lower[2] - full.lower[2], 6) == 0
+    object_count = len(STUB.objects)
+    assert scene.set_lod("full") == 1 and brick.compound is full and full.visible and flat.visible is False
+    assert len(STUB.objects) == object_count and brick.lod_compounds == {None: flat}
+    assert scene.get_lod_counts() == {"full": 1, "solid": 0, "flat": 0}
+
+@stubbed
+def test_lod_duplo_solid_studs():
+    """Duplo bricks swap hollow studs (extrusions) for plain cylinders in the "solid" tier."""
+    scene = BrickProject("duplo").add_scene()
+    brick = scene.add_brick("rect", 2, 2, 1, 0, 0, 0, color.red, NORTH)
+    full = brick.compound
+    assert scene.set_lod("solid") == 1 and full.visible is False
+    studs = brick.compound.source.parts[1:]
+    assert len(studs) == 4 and all(stud.kind == "cylinder" and stud.source.kind == "cylinder" for stud in studs)
+    assert created("extrusion") == 1 and created("cylinder") == 1
+    assert_brick_at(brick, 2, 2, 1, 0, 0, NORTH)
+    assert scene.set_lod("full") == 1 and brick.compound is full and full.visible
+
+@stubbed
+def test_lod_culled_baseplate_rows():
+    """Culled baseplates keep their plate and hide or show their stud row compounds."""
+    scene = BrickProject("lego", cull_hidden_studs=True).add_scene()
+    baseplate = scene.add_baseplate(color.green, 4, 4)
+    plate, rows = baseplate.compound, dict(baseplate.stud_row_compounds)
+    assert plate.kind == "extrusion" and len(rows) == 4 and all(len(row.parts) == 4 for row in rows.values())
+    assert scene.set_lod("flat") == 1 and baseplate.compound is plate and plate.visible
+    assert not any(row.visible for row in rows.values())
+    object_count = len(STUB.objects)
+    assert scene.set_lod("full") == 1 and baseplate.stud_row_compounds == rows
+    assert all(row.visible for row in rows.values()) and len(STUB.objects) == object_count
+    # a row covered completely while flat has no studs to show afterwards
+    scene.set_lod("flat")
+    scene.add_brick("rect", 1, 4, 1, -2, -2, 0, color.red, NORTH)
+    scene.set_lod("full")
+    assert sorted(baseplate.stud_row_compounds) == [1, 2, 3] and all(row.visible for row in baseplate.stud_row_compounds.values())
+
+##### baseplate cache #####
+
+@stubbed
+def test_baseplate_cache_hits():
+    """Baseplates of one size and color are clones of one cached compound, moved to their center."""
+    scene = BrickProject("lego").add_scene()
+    cache = Baseplate.compound_cache
+    hits, misses = cache.hits, cache.misses
+    first = scene.add_baseplate(color.green, 4, 6)
+    second = scene.add_baseplate(color.green, 4, 6, 10, -4)
+    assert (cache.hits - hits, cache.misses - misses) == (1, 1) and len(cache.entries) == 1
+    template, = cache.entries.values()
+    assert template.visible is False and first.compound.source is template and second.compound.source is template
+    # built once: one plate and one compound of 24 stud clones
+    assert created("extrusion") == 1 and len(template.parts) == 1 + 24
+    assert all(stud.source is next(iter(StudTemplateCache.templates.values())) for stud in template.parts[1:])
+    xy_factor = BasicBrick.BRICK_SPECS["lego"]["xy_factor"]
+    # length 4 and width 6 studs: 6 along x, 4 along y
+    for baseplate, (center_x, center_y) in ((first, (0, 0)), (second, (10, -4))):
+        assert baseplate.compound.visible
+        assert [round(value, 6) for value in baseplate.compound.lower[:2]] == [round((center_x - 3) * xy_factor, 6), round((center_y - 2) * xy_factor, 6)]
+        assert [round(value, 6) for value in baseplate.compound.upper[:2]] == [round((center_x + 3) * xy_factor, 6), round((center_y + 2) * xy_factor, 6)]
+    assert first.compound.lower[2] == second.compound.lower[2] and first.compound.upper[2] == second.compound.upper[2]
+    # another color or size is another entry
+    scene.add_baseplate(color.blue, 4, 6, 20, 0)
+    scene.add_baseplate(color.green, 6, 4, -20, 0)
+    assert (cache.hits - hits, cache.misses - misses) == (1, 3) and len(cache.entries) == 3 and created("extrusion") == 3
+
+@stubbed
+def test_baseplate_cache_duplo_corners():
+    """Duplo baseplates have no corner studs, in the cached compound as well."""
+    scene = BrickProject("duplo").add_scene()
+    baseplate = scene.add_baseplate(color.green, 4, 4)
+    assert len(baseplate.compound.source.parts) == 1 + 16 - 4
+
+
+##### vertex buffer geometry #####
+
+@stubbed
+def test_buffer_compounds():
+    """geometry="buffers" builds one vertex per buffer vertex, shared by the triangles, at scene coordinates."""
+    from brickstack_buffers import generate_buffers
+    scene = BrickProject("duplo", geometry="buffers", geometry_processes=1).add_scene()
+    bricks = scene.add_bricks([("rect", 4, 2, 1, 2, 0, 0, color.red, NORTH), ("rect", 4, 2, 2, 0, 4, 1, color.blue, EAST)])
+    specs = BasicBrick.BRICK_SPECS["duplo"]
+    for brick, (positions, normals, indices) in zip(bricks, generate_buffers([brick.get_mesh_part() for brick in bricks], specs, 1)):
+        compound = brick.compound
+        assert compound.visible and all(part.kind == "triangle" for part in compound.parts)
+        assert len(compound.parts) == len(indices)
+        # every buffer index stands for one vertex object, whichever triangle uses it
+        vertices = {}
+        for triangle, corners in zip(compound.parts, indices.tolist()):
+            for vertex, corner in zip(triangle.vs, corners):
+                assert vertices.setdefault(corner, vertex) is vertex
+        assert len(vertices) == len({id(vertex) for vertex in vertices.values()}) == len(positions)
+        # no move or rotation: the box of the brick plus studs on top
+        lower, upper = brick.get_box()
+        assert [round(value, 4) for value in compound.lower] == [round(value, 4) for value in lower]
+        assert [round(value, 4) for value in compound.upper] == [round(value, 4) for value in upper[:2]] + [round(upper[2] + specs["stud_height"], 4)]
+    assert created("box") == created("cylinder") == created("extrusion") == 0
+
+
+##### simple version #####
+
+@stubbed
+def test_simple_add_bricks_columns():
+    """brickstack_simple checks add_bricks columns like BrickScene: no silent truncation, nothing to add is no error."""
+    import brickstack_simple
+    scene = brickstack_simple.BrickProject("lego").add_scene()
+    assert scene.add_bricks() == [] and scene.bricks == []
+    bricks = scene.add_bricks(length=2, width=2, x_pos=[0, 0, 4], brick_color=color.blue)
+    # the second brick lands on the first one (mm: 7.8 per stud, 9.6 per brick height)
+    assert [(round(brick.x, 6), round(brick.y, 6), round(brick.z, 6)) for brick in bricks] == [(0, 0, 0), (0, 0, 9.6), (31.2, 0, 0)]
+    for columns, error in (({"x_pos": [0, 4], "y_pos": [0, 4, 8]}, ValueError), ({"colour": color.red}, TypeError)):
+        try:
+            scene.add_bricks(**columns)
+            assert False, f"{error.__name__} expected"
+        except error:
+            pass
+    try:
+        scene.add_bricks([("rect", 2, 2, 1, 8, 0)], x_pos=[0])
+        assert False, "ValueError expected"
+    except ValueError:
+        pass
+    assert len(scene.bricks) == 3
+
+
+def run_all_tests():
+    """Run all tests against the stand-in vpython module."""
+    print("Brick Stack - 3d-Object Tests (stand-in vpython)")
+    print("=" * 40)
+
+    tests = [
+        test_stud_templates_are_cloned,
+        test_hollow_stud_clone_offset,
+        test_stud_templates_per_canvas,
+        test_mesh_cache_hits_and_positions,
+        test_mesh_cache_keys,
+        test_mesh_cache_eviction,
+        test_chunks_merge_bricks,
+        test_chunks_rebuild_only_dirty,
+        test_lod_swaps_reuse_compounds,
+        test_lod_duplo_solid_studs,
+        test_lod_culled_baseplate_rows,
+        test_baseplate_cache_hits,
+        test_baseplate_cache_duplo_corners,
+        test_buffer_compounds,
+        test_simple_add_bricks_columns,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+
+    print("\n🎉 All 3d-object tests passed!")
+
+if __name__ == "__main__":
+    run_all_tests()